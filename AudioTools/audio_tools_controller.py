@@ -1,17 +1,28 @@
 # AudioTools/audio_tools_controller.py
 
 import os
+import time
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import subprocess
-import json
 import re
 from mutagen.flac import FLAC
 from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, APIC, TPE1, TIT2, TALB, TDRC, TCON
+from mutagen.id3 import ID3
 from PIL import Image
 
 from Utils.logger_setup import LoggerProvider
-from Utils.ffmpeg_utils import run_ffmpeg, stop_ffmpeg_processes
+from Utils.ffmpeg_utils import run_ffmpeg, stop_ffmpeg_processes, get_media_duration
+from Utils.output_cache import get_output_cache
+from Utils.thumbnail_cache import ThumbnailCache
+from Utils.parallel_encode import default_worker_count
+from .loudness import LoudnessService, resolve_targets, TARGET_TRACK
+from .bulk_tagger import (
+    TAG_FIELDS, list_audio_files, load_tags_parallel, apply_templates,
+    build_cover_frame, write_tags, write_rows_parallel,
+)
+from .denoise_engine import build_denoise_filter, learn_noise_floor, denoise_chunked, MIN_CHUNKED_SECONDS, CHUNKS_PER_WORKER, CHUNK_OVERLAP_SECONDS
+from Utils.job_journal import JobJournal, STATE_RUNNING, STATE_DONE, STATE_FAILED, STATE_CANCELLED, RESUME_RETRY_MS, temp_output_path, commit_output, discard_output
 
 class AudioToolsController:
     def __init__(self, gui, project_root, thread_pool):
@@ -22,10 +33,35 @@ class AudioToolsController:
         
         self.active_ffmpeg_pids = []
         self.is_processing = False
+        self.is_closing = False
         self.task_lock = threading.Lock()
         self.active_tasks = 0
+        # Giới hạn chung số tiến trình FFmpeg giảm tạp âm cho cả lô: các file được xử lý đồng thời và
+        # file dài còn tự chia đoạn, nên không có giới hạn chung thì số tiến trình = số file x số nhân
+        self.ffmpeg_slots = threading.BoundedSemaphore(default_worker_count(threads_per_job=1))
+
+        # Nhật ký tác vụ: loại tác vụ -> (hàm xử lý, tên thao tác hiển thị)
+        self.journal = JobJournal(project_root, "audio_tools")
+        # Cache output: cùng file + cùng cài đặt thì lấy lại kết quả cũ thay vì chạy lại FFmpeg
+        self.output_cache = get_output_cache(project_root)
+        # Số đo độ lớn âm thanh (pass 1) được cache theo file, dùng lại khi đổi mức mục tiêu
+        self.loudness = LoudnessService(project_root)
+        self.task_kinds = {
+            "normalize": (self.run_normalization_task, "chuẩn hóa âm lượng"),
+            "denoise": (self.run_noise_reduction_task, "giảm tạp âm"),
+        }
+        # Bảng tag của chế độ sửa hàng loạt và khung ảnh bìa đã đóng gói sẵn
+        self.bulk_rows = []
+        self.cover_frames = {}
+        # Ảnh bìa được thu nhỏ trên một luồng riêng (không chờ các tác vụ FFmpeg trong thread_pool)
+        self.thumbnails = ThumbnailCache(project_root)
+        self.thumbnail_executor = ThreadPoolExecutor(max_workers=1)
+        self.cover_request_id = 0
 
     def on_closing(self):
+        # Các tác vụ bị dừng do đóng ứng dụng vẫn giữ trạng thái "chưa xong" trong nhật ký
+        self.is_closing = True
+        self.thumbnail_executor.shutdown(wait=False)
         if self.active_ffmpeg_pids:
             self.logger.warning(f"Đang dừng {len(self.active_ffmpeg_pids)} tiến trình FFmpeg...")
             stop_ffmpeg_processes(self.active_ffmpeg_pids)
@@ -35,51 +71,150 @@ class AudioToolsController:
             self.active_tasks -= 1
             if self.active_tasks == 0:
                 self.is_processing = False
+                self.journal.compact()
                 self.gui.root.after(100, self.gui.finalize_processing, operation_name)
+
+    def launch_tasks(self, jobs):
+        """jobs là danh sách (task_id, kind, params) đã được ghi vào nhật ký."""
+        self.is_processing = True
+        self.gui.set_ui_state("processing")
+        with self.task_lock:
+            self.active_tasks = 0
+        self.submit_tasks(jobs)
+
+    def submit_tasks(self, jobs):
+        with self.task_lock:
+            self.active_tasks += len(jobs)
+        for task_id, kind, params in jobs:
+            handler, _ = self.task_kinds[kind]
+            self.thread_pool.submit(handler, task_id=task_id, **params)
+
+    def journal_tasks(self, kind, params_list):
+        task_ids = self.journal.add_tasks(kind, [{"params": params} for params in params_list])
+        return [(task_id, kind, params) for task_id, params in zip(task_ids, params_list)]
+
+    def offer_resume(self, task_ids=None):
+        """
+        Khi khởi động: hỏi người dùng có muốn tiếp tục các tác vụ dang dở của lần chạy trước.
+        Nếu tab đang bận xử lý thì hỏi lại khi rảnh, không hủy các tác vụ dang dở.
+        """
+        unfinished = self.journal.unfinished_tasks()
+        if task_ids is None:
+            # Chỉ các tác vụ của lần chạy trước, không gồm tác vụ được thêm trong lúc chờ hỏi
+            task_ids = {task["id"] for task in unfinished}
+        unfinished = [task for task in unfinished if task["id"] in task_ids]
+        if not unfinished:
+            if not self.is_processing:
+                self.journal.compact()
+            return
+        if self.is_processing:
+            self.gui.root.after(RESUME_RETRY_MS, self.offer_resume, task_ids)
+            return
+        if not self.gui.ask_yes_no(
+            "Tiếp tục xử lý",
+            f"Có {len(unfinished)} file chưa xử lý xong từ lần chạy trước.\nTiếp tục xử lý các file này?"
+        ):
+            self.journal.cancel_unfinished(task_ids)
+            self.journal.compact()
+            return
+
+        jobs = []
+        missing = []
+        for task in unfinished:
+            if task["kind"] in self.task_kinds and os.path.exists(task["params"]["file_path"]):
+                jobs.append((task["id"], task["kind"], task["params"]))
+            else:
+                missing.append(task["id"])
+        self.journal.mark_many(missing, STATE_CANCELLED)
+        if not jobs:
+            self.journal.compact()
+            return
+        self.gui.log_status(f"Tiếp tục {len(jobs)} tác vụ dang dở...")
+        self.launch_tasks(jobs)
+
+    def _fail_task(self, task_id, error):
+        if not self.is_closing:
+            self.journal.mark(task_id, STATE_FAILED, error)
     
     # --- LOGIC CHO CHUẨN HÓA ÂM LƯỢNG ---
-    def start_normalization(self, file_list, target_lufs):
+    def start_normalization(self, file_list, target_lufs, target_mode=TARGET_TRACK):
         if self.is_processing: return
+        if not file_list:
+            self.gui.show_message("error", "Lỗi", "Vui lòng thêm ít nhất một file.")
+            return
         self.is_processing = True
         self.gui.set_ui_state("processing")
         self.gui.log_status(f"Bắt đầu quá trình chuẩn hóa âm lượng cho {len(file_list)} file...")
-        
+
         with self.task_lock:
-            self.active_tasks = len(file_list)
-            
-        for file_path in file_list:
-            self.thread_pool.submit(self.run_normalization_task, file_path, target_lufs)
+            self.active_tasks = 1
+        self.thread_pool.submit(self.run_loudness_planning, list(file_list), target_lufs, target_mode)
+
+    def run_loudness_planning(self, file_list, target_lufs, target_mode):
+        """
+        Đo (hoặc lấy từ cache) độ lớn âm thanh của mọi file song song, tính mức mục tiêu cho từng file
+        theo chế độ track/album/batch, rồi tạo các tác vụ áp dụng (pass 2).
+        """
+        try:
+            stats_by_file = {}
+            workers = min(default_worker_count(threads_per_job=1), len(file_list))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self._run_tracked, self.loudness.get_stats, path): path for path in file_list}
+                for done, future in enumerate(as_completed(futures), 1):
+                    path = futures[future]
+                    try:
+                        stats = future.result()
+                        stats_by_file[path] = stats
+                        self.gui.log_status(
+                            f"Đo độ lớn ({done}/{len(file_list)}): {os.path.basename(path)} = "
+                            f"{stats.input_i:.1f} LUFS, đỉnh {stats.input_tp:.1f} dBTP"
+                        )
+                    except Exception as e:
+                        self.logger.error(f"Lỗi khi đo độ lớn {os.path.basename(path)}: {e}", exc_info=True)
+                        self.gui.log_status(f"LỖI đo độ lớn {os.path.basename(path)}: {e}", "error")
+
+            targets = resolve_targets(stats_by_file, target_lufs, target_mode)
+            if target_mode != TARGET_TRACK and targets:
+                self.gui.log_status(f"Mức mục tiêu theo chế độ '{target_mode}': " + ", ".join(
+                    f"{os.path.basename(path)} -> {value:.1f}" for path, value in targets.items()
+                ))
+            jobs = self.journal_tasks("normalize", [
+                {"file_path": path, "target_lufs": targets[path]} for path in file_list if path in targets
+            ])
+            self.submit_tasks(jobs)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi lập kế hoạch chuẩn hóa: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI khi lập kế hoạch chuẩn hóa: {e}", "error")
+        finally:
+            self.task_finished("chuẩn hóa âm lượng")
             
-    def run_normalization_task(self, file_path, target_lufs):
+    def run_normalization_task(self, file_path, target_lufs, task_id=None):
         """Thực hiện chuẩn hóa 2-pass cho một file."""
+        output_file = self.get_output_path(file_path, "_normalized")
+        temp_file = temp_output_path(output_file)
         try:
-            self.gui.log_status(f"Phân tích (Pass 1/2): {os.path.basename(file_path)}")
-            # Pass 1: Phân tích và lấy thông số
-            pass1_args = ["-af", f"loudnorm=I={target_lufs}:tp=-1.5:LRA=7:print_format=json", "-f", "null", "-"]
-            _, stderr = run_ffmpeg(file_path, "", pass1_args, get_output=True)
-            
-            # Trích xuất dữ liệu JSON từ output của FFmpeg
-            json_str = stderr[stderr.rfind('{'):stderr.rfind('}')+1]
-            stats = json.loads(json_str)
-            
+            self.journal.mark(task_id, STATE_RUNNING)
+            # Pass 1: số đo lấy từ cache nếu file đã được đo trước đó (với bất kỳ mức mục tiêu nào)
+            stats = self._run_tracked(self.loudness.get_stats, file_path)
+            pass2_args = ["-af", stats.loudnorm_filter(target_lufs), "-ar", "44100", "-b:a", "192k"]
+
+            # Khóa cache là chính tham số FFmpeg của pass 2 (gồm cả số đo pass 1)
+            cache_key = self.output_cache.make_key(file_path, pass2_args, os.path.splitext(output_file)[1])
+            if self.output_cache.fetch(cache_key, output_file):
+                self.journal.mark(task_id, STATE_DONE)
+                self.gui.log_status(f"Lấy từ cache (không cần chuẩn hóa lại) -> {os.path.basename(output_file)}", "success")
+                return
+
             self.gui.log_status(f"Áp dụng (Pass 2/2): {os.path.basename(file_path)}")
-            # Pass 2: Áp dụng các thông số đã đo
-            pass2_filter = (
-                f"loudnorm=I={target_lufs}:tp=-1.5:LRA=7:"
-                f"measured_I={stats['input_i']}:"
-                f"measured_LRA={stats['input_lra']}:"
-                f"measured_tp={stats['input_tp']}:"
-                f"measured_thresh={stats['input_thresh']}:"
-                f"offset={stats['target_offset']}"
-            )
-            
-            output_file = self.get_output_path(file_path, "_normalized")
-            pass2_args = ["-af", pass2_filter, "-ar", "44100", "-b:a", "192k"]
-            
-            run_ffmpeg(file_path, output_file, pass2_args)
+            self._run_tracked(run_ffmpeg, file_path, temp_file, pass2_args)
+            commit_output(temp_file, output_file)
+            self.output_cache.store(cache_key, output_file)
+            self.journal.mark(task_id, STATE_DONE)
             self.gui.log_status(f"Chuẩn hóa thành công -> {os.path.basename(output_file)}", "success")
 
         except Exception as e:
+            discard_output(temp_file)
+            self._fail_task(task_id, e)
             self.logger.error(f"Lỗi khi chuẩn hóa {os.path.basename(file_path)}: {e}", exc_info=True)
             self.gui.log_status(f"LỖI chuẩn hóa {os.path.basename(file_path)}: {e}", "error")
         finally:
@@ -105,59 +240,222 @@ class AudioToolsController:
             self.logger.error(f"Không thể đọc metadata từ {file_path}: {e}")
             return None, None
 
+    def request_cover_thumbnail(self, data):
+        """Thu nhỏ ảnh bìa ở luồng nền; kết quả được đưa về GUI qua root.after. Chỉ yêu cầu mới nhất được hiển thị."""
+        self.cover_request_id += 1
+        request_id = self.cover_request_id
+        self.thumbnail_executor.submit(self._load_cover_thumbnail, data, request_id)
+        return request_id
+
+    def _load_cover_thumbnail(self, data, request_id):
+        if request_id != self.cover_request_id:
+            return  # Người dùng đã chọn file khác
+        try:
+            image = self.thumbnails.get(data)
+        except Exception as e:
+            self.logger.error(f"Lỗi hiển thị ảnh bìa: {e}")
+            image = None
+        self.gui.root.after(0, self.gui.show_cover_thumbnail, image, request_id)
+
+    def get_cover_frame(self, cover_path):
+        """Khung APIC của ảnh bìa, chỉ đọc file ảnh một lần cho đến khi ảnh bị sửa."""
+        key = (cover_path, os.path.getmtime(cover_path))
+        frame = self.cover_frames.get(key)
+        if frame is None:
+            frame = build_cover_frame(cover_path)
+            self.cover_frames = {key: frame}
+        return frame
+
     def save_metadata(self, file_path, tags_to_save, new_cover_path):
         if not file_path: return
         try:
             self.gui.log_status("Bắt đầu lưu thông tin...")
-            audio = MP3(file_path, ID3=ID3)
-            # Add new tags
-            audio['TIT2'] = TIT2(encoding=3, text=tags_to_save['title'])
-            audio['TPE1'] = TPE1(encoding=3, text=tags_to_save['artist'])
-            audio['TALB'] = TALB(encoding=3, text=tags_to_save['album'])
-            audio['TDRC'] = TDRC(encoding=3, text=tags_to_save['year'])
-            audio['TCON'] = TCON(encoding=3, text=tags_to_save['genre'])
-            
-            # Add cover art
-            if new_cover_path:
-                with open(new_cover_path, 'rb') as art:
-                    audio['APIC'] = APIC(
-                        encoding=3, # 3 is for utf-8
-                        mime='image/jpeg', # or image/png
-                        type=3, # 3 is for the cover (front)
-                        desc='Cover',
-                        data=art.read()
-                    )
-            audio.save()
+            cover_frame = self.get_cover_frame(new_cover_path) if new_cover_path else None
+            write_tags(file_path, {field: tags_to_save.get(field, '') for field in TAG_FIELDS}, cover_frame)
             self.gui.log_status("Lưu thông tin thành công!", "success")
             self.gui.show_message("info", "Thành công", "Đã cập nhật thông tin cho file.")
         except Exception as e:
             self.logger.error(f"Lỗi khi lưu metadata: {e}", exc_info=True)
             self.gui.show_message("error", "Lỗi", f"Không thể lưu thông tin: {e}")
 
+    # --- SỬA THÔNG TIN HÀNG LOẠT ---
+    def start_bulk_load(self, folder):
+        if self.is_processing:
+            self.gui.show_message("warning", "Đang bận", "Một tác vụ khác đang chạy.")
+            return
+        self.is_processing = True
+        self.gui.set_ui_state("processing")
+        with self.task_lock:
+            self.active_tasks = 1
+        self.thread_pool.submit(self.run_bulk_load, folder)
+
+    def run_bulk_load(self, folder):
+        try:
+            paths = list_audio_files(folder)
+            self.gui.log_status(f"Đang đọc thông tin {len(paths)} file MP3...")
+            start = time.time()
+            rows = load_tags_parallel(paths)
+            self.bulk_rows = rows
+            failed = sum(1 for row in rows if row.error)
+            self.gui.log_status(f"Đã đọc {len(rows) - failed}/{len(rows)} file trong {time.time() - start:.1f} giây.", "success")
+            self.gui.root.after(0, self.gui.show_bulk_rows, rows)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi đọc thư mục {folder}: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI đọc thư mục: {e}", "error")
+        finally:
+            self.task_finished("đọc thông tin hàng loạt")
+
+    def apply_bulk_templates(self, templates):
+        """Áp dụng mẫu lên bảng trong bộ nhớ (chưa ghi vào file)."""
+        if not self.bulk_rows:
+            self.gui.show_message("warning", "Chưa có file", "Vui lòng chọn thư mục chứa file MP3.")
+            return
+        try:
+            apply_templates(self.bulk_rows, templates)
+        except (ValueError, IndexError) as e:
+            self.gui.show_message("error", "Mẫu không hợp lệ", str(e))
+            return
+        changed = sum(1 for row in self.bulk_rows if row.is_dirty())
+        self.gui.log_status(f"Đã áp dụng mẫu: {changed} file có thay đổi (chưa ghi).")
+        self.gui.show_bulk_rows(self.bulk_rows)
+
+    def start_bulk_write(self, cover_path=None):
+        if self.is_processing:
+            self.gui.show_message("warning", "Đang bận", "Một tác vụ khác đang chạy.")
+            return
+        if not self.bulk_rows:
+            self.gui.show_message("warning", "Chưa có file", "Vui lòng chọn thư mục chứa file MP3.")
+            return
+        try:
+            # Ảnh bìa được đọc và đóng gói một lần, dùng chung cho mọi file
+            cover_frame = self.get_cover_frame(cover_path) if cover_path else None
+        except OSError as e:
+            self.gui.show_message("error", "Lỗi", f"Không thể đọc ảnh bìa: {e}")
+            return
+        self.is_processing = True
+        self.gui.set_ui_state("processing")
+        with self.task_lock:
+            self.active_tasks = 1
+        self.thread_pool.submit(self.run_bulk_write, self.bulk_rows, cover_frame)
+
+    def run_bulk_write(self, rows, cover_frame):
+        try:
+            start = time.time()
+            def on_progress(done, total):
+                if done == total or done % 100 == 0:
+                    self.gui.log_status(f"Đã ghi {done}/{total} file...")
+            written, errors = write_rows_parallel(rows, cover_frame, on_progress=on_progress)
+            for path, error in errors:
+                self.logger.error(f"Lỗi khi ghi thông tin {path}: {error}")
+                self.gui.log_status(f"LỖI ghi {os.path.basename(path)}: {error}", "error")
+            self.gui.log_status(f"Đã ghi thông tin cho {written} file trong {time.time() - start:.1f} giây.", "success")
+            self.gui.root.after(0, self.gui.show_bulk_rows, rows)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi ghi thông tin hàng loạt: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI ghi thông tin hàng loạt: {e}", "error")
+        finally:
+            self.task_finished("ghi thông tin hàng loạt")
+
 
     # --- LOGIC CHO GIẢM TẠP ÂM ---
-    def start_noise_reduction(self, file_list, strength):
+    def start_noise_reduction(self, file_list, strength, learn_profile=False):
         if self.is_processing: return
+        if not file_list:
+            self.gui.show_message("error", "Lỗi", "Vui lòng thêm ít nhất một file.")
+            return
+        self.gui.log_status(f"Bắt đầu giảm tạp âm cho {len(file_list)} file...")
+        if not learn_profile:
+            jobs = self.journal_tasks("denoise", [
+                {"file_path": file_path, "strength": strength} for file_path in file_list
+            ])
+            self.launch_tasks(jobs)
+            return
+
         self.is_processing = True
         self.gui.set_ui_state("processing")
-        self.gui.log_status(f"Bắt đầu giảm tạp âm cho {len(file_list)} file...")
-        
         with self.task_lock:
-            self.active_tasks = len(file_list)
-        
-        for file_path in file_list:
-            self.thread_pool.submit(self.run_noise_reduction_task, file_path, strength)
+            self.active_tasks = 1
+        self.thread_pool.submit(self.run_noise_profile_planning, list(file_list), strength)
 
-    def run_noise_reduction_task(self, file_path, strength):
-        """Áp dụng bộ lọc anlmdn của FFmpeg."""
+    def run_noise_profile_planning(self, file_list, strength):
+        """Học mức nền tạp âm một lần từ khoảng lặng đầu tiên tìm được, dùng chung cho cả lô."""
         try:
-            self.gui.log_status(f"Đang xử lý: {os.path.basename(file_path)}")
-            output_file = self.get_output_path(file_path, "_denoised")
-            args = ["-af", f"anlmdn=s={strength}"]
-            
-            run_ffmpeg(file_path, output_file, args)
+            noise_floor = None
+            for file_path in file_list:
+                self.gui.log_status(f"Tìm khoảng lặng để học tạp âm nền: {os.path.basename(file_path)}")
+                noise_floor = self._run_tracked(learn_noise_floor, file_path)
+                if noise_floor is not None:
+                    self.gui.log_status(f"Mức tạp âm nền: {noise_floor:.1f} dB (áp dụng cho cả lô bằng bộ lọc afftdn thay cho anlmdn)")
+                    break
+            if noise_floor is None:
+                self.gui.log_status("Không tìm thấy khoảng lặng, dùng bộ lọc mặc định.", "warning")
+
+            jobs = self.journal_tasks("denoise", [
+                {"file_path": file_path, "strength": strength, "noise_floor": noise_floor} for file_path in file_list
+            ])
+            self.submit_tasks(jobs)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi học tạp âm nền: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI khi học tạp âm nền: {e}", "error")
+        finally:
+            self.task_finished("giảm tạp âm")
+
+    def _run_tracked(self, func, *args, **kwargs):
+        """Gọi func(on_start=...), ghi nhận PID FFmpeg trong lúc chạy để có thể dừng khi đóng ứng dụng."""
+        pids = []
+        def on_start(pid):
+            pids.append(pid)
+            self.active_ffmpeg_pids.append(pid)
+        try:
+            return func(*args, on_start=on_start, **kwargs)
+        finally:
+            for pid in pids:
+                self.active_ffmpeg_pids.remove(pid)
+
+    def run_noise_reduction_task(self, file_path, strength, task_id=None, noise_floor=None):
+        """Giảm tạp âm một file; file dài được chia đoạn và xử lý song song."""
+        output_file = self.get_output_path(file_path, "_denoised")
+        temp_file = temp_output_path(output_file)
+        try:
+            self.journal.mark(task_id, STATE_RUNNING)
+            audio_filter = build_denoise_filter(strength, noise_floor)
+            args = ["-af", audio_filter]
+            duration = get_media_duration(file_path) or 0
+            workers = default_worker_count(threads_per_job=1)
+            chunked = duration >= MIN_CHUNKED_SECONDS and workers > 1
+            # Output chia đoạn (ghép bằng crossfade) không giống hệt từng byte output xử lý một lần,
+            # nên khóa cache gồm cả cách chia đoạn
+            key_args = args + ["chunked", str(workers * CHUNKS_PER_WORKER), str(CHUNK_OVERLAP_SECONDS)] if chunked else args
+            cache_key = self.output_cache.make_key(file_path, key_args, os.path.splitext(output_file)[1])
+            if self.output_cache.fetch(cache_key, output_file):
+                self.journal.mark(task_id, STATE_DONE)
+                self.gui.log_status(f"Lấy từ cache (không cần xử lý lại) -> {os.path.basename(output_file)}", "success")
+                return
+
+            if chunked:
+                self.gui.log_status(f"Đang xử lý song song {workers} luồng: {os.path.basename(file_path)}")
+                work_dir = os.path.join(os.path.dirname(output_file), f".{os.path.basename(output_file)}_chunks")
+                last_reported = [0]
+
+                def on_progress(fraction):
+                    percent = int(fraction * 100) // 10 * 10
+                    if percent > last_reported[0]:
+                        last_reported[0] = percent
+                        self.gui.log_status(f"{os.path.basename(file_path)}: {percent}%")
+
+                self._run_tracked(denoise_chunked, file_path, temp_file, audio_filter, duration,
+                                  workers, work_dir, on_progress=on_progress, slots=self.ffmpeg_slots)
+            else:
+                self.gui.log_status(f"Đang xử lý: {os.path.basename(file_path)}")
+                with self.ffmpeg_slots:
+                    self._run_tracked(run_ffmpeg, file_path, temp_file, args)
+            commit_output(temp_file, output_file)
+            self.output_cache.store(cache_key, output_file)
+            self.journal.mark(task_id, STATE_DONE)
             self.gui.log_status(f"Giảm tạp âm thành công -> {os.path.basename(output_file)}", "success")
         except Exception as e:
+            discard_output(temp_file)
+            self._fail_task(task_id, e)
             self.logger.error(f"Lỗi khi giảm tạp âm {os.path.basename(file_path)}: {e}", exc_info=True)
             self.gui.log_status(f"LỖI giảm tạp âm {os.path.basename(file_path)}: {e}", "error")
         finally:
@@ -3,10 +3,11 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
-from PIL import Image, ImageTk
-from io import BytesIO
+from PIL import ImageTk
 
 from .audio_tools_controller import AudioToolsController
+from .loudness import TARGET_TRACK, TARGET_ALBUM, TARGET_BATCH
+from .bulk_tagger import TAG_FIELDS
 from Utils.ui_utils import create_tab_title
 
 class AudioToolsGUI:
@@ -22,11 +23,25 @@ class AudioToolsGUI:
         self.current_metadata_file = None
         self.current_cover_path = None
         
+        # Biến cho tab sửa hàng loạt
+        self.bulk_folder_var = tk.StringVar()
+        self.bulk_cover_path = None
+        self.bulk_template_vars = {field: tk.StringVar() for field in TAG_FIELDS}
+
         # Biến cho các tùy chọn
         self.norm_lufs_var = tk.DoubleVar(value=-14.0)
+        self.norm_mode_options = {
+            "Từng file (mỗi file về mức mục tiêu)": TARGET_TRACK,
+            "Album (giữ chênh lệch giữa các bài)": TARGET_ALBUM,
+            "Theo lô (đưa mọi file về mức trung vị)": TARGET_BATCH,
+        }
+        self.norm_mode_var = tk.StringVar(value="Từng file (mỗi file về mức mục tiêu)")
         self.denoise_strength_var = tk.DoubleVar(value=5.0)
+        self.denoise_learn_profile_var = tk.BooleanVar(value=False) # Học tạp âm nền một lần cho cả lô
 
         self.create_widgets()
+        # Hỏi tiếp tục các tác vụ dang dở sau khi giao diện đã hiển thị
+        self.root.after(1000, self.controller.offer_resume)
 
     def create_widgets(self):
         create_tab_title(self.root, "Công cụ Xử lý & Cải thiện Âm thanh")
@@ -36,14 +51,17 @@ class AudioToolsGUI:
 
         norm_frame = ttk.Frame(self.sub_notebook, padding=10)
         meta_frame = ttk.Frame(self.sub_notebook, padding=10)
+        bulk_frame = ttk.Frame(self.sub_notebook, padding=10)
         denoise_frame = ttk.Frame(self.sub_notebook, padding=10)
 
         self.sub_notebook.add(norm_frame, text=" Chuẩn hóa Âm lượng ")
         self.sub_notebook.add(meta_frame, text=" Chỉnh sửa Thông tin ")
+        self.sub_notebook.add(bulk_frame, text=" Sửa Thông tin Hàng loạt ")
         self.sub_notebook.add(denoise_frame, text=" Giảm Tạp âm ")
 
         self.create_normalization_tab(norm_frame)
         self.create_metadata_tab(meta_frame)
+        self.create_bulk_metadata_tab(bulk_frame)
         self.create_denoise_tab(denoise_frame)
         
         # Log chung
@@ -80,9 +98,11 @@ class AudioToolsGUI:
         ttk.Scale(options_frame, from_=-24, to=-9, variable=self.norm_lufs_var, orient="horizontal", command=lambda v: self.norm_lufs_label.config(text=f"{float(v):.1f}")).grid(row=0, column=1, sticky="ew")
         self.norm_lufs_label = ttk.Label(options_frame, text=f"{self.norm_lufs_var.get():.1f}")
         self.norm_lufs_label.grid(row=0, column=2, padx=5)
+        ttk.Label(options_frame, text="Chế độ:").grid(row=1, column=0, sticky="w", padx=5, pady=(5,0))
+        ttk.Combobox(options_frame, textvariable=self.norm_mode_var, values=list(self.norm_mode_options), state="readonly").grid(row=1, column=1, columnspan=2, sticky="ew", pady=(5,0))
 
         # Nút bắt đầu
-        self.norm_btn = ttk.Button(parent, text="BẮT ĐẦU CHUẨN HÓA", style="Accent.TButton", command=lambda: self.controller.start_normalization(self.file_list_norm, self.norm_lufs_var.get()))
+        self.norm_btn = ttk.Button(parent, text="BẮT ĐẦU CHUẨN HÓA", style="Accent.TButton", command=lambda: self.controller.start_normalization(self.file_list_norm, self.norm_lufs_var.get(), self.norm_mode_options[self.norm_mode_var.get()]))
         self.norm_btn.grid(row=2, column=0, pady=10)
     
     def create_metadata_tab(self, parent):
@@ -134,6 +154,54 @@ class AudioToolsGUI:
         self.meta_save_btn = ttk.Button(parent, text="LƯU THAY ĐỔI", style="Accent.TButton", command=self.save_metadata)
         self.meta_save_btn.grid(row=2, column=0, columnspan=2, pady=10)
 
+    def create_bulk_metadata_tab(self, parent):
+        parent.columnconfigure(0, weight=1)
+        parent.rowconfigure(1, weight=1)
+
+        folder_frame = ttk.LabelFrame(parent, text="Thư mục chứa file MP3", padding=10)
+        folder_frame.grid(row=0, column=0, sticky="ew", pady=5)
+        folder_frame.columnconfigure(0, weight=1)
+        ttk.Entry(folder_frame, textvariable=self.bulk_folder_var, state="readonly").grid(row=0, column=0, sticky="ew")
+        self.bulk_browse_btn = ttk.Button(folder_frame, text="Duyệt...", command=self.browse_bulk_folder)
+        self.bulk_browse_btn.grid(row=0, column=1, padx=(5,0))
+
+        # Bảng tag của mọi file trong thư mục (giá trị mới chưa ghi được đánh dấu *)
+        table_frame = ttk.Frame(parent)
+        table_frame.grid(row=1, column=0, sticky="nsew", pady=5)
+        table_frame.columnconfigure(0, weight=1)
+        table_frame.rowconfigure(0, weight=1)
+        columns = ("file",) + tuple(TAG_FIELDS)
+        self.bulk_tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=8)
+        headings = {"file": "File", "title": "Tiêu đề", "artist": "Nghệ sĩ", "album": "Album", "year": "Năm", "genre": "Thể loại"}
+        for column in columns:
+            self.bulk_tree.heading(column, text=headings[column])
+            self.bulk_tree.column(column, width=200 if column in ("file", "title") else 100, stretch=True)
+        self.bulk_tree.grid(row=0, column=0, sticky="nsew")
+        tree_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.bulk_tree.yview)
+        tree_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.bulk_tree.config(yscrollcommand=tree_scrollbar.set)
+
+        template_frame = ttk.LabelFrame(parent, text="Mẫu (để trống = giữ nguyên)", padding=10)
+        template_frame.grid(row=2, column=0, sticky="ew", pady=5)
+        template_frame.columnconfigure(1, weight=1)
+        for i, field in enumerate(TAG_FIELDS):
+            ttk.Label(template_frame, text=f"{headings[field]}:").grid(row=i, column=0, sticky="w", padx=5, pady=2)
+            ttk.Entry(template_frame, textvariable=self.bulk_template_vars[field]).grid(row=i, column=1, sticky="ew", padx=5, pady=2)
+        ttk.Label(
+            template_frame,
+            text="Biến: {filename} {folder} {index} {user} {date} {time} {year} {title} {artist} {album} {genre}",
+            foreground="gray"
+        ).grid(row=len(TAG_FIELDS), column=0, columnspan=2, sticky="w", padx=5, pady=(5,0))
+
+        actions = ttk.Frame(parent)
+        actions.grid(row=3, column=0, pady=10)
+        self.bulk_apply_btn = ttk.Button(actions, text="Áp dụng mẫu", command=self.apply_bulk_templates)
+        self.bulk_apply_btn.pack(side="left", padx=5)
+        self.bulk_cover_btn = ttk.Button(actions, text="Ảnh bìa chung...", command=self.browse_bulk_cover)
+        self.bulk_cover_btn.pack(side="left", padx=5)
+        self.bulk_write_btn = ttk.Button(actions, text="GHI TẤT CẢ", style="Accent.TButton", command=lambda: self.controller.start_bulk_write(self.bulk_cover_path))
+        self.bulk_write_btn.pack(side="left", padx=5)
+
     def create_denoise_tab(self, parent):
         parent.columnconfigure(0, weight=1)
         list_frame = ttk.LabelFrame(parent, text="Danh sách file cần giảm tạp âm", padding=10)
@@ -155,7 +223,8 @@ class AudioToolsGUI:
         ttk.Scale(options_frame, from_=1.0, to=21.0, variable=self.denoise_strength_var, orient="horizontal", command=lambda v: self.denoise_strength_label.config(text=f"{float(v):.1f}")).grid(row=0, column=1, sticky="ew")
         self.denoise_strength_label = ttk.Label(options_frame, text=f"{self.denoise_strength_var.get():.1f}")
         self.denoise_strength_label.grid(row=0, column=2, padx=5)
-        self.denoise_btn = ttk.Button(parent, text="BẮT ĐẦU GIẢM TẠP ÂM", style="Accent.TButton", command=lambda: self.controller.start_noise_reduction(self.file_list_denoise, self.denoise_strength_var.get()))
+        ttk.Checkbutton(options_frame, text="Học mức tạp âm nền từ khoảng lặng, dùng chung cho cả lô (chuyển sang bộ lọc afftdn)", variable=self.denoise_learn_profile_var).grid(row=1, column=0, columnspan=3, sticky="w", padx=5, pady=(5,0))
+        self.denoise_btn = ttk.Button(parent, text="BẮT ĐẦU GIẢM TẠP ÂM", style="Accent.TButton", command=lambda: self.controller.start_noise_reduction(self.file_list_denoise, self.denoise_strength_var.get(), self.denoise_learn_profile_var.get()))
         self.denoise_btn.grid(row=2, column=0, pady=10)
 
     def browse_norm_files(self):
@@ -207,22 +276,55 @@ class AudioToolsGUI:
 
     def display_cover_art(self, data):
         if data:
-            try:
-                img = Image.open(BytesIO(data))
-                img.thumbnail((150, 150))
-                self.cover_photo = ImageTk.PhotoImage(img)
-                self.art_label.config(image=self.cover_photo, text="")
-            except Exception as e:
-                self.art_label.config(image='', text="Lỗi ảnh")
-                self.controller.logger.error(f"Lỗi hiển thị ảnh bìa: {e}")
+            self.art_label.config(image='', text="Đang tải ảnh...")
+            self.controller.request_cover_thumbnail(data)
         else:
+            self.controller.cover_request_id += 1  # Bỏ qua ảnh đang tải của file trước
             self.art_label.config(image='', text="Chưa có ảnh")
 
+    def show_cover_thumbnail(self, image, request_id):
+        if request_id != self.controller.cover_request_id:
+            return
+        if image is None:
+            self.art_label.config(image='', text="Lỗi ảnh")
+            return
+        self.cover_photo = ImageTk.PhotoImage(image)
+        self.art_label.config(image=self.cover_photo, text="")
+
     def browse_cover_art(self):
         path = filedialog.askopenfilename(title="Chọn ảnh bìa", filetypes=[("Image files", "*.jpg *.jpeg *.png")])
         if path:
             self.current_cover_path = path
-            self.display_cover_art(open(path, 'rb').read())
+            with open(path, 'rb') as f:
+                self.display_cover_art(f.read())
+
+    def browse_bulk_folder(self):
+        folder = filedialog.askdirectory(title="Chọn thư mục chứa file MP3")
+        if not folder: return
+        self.bulk_folder_var.set(folder)
+        self.bulk_cover_path = None
+        self.controller.start_bulk_load(folder)
+
+    def browse_bulk_cover(self):
+        path = filedialog.askopenfilename(title="Chọn ảnh bìa chung", filetypes=[("Image files", "*.jpg *.jpeg *.png")])
+        if path:
+            self.bulk_cover_path = path
+            self.log_status(f"Ảnh bìa chung: {os.path.basename(path)} (sẽ được ghi khi bấm GHI TẤT CẢ)")
+
+    def apply_bulk_templates(self):
+        templates = {field: var.get() for field, var in self.bulk_template_vars.items()}
+        self.controller.apply_bulk_templates(templates)
+
+    def show_bulk_rows(self, rows):
+        self.bulk_tree.delete(*self.bulk_tree.get_children())
+        for row in rows:
+            values = [os.path.basename(row.path)]
+            for field in TAG_FIELDS:
+                value = row.value(field)
+                values.append(f"*{value}" if row.tags.get(field, '') != value else value)
+            if row.error:
+                values[1] = f"Lỗi: {row.error}"
+            self.bulk_tree.insert("", tk.END, values=values)
 
     def save_metadata(self):
         tags = {
@@ -240,6 +342,8 @@ class AudioToolsGUI:
         ui_state = "disabled" if is_processing else "normal"
         self.norm_btn.config(state=ui_state)
         self.meta_save_btn.config(state=ui_state)
+        for button in (self.bulk_browse_btn, self.bulk_apply_btn, self.bulk_cover_btn, self.bulk_write_btn):
+            button.config(state=ui_state)
         self.denoise_btn.config(state=ui_state)
 
     def log_status(self, message, level="info"):
@@ -253,6 +357,10 @@ class AudioToolsGUI:
             self.status_text.config(state="disabled")
         self.root.after(0, _update)
 
+    def ask_yes_no(self, title, message):
+        """Hỏi xác nhận (chỉ gọi từ luồng UI)."""
+        return messagebox.askyesno(title, message)
+
     def show_message(self, level, title, message):
         def _show():
             if level == "info": messagebox.showinfo(title, message)
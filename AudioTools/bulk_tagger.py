@@ -0,0 +1,181 @@
+# AudioTools/bulk_tagger.py
+
+import os
+import re
+import time
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from mutagen.id3 import ID3, ID3NoHeaderError, APIC, TPE1, TIT2, TALB, TDRC, TCON
+
+# Trường thông tin -> khung ID3 tương ứng (cùng bộ trường với tab chỉnh sửa từng file)
+TAG_FRAMES = {
+    'title': TIT2,
+    'artist': TPE1,
+    'album': TALB,
+    'year': TDRC,
+    'genre': TCON,
+}
+TAG_FIELDS = list(TAG_FRAMES)
+AUDIO_EXTENSIONS = ('.mp3',)
+MAX_TAG_WORKERS = 8
+
+# Tên file bản ghi: "TT_<user>_YYYYMMDD_HHMMSS" / "DY_<user>_YYYYMMDD_HHMMSS"
+RECORDING_NAME_RE = re.compile(r"^(?:[A-Z]{2}_)?(?P<user>.+?)_(?P<date>\d{8})_(?P<time>\d{6})")
+DATE_IN_NAME_RE = re.compile(r"(?P<date>\d{4}[-_.]?\d{2}[-_.]?\d{2})")
+
+class TagRow:
+    """Một dòng trong bảng sửa hàng loạt: tag đọc từ file và các thay đổi chưa ghi."""
+    def __init__(self, path, tags, error=None):
+        self.path = path
+        self.tags = tags
+        self.changes = {}
+        self.error = error
+
+    def value(self, field):
+        return self.changes.get(field, self.tags.get(field, ''))
+
+    def is_dirty(self):
+        return any(self.tags.get(field, '') != value for field, value in self.changes.items())
+
+
+def list_audio_files(folder):
+    files = []
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and name.lower().endswith(AUDIO_EXTENSIONS):
+            files.append(path)
+    return files
+
+def read_tags(file_path):
+    """Chỉ đọc phần tag ID3 ở đầu file (không phân tích luồng audio như MP3())."""
+    try:
+        id3 = ID3(file_path)
+    except ID3NoHeaderError:
+        return {}
+    tags = {}
+    for field, frame_cls in TAG_FRAMES.items():
+        frame = id3.get(frame_cls.__name__)
+        tags[field] = str(frame.text[0]) if frame and frame.text else ''
+    return tags
+
+def load_tags_parallel(paths, max_workers=MAX_TAG_WORKERS):
+    """Đọc tag của nhiều file song song, trả về danh sách TagRow theo đúng thứ tự đầu vào."""
+    def _load(path):
+        try:
+            return TagRow(path, read_tags(path))
+        except Exception as e:
+            return TagRow(path, {}, error=str(e))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_load, paths))
+
+
+def recording_info(file_path):
+    """
+    Thông tin lấy từ tên file bản ghi: tên kênh, ngày và giờ ghi.
+    Nếu tên file không chứa ngày thì dùng thời điểm sửa đổi của file.
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    match = RECORDING_NAME_RE.match(stem)
+    if match:
+        moment = time.strptime(match.group('date') + match.group('time'), "%Y%m%d%H%M%S")
+        return match.group('user'), moment
+    match = DATE_IN_NAME_RE.search(stem)
+    if match:
+        digits = re.sub(r"\D", "", match.group('date'))
+        try:
+            return '', time.strptime(digits, "%Y%m%d")
+        except ValueError:
+            pass
+    return '', time.localtime(os.path.getmtime(file_path))
+
+class _BlankFormatter(string.Formatter):
+    # Biến không có trong mẫu được thay bằng chuỗi rỗng thay vì báo lỗi
+    def get_value(self, key, args, kwargs):
+        if isinstance(key, str):
+            return kwargs.get(key, '')
+        return super().get_value(key, args, kwargs)
+
+_formatter = _BlankFormatter()
+
+def render_template(template, row, index):
+    """
+    Tạo giá trị trường từ mẫu. Các biến hỗ trợ:
+    {filename} tên file (không đuôi), {folder} tên thư mục, {index} số thứ tự (bắt đầu từ 1),
+    {user} tên kênh trong tên file bản ghi, {date} ngày ghi (YYYY-MM-DD), {time} giờ ghi (HH:MM),
+    {year} năm ghi, và tag hiện tại: {title}, {artist}, {album}, {genre}.
+    """
+    user, moment = recording_info(row.path)
+    values = {field: row.value(field) for field in TAG_FIELDS}
+    values.update({
+        'filename': os.path.splitext(os.path.basename(row.path))[0],
+        'folder': os.path.basename(os.path.dirname(row.path)),
+        'index': index,
+        'user': user,
+        'date': time.strftime("%Y-%m-%d", moment),
+        'time': time.strftime("%H:%M", moment),
+        'year': time.strftime("%Y", moment),
+    })
+    return _formatter.format(template, **values).strip()
+
+def apply_templates(rows, templates):
+    """templates: {trường: mẫu}; mẫu rỗng thì bỏ qua trường đó. Chỉ thay đổi dữ liệu trong bộ nhớ."""
+    for index, row in enumerate(rows, start=1):
+        if row.error:
+            continue
+        new_values = {field: render_template(template, row, index) for field, template in templates.items() if template}
+        row.changes.update(new_values)
+
+
+def build_cover_frame(image_path):
+    """Đọc ảnh bìa một lần và tạo sẵn khung APIC dùng chung cho mọi file."""
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    mime = 'image/png' if data.startswith(b'\x89PNG') else 'image/jpeg'
+    return APIC(encoding=3, mime=mime, type=3, desc='Cover', data=data)
+
+def write_tags(file_path, values, cover_frame=None):
+    """
+    Ghi các trường trong values (và ảnh bìa nếu có) vào file, chỉ mở file một lần:
+    đọc tag và ghi lại trên cùng một file object. Giá trị rỗng sẽ xóa trường đó.
+    """
+    with open(file_path, 'r+b') as f:
+        try:
+            id3 = ID3(f)
+        except ID3NoHeaderError:
+            id3 = ID3()
+        for field, value in values.items():
+            frame_cls = TAG_FRAMES[field]
+            id3.delall(frame_cls.__name__)
+            if value:
+                id3.add(frame_cls(encoding=3, text=value))
+        if cover_frame is not None:
+            id3.delall('APIC')
+            id3.add(cover_frame)
+        f.seek(0)
+        id3.save(f)
+
+def write_rows_parallel(rows, cover_frame=None, max_workers=MAX_TAG_WORKERS, on_progress=None):
+    """Ghi mọi dòng có thay đổi (hoặc mọi dòng nếu có ảnh bìa mới). Trả về (số file đã ghi, [(path, lỗi)])."""
+    targets = [row for row in rows if not row.error and (row.is_dirty() or cover_frame is not None)]
+    written = 0
+    errors = []
+
+    def _write(row):
+        values = {field: value for field, value in row.changes.items() if row.tags.get(field, '') != value}
+        write_tags(row.path, values, cover_frame)
+        row.tags.update(values)
+        row.changes.clear()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_write, row): row for row in targets}
+        for future, row in futures.items():
+            try:
+                future.result()
+                written += 1
+            except Exception as e:
+                errors.append((row.path, str(e)))
+            if on_progress:
+                on_progress(written + len(errors), len(targets))
+    return written, errors
@@ -0,0 +1,149 @@
+# AudioTools/denoise_engine.py
+
+import os
+import re
+import shutil
+from contextlib import nullcontext
+
+from Utils.ffmpeg_utils import iter_ffmpeg_stderr, probe_media_streams
+from Utils.parallel_encode import EncodeJob, run_parallel_encodes
+
+# Chỉ chia đoạn với file dài hơn ngưỡng này
+MIN_CHUNKED_SECONDS = 10 * 60
+# Mỗi đoạn được mở rộng sang hai bên để ghép bằng crossfade, tránh tiếng "click" tại ranh giới
+CHUNK_OVERLAP_SECONDS = 2.0
+# Số đoạn cho mỗi tiến trình: đoạn nhỏ hơn giúp các tiến trình xong gần cùng lúc
+CHUNKS_PER_WORKER = 2
+
+SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+RMS_LEVEL_RE = re.compile(r"RMS level dB:\s*(-?[\d.]+|-inf)")
+# Giới hạn hợp lệ của tham số nf (noise floor) trong bộ lọc afftdn
+NOISE_FLOOR_MIN = -80.0
+NOISE_FLOOR_MAX = -20.0
+
+def build_denoise_filter(strength, noise_floor=None):
+    """
+    Bộ lọc giảm tạp âm: mặc định anlmdn (như trước). Khi bật "học tạp âm nền", thuật toán đổi sang
+    afftdn (khử nhiễu theo phổ FFT) vì anlmdn không nhận mức nền tạp âm; thứ được học chỉ là một mức
+    nền (nf, dB) dùng chung cho cả lô, không phải hồ sơ phổ tạp âm. strength được quy đổi sang nr (dB).
+    """
+    if noise_floor is None:
+        return f"anlmdn=s={strength}"
+    noise_reduction = min(97.0, max(1.0, strength * 2))
+    return f"afftdn=nr={noise_reduction:.1f}:nf={noise_floor:.1f}"
+
+def learn_noise_floor(file_path, probe_seconds=600, min_silence=0.5, on_start=None):
+    """
+    Tìm khoảng lặng đầu tiên (trong probe_seconds đầu file) và đo mức RMS của nó làm mức nền tạp âm.
+    Trả về None nếu không tìm thấy khoảng lặng nào.
+    """
+    args = ["-nostdin", "-t", str(probe_seconds), "-i", file_path, "-vn",
+            "-af", f"silencedetect=n=-40dB:d={min_silence}", "-f", "null", "-"]
+    region = None
+    start = None
+    for line in iter_ffmpeg_stderr(args, on_start=on_start):
+        if region is not None:
+            continue
+        match = SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = SILENCE_END_RE.search(line)
+        if match and start is not None:
+            region = (start, float(match.group(1)))
+    if region is None:
+        return None
+
+    start, end = region
+    args = ["-nostdin", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", file_path, "-vn",
+            "-af", "astats=metadata=0", "-f", "null", "-"]
+    levels = []
+    for line in iter_ffmpeg_stderr(args, on_start=on_start):
+        match = RMS_LEVEL_RE.search(line)
+        if match and match.group(1) != "-inf":
+            levels.append(float(match.group(1)))
+    if not levels:
+        return None
+    # Dòng "RMS level" cuối cùng là mức tổng của mọi kênh
+    return min(max(levels[-1], NOISE_FLOOR_MIN), NOISE_FLOOR_MAX)
+
+
+def plan_overlapping_chunks(duration, chunk_count, overlap=CHUNK_OVERLAP_SECONDS):
+    """Chia [0, duration] thành chunk_count đoạn, mỗi đoạn (trừ hai đầu) chồng lên đoạn kề overlap giây."""
+    chunk_count = max(1, chunk_count)
+    boundaries = [duration * i / chunk_count for i in range(chunk_count + 1)]
+    half = overlap / 2
+    chunks = []
+    for i in range(chunk_count):
+        start = boundaries[i] - half if i > 0 else 0.0
+        end = boundaries[i + 1] + half if i < chunk_count - 1 else duration
+        chunks.append((max(0.0, start), min(duration, end)))
+    return chunks
+
+
+def _audio_format(file_path):
+    info = probe_media_streams(file_path)
+    if info:
+        for stream in info["streams"]:
+            if stream.get("codec_type") == "audio":
+                return int(stream.get("sample_rate") or 44100), int(stream.get("channels") or 2)
+    raise ValueError("File không có luồng audio.")
+
+
+def build_crossfade_graph(chunks):
+    """
+    Chuỗi bộ lọc ghép các đoạn (input 0..n-1) thành nhãn [out]: mỗi cặp đoạn liên tiếp được trộn bằng
+    acrossfade tuyến tính dài đúng bằng phần chồng lấn (hai đoạn cùng nội dung nên tổng hai đường
+    cong bằng 1, không bị phồng âm lượng ở giữa). Trả về None nếu chỉ có một đoạn.
+    """
+    if len(chunks) < 2:
+        return None
+    parts = []
+    previous = "[0:a]"
+    for i in range(1, len(chunks)):
+        overlap = chunks[i - 1][1] - chunks[i][0]
+        label = "[out]" if i == len(chunks) - 1 else f"[x{i}]"
+        parts.append(f"{previous}[{i}:a]acrossfade=d={overlap:.3f}:c1=tri:c2=tri{label}")
+        previous = label
+    return ";".join(parts)
+
+
+def denoise_chunked(file_path, output_file, audio_filter, duration, workers, work_dir,
+                    on_progress=None, on_start=None, slots=None):
+    """
+    Giảm tạp âm file dài: chia thành các đoạn chồng lấn, xử lý song song trên nhiều tiến trình FFmpeg,
+    rồi một tiến trình FFmpeg ghép các đoạn bằng acrossfade và mã hóa thẳng ra định dạng của output
+    (giữ metadata của file gốc), không qua file ghép trung gian.
+    Các đoạn được ghi dạng Wave64 nên không bị giới hạn 4 GiB của WAV với bản ghi rất dài.
+    slots (semaphore, nếu có) giới hạn số tiến trình FFmpeg chạy cùng lúc, dùng chung cho cả lô file.
+    """
+    sample_rate, channels = _audio_format(file_path)
+    chunks = plan_overlapping_chunks(duration, workers * CHUNKS_PER_WORKER)
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        jobs = []
+        for i, (start, end) in enumerate(chunks):
+            chunk_file = os.path.join(work_dir, f"chunk_{i:04d}.w64")
+            args = [
+                "-nostdin", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", file_path, "-vn",
+                "-af", audio_filter, "-ar", str(sample_rate), "-ac", str(channels), "-c:a", "pcm_s16le",
+            ]
+            jobs.append(EncodeJob(args, chunk_file, end - start))
+        run_parallel_encodes(jobs, max_workers=workers, on_progress=on_progress, on_start=on_start, slots=slots)
+
+        final_args = ["-nostdin"]
+        for job in jobs:
+            final_args.extend(["-i", job.output_file])
+        final_args.extend(["-i", file_path])
+        graph = build_crossfade_graph(chunks)
+        if graph:
+            final_args.extend(["-filter_complex", graph, "-map", "[out]"])
+        else:
+            final_args.extend(["-map", "0:a"])
+        final_args.extend(["-map_metadata", str(len(jobs))])
+        with slots or nullcontext():
+            for _ in iter_ffmpeg_stderr(final_args + ["-y", output_file], on_start=on_start):
+                pass
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,164 @@
+# AudioTools/loudness.py
+
+import os
+import json
+import math
+import threading
+
+from Utils.logger_setup import LoggerProvider
+from Utils.cache_utils import get_cache_dir, file_identity_key
+from Utils.ffmpeg_utils import iter_ffmpeg_stderr, get_media_duration
+from .loudness_meter import measure_r128
+
+LOUDNESS_CACHE_DIR = "loudness"
+INDEX_FILE = "index.json"
+# Giới hạn hợp lệ của tham số I trong bộ lọc loudnorm
+LOUDNORM_MIN_I = -70.0
+LOUDNORM_MAX_I = -5.0
+
+# Các chế độ mục tiêu khi chuẩn hóa nhiều file
+TARGET_TRACK = "track"  # mỗi file về đúng mức mục tiêu
+TARGET_ALBUM = "album"  # cùng một mức tăng/giảm cho mọi file, cả album đạt mức mục tiêu
+TARGET_BATCH = "batch"  # mọi file về mức trung vị của lô (không cần chọn LUFS)
+
+class LoudnessStats:
+    """Số đo EBU R128 của một file: độ lớn tích hợp (I), dải độ lớn (LRA), đỉnh thật (TP), ngưỡng gating."""
+    def __init__(self, input_i, input_lra, input_tp, input_thresh, duration=0.0):
+        self.input_i = input_i
+        self.input_lra = input_lra
+        self.input_tp = input_tp
+        self.input_thresh = input_thresh
+        self.duration = duration
+
+    def to_dict(self):
+        return {
+            "input_i": self.input_i, "input_lra": self.input_lra, "input_tp": self.input_tp,
+            "input_thresh": self.input_thresh, "duration": self.duration,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["input_i"], data["input_lra"], data["input_tp"], data["input_thresh"], data.get("duration", 0.0))
+
+    def loudnorm_filter(self, target_lufs, true_peak=-1.5, lra=7):
+        """Bộ lọc loudnorm pass 2 dùng số đo này (không cần chạy lại pass 1)."""
+        return (
+            f"loudnorm=I={target_lufs}:tp={true_peak}:LRA={lra}:"
+            f"measured_I={self.input_i}:"
+            f"measured_LRA={self.input_lra}:"
+            f"measured_tp={self.input_tp}:"
+            f"measured_thresh={self.input_thresh}"
+        )
+
+
+def _parse_loudnorm_json(lines):
+    """Lấy khối JSON mà loudnorm in ra ở cuối stderr (sau dòng '[Parsed_loudnorm...')."""
+    block = None
+    closed = False
+    # Đọc hết các dòng (để FFmpeg kết thúc và mã lỗi được kiểm tra), chỉ giữ lại khối JSON
+    for line in lines:
+        stripped = line.strip()
+        if closed:
+            continue
+        if block is None:
+            if stripped.startswith("[Parsed_loudnorm"):
+                block = []
+            continue
+        block.append(stripped)
+        closed = stripped == "}"
+    if not closed:
+        raise ValueError("Không tìm thấy kết quả đo của loudnorm trong output FFmpeg.")
+    return json.loads("\n".join(block))
+
+def measure_loudness(file_path, on_start=None):
+    """Chạy loudnorm ở chế độ đo (pass 1) và trả về LoudnessStats. Số đo không phụ thuộc mức mục tiêu."""
+    args = ["-nostdin", "-i", file_path, "-vn", "-af", "loudnorm=print_format=json", "-f", "null", "-"]
+    stats = _parse_loudnorm_json(iter_ffmpeg_stderr(args, on_start=on_start))
+    return LoudnessStats(
+        float(stats["input_i"]), float(stats["input_lra"]), float(stats["input_tp"]),
+        float(stats["input_thresh"]), get_media_duration(file_path) or 0.0,
+    )
+
+def measure_loudness_fast(file_path, on_start=None):
+    """Đo bằng bộ đo NumPy (loudness_meter); nếu không giải mã/đo được thì quay về loudnorm của FFmpeg."""
+    try:
+        return LoudnessStats(*measure_r128(file_path, on_start=on_start))
+    except Exception as e:
+        LoggerProvider.get_logger('audio_tools').warning(
+            f"Bộ đo NumPy lỗi với {os.path.basename(file_path)}, dùng loudnorm: {e}"
+        )
+        return measure_loudness(file_path, on_start=on_start)
+
+
+class LoudnessService:
+    """
+    Dịch vụ đo độ lớn âm thanh có cache theo định danh file ('Data/loudness/index.json').
+    Mỗi file chỉ được đo một lần; chuẩn hóa lại với mức mục tiêu khác sẽ bỏ qua pass 1.
+    """
+    def __init__(self, project_root, measure=measure_loudness_fast):
+        self.logger = LoggerProvider.get_logger('audio_tools')
+        self.index_path = os.path.join(get_cache_dir(project_root, LOUDNESS_CACHE_DIR), INDEX_FILE)
+        self.measure = measure
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def get_stats(self, file_path, on_start=None):
+        """Trả về số đo của file, chỉ chạy FFmpeg khi chưa có trong cache."""
+        key = file_identity_key(file_path)
+        with self._lock:
+            data = self._index.get(key)
+        if data:
+            return LoudnessStats.from_dict(data)
+
+        stats = self.measure(file_path, on_start=on_start)
+        with self._lock:
+            self._index[key] = stats.to_dict()
+            try:
+                self._save_index()
+            except OSError as e:
+                self.logger.warning(f"Không thể lưu cache độ lớn âm thanh: {e}")
+        return stats
+
+
+def album_loudness(stats_list):
+    """Độ lớn tích hợp của cả nhóm file (trung bình năng lượng, trọng số theo thời lượng)."""
+    total_duration = sum(max(stats.duration, 0.0) for stats in stats_list)
+    if total_duration <= 0:
+        weights = [1.0] * len(stats_list)
+        total_duration = float(len(stats_list))
+    else:
+        weights = [max(stats.duration, 0.0) for stats in stats_list]
+    energy = sum(w * 10 ** (stats.input_i / 10) for w, stats in zip(weights, stats_list))
+    return 10 * math.log10(energy / total_duration) if energy > 0 else LOUDNORM_MIN_I
+
+def resolve_targets(stats_by_file, target_lufs, mode):
+    """
+    Tính mức LUFS mục tiêu cho từng file theo chế độ:
+    - track: mọi file về target_lufs.
+    - album: mọi file cùng một mức tăng/giảm để cả nhóm đạt target_lufs (giữ chênh lệch giữa các bài).
+    - batch: mọi file về mức trung vị của nhóm.
+    """
+    if mode == TARGET_ALBUM and stats_by_file:
+        gain = target_lufs - album_loudness(list(stats_by_file.values()))
+        targets = {path: stats.input_i + gain for path, stats in stats_by_file.items()}
+    elif mode == TARGET_BATCH and stats_by_file:
+        levels = sorted(stats.input_i for stats in stats_by_file.values())
+        middle = len(levels) // 2
+        median = levels[middle] if len(levels) % 2 else (levels[middle - 1] + levels[middle]) / 2
+        targets = {path: median for path in stats_by_file}
+    else:
+        targets = {path: target_lufs for path in stats_by_file}
+    return {path: round(min(max(value, LOUDNORM_MIN_I), LOUDNORM_MAX_I), 1) for path, value in targets.items()}
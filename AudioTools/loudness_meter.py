@@ -0,0 +1,211 @@
+# AudioTools/loudness_meter.py
+
+import os
+import threading
+import subprocess
+from collections import deque
+import numpy as np
+from scipy.signal import sosfilt, resample_poly
+
+from Utils.ffmpeg_utils import probe_media_streams
+
+# Giải mã về 48 kHz để dùng đúng bộ hệ số K-weighting chuẩn trong ITU-R BS.1770
+METER_SAMPLE_RATE = 48000
+# Khối con 100ms: khối 400ms (momentary) = 4 khối con, khối 3s (short-term) = 30 khối con
+SUBBLOCK_FRAMES = METER_SAMPLE_RATE // 10
+MOMENTARY_SUBBLOCKS = 4
+SHORT_TERM_SUBBLOCKS = 30
+# Mỗi lần đọc từ pipe xử lý 10 giây audio
+READ_FRAMES = SUBBLOCK_FRAMES * 100
+TRUE_PEAK_OVERSAMPLE = 4
+# Số frame chồng lấn giữa hai khối khi lấy mẫu tăng (lớn hơn nửa độ dài bộ lọc của resample_poly),
+# để đỉnh thật tính theo khối khớp với tính trên cả file liền một mạch
+TRUE_PEAK_MARGIN = 64
+# Chỉ giữ vài dòng stderr cuối của FFmpeg cho thông báo lỗi
+STDERR_TAIL_LINES = 20
+
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+LRA_RELATIVE_GATE_LU = -20.0
+
+# Hai tầng biquad K-weighting (shelf tần cao + lọc thông cao RLB) ở 48 kHz, dạng second-order sections
+K_WEIGHTING_SOS = np.array([
+    [1.53512485958697, -2.69169618940638, 1.19839281085285, 1.0, -1.69065929318241, 0.73248077421585],
+    [1.0, -2.0, 1.0, 1.0, -1.99004745483398, 0.99007225036621],
+])
+
+# Thứ tự kênh của các bố cục FFmpeg thường gặp; bố cục mặc định theo số kênh giống av_channel_layout_default
+LAYOUT_CHANNELS = {
+    "mono": ["FC"], "stereo": ["FL", "FR"], "2.1": ["FL", "FR", "LFE"],
+    "3.0": ["FL", "FR", "FC"], "3.0(back)": ["FL", "FR", "BC"], "3.1": ["FL", "FR", "FC", "LFE"],
+    "4.0": ["FL", "FR", "FC", "BC"], "quad": ["FL", "FR", "BL", "BR"], "quad(side)": ["FL", "FR", "SL", "SR"],
+    "4.1": ["FL", "FR", "FC", "LFE", "BC"],
+    "5.0": ["FL", "FR", "FC", "SL", "SR"], "5.0(back)": ["FL", "FR", "FC", "BL", "BR"],
+    "5.1": ["FL", "FR", "FC", "LFE", "SL", "SR"], "5.1(back)": ["FL", "FR", "FC", "LFE", "BL", "BR"],
+    "6.0": ["FL", "FR", "FC", "BC", "SL", "SR"], "6.1": ["FL", "FR", "FC", "LFE", "BC", "SL", "SR"],
+    "7.0": ["FL", "FR", "FC", "BL", "BR", "SL", "SR"], "7.1": ["FL", "FR", "FC", "LFE", "BL", "BR", "SL", "SR"],
+    "7.1(wide)": ["FL", "FR", "FC", "LFE", "BL", "BR", "FLC", "FRC"],
+    "7.1(wide-side)": ["FL", "FR", "FC", "LFE", "FLC", "FRC", "SL", "SR"],
+}
+DEFAULT_LAYOUTS = {1: "mono", 2: "stereo", 3: "2.1", 4: "4.0", 5: "5.0", 6: "5.1", 7: "6.1", 8: "7.1"}
+LFE_CHANNELS = {"LFE", "LFE2"}
+# Kênh phía sau/hai bên được nhân 1.41 (+1.5 dB), cùng cách chia của bộ lọc ebur128 trong FFmpeg
+SURROUND_CHANNELS = {"BL", "BR", "BC", "SL", "SR", "TBL", "TBC", "TBR", "SDL", "SDR"}
+
+def channel_weights(channels, layout=None):
+    """
+    Trọng số kênh theo BS.1770: kênh surround x1.41, bỏ qua LFE.
+    layout là tên bố cục FFmpeg (ví dụ '5.1(side)'); không có, không biết hoặc không khớp số kênh thì dùng
+    bố cục mặc định theo số kênh. Số kênh không có bố cục mặc định thì mọi kênh có trọng số 1.
+    """
+    names = LAYOUT_CHANNELS.get(layout or "")
+    if not names or len(names) != channels:
+        names = LAYOUT_CHANNELS.get(DEFAULT_LAYOUTS.get(channels, ""))
+    if not names:
+        return np.ones(channels)
+    return np.array([0.0 if name in LFE_CHANNELS else 1.41 if name in SURROUND_CHANNELS else 1.0 for name in names])
+
+def _loudness(energy):
+    with np.errstate(divide='ignore'):
+        return -0.691 + 10 * np.log10(energy)
+
+def _window_means(subblock_energy, size):
+    """Năng lượng trung bình của các cửa sổ trượt `size` khối con, bước 100ms."""
+    if len(subblock_energy) < size:
+        return np.empty(0)
+    cumsum = np.concatenate(([0.0], np.cumsum(subblock_energy)))
+    return (cumsum[size:] - cumsum[:-size]) / size
+
+def _audio_channels(file_path):
+    """Trả về (số kênh, tên bố cục kênh hoặc None) của luồng audio đầu tiên."""
+    info = probe_media_streams(file_path)
+    if info:
+        for stream in info["streams"]:
+            if stream.get("codec_type") == "audio" and stream.get("channels"):
+                return int(stream["channels"]), stream.get("channel_layout")
+    raise ValueError("Không xác định được số kênh audio.")
+
+def _oversampled_peak(history, block):
+    """
+    Đỉnh của phần giữa [history + block] sau khi lấy mẫu tăng. TRUE_PEAK_MARGIN frame cuối chưa được
+    tính (thiếu mẫu phía sau) và được giữ lại làm history cho khối kế tiếp.
+    Trả về (đỉnh, history mới).
+    """
+    segment = np.concatenate((history, block))
+    margin = TRUE_PEAK_MARGIN
+    oversampled = resample_poly(segment, TRUE_PEAK_OVERSAMPLE, 1, axis=0)
+    valid = oversampled[margin * TRUE_PEAK_OVERSAMPLE:(len(segment) - margin) * TRUE_PEAK_OVERSAMPLE]
+    peak = float(np.abs(valid).max()) if valid.size else 0.0
+    return peak, segment[-2 * margin:]
+
+def compute_loudness(frames_iter, channels, layout=None):
+    """
+    Tính (I, LRA, TP, ngưỡng gating, số frame) từ các khối PCM float (frames x channels) ở 48 kHz.
+    Toàn bộ phép tính theo khối bằng NumPy, bộ nhớ chỉ phụ thuộc độ dài khối đọc.
+    """
+    weights = channel_weights(channels, layout)
+    zi = np.zeros((K_WEIGHTING_SOS.shape[0], 2, channels))
+    pending = np.empty((0, channels))
+    subblock_chunks = []
+    peak = 0.0
+    total_frames = 0
+    # Đỉnh thật: lấy mẫu tăng 4 lần rồi tìm biên độ lớn nhất. Các khối được nối chồng lấn để không có
+    # sai số biên tại ranh giới khối; khoảng đệm 0 ở đầu/cuối giống như lấy mẫu tăng cả file một lần.
+    peak_history = np.zeros((2 * TRUE_PEAK_MARGIN, channels))
+
+    for block in frames_iter:
+        total_frames += len(block)
+        filtered, zi = sosfilt(K_WEIGHTING_SOS, block, axis=0, zi=zi)
+        if len(pending):
+            filtered = np.concatenate((pending, filtered))
+        usable = len(filtered) - len(filtered) % SUBBLOCK_FRAMES
+        if usable:
+            squares = filtered[:usable].reshape(-1, SUBBLOCK_FRAMES, channels) ** 2
+            subblock_chunks.append(squares.mean(axis=1) @ weights)
+        pending = filtered[usable:]
+        block_peak, peak_history = _oversampled_peak(peak_history, block)
+        peak = max(peak, block_peak)
+    block_peak, _ = _oversampled_peak(peak_history, np.zeros((TRUE_PEAK_MARGIN, channels)))
+    peak = max(peak, block_peak)
+
+    subblocks = np.concatenate(subblock_chunks) if subblock_chunks else np.empty(0)
+
+    # Độ lớn tích hợp: cửa sổ 400ms, gating tuyệt đối -70 LUFS rồi gating tương đối -10 LU
+    momentary = _window_means(subblocks, MOMENTARY_SUBBLOCKS)
+    above_absolute = momentary[_loudness(momentary) > ABSOLUTE_GATE_LUFS]
+    if len(above_absolute):
+        threshold = float(_loudness(above_absolute.mean())) + RELATIVE_GATE_LU
+        gated = above_absolute[_loudness(above_absolute) > threshold]
+        integrated = float(_loudness(gated.mean())) if len(gated) else ABSOLUTE_GATE_LUFS
+    else:
+        threshold = ABSOLUTE_GATE_LUFS + RELATIVE_GATE_LU
+        integrated = ABSOLUTE_GATE_LUFS
+
+    # Dải độ lớn (EBU Tech 3342): cửa sổ 3s, gating tương đối -20 LU, lấy P95 - P10
+    short_term = _window_means(subblocks, SHORT_TERM_SUBBLOCKS)
+    short_term = short_term[_loudness(short_term) > ABSOLUTE_GATE_LUFS]
+    lra = 0.0
+    if len(short_term):
+        lra_gate = float(_loudness(short_term.mean())) + LRA_RELATIVE_GATE_LU
+        levels = _loudness(short_term[_loudness(short_term) > lra_gate])
+        if len(levels):
+            low, high = np.percentile(levels, [10, 95])
+            lra = float(high - low)
+
+    true_peak = 20 * np.log10(peak) if peak > 0 else -99.0
+    return integrated, lra, float(true_peak), threshold, total_frames
+
+
+def _drain_stderr(stream, tail):
+    """Đọc hết stderr trên luồng riêng: file hỏng có thể in ra nhiều hơn bộ đệm pipe và làm FFmpeg bị treo."""
+    for line in stream:
+        tail.append(line.decode('utf-8', errors='ignore').rstrip())
+    stream.close()
+
+
+def iter_pcm_blocks(file_path, channels, on_start=None):
+    """Giải mã file qua pipe FFmpeg thành PCM float32 48 kHz, trả về từng khối (frames x channels)."""
+    ffmpeg_path = os.environ.get("FFMPEG_PATH")
+    if not ffmpeg_path:
+        raise FileNotFoundError("Đường dẫn FFmpeg chưa được thiết lập.")
+    cmd = [
+        ffmpeg_path, "-v", "error", "-nostdin", "-i", file_path, "-vn",
+        "-ac", str(channels), "-ar", str(METER_SAMPLE_RATE), "-f", "f32le", "-acodec", "pcm_f32le", "-"
+    ]
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        creationflags=subprocess.CREATE_NO_WINDOW
+    )
+    if on_start:
+        on_start(process.pid)
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    drain = threading.Thread(target=_drain_stderr, args=(process.stderr, stderr_tail), daemon=True)
+    drain.start()
+
+    frame_bytes = 4 * channels
+    try:
+        while True:
+            raw = process.stdout.read(READ_FRAMES * frame_bytes)
+            if not raw:
+                break
+            raw = raw[:len(raw) - len(raw) % frame_bytes]
+            yield np.frombuffer(raw, dtype=np.float32).reshape(-1, channels).astype(np.float64)
+    finally:
+        process.stdout.close()
+        process.wait()
+        drain.join()
+    if process.returncode != 0:
+        error_msg = "\n".join(stderr_tail)[-500:]
+        raise Exception(f"Lỗi FFmpeg khi giải mã để đo độ lớn: {error_msg}")
+
+
+def measure_r128(file_path, on_start=None):
+    """
+    Đo EBU R128 bằng NumPy thay cho pass 1 của loudnorm, trả về (I, LRA, TP, ngưỡng, thời lượng).
+    FFmpeg chỉ giải mã (nhanh, đa luồng); lọc K-weighting, gating và đỉnh thật được vector hóa.
+    """
+    channels, layout = _audio_channels(file_path)
+    integrated, lra, true_peak, threshold, frames = compute_loudness(
+        iter_pcm_blocks(file_path, channels, on_start=on_start), channels, layout
+    )
+    return round(integrated, 2), round(lra, 2), round(true_peak, 2), round(threshold, 2), frames / METER_SAMPLE_RATE
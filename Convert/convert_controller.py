@@ -2,13 +2,26 @@
 
 import os
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from Utils.logger_setup import LoggerProvider
-from Utils.ffmpeg_utils import run_ffmpeg, stop_ffmpeg_processes
+from Utils.ffmpeg_utils import run_ffmpeg_multi_output, stop_ffmpeg_processes, get_media_duration
+from Utils.parallel_encode import default_worker_count
+from Utils.output_cache import get_output_cache
+from Utils.job_journal import JobJournal, STATE_RUNNING, STATE_DONE, STATE_FAILED, STATE_CANCELLED, RESUME_RETRY_MS, temp_output_path, commit_output, discard_output
 
 # Hằng số cho các đuôi file video
 VIDEO_EXTENSIONS = {'.mp4', '.flv', '.mkv', '.mov', '.avi', '.wmv'}
 
+def probe_durations(input_files, max_workers):
+    """Thăm dò thời lượng nhiều file song song (mỗi lần thăm dò là một tiến trình ffprobe riêng)."""
+    if not input_files:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(input_files)))) as executor:
+        durations = executor.map(lambda path: get_media_duration(path) or 0, input_files)
+        return dict(zip(input_files, durations))
+
 class ConvertController:
     def __init__(self, gui, project_root, thread_pool, options_map):
         self.gui = gui
@@ -20,11 +33,19 @@ class ConvertController:
         
         self.active_ffmpeg_pids = []
         self.is_converting = False
+        self.is_closing = False
         
         self.task_lock = threading.Lock()
         self.active_tasks = 0
 
+        # Nhật ký tác vụ để có thể tiếp tục lô chuyển đổi sau khi ứng dụng bị đóng giữa chừng
+        self.journal = JobJournal(project_root, "convert")
+        # Cache output: cùng file + cùng cài đặt thì lấy lại kết quả cũ thay vì chạy lại FFmpeg
+        self.output_cache = get_output_cache(project_root)
+
     def on_closing(self):
+        # Các tác vụ bị dừng do đóng ứng dụng vẫn giữ trạng thái "chưa xong" trong nhật ký
+        self.is_closing = True
         if self.active_ffmpeg_pids:
             self.logger.warning(f"Đang dừng {len(self.active_ffmpeg_pids)} tiến trình FFmpeg đang chạy...")
             stop_ffmpeg_processes(self.active_ffmpeg_pids)
@@ -36,29 +57,26 @@ class ConvertController:
         if channel_value not in [None, "keep"]:
             args_list.extend(["-ac", channel_value])
             
-    def build_ffmpeg_args(self, input_file, output_ext):
-        args = []
-        
-        # Xử lý hiệu ứng Tốc độ và Cao độ
+    def build_audio_filters(self):
+        """Chuỗi bộ lọc Tốc độ/Cao độ, dùng chung cho mọi định dạng đầu ra."""
         speed = self.gui.speed_var.get()
         pitch_semitones = self.gui.pitch_var.get()
         audio_filters = []
-        
+
         if speed != 1.0:
             audio_filters.append(f"atempo={speed}")
-            
-        # --- SỬA LỖI TẠI ĐÂY ---
+
         # Chỉ kích hoạt bộ lọc pitch khi giá trị đủ lớn, tránh sai số float
         if abs(pitch_semitones) > 0.01:
             pitch_multiplier = pow(2, pitch_semitones / 12.0)
             original_rate = 44100
             new_rate = int(original_rate * pitch_multiplier)
             audio_filters.append(f"asetrate={new_rate},aresample={original_rate}")
-            
-        if audio_filters:
-            args.extend(["-af", ",".join(audio_filters)])
-            
-        # Lấy giá trị từ dict
+        return audio_filters
+
+    def build_format_args(self, output_ext):
+        """Tham số mã hóa riêng của từng định dạng đầu ra."""
+        args = []
         if output_ext == 'mp3':
             rate_display = self.gui.mp3_sample_rate_var.get()
             bitrate_display = self.gui.mp3_bitrate_var.get()
@@ -66,32 +84,64 @@ class ConvertController:
 
             sample_rate = self.options["sample_rates"].get(rate_display)
             bitrate = self.options["mp3_bitrates"].get(bitrate_display)
-            
+
             args.extend(["-ar", sample_rate, "-ab", bitrate])
             self._add_channel_args(channel_display, args)
-            
+
         elif output_ext == 'wav':
             rate_display = self.gui.wav_sample_rate_var.get()
             depth_display = self.gui.wav_bit_depth_var.get()
             channel_display = self.gui.wav_channels_var.get()
-            
+
             sample_rate = self.options["sample_rates"].get(rate_display)
             bit_depth_codec = self.options["wav_bit_depths"].get(depth_display)
 
             args.extend(["-ar", sample_rate, "-acodec", bit_depth_codec])
             self._add_channel_args(channel_display, args)
-            
+
         return args
 
+    @staticmethod
+    def get_output_file(input_file, output_dir, ext):
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        return os.path.join(output_dir, f"{base_name}.{ext}")
+
+    @staticmethod
+    def build_multi_output(input_file, output_dir, audio_filters, format_args):
+        """
+        Tạo danh sách (args, output_file) để MỘT tiến trình FFmpeg giải mã file một lần
+        và ghi ra tất cả các định dạng. Chuỗi bộ lọc chạy một lần rồi được tách (asplit)
+        cho từng output.
+        """
+        targets = list(format_args)
+        outputs = []
+
+        if audio_filters:
+            labels = [f"[out{i}]" for i in range(len(targets))]
+            graph = ",".join(audio_filters)
+            if len(targets) > 1:
+                graph += f",asplit={len(targets)}{''.join(labels)}"
+            else:
+                graph += labels[0]
+            map_args = [["-map", label] for label in labels]
+            map_args[0] = ["-filter_complex", f"[0:a:0]{graph}"] + map_args[0]
+        else:
+            map_args = [["-map", "0:a:0"] for _ in targets]
+
+        for ext, maps in zip(targets, map_args):
+            output_file = ConvertController.get_output_file(input_file, output_dir, ext)
+            outputs.append((maps + format_args[ext], output_file))
+        return outputs
+
     def start_conversion(self):
         if self.is_converting:
             self.gui.show_message("warning", "Đang xử lý", "Một tác vụ chuyển đổi đang chạy, vui lòng chờ.")
             return
 
-        input_file = self.gui.input_path_var.get()
+        input_files = [p.strip() for p in self.gui.input_path_var.get().split(";") if p.strip()]
         output_dir = self.gui.output_path_var.get()
 
-        if not input_file or not os.path.exists(input_file):
+        if not input_files or not all(os.path.exists(p) for p in input_files):
             self.gui.show_message("error", "Lỗi", "Vui lòng chọn file đầu vào hợp lệ.")
             return
 
@@ -107,43 +157,166 @@ class ConvertController:
         if not targets:
             self.gui.show_message("error", "Lỗi", "Vui lòng chọn ít nhất một định dạng đầu ra.")
             return
-            
+
+        # Đọc toàn bộ cài đặt trên luồng UI, các luồng xử lý chỉ dùng bản chụp này
+        audio_filters = self.build_audio_filters()
+        format_args = {ext: self.build_format_args(ext) for ext in targets}
+
+        tasks = []
+        for input_file in input_files:
+            params = {"input_file": input_file, "output_dir": output_dir,
+                      "audio_filters": audio_filters, "format_args": format_args}
+            outputs = [path for _, path in self.build_multi_output(input_file, output_dir, audio_filters, format_args)]
+            tasks.append({"params": params, "outputs": outputs})
+        task_ids = self.journal.add_tasks("convert", tasks)
+
+        if len(input_files) == 1:
+            self.gui.log_status(f"Bắt đầu chuyển đổi file: {os.path.basename(input_files[0])}")
+        else:
+            self.gui.log_status(f"Bắt đầu chuyển đổi {len(input_files)} file sang {', '.join(t.upper() for t in targets)}")
+        self.launch_batch(list(zip(task_ids, [task["params"] for task in tasks])))
+
+    def launch_batch(self, jobs):
+        """jobs là danh sách (task_id, params) đã được ghi vào nhật ký."""
         self.is_converting = True
         self.gui.set_ui_state("converting")
-        self.gui.log_status(f"Bắt đầu chuyển đổi file: {os.path.basename(input_file)}")
-        
         with self.task_lock:
-            self.active_tasks = len(targets)
+            self.active_tasks = 1
 
-        for ext in targets:
-            self.thread_pool.submit(self.run_conversion_task, input_file, output_dir, ext)
+        self.thread_pool.submit(self.run_batch_planning, jobs)
 
-    def run_conversion_task(self, input_file, output_dir, output_ext):
-        base_name = os.path.splitext(os.path.basename(input_file))[0]
-        output_file = os.path.join(output_dir, f"{base_name}.{output_ext}")
-        
+    def offer_resume(self, task_ids=None):
+        """
+        Khi khởi động: hỏi người dùng có muốn tiếp tục các tác vụ dang dở của lần chạy trước.
+        Nếu đang chuyển đổi thì hỏi lại khi rảnh, không hủy các tác vụ dang dở.
+        """
+        unfinished = self.journal.unfinished_tasks()
+        if task_ids is None:
+            # Chỉ các tác vụ của lần chạy trước, không gồm tác vụ được thêm trong lúc chờ hỏi
+            task_ids = {task["id"] for task in unfinished}
+        unfinished = [task for task in unfinished if task["id"] in task_ids]
+        if not unfinished:
+            if not self.is_converting:
+                self.journal.compact()
+            return
+        if self.is_converting:
+            self.gui.root.after(RESUME_RETRY_MS, self.offer_resume, task_ids)
+            return
+        if not self.gui.ask_yes_no(
+            "Tiếp tục chuyển đổi",
+            f"Có {len(unfinished)} file chưa chuyển đổi xong từ lần chạy trước.\nTiếp tục xử lý các file này?"
+        ):
+            self.journal.cancel_unfinished(task_ids)
+            self.journal.compact()
+            return
+
+        jobs = []
+        missing = []
+        for task in unfinished:
+            if os.path.exists(task["params"]["input_file"]):
+                os.makedirs(task["params"]["output_dir"], exist_ok=True)
+                jobs.append((task["id"], task["params"]))
+            else:
+                missing.append(task["id"])
+                self.gui.log_status(f"Bỏ qua (file nguồn không còn): {task['params']['input_file']}", "warning")
+        self.journal.mark_many(missing, STATE_CANCELLED)
+        if not jobs:
+            self.journal.compact()
+            return
+        self.gui.log_status(f"Tiếp tục {len(jobs)} tác vụ chuyển đổi dang dở...")
+        self.launch_batch(jobs)
+
+    def run_batch_planning(self, jobs):
+        """
+        Thăm dò thời lượng các file (song song), xếp file dài nhất lên trước rồi phân phối cho
+        một số luồng làm việc cố định (mỗi luồng chạy một tiến trình FFmpeg tại một thời điểm).
+        """
         try:
-            self.gui.log_status(f"Đang chuẩn bị chuyển đổi sang {output_ext.upper()}...")
-            args = self.build_ffmpeg_args(input_file, output_ext)
-            
-            input_ext = os.path.splitext(input_file)[1].lower()
-            if input_ext in VIDEO_EXTENSIONS:
-                args.insert(0, "-vn")
-            
-            self.gui.log_status(f"Lệnh FFmpeg cho {output_ext.upper()}: ffmpeg -i ... {' '.join(args)} ...")
-            
-            pid = run_ffmpeg(input_file, output_file, args)
-            self.active_ffmpeg_pids.append(pid)
-            self.active_ffmpeg_pids.remove(pid) 
-            
-            self.gui.log_status(f"CHUYỂN ĐỔI THÀNH CÔNG -> {os.path.basename(output_file)}", "success")
+            max_workers = default_worker_count(threads_per_job=1)
+            durations = probe_durations([params["input_file"] for _, params in jobs], max_workers)
+            queue = deque(sorted(jobs, key=lambda job: durations[job[1]["input_file"]], reverse=True))
+            workers = min(max_workers, len(queue))
+            if len(jobs) > 1:
+                self.gui.log_status(f"Xếp lịch {len(jobs)} file (dài nhất trước) trên {workers} luồng.")
 
+            queue_lock = threading.Lock()
+            with self.task_lock:
+                self.active_tasks += workers
+            for _ in range(workers):
+                self.thread_pool.submit(self.run_conversion_worker, queue, queue_lock)
         except Exception as e:
-            self.logger.error(f"Lỗi khi chuyển đổi sang {output_ext.upper()}: {e}", exc_info=True)
-            self.gui.log_status(f"LỖI khi chuyển đổi sang {output_ext.upper()}: {e}", "error")
+            self.logger.error(f"Lỗi khi lập lịch chuyển đổi: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI khi lập lịch chuyển đổi: {e}", "error")
+        finally:
+            self.task_finished()
+
+    def run_conversion_worker(self, queue, queue_lock):
+        try:
+            while not self.is_closing:
+                with queue_lock:
+                    if not queue:
+                        break
+                    task_id, params = queue.popleft()
+                self.run_conversion_task(task_id=task_id, **params)
         finally:
             self.task_finished()
 
+    def run_conversion_task(self, input_file, output_dir, audio_filters, format_args, task_id=None):
+        file_name = os.path.basename(input_file)
+        temp_outputs = []
+        try:
+            self.journal.mark(task_id, STATE_RUNNING)
+
+            # Các định dạng đã có trong cache được lấy ra ngay, chỉ chạy FFmpeg cho phần còn lại
+            cache_keys = {
+                ext: self.output_cache.make_key(input_file, audio_filters + args, ext)
+                for ext, args in format_args.items()
+            }
+            remaining = {}
+            for ext, args in format_args.items():
+                output_file = self.get_output_file(input_file, output_dir, ext)
+                if self.output_cache.fetch(cache_keys[ext], output_file):
+                    self.gui.log_status(f"Lấy từ cache (không cần chuyển đổi lại) -> {os.path.basename(output_file)}", "success")
+                else:
+                    remaining[ext] = args
+
+            if remaining:
+                outputs = self.build_multi_output(input_file, output_dir, audio_filters, remaining)
+                # FFmpeg ghi vào file tạm, chỉ đổi tên thành file thật khi đã ghi xong
+                temp_outputs = [(args, temp_output_path(path)) for args, path in outputs]
+                targets = ", ".join(ext.upper() for ext in remaining)
+                self.gui.log_status(f"Đang chuyển đổi {file_name} -> {targets} (một lần giải mã)...")
+
+                started = []
+                try:
+                    run_ffmpeg_multi_output(input_file, temp_outputs, on_start=lambda pid: self._track_pid(pid, started))
+                finally:
+                    self._release_pids(started)
+
+                for ext, (_, temp_file), (_, output_file) in zip(remaining, temp_outputs, outputs):
+                    commit_output(temp_file, output_file)
+                    self.output_cache.store(cache_keys[ext], output_file)
+                    self.gui.log_status(f"CHUYỂN ĐỔI THÀNH CÔNG -> {os.path.basename(output_file)}", "success")
+            self.journal.mark(task_id, STATE_DONE)
+
+        except Exception as e:
+            for _, temp_file in temp_outputs:
+                discard_output(temp_file)
+            if not self.is_closing:
+                self.journal.mark(task_id, STATE_FAILED, e)
+            self.logger.error(f"Lỗi khi chuyển đổi {file_name}: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI khi chuyển đổi {file_name}: {e}", "error")
+
+    def _track_pid(self, pid, started):
+        """Ghi PID ngay khi FFmpeg khởi động để việc đóng ứng dụng có thể kết thúc tiến trình."""
+        started.append(pid)
+        self.active_ffmpeg_pids.append(pid)
+
+    def _release_pids(self, started):
+        for pid in started:
+            if pid in self.active_ffmpeg_pids:
+                self.active_ffmpeg_pids.remove(pid)
+
     def task_finished(self):
         with self.task_lock:
             self.active_tasks -= 1
@@ -152,5 +325,6 @@ class ConvertController:
 
     def finalize_processing(self):
         self.is_converting = False
+        self.journal.compact()
         self.gui.set_ui_state("idle")
         self.gui.show_message("info", "Hoàn tất", "Tất cả các tác vụ chuyển đổi đã hoàn thành.")
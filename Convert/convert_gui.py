@@ -1,9 +1,10 @@
 # Convert/convert_gui.py
 
+import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 
-from .convert_controller import ConvertController
+from .convert_controller import ConvertController, VIDEO_EXTENSIONS
 
 # --- Dữ liệu tùy chọn, không thay đổi ---
 MP3_BITRATE_OPTIONS = {"128 kbps": "128k", "192 kbps": "192k", "256 kbps": "256k", "320 kbps": "320k"}
@@ -44,6 +45,8 @@ class ConvertGUI:
 
         self.create_widgets()
         self.toggle_options_ui()
+        # Hỏi tiếp tục các tác vụ dang dở sau khi giao diện đã hiển thị
+        self.root.after(1000, self.controller.offer_resume)
 
     # --- HÀM MỚI: Xử lý việc reset hiệu ứng ---
     def reset_effects(self):
@@ -78,12 +81,13 @@ class ConvertGUI:
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(4, weight=1)
 
-        input_frame = ttk.LabelFrame(self.root, text="1. Chọn File Đầu vào", padding=10)
+        input_frame = ttk.LabelFrame(self.root, text="1. Chọn File Đầu vào (có thể chọn nhiều file)", padding=10)
         input_frame.pack(side="top", fill="x", padx=10, pady=5)
         input_frame.columnconfigure(0, weight=1)
         self.input_entry = ttk.Entry(input_frame, textvariable=self.input_path_var)
         self.input_entry.grid(row=0, column=0, sticky="ew")
         ttk.Button(input_frame, text="Duyệt...", command=self.browse_input).grid(row=0, column=1, padx=(5, 0))
+        ttk.Button(input_frame, text="Thư mục...", command=self.browse_input_folder).grid(row=0, column=2, padx=(5, 0))
 
         settings_frame = ttk.LabelFrame(self.root, text="2. Cài đặt Chuyển đổi", padding=10)
         settings_frame.pack(side="top", fill="x", padx=10, pady=5)
@@ -172,12 +176,27 @@ class ConvertGUI:
             self.output_entry.config(foreground="grey")
 
     def browse_input(self):
-        file_path = filedialog.askopenfilename(title="Chọn file Video hoặc Audio", filetypes=[
+        file_paths = filedialog.askopenfilenames(title="Chọn file Video hoặc Audio", filetypes=[
             ("Media Files", "*.mp4 *.flv *.mkv *.mov *.avi *.wmv *.mp3 *.wav"),
             ("All Files", "*.*")
         ])
-        if file_path:
-            self.input_path_var.set(file_path)
+        if file_paths:
+            self.input_path_var.set(";".join(file_paths))
+
+    def browse_input_folder(self):
+        dir_path = filedialog.askdirectory(title="Chọn thư mục chứa file Video hoặc Audio")
+        if not dir_path:
+            return
+        media_extensions = VIDEO_EXTENSIONS | {'.mp3', '.wav'}
+        file_paths = sorted(
+            os.path.join(dir_path, name) for name in os.listdir(dir_path)
+            if os.path.splitext(name)[1].lower() in media_extensions
+        )
+        if file_paths:
+            self.input_path_var.set(";".join(file_paths))
+            self.log_status(f"Đã chọn {len(file_paths)} file trong thư mục.")
+        else:
+            self.show_message("warning", "Không có file", "Thư mục không chứa file Video hoặc Audio nào.")
 
     def browse_output(self):
         dir_path = filedialog.askdirectory(title="Chọn thư mục lưu file")
@@ -205,6 +224,10 @@ class ConvertGUI:
             self.status_text.config(state="disabled")
         self.root.after(0, _update)
 
+    def ask_yes_no(self, title, message):
+        """Hỏi xác nhận (chỉ gọi từ luồng UI)."""
+        return messagebox.askyesno(title, message)
+
     def show_message(self, level, title, message):
         def _show():
             if level == "info": messagebox.showinfo(title, message)
@@ -0,0 +1,91 @@
+# CutMerge/auto_segment.py
+
+import re
+
+from Utils.ffmpeg_utils import iter_ffmpeg_stderr
+
+SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+SCENE_TIME_RE = re.compile(r"lavfi\.scd\.time:\s*([\d.]+)")
+PROGRESS_TIME_RE = re.compile(r"time=(\d+):(\d+):([\d.]+)")
+
+# Các đoạn ngắn hơn ngưỡng này sẽ bị bỏ qua khi đề xuất
+MIN_SEGMENT_SECONDS = 0.5
+
+def format_timestamp(seconds):
+    """HH:MM:SS.mmm: giữ phần lẻ của giây để các đoạn ngắn không bị làm tròn thành đoạn rỗng."""
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3600 * 1000)
+    minutes, millis = divmod(millis, 60 * 1000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02}.{millis:03}"
+
+
+class MediaEvents:
+    """Kết quả phân tích: danh sách khoảng lặng (start, end) và các thời điểm chuyển cảnh."""
+    def __init__(self):
+        self.silences = []
+        self.scene_changes = []
+
+
+def analyze_media_events(file_path, duration, has_video, noise_db=-35, min_silence=2.0,
+                         scene_threshold=10.0, on_progress=None, on_start=None):
+    """
+    Chạy silencedetect (và scdet nếu có video) trong MỘT lần FFmpeg đọc file,
+    phân tích sự kiện ngay khi FFmpeg in ra stderr.
+    on_progress(seconds) được gọi khi FFmpeg báo vị trí xử lý hiện tại.
+    """
+    args = ["-nostdin", "-i", file_path, "-af", f"silencedetect=n={noise_db}dB:d={min_silence}"]
+    if has_video:
+        args.extend(["-vf", f"scdet=threshold={scene_threshold}"])
+    else:
+        args.append("-vn")
+    args.extend(["-f", "null", "-"])
+
+    events = MediaEvents()
+    pending_silence_start = None
+    for line in iter_ffmpeg_stderr(args, on_start=on_start):
+        match = SILENCE_START_RE.search(line)
+        if match:
+            pending_silence_start = max(0.0, float(match.group(1)))
+            continue
+        match = SILENCE_END_RE.search(line)
+        if match and pending_silence_start is not None:
+            events.silences.append((pending_silence_start, float(match.group(1))))
+            pending_silence_start = None
+            continue
+        match = SCENE_TIME_RE.search(line)
+        if match:
+            events.scene_changes.append(float(match.group(1)))
+            continue
+        match = PROGRESS_TIME_RE.search(line)
+        if match and on_progress:
+            hours, minutes, seconds = match.groups()
+            on_progress(int(hours) * 3600 + int(minutes) * 60 + float(seconds))
+
+    # Khoảng lặng kéo dài tới cuối file không có dòng silence_end
+    if pending_silence_start is not None:
+        events.silences.append((pending_silence_start, duration))
+    return events
+
+
+def propose_without_silences(silences, duration):
+    """Đề xuất các đoạn giữ lại sau khi bỏ hết các khoảng lặng."""
+    segments = []
+    cursor = 0.0
+    for start, end in sorted(silences):
+        if start - cursor >= MIN_SEGMENT_SECONDS:
+            segments.append((cursor, start))
+        cursor = max(cursor, end)
+    if duration - cursor >= MIN_SEGMENT_SECONDS:
+        segments.append((cursor, duration))
+    return segments
+
+
+def propose_scene_splits(scene_changes, duration):
+    """Đề xuất các đoạn được tách tại mỗi điểm chuyển cảnh."""
+    boundaries = [0.0] + sorted(t for t in scene_changes if 0 < t < duration) + [duration]
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:])
+        if end - start >= MIN_SEGMENT_SECONDS
+    ]
@@ -4,12 +4,20 @@ import os
 import threading
 import subprocess
 import time
+import shutil
 from datetime import datetime
 import psutil
 import pygame
 
 from Utils.logger_setup import LoggerProvider
-from Utils.ffmpeg_utils import run_ffmpeg, stop_ffmpeg_processes, get_media_duration
+from Utils.ffmpeg_utils import run_ffmpeg, run_ffmpeg_multi_output, stop_ffmpeg_processes, get_media_duration, has_video_stream
+from Utils.media_index import get_media_index
+from .waveform import get_waveform
+from .preview_engine import PreviewEngine, SAMPLE_RATE, CHANNELS
+from .merge_planner import plan_merge, plan_full_reencode, build_normalize_args
+from Utils.parallel_encode import EncodeJob, run_parallel_encodes, default_worker_count, write_concat_list, plan_keyframe_chunks, allocate_chunk_counts
+from .auto_segment import analyze_media_events, propose_without_silences, propose_scene_splits, format_timestamp
+from Utils.job_journal import JobJournal, STATE_RUNNING, STATE_DONE, STATE_FAILED, STATE_CANCELLED, RESUME_RETRY_MS, temp_output_path, commit_output, discard_output
 
 class CutMergeController:
     def __init__(self, gui, project_root, thread_pool):
@@ -25,22 +33,36 @@ class CutMergeController:
         
         self.task_lock = threading.Lock()
         self.active_tasks = 0
-
-        pygame.mixer.init()
+        self.is_closing = False
+
+        # Nhật ký tác vụ: loại tác vụ -> (hàm xử lý, tên thao tác hiển thị)
+        self.journal = JobJournal(project_root, "cut_merge")
+        self.task_kinds = {
+            "cut": (self.run_cut_task, "cắt"),
+            "cut_batch": (self.run_batch_cut_task, "cắt"),
+            "merge": (self.run_merge_task, "ghép"),
+        }
+
+        # Chỉ mục keyframe của file đang mở ở tab Cắt (tạo nền, có cache trong Data/)
+        self.media_index = None
+        self.media_index_path = None
+
+        pygame.mixer.init(frequency=SAMPLE_RATE, size=-16, channels=CHANNELS)
+        pygame.mixer.set_reserved(1)
         self.audio_duration = 0
         self.is_playing = False
         self.is_paused = False
-        
-        self.playback_start_offset = 0 # <-- THÊM MỚI
-        self.playback_monitor_thread = None
-        self.stop_playback_monitor = threading.Event()
+        self.loop_enabled = False
+
+        # Bộ phát nghe thử từ bộ nhớ (thay cho việc poll pygame.mixer.music.get_pos())
+        self.preview = PreviewEngine(on_position=self._on_preview_position, on_finished=self._on_preview_finished)
 
     # --- THÊM MỚI: CÁC HÀM ĐIỀU KHIỂN AUDIO ---
 
     def load_audio_for_preview(self, file_path):
         """Tải file audio, lấy thông tin và cập nhật GUI."""
         self.logger.info(f"Đang tải file nghe thử: {file_path}")
-        if pygame.mixer.music.get_busy():
+        if self.is_playing or self.is_paused:
             self.stop_audio()
 
         duration = get_media_duration(file_path)
@@ -53,17 +75,25 @@ class CutMergeController:
         
         self.is_paused = False
         self.is_playing = False
-        self.playback_start_offset = 0 # <-- THÊM MỚI: Reset offset
         
+        self.preview.load(file_path, duration)
+        self.gui.update_player_ui(self.audio_duration)
+        self.gui.toggle_player_visibility(True)
+        self.logger.info("Tải file nghe thử thành công.")
+        self.thread_pool.submit(self._load_waveform, file_path)
+
+    def _load_waveform(self, file_path):
+        """Phân tích (hoặc đọc cache) dạng sóng trong luồng nền rồi vẽ lên thước kéo."""
         try:
-            pygame.mixer.music.load(file_path)
-            self.gui.update_player_ui(self.audio_duration)
-            self.gui.toggle_player_visibility(True)
-            self.logger.info("Tải file nghe thử thành công.")
-        except pygame.error as e:
-            self.logger.error(f"Lỗi Pygame khi tải file: {e}")
-            self.gui.show_message("error", "Lỗi Pygame", f"Không thể tải file audio:\n{e}")
-            self.gui.toggle_player_visibility(False)
+            start = time.time()
+            waveform = get_waveform(file_path, self.project_root)
+            self.logger.info(f"Dạng sóng sẵn sàng sau {time.time() - start:.2f} giây.")
+        except Exception as e:
+            self.logger.error(f"Lỗi khi phân tích dạng sóng: {e}", exc_info=True)
+            return
+        # Bỏ qua nếu người dùng đã chọn file khác trong lúc phân tích
+        if file_path == self.gui.cut_input_var.get():
+            self.gui.show_waveform(waveform)
 
     def play_pause_audio(self):
         """
@@ -75,18 +105,16 @@ class CutMergeController:
         if self.is_playing:
             self.is_playing = False
             self.is_paused = True
-            pygame.mixer.music.pause()
-            
-            paused_time_ms = pygame.mixer.music.get_pos()
-            if paused_time_ms != -1:
-                current_pause_sec = self.playback_start_offset + (paused_time_ms / 1000.0)
-                self.gui.update_end_marker_position(current_pause_sec)
+            self.preview.pause()
+            # Khi đang lặp, giữ nguyên khoảng lặp thay vì dời điểm Kết thúc
+            if not self.loop_enabled:
+                self.gui.update_end_marker_position(self.preview.position)
 
         # 2. Nếu đang tạm dừng -> Tiếp tục phát
         elif self.is_paused:
             self.is_playing = True
             self.is_paused = False
-            pygame.mixer.music.unpause()
+            self.preview.resume()
 
         # 3. Nếu đang dừng hẳn -> Bắt đầu phát mới từ vị trí của thanh Start
         else:
@@ -95,15 +123,9 @@ class CutMergeController:
             
             # Lấy vị trí bắt đầu từ chính GUI
             start_from_seconds = self.gui.timeline.start_val
-            self.playback_start_offset = start_from_seconds
-            
-            pygame.mixer.music.play(start=start_from_seconds)
+            self.update_loop_region(start_from_seconds, self.gui.timeline.end_val)
+            self.preview.play(start_from_seconds)
             self.gui.update_timeline_indicator(start_from_seconds) # Cập nhật vạch đỏ ngay
-            
-            if self.playback_monitor_thread is None or not self.playback_monitor_thread.is_alive():
-                self.stop_playback_monitor.clear()
-                self.playback_monitor_thread = threading.Thread(target=self._monitor_playback, daemon=True)
-                self.playback_monitor_thread.start()
         
         self.gui.update_play_button_state(self.is_playing)
 
@@ -111,10 +133,7 @@ class CutMergeController:
         """Dừng hẳn việc phát audio và reset trạng thái."""
         self.is_playing = False
         self.is_paused = False
-         
-        self.playback_start_offset = 0 # <-- THÊM MỚI: Reset offset
-        pygame.mixer.music.stop()
-        self.stop_playback_monitor.set() 
+        self.preview.stop()
         self.gui.update_play_button_state(False)
         self.gui.update_timeline_indicator(0)
         self.gui.update_marker_positions(0, self.audio_duration)
@@ -123,43 +142,36 @@ class CutMergeController:
         """Tua audio đến một vị trí nhất định và bắt đầu phát."""
         self.is_playing = True
         self.is_paused = False
-        self.playback_start_offset = time_seconds # <-- SỬA ĐỔI: Set offset
-        pygame.mixer.music.play(start=time_seconds)
+        self.preview.seek(time_seconds, play=True)
         self.gui.update_play_button_state(True)
         self.gui.update_timeline_indicator(time_seconds) # Cập nhật vạch đỏ ngay lập tức
-        if self.playback_monitor_thread is None or not self.playback_monitor_thread.is_alive():
-            self.stop_playback_monitor.clear()
-            self.playback_monitor_thread = threading.Thread(target=self._monitor_playback, daemon=True)
-            self.playback_monitor_thread.start()
 
     def seek_and_pause(self, time_seconds):
         """Tua audio đến một vị trí nhất định và tạm dừng ngay lập tức."""
         self.is_playing = False
         self.is_paused = True
-        self.playback_start_offset = time_seconds # <-- SỬA ĐỔI: Set offset
-        pygame.mixer.music.play(start=time_seconds)
-        pygame.mixer.music.pause()
+        self.preview.seek(time_seconds, play=False)
         self.gui.update_play_button_state(False)
         self.gui.update_timeline_indicator(time_seconds)
 
-    def _monitor_playback(self):
-        """Luồng nền để liên tục cập nhật vị trí con trỏ trên GUI."""
-        while pygame.mixer.music.get_busy() and not self.stop_playback_monitor.is_set():
-            current_pos_ms = pygame.mixer.music.get_pos()
-            if current_pos_ms == -1: break
-            
-            # --- SỬA ĐỔI: Tính toán thời gian thực tế dựa trên offset ---
-            real_current_pos_sec = self.playback_start_offset + (current_pos_ms / 1000.0)
-            
-            # Đảm bảo không vượt quá tổng thời lượng do sai số
-            real_current_pos_sec = min(real_current_pos_sec, self.audio_duration)
+    def set_loop_enabled(self, enabled):
+        """Bật/tắt chế độ lặp khoảng đang chọn trên thước kéo."""
+        self.loop_enabled = enabled
+        self.update_loop_region(self.gui.timeline.start_val, self.gui.timeline.end_val)
 
-            self.gui.update_timeline_indicator(real_current_pos_sec)
-            time.sleep(0.1)
-        
-        # Khi nhạc kết thúc tự nhiên
-        if self.is_playing:
-             self.gui.update_timeline_indicator(self.audio_duration)
+    def update_loop_region(self, start_seconds, end_seconds):
+        if self.loop_enabled:
+            self.preview.set_loop(start_seconds, end_seconds)
+        else:
+            self.preview.set_loop(None, None)
+
+    def _on_preview_position(self, position):
+        """Được gọi từ luồng phát với vị trí theo đồng hồ mẫu (sample clock)."""
+        self.gui.update_timeline_indicator(position)
+
+    def _on_preview_finished(self):
+        """Khi phát hết file một cách tự nhiên."""
+        self.gui.update_timeline_indicator(self.audio_duration)
         self.is_playing = False
         self.is_paused = False
         self.gui.update_play_button_state(False)
@@ -167,15 +179,107 @@ class CutMergeController:
     def on_closing(self):
         """Dọn dẹp khi đóng chương trình."""
         self.logger.info("Bắt đầu dọn dẹp cho tab Cắt & Ghép...")
+        # Các tác vụ bị dừng do đóng ứng dụng vẫn giữ trạng thái "chưa xong" trong nhật ký
+        self.is_closing = True
         # Dừng các tiến trình ffmpeg
         if self.active_ffmpeg_pids:
             self.logger.warning(f"Đang dừng {len(self.active_ffmpeg_pids)} tiến trình FFmpeg đang chạy...")
             stop_ffmpeg_processes(self.active_ffmpeg_pids)
             self.logger.info("Đã dừng các tiến trình FFmpeg.")
         # --- THÊM MỚI: Dọn dẹp Pygame ---
+        self.preview.shutdown()
         pygame.mixer.quit()
         self.logger.info("Đã đóng pygame mixer.")
     
+    # --- CHỈ MỤC KEYFRAME ---
+    def prepare_media_index(self, file_path):
+        """Tạo (hoặc đọc từ cache) chỉ mục keyframe cho file trong luồng nền."""
+        self.media_index = None
+        self.media_index_path = file_path
+        self.thread_pool.submit(self._build_media_index, file_path)
+
+    def _build_media_index(self, file_path):
+        index = get_media_index(file_path, self.project_root)
+        # Bỏ qua kết quả nếu người dùng đã chọn file khác trong lúc chờ
+        if file_path == self.media_index_path:
+            self.media_index = index
+
+    def get_index_for(self, file_path):
+        if file_path == self.media_index_path:
+            return self.media_index
+        return None
+
+    @staticmethod
+    def hhmmss_to_seconds(value):
+        seconds = 0.0
+        for part in str(value).split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+
+    # --- TỰ ĐỘNG ĐỀ XUẤT ĐOẠN CẮT ---
+    def start_auto_segment(self, mode, min_silence):
+        """Phân tích khoảng lặng / chuyển cảnh trong một lần đọc file và đề xuất các đoạn cắt."""
+        if self.is_processing: return
+        input_file = self.gui.cut_input_var.get()
+        if not input_file or not os.path.exists(input_file):
+            self.gui.show_message("error", "Lỗi", "Vui lòng chọn file đầu vào.")
+            return
+
+        self.is_processing = True
+        self.gui.set_ui_state("processing")
+        self.thread_pool.submit(self.run_auto_segment_task, input_file, mode, min_silence)
+
+    def run_auto_segment_task(self, input_file, mode, min_silence):
+        segments = []
+        started_pids = []
+        try:
+            duration = get_media_duration(input_file)
+            if duration is None:
+                raise Exception("Không thể đọc thời lượng file.")
+            has_video = has_video_stream(input_file)
+            if mode == "scene" and not has_video:
+                raise Exception("File không có luồng video để phát hiện chuyển cảnh.")
+
+            self.gui.log_status(f"Đang phân tích {'khoảng lặng và chuyển cảnh' if has_video else 'khoảng lặng'}...")
+            started = time.time()
+            last_report = [0.0]
+
+            def on_progress(seconds):
+                if seconds - last_report[0] >= 600:
+                    last_report[0] = seconds
+                    self.gui.log_status(f"Đã phân tích {self.gui.seconds_to_hhmmss(seconds)} / {self.gui.seconds_to_hhmmss(duration)}")
+
+            events = analyze_media_events(
+                input_file, duration, has_video, min_silence=min_silence,
+                on_progress=on_progress, on_start=lambda pid: self._track_pid(pid, started_pids)
+            )
+            elapsed = time.time() - started
+            self.gui.log_status(
+                f"Phân tích xong trong {elapsed:.1f} giây ({duration / max(elapsed, 0.001):.1f}x thời gian thực): "
+                f"{len(events.silences)} khoảng lặng, {len(events.scene_changes)} chuyển cảnh.", "success"
+            )
+
+            if mode == "scene":
+                segments = propose_scene_splits(events.scene_changes, duration)
+            else:
+                segments = propose_without_silences(events.silences, duration)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi phân tích tự động: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI khi phân tích tự động: {e}", "error")
+        finally:
+            self._release_pids(started_pids)
+            self.is_processing = False
+            self.gui.root.after(0, self.gui.set_ui_state, "idle")
+            self.gui.root.after(0, self.gui.confirm_proposed_segments, segments)
+
+    def accept_proposed_segments(self, segments):
+        """Thêm các đoạn được đề xuất (đơn vị giây) vào danh sách cắt, giữ nguyên phần lẻ của giây."""
+        for start, end in segments:
+            self.cut_list.append((format_timestamp(start), format_timestamp(end)))
+        self.gui.update_cut_listbox(self.cut_list)
+        self.gui.validate_button_states()
+        self.logger.info(f"Đã thêm {len(segments)} đoạn cắt được đề xuất tự động.")
+
     # --- CÁC HÀM CHO VIỆC CẮT FILE ---
     def add_cut_segment(self, start_time, end_time):
         """Thêm một đoạn cắt vào danh sách."""
@@ -208,36 +312,165 @@ class CutMergeController:
         os.makedirs(output_session_dir, exist_ok=True)
         self.gui.log_status(f"Các file sẽ được lưu tại: {output_session_dir}")
 
-        # --- THAY ĐỔI: Sử dụng bộ đếm tác vụ ---
+        # Chế độ cắt gộp: một tiến trình FFmpeg đọc file nguồn một lần cho mọi đoạn
+        if self.gui.cut_batch_mode_var.get() and len(self.cut_list) > 1:
+            jobs = self.journal_tasks("cut_batch", [
+                {"input_file": input_file, "segments": list(self.cut_list), "output_dir": output_session_dir}
+            ])
+        else:
+            jobs = self.journal_tasks("cut", [
+                {"index": i, "input_file": input_file, "start_time": start, "end_time": end, "output_dir": output_session_dir}
+                for i, (start, end) in enumerate(self.cut_list, 1)
+            ])
+        self.launch_tasks(jobs)
+
+    # --- NHẬT KÝ TÁC VỤ ---
+    def journal_tasks(self, kind, params_list):
+        task_ids = self.journal.add_tasks(kind, [{"params": params} for params in params_list])
+        return [(task_id, kind, params) for task_id, params in zip(task_ids, params_list)]
+
+    def launch_tasks(self, jobs):
+        """jobs là danh sách (task_id, kind, params) đã được ghi vào nhật ký."""
         with self.task_lock:
-            self.active_tasks = len(self.cut_list)
-        
-        for i, (start, end) in enumerate(self.cut_list, 1):
-            self.thread_pool.submit(self.run_cut_task, i, input_file, start, end, output_session_dir)
-        
-        # --- XÓA: Lời gọi hàm không tồn tại ---
-        # self.thread_pool.submit(self.wait_for_all_tasks_to_finish)
+            self.active_tasks = len(jobs)
+        for task_id, kind, params in jobs:
+            handler, _ = self.task_kinds[kind]
+            self.thread_pool.submit(handler, task_id=task_id, **params)
+
+    def offer_resume(self, task_ids=None):
+        """
+        Khi khởi động: hỏi người dùng có muốn tiếp tục các tác vụ dang dở của lần chạy trước.
+        Nếu tab đang bận xử lý thì hỏi lại khi rảnh, không hủy các tác vụ dang dở.
+        """
+        unfinished = self.journal.unfinished_tasks()
+        if task_ids is None:
+            # Chỉ các tác vụ của lần chạy trước, không gồm tác vụ được thêm trong lúc chờ hỏi
+            task_ids = {task["id"] for task in unfinished}
+        unfinished = [task for task in unfinished if task["id"] in task_ids]
+        if not unfinished:
+            if not self.is_processing:
+                self.journal.compact()
+            return
+        if self.is_processing:
+            self.gui.root.after(RESUME_RETRY_MS, self.offer_resume, task_ids)
+            return
+        if not self.gui.ask_yes_no(
+            "Tiếp tục Cắt & Ghép",
+            f"Có {len(unfinished)} tác vụ cắt/ghép chưa hoàn thành từ lần chạy trước.\nTiếp tục xử lý?"
+        ):
+            self.journal.cancel_unfinished(task_ids)
+            self.journal.compact()
+            return
 
-    def run_cut_task(self, index, input_file, start_time, end_time, output_dir):
+        jobs = []
+        missing = []
+        for task in unfinished:
+            params = task["params"]
+            sources = params["file_list"] if task["kind"] == "merge" else [params["input_file"]]
+            if task["kind"] in self.task_kinds and all(os.path.exists(p) for p in sources):
+                os.makedirs(params["output_dir"], exist_ok=True)
+                jobs.append((task["id"], task["kind"], params))
+            else:
+                missing.append(task["id"])
+        self.journal.mark_many(missing, STATE_CANCELLED)
+        if not jobs:
+            self.journal.compact()
+            return
+        self.is_processing = True
+        self.gui.set_ui_state("processing")
+        self.gui.log_status(f"Tiếp tục {len(jobs)} tác vụ dang dở...")
+        self.launch_tasks(jobs)
+
+    def _fail_task(self, task_id, error):
+        if not self.is_closing:
+            self.journal.mark(task_id, STATE_FAILED, error)
+
+    def run_cut_task(self, index, input_file, start_time, end_time, output_dir, task_id=None):
         """Chạy một tác vụ cắt trong luồng nền."""
-        base_name = os.path.splitext(os.path.basename(input_file))[0]
-        ext = os.path.splitext(input_file)[1]
-        output_file = os.path.join(output_dir, f"{base_name}_part{index}{ext}")
+        output_file = self.get_cut_output_path(input_file, index, output_dir)
+        temp_file = temp_output_path(output_file)
         
         try:
+            self.journal.mark(task_id, STATE_RUNNING)
             self.gui.log_status(f"Bắt đầu cắt đoạn {index} ({start_time} -> {end_time})...")
-            args = ["-ss", start_time, "-to", end_time, "-c", "copy"]
-            pid = run_ffmpeg(input_file, output_file, args)
-            self.active_ffmpeg_pids.append(pid)
-            self.active_ffmpeg_pids.remove(pid)
+            media_index = self.get_index_for(input_file)
+            if media_index is not None:
+                # Tua thẳng tới keyframe ngay trước điểm bắt đầu (tra cứu trong chỉ mục),
+                # FFmpeg không phải đọc lại file từ đầu và đoạn copy bắt đầu đúng keyframe.
+                start_sec = self.hhmmss_to_seconds(start_time)
+                end_sec = self.hhmmss_to_seconds(end_time)
+                key_start, _ = media_index.keyframe_at_or_before(start_sec)
+                if media_index.has_video and abs(key_start - start_sec) > 0.001:
+                    self.gui.log_status(f"Đoạn {index}: điểm bắt đầu được căn về keyframe {key_start:.3f}s", "warning")
+                input_args = ["-ss", f"{key_start:.3f}"]
+                args = ["-t", f"{end_sec - key_start:.3f}", "-map", "0:v?", "-map", "0:a?", "-c", "copy"]
+            else:
+                input_args = None
+                args = ["-ss", start_time, "-to", end_time, "-c", "copy"]
+            started = []
+            try:
+                run_ffmpeg(input_file, temp_file, args, input_args=input_args,
+                           on_start=lambda pid: self._track_pid(pid, started))
+            finally:
+                self._release_pids(started)
+            commit_output(temp_file, output_file)
+            self.journal.mark(task_id, STATE_DONE)
             self.gui.log_status(f"Cắt thành công đoạn {index} -> {os.path.basename(output_file)}", "success")
         except Exception as e:
+            discard_output(temp_file)
+            self._fail_task(task_id, e)
             self.logger.error(f"Lỗi khi cắt đoạn {index}: {e}", exc_info=True)
             self.gui.log_status(f"LỖI khi cắt đoạn {index}: {e}", "error")
         finally:
             # --- THÊM MỚI: Báo cáo tác vụ hoàn thành ---
             self.task_finished("cắt")
             
+    def get_cut_output_path(self, input_file, index, output_dir):
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        ext = os.path.splitext(input_file)[1]
+        return os.path.join(output_dir, f"{base_name}_part{index}{ext}")
+
+    def run_batch_cut_task(self, input_file, segments, output_dir, task_id=None):
+        """Cắt tất cả các đoạn trong một lần chạy FFmpeg, mỗi đoạn là một output riêng."""
+        output_files = [self.get_cut_output_path(input_file, i, output_dir) for i in range(1, len(segments) + 1)]
+        temp_files = [temp_output_path(path) for path in output_files]
+        try:
+            self.journal.mark(task_id, STATE_RUNNING)
+            self.gui.log_status(f"Bắt đầu cắt gộp {len(segments)} đoạn trong một lần đọc file...")
+            # Chỉ lấy video/audio (giống chế độ cắt từng đoạn): luồng data/phụ đề thường không mux được với -c copy
+            outputs = [
+                (["-ss", start, "-to", end, "-map", "0:v?", "-map", "0:a?", "-c", "copy"], temp_file)
+                for (start, end), temp_file in zip(segments, temp_files)
+            ]
+
+            started = []
+            try:
+                run_ffmpeg_multi_output(input_file, outputs, on_start=lambda pid: self._track_pid(pid, started))
+            finally:
+                self._release_pids(started)
+            for i, (temp_file, output_file) in enumerate(zip(temp_files, output_files), 1):
+                commit_output(temp_file, output_file)
+                self.gui.log_status(f"Cắt thành công đoạn {i} -> {os.path.basename(output_file)}", "success")
+            self.journal.mark(task_id, STATE_DONE)
+        except Exception as e:
+            for temp_file in temp_files:
+                discard_output(temp_file)
+            self._fail_task(task_id, e)
+            self.logger.error(f"Lỗi khi cắt gộp: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI khi cắt gộp: {e}", "error")
+        finally:
+            self.task_finished("cắt")
+
+    def _track_pid(self, pid, started):
+        """Ghi PID ngay khi FFmpeg khởi động để nút dừng/đóng ứng dụng có thể kết thúc tiến trình."""
+        started.append(pid)
+        self.active_ffmpeg_pids.append(pid)
+
+    def _release_pids(self, started):
+        for pid in started:
+            if pid in self.active_ffmpeg_pids:
+                self.active_ffmpeg_pids.remove(pid)
+
     # --- THÊM MỚI: Hàm xử lý khi một tác vụ hoàn tất ---
     def task_finished(self, operation_name):
         """Giảm bộ đếm và kiểm tra nếu tất cả tác vụ đã xong."""
@@ -245,6 +478,7 @@ class CutMergeController:
             self.active_tasks -= 1
             if self.active_tasks == 0:
                 self.is_processing = False
+                self.journal.compact()
                 # Dùng after để đảm bảo hàm này chạy trên luồng chính của UI
                 self.gui.root.after(100, self.finalize_processing, operation_name)
 
@@ -322,30 +556,150 @@ class CutMergeController:
         os.makedirs(output_session_dir, exist_ok=True)
         self.gui.log_status(f"File ghép sẽ được lưu tại: {output_session_dir}")
 
-        with self.task_lock:
-            self.active_tasks = 1
-        
         merge_mode = self.gui.merge_mode_var.get()
-        self.thread_pool.submit(self.run_merge_task, self.merge_list.copy(), merge_mode, output_session_dir)
+        jobs = self.journal_tasks("merge", [
+            {"file_list": self.merge_list.copy(), "mode": merge_mode, "output_dir": output_session_dir}
+        ])
+        self.launch_tasks(jobs)
+
+    def run_concat_copy(self, file_list, output_file, output_dir):
+        """Ghép các file cùng thông số bằng concat demuxer, không mã hóa lại."""
+        list_file_path = os.path.join(output_dir, "mylist.txt")
+        write_concat_list(file_list, list_file_path)
+        try:
+            args = ["-f", "concat", "-safe", "0", "-i", list_file_path, "-c", "copy"]
+            started = []
+            try:
+                run_ffmpeg("", output_file, args, on_start=lambda pid: self._track_pid(pid, started))
+            finally:
+                self._release_pids(started)
+        finally:
+            os.remove(list_file_path)
+
+    def run_smart_merge(self, plan, output_file, output_dir):
+        """Chỉ mã hóa lại các file lệch thông số, sau đó ghép tất cả bằng stream copy."""
+        outliers = plan.outliers
+        self.gui.log_status(
+            f"Kế hoạch ghép: {len(plan.items) - len(outliers)} file stream copy, "
+            f"{len(outliers)} file cần mã hóa lại cho khớp thông số."
+        )
+        intermediate_dir = os.path.join(output_dir, "_intermediate")
+        os.makedirs(intermediate_dir, exist_ok=True)
+        ext = os.path.splitext(output_file)[1]
+
+        concat_files = []
+        jobs = []
+        remux_jobs = []
+        try:
+            chunk_plan = self.plan_merge_chunks(plan)
+            for i, item in enumerate(plan.items):
+                if not item.needs_reencode:
+                    concat_files.append(item.path)
+                    continue
+                intermediate = os.path.join(intermediate_dir, f"part_{i}{ext}")
+                duration = float(item.info["format"].get("duration", 0) or 0)
+                concat_files.append(intermediate)
+                chunks = chunk_plan.get(i)
+                if not chunks:
+                    jobs.append(EncodeJob(build_normalize_args(item, plan.reference), intermediate, duration))
+                    continue
+
+                # Video chia theo keyframe, mỗi đoạn một tiến trình; audio mã hóa một lần cho cả file
+                # để không có khoảng lặng tại ranh giới đoạn. Sau đó ghép lại thành file trung gian.
+                chunk_files = []
+                for j, (start, end) in enumerate(chunks):
+                    chunk_file = os.path.join(intermediate_dir, f"part_{i}_{j:04d}{ext}")
+                    chunk_args = build_normalize_args(item, plan.reference, audio=False, start=start, length=end - start)
+                    jobs.append(EncodeJob(chunk_args, chunk_file, end - start))
+                    chunk_files.append(chunk_file)
+                list_file_path = os.path.join(intermediate_dir, f"part_{i}.txt")
+                write_concat_list(chunk_files, list_file_path)
+                remux_args = ["-f", "concat", "-safe", "0", "-i", list_file_path]
+                if plan.reference["audio"]:
+                    audio_file = os.path.join(intermediate_dir, f"part_{i}_audio.mka")
+                    jobs.append(EncodeJob(build_normalize_args(item, plan.reference, video=False), audio_file, duration))
+                    remux_args.extend(["-i", audio_file, "-map", "0:v:0", "-map", "1:a:0"])
+                remux_jobs.append(EncodeJob(remux_args + ["-c", "copy"], intermediate, 0))
+
+            if jobs:
+                self.run_encode_jobs(jobs)
+            if remux_jobs:
+                self.run_encode_jobs(remux_jobs)
+
+            self.gui.log_status("Ghép toàn bộ bằng stream copy...")
+            self.run_concat_copy(concat_files, output_file, output_dir)
+        finally:
+            shutil.rmtree(intermediate_dir, ignore_errors=True)
 
-    def run_merge_task(self, file_list, mode, output_dir):
+    def plan_merge_chunks(self, plan):
+        """
+        Chia timeline của các file video cần mã hóa lại thành các đoạn tại keyframe, như đường mã hóa
+        song song của tab Video: tổng số đoạn bằng số tiến trình song song, phân cho từng file theo
+        thời lượng, nên ghép hai bản ghi dài vẫn dùng hết các nhân CPU.
+        Trả về {chỉ số file: [(start, end), ...]} chỉ cho các file được chia thành nhiều hơn một đoạn.
+        """
+        if not plan.has_video or not self.gui.parallel_merge_var.get():
+            return {}
+        indexed = [
+            (i, item, float(item.info["format"].get("duration", 0) or 0))
+            for i, item in enumerate(plan.items) if item.needs_reencode
+        ]
+        indexed = [(i, item, duration) for i, item, duration in indexed if duration > 0]
+        counts = allocate_chunk_counts([duration for _, _, duration in indexed], default_worker_count())
+        chunk_plan = {}
+        for (i, item, duration), count in zip(indexed, counts):
+            if count < 2:
+                continue
+            media_index = get_media_index(item.path, self.project_root)
+            keyframes = list(media_index.key_pts) if media_index and media_index.has_video else None
+            chunks = plan_keyframe_chunks(duration, count, keyframes)
+            if len(chunks) > 1:
+                chunk_plan[i] = chunks
+        return chunk_plan
+
+    def run_encode_jobs(self, jobs):
+        """Mã hóa các file/đoạn trung gian song song trên nhiều tiến trình FFmpeg, báo tiến độ tổng hợp."""
+        workers = default_worker_count() if self.gui.parallel_merge_var.get() else 1
+        self.gui.log_status(f"Xử lý {len(jobs)} file/đoạn trên {min(workers, len(jobs))} tiến trình FFmpeg...")
+        last_reported = [0]
+
+        def on_progress(fraction):
+            percent = int(fraction * 100) // 10 * 10
+            if percent > last_reported[0]:
+                last_reported[0] = percent
+                self.gui.log_status(f"Tiến độ mã hóa: {percent}%")
+
+        started = []
+        try:
+            run_parallel_encodes(jobs, max_workers=workers, on_progress=on_progress,
+                                 on_start=lambda pid: self._track_pid(pid, started))
+        finally:
+            self._release_pids(started)
+
+    def run_merge_task(self, file_list, mode, output_dir, task_id=None):
         ext = os.path.splitext(file_list[0])[1].lower() # Lấy đuôi file và chuyển thành chữ thường
-        output_file = os.path.join(output_dir, f"merged_output{ext}")
+        final_output_file = os.path.join(output_dir, f"merged_output{ext}")
+        # Mọi chế độ ghép đều ghi vào file tạm, chỉ đổi tên khi đã ghép xong
+        output_file = temp_output_path(final_output_file)
         
         try:
+            self.journal.mark(task_id, STATE_RUNNING)
+            if mode == "smart":
+                self.gui.log_status("Đang thăm dò thông số các file để lập kế hoạch ghép...")
+                plan = plan_merge(file_list)
+                if plan is None:
+                    self.gui.log_status("Các file không thể ghép lossless, chuyển sang ghép tương thích.", "warning")
+                    mode = "slow"
+                else:
+                    self.run_smart_merge(plan, output_file, output_dir)
+
             if mode == "fast":
                 self.gui.log_status("Bắt đầu ghép nhanh (yêu cầu file cùng thông số)...")
-                list_file_path = os.path.join(output_dir, "mylist.txt")
-                with open(list_file_path, 'w', encoding='utf-8') as f:
-                    for file_path in file_list:
-                        escaped_path = file_path.replace("'", "'\\''")
-                        f.write(f"file '{escaped_path}'\n")
-                
-                args = ["-f", "concat", "-safe", "0", "-i", list_file_path, "-c", "copy"]
-                pid = run_ffmpeg("", output_file, args)
-                self.active_ffmpeg_pids.append(pid)
-                self.active_ffmpeg_pids.remove(pid)
-                os.remove(list_file_path)
+                self.run_concat_copy(file_list, output_file, output_dir)
+
+            elif mode == "slow" and self.gui.parallel_merge_var.get() and (plan := plan_full_reencode(file_list)):
+                self.gui.log_status("Bắt đầu ghép tương thích (mã hóa lại song song từng file)...")
+                self.run_smart_merge(plan, output_file, output_dir)
 
             elif mode == "slow":
                 self.gui.log_status("Bắt đầu ghép tương thích (chậm, mã hóa lại)...")
@@ -354,15 +708,15 @@ class CutMergeController:
                     inputs.extend(["-i", file_path])
                 
                 filter_complex_parts = []
-                # Kiểm tra xem có luồng video nào không để quyết định loại filter
-                has_video = any(os.path.splitext(f)[1].lower() in ['.mp4', '.mkv', '.avi', '.mov'] for f in file_list)
+                # Thăm dò luồng thực tế thay vì đoán theo đuôi file
+                has_video = any(has_video_stream(f) for f in file_list)
                 
                 if has_video:
                     # Ghép cả video và audio
                     for i in range(len(file_list)):
-                        # Sử dụng stream video và audio đầu tiên của mỗi file, bỏ qua nếu không có
-                        filter_complex_parts.append(f"[{i}:v:0]?")
-                        filter_complex_parts.append(f"[{i}:a:0]?")
+                        # Sử dụng stream video và audio đầu tiên của mỗi file
+                        filter_complex_parts.append(f"[{i}:v:0]")
+                        filter_complex_parts.append(f"[{i}:a:0]")
                     filter_complex = "".join(filter_complex_parts) + f"concat=n={len(file_list)}:v=1:a=1[v][a]"
                     map_args = ["-map", "[v]", "-map", "[a]"]
                 else:
@@ -382,13 +736,19 @@ class CutMergeController:
                 elif ext == '.mp4':
                     args.extend(['-vcodec', 'libx264', '-acodec', 'aac']) # Codec video và audio phổ biến cho MP4
                 
-                pid = run_ffmpeg("", output_file, args)
-                self.active_ffmpeg_pids.append(pid)
-                self.active_ffmpeg_pids.remove(pid)
-
-            self.gui.log_status(f"GHÉP THÀNH CÔNG -> {os.path.basename(output_file)}", "success")
+                started = []
+                try:
+                    run_ffmpeg("", output_file, args, on_start=lambda pid: self._track_pid(pid, started))
+                finally:
+                    self._release_pids(started)
+
+            commit_output(output_file, final_output_file)
+            self.journal.mark(task_id, STATE_DONE)
+            self.gui.log_status(f"GHÉP THÀNH CÔNG -> {os.path.basename(final_output_file)}", "success")
         
         except Exception as e:
+            discard_output(output_file)
+            self._fail_task(task_id, e)
             self.logger.error(f"Lỗi khi ghép file: {e}", exc_info=True)
             self.gui.log_status(f"LỖI khi ghép file: {e}", "error")
         finally:
@@ -7,6 +7,7 @@ import datetime
 import pygame
 
 from .cut_merge_controller import CutMergeController
+from .auto_segment import format_timestamp
 from Utils.ui_utils import create_tab_title
 
 # --- THÊM LỚP MỚI: THƯỚC KÉO 2 CON TRƯỢT ---
@@ -22,6 +23,11 @@ class DualHandleSlider(tk.Canvas):
         self._drag_data = {"x": 0, "y": 0, "item": None}
         self.indicator_pos = 0
 
+        # Khoảng thời gian đang hiển thị (thay đổi khi phóng to/thu nhỏ bằng con lăn chuột)
+        self.view_start = 0
+        self.view_end = 100
+        self.waveform = None
+
         self.bind("<Configure>", self._on_resize)
         # Binding cho các con trượt
         self.tag_bind("start_handle", "<ButtonPress-1>", self._on_press)
@@ -33,6 +39,8 @@ class DualHandleSlider(tk.Canvas):
         
         # --- THÊM MỚI: Binding cho việc click vào track ---
         self.tag_bind("track", "<ButtonPress-1>", self._on_track_click)
+        self.tag_bind("waveform", "<ButtonPress-1>", self._on_track_click)
+        self.bind("<MouseWheel>", self._on_mouse_wheel)
 
         # --- THAY ĐỔI: Thêm callback mới ---
         self.on_change_callback = None
@@ -46,6 +54,7 @@ class DualHandleSlider(tk.Canvas):
     def _draw_all(self):
         self.delete("all")
         self.track = self.create_rectangle(10, 20, self.winfo_width()-10, 30, fill="#BDBDBD", outline="", tags="track")
+        self._draw_waveform()
         self.selection_rect = self.create_rectangle(0, 20, 0, 30, fill="#0078D7", outline="")
         self.indicator = self.create_line(0, 15, 0, 35, fill="red", width=2)
         
@@ -58,8 +67,46 @@ class DualHandleSlider(tk.Canvas):
 
     def set_range(self, max_val):
         self.max_val = max_val
+        self.view_start = 0
+        self.view_end = max_val
+        self.waveform = None
+        self._draw_all()
         self.set_values(0, max_val)
 
+    def set_waveform(self, waveform):
+        """Gắn dữ liệu dạng sóng (đã phân tích sẵn) để vẽ phía sau thanh kéo."""
+        self.waveform = waveform
+        self._draw_all()
+
+    def _draw_waveform(self):
+        if self.waveform is None:
+            return
+        width = self.winfo_width() - 20
+        peaks = self.waveform.get_peaks(width, self.view_start, self.view_end)
+        if peaks is None:
+            return
+        mins, maxs = peaks
+        center, half_height = 25, 20
+        column_width = width / len(mins)
+        for i in range(len(mins)):
+            x = 10 + i * column_width
+            y_top = center - maxs[i] * half_height
+            y_bottom = center - mins[i] * half_height
+            self.create_line(x, y_top, x, y_bottom + 1, fill="#7A9CC6", tags="waveform")
+
+    def _on_mouse_wheel(self, event):
+        """Phóng to/thu nhỏ quanh vị trí con trỏ chuột; chỉ vẽ lại từ dữ liệu dạng sóng có sẵn."""
+        if self.max_val <= 0:
+            return
+        anchor = self._x_to_val(event.x)
+        factor = 0.8 if event.delta > 0 else 1.25
+        span = min(max((self.view_end - self.view_start) * factor, 1.0), self.max_val)
+        ratio = (anchor - self.view_start) / max(self.view_end - self.view_start, 1e-9)
+        new_start = max(0, min(anchor - span * ratio, self.max_val - span))
+        self.view_start = new_start
+        self.view_end = new_start + span
+        self._draw_all()
+
     def set_values(self, start, end):
         # Đảm bảo giá trị nằm trong khoảng 0 -> max_val
         start = max(0, min(start, self.max_val))
@@ -81,11 +128,13 @@ class DualHandleSlider(tk.Canvas):
 
     def _val_to_x(self, val):
         slider_width = self.winfo_width() - 20
-        return 10 + (val / self.max_val) * slider_width
+        view_span = (self.view_end - self.view_start) or 1
+        return 10 + ((val - self.view_start) / view_span) * slider_width
 
     def _x_to_val(self, x):
         slider_width = self.winfo_width() - 20
-        val = ((x - 10) / slider_width) * self.max_val
+        view_span = self.view_end - self.view_start
+        val = self.view_start + ((x - 10) / slider_width) * view_span
         return max(0, min(val, self.max_val))
 
     def update_handles_from_values(self):
@@ -146,12 +195,23 @@ class CutMergeGUI:
         self.cut_input_var = tk.StringVar()
         self.start_placeholder = "ví dụ: 90"
         self.end_placeholder = "ví dụ: 125.5"
+        self.loop_var = tk.BooleanVar(value=False)
+        self.cut_batch_mode_var = tk.BooleanVar(value=True) # Cắt tất cả các đoạn trong một lần đọc file
+        self.auto_mode_options = {
+            "Bỏ các khoảng lặng dài hơn N giây": "silence",
+            "Tách tại các điểm chuyển cảnh (video)": "scene",
+        }
+        self.auto_mode_var = tk.StringVar(value="Bỏ các khoảng lặng dài hơn N giây")
+        self.auto_min_silence_var = tk.StringVar(value="2")
 
         # Biến cho tab Ghép
-        self.merge_mode_var = tk.StringVar(value="slow") # Mặc định là chế độ chậm, an toàn hơn
+        self.merge_mode_var = tk.StringVar(value="smart") # Mặc định: chỉ mã hóa lại các file lệch thông số
+        self.parallel_merge_var = tk.BooleanVar(value=True) # Mã hóa lại các file song song trên nhiều nhân
 
         self.create_widgets()
         self.validate_button_states()
+        # Hỏi tiếp tục các tác vụ dang dở sau khi giao diện đã hiển thị
+        self.root.after(1000, self.controller.offer_resume)
     
     def create_widgets(self):
         create_tab_title(self.root, "Cắt & Ghép Video/Audio")
@@ -228,6 +288,17 @@ class CutMergeGUI:
         ttk.Button(cut_actions_frame, text="Thêm", command=self.add_cut).pack(fill="x", pady=2)
         ttk.Button(cut_actions_frame, text="Xóa", command=self.remove_cut).pack(fill="x")
 
+        ttk.Checkbutton(def_frame, text="Cắt gộp (đọc file nguồn một lần cho tất cả các đoạn)", variable=self.cut_batch_mode_var).grid(row=3, column=0, columnspan=3, sticky="w", pady=(5,0))
+
+        auto_frame = ttk.Frame(def_frame)
+        auto_frame.grid(row=4, column=0, columnspan=3, sticky="ew", pady=(5,0))
+        ttk.Label(auto_frame, text="Tự động đề xuất:").pack(side="left")
+        ttk.Combobox(auto_frame, textvariable=self.auto_mode_var, values=list(self.auto_mode_options.keys()), state="readonly", width=36).pack(side="left", padx=5)
+        ttk.Label(auto_frame, text="N (giây):").pack(side="left")
+        ttk.Entry(auto_frame, textvariable=self.auto_min_silence_var, width=5).pack(side="left", padx=5)
+        self.auto_btn = ttk.Button(auto_frame, text="Phân tích", command=self.start_auto_segment)
+        self.auto_btn.pack(side="left")
+
         # 4. Nút bắt đầu
         self.cut_btn = ttk.Button(parent, text="BẮT ĐẦU CẮT", command=self.controller.start_cutting, style="Accent.TButton")
         self.cut_btn.grid(row=3, column=0, pady=10)
@@ -266,8 +337,10 @@ class CutMergeGUI:
         
         options_frame = ttk.LabelFrame(bottom_frame, text="Chế độ ghép", padding=10)
         options_frame.pack(side="left", fill="x", expand=True)
+        ttk.Radiobutton(options_frame, text="Ghép Thông Minh (Chỉ mã hóa lại file lệch thông số)", variable=self.merge_mode_var, value="smart").pack(anchor="w")
         ttk.Radiobutton(options_frame, text="Ghép Tương Thích (Chậm, an toàn)", variable=self.merge_mode_var, value="slow").pack(anchor="w")
         ttk.Radiobutton(options_frame, text="Ghép Nhanh (Yêu cầu file cùng thông số)", variable=self.merge_mode_var, value="fast").pack(anchor="w")
+        ttk.Checkbutton(options_frame, text="Mã hóa song song (dùng nhiều nhân CPU)", variable=self.parallel_merge_var).pack(anchor="w", pady=(5,0))
         
         self.merge_btn = ttk.Button(bottom_frame, text="BẮT ĐẦU GHÉP", command=self.controller.start_merging, style="Accent.TButton")
         self.merge_btn.pack(side="right", padx=10, pady=10)
@@ -317,6 +390,7 @@ class CutMergeGUI:
         self.play_btn.pack(side="top", pady=2)
         stop_btn = ttk.Button(control_frame, text="⏹ Stop", command=self.controller.stop_audio, width=8)
         stop_btn.pack(side="top", pady=2)
+        ttk.Checkbutton(control_frame, text="Lặp", variable=self.loop_var, command=lambda: self.controller.set_loop_enabled(self.loop_var.get())).pack(side="top", pady=2)
 
         slider_frame = ttk.Frame(parent)
         slider_frame.grid(row=0, column=1, sticky="ew")
@@ -354,6 +428,13 @@ class CutMergeGUI:
         self.timeline.set_range(duration)
         self.update_timeline_indicator(0)
     
+    def show_waveform(self, waveform):
+        """Vẽ dạng sóng lên thước kéo (an toàn khi gọi từ luồng nền)."""
+        def _update():
+            if self.root.winfo_exists():
+                self.timeline.set_waveform(waveform)
+        self.root.after(0, _update)
+
     def update_play_button_state(self, is_playing):
         def _update():
             if self.play_btn.winfo_exists():
@@ -381,6 +462,7 @@ class CutMergeGUI:
 
     def _on_slider_change(self, start_val, end_val):
         """Callback được gọi khi con trượt trên timeline thay đổi."""
+        self.controller.update_loop_region(start_val, end_val)
         # Cập nhật các ô Entry
         self.start_entry.config(foreground="black")
         self.start_entry.delete(0, tk.END)
@@ -415,6 +497,7 @@ class CutMergeGUI:
         if path:
             self.cut_input_var.set(path)
             self.validate_button_states()
+            self.controller.prepare_media_index(path)
             
             # --- THÊM MỚI: Logic xử lý file nghe thử ---
             audio_exts = {'.mp3', '.wav', '.m4a', '.aac', '.flac'}
@@ -485,6 +568,28 @@ class CutMergeGUI:
         except ValueError:
             self.show_message("error", "Lỗi định dạng", "Vui lòng nhập số giây hợp lệ.")
 
+    def start_auto_segment(self):
+        try:
+            min_silence = float(self.auto_min_silence_var.get())
+            if min_silence <= 0: raise ValueError
+        except ValueError:
+            self.show_message("error", "Lỗi định dạng", "Vui lòng nhập số giây hợp lệ cho N.")
+            return
+        mode = self.auto_mode_options.get(self.auto_mode_var.get(), "silence")
+        self.controller.start_auto_segment(mode, min_silence)
+
+    def confirm_proposed_segments(self, segments):
+        """Hỏi người dùng có thêm các đoạn được đề xuất vào danh sách cắt hay không."""
+        if not segments:
+            return
+        preview = "\n".join(
+            f"  {format_timestamp(start)} -> {format_timestamp(end)}" for start, end in segments[:10]
+        )
+        if len(segments) > 10:
+            preview += f"\n  ... và {len(segments) - 10} đoạn khác"
+        if messagebox.askyesno("Đề xuất đoạn cắt", f"Tìm thấy {len(segments)} đoạn:\n{preview}\n\nThêm vào danh sách cắt?"):
+            self.controller.accept_proposed_segments(segments)
+
     def remove_cut(self):
         selected = self.cut_listbox.curselection()
         if selected:
@@ -530,6 +635,7 @@ class CutMergeGUI:
         ui_state = "disabled" if is_processing else "normal"
         self.cut_btn.config(state=ui_state)
         self.merge_btn.config(state=ui_state)
+        self.auto_btn.config(state=ui_state)
         self.validate_button_states()
 
     def log_status(self, message, level="info"):
@@ -543,6 +649,10 @@ class CutMergeGUI:
             self.status_text.config(state="disabled")
         self.root.after(0, _update)
 
+    def ask_yes_no(self, title, message):
+        """Hỏi xác nhận (chỉ gọi từ luồng UI)."""
+        return messagebox.askyesno(title, message)
+
     def show_message(self, level, title, message):
         def _show():
             if level == "info": messagebox.showinfo(title, message)
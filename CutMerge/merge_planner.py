@@ -0,0 +1,214 @@
+# CutMerge/merge_planner.py
+
+from collections import Counter, namedtuple
+
+from Utils.ffmpeg_utils import probe_media_streams
+
+# Encoder FFmpeg dùng để mã hóa lại về đúng codec của file tham chiếu
+VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265", "mpeg4": "mpeg4", "vp9": "libvpx-vp9", "vp8": "libvpx"}
+AUDIO_ENCODERS = {
+    "aac": "aac", "mp3": "libmp3lame", "opus": "libopus", "vorbis": "libvorbis", "flac": "flac",
+    "pcm_s16le": "pcm_s16le", "pcm_s24le": "pcm_s24le", "ac3": "ac3",
+}
+# Tên profile ffprobe -> giá trị -profile của encoder. Codec không có trong bảng thì không đặt profile;
+# codec có trong bảng mà profile tham chiếu không có encoder tương ứng thì không thể ghép lossless.
+VIDEO_PROFILES = {
+    "h264": {
+        "Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+        "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444",
+    },
+    "hevc": {"Main": "main", "Main 10": "main10"},
+}
+AUDIO_PROFILES = {"aac": {"LC": "aac_low", "Main": "aac_main", "LTP": "aac_ltp"}}
+
+VideoSignature = namedtuple("VideoSignature", "codec profile level width height pix_fmt fps time_base")
+AudioSignature = namedtuple("AudioSignature", "codec profile sample_rate channels")
+
+class MergeItem:
+    def __init__(self, path, signature, info):
+        self.path = path
+        self.signature = signature
+        self.info = info
+        self.needs_reencode = False
+
+class MergePlan:
+    """
+    Kế hoạch ghép: file tham chiếu (thông số phổ biến nhất) và danh sách các file
+    cần mã hóa lại cho khớp. Các file còn lại được ghép bằng stream copy.
+    """
+    def __init__(self, items, reference):
+        self.items = items
+        self.reference = reference
+
+    @property
+    def has_video(self):
+        return self.reference["video"] is not None
+
+    @property
+    def outliers(self):
+        return [item for item in self.items if item.needs_reencode]
+
+
+def _parse_fps(rate):
+    try:
+        num, den = rate.split("/")
+        return round(float(num) / float(den), 2) if float(den) else None
+    except (AttributeError, ValueError):
+        return None
+
+def stream_signature(info):
+    """
+    Rút gọn thông tin ffprobe thành các thông số quyết định việc ghép bằng concat -c copy.
+    Tốc độ khung hình lấy từ r_frame_rate (làm tròn) chứ không phải avg_frame_rate, vì bản ghi VFR
+    lệch nhau vài phần khung hình ở avg_frame_rate dù hoàn toàn ghép được bằng stream copy.
+    """
+    video = audio = None
+    for stream in info["streams"]:
+        codec_type = stream.get("codec_type")
+        if codec_type == "video" and video is None and not stream.get("disposition", {}).get("attached_pic"):
+            video = VideoSignature(
+                stream.get("codec_name"), stream.get("profile"), stream.get("level"),
+                stream.get("width"), stream.get("height"), stream.get("pix_fmt"),
+                _parse_fps(stream.get("r_frame_rate") or stream.get("avg_frame_rate")), stream.get("time_base"),
+            )
+        elif codec_type == "audio" and audio is None:
+            audio = AudioSignature(
+                stream.get("codec_name"), stream.get("profile"), str(stream.get("sample_rate")), stream.get("channels")
+            )
+    return {"video": video, "audio": audio}
+
+def _timescale(time_base):
+    """'1/15360' -> '15360'; None nếu time base không ở dạng 1/N."""
+    num, _, den = (time_base or "").partition("/")
+    return den if num == "1" and den.isdigit() else None
+
+def _encoder_profile(profiles, codec, profile):
+    """Trả về (có tái tạo được không, giá trị -profile hoặc None)."""
+    if codec not in profiles or not profile:
+        return True, None
+    encoder_profile = profiles[codec].get(profile)
+    return encoder_profile is not None, encoder_profile
+
+def _signature_key(signature):
+    return (signature["video"], signature["audio"])
+
+def plan_merge(file_list):
+    """
+    Thăm dò thông số từng file và lập kế hoạch ghép.
+    Trả về None nếu không thể lập kế hoạch lossless (ví dụ: lẫn file có/không có video,
+    hoặc codec tham chiếu không có encoder tương ứng) để bên gọi dùng chế độ mã hóa lại toàn bộ.
+    """
+    items = []
+    for path in file_list:
+        info = probe_media_streams(path)
+        if not info:
+            return None
+        items.append(MergeItem(path, stream_signature(info), info))
+
+    # Thông số phổ biến nhất làm tham chiếu (hòa thì ưu tiên file xuất hiện trước)
+    counts = Counter(_signature_key(item.signature) for item in items)
+    reference_key = counts.most_common(1)[0][0]
+    reference = next(item.signature for item in items if _signature_key(item.signature) == reference_key)
+
+    for item in items:
+        if (item.signature["video"] is None) != (reference["video"] is None):
+            return None
+        item.needs_reencode = _signature_key(item.signature) != reference_key
+
+    if any(item.needs_reencode for item in items):
+        ref_video, ref_audio = reference["video"], reference["audio"]
+        if ref_video and (ref_video.codec not in VIDEO_ENCODERS
+                          or not _encoder_profile(VIDEO_PROFILES, ref_video.codec, ref_video.profile)[0]):
+            return None
+        if ref_audio and (ref_audio.codec not in AUDIO_ENCODERS
+                          or not _encoder_profile(AUDIO_PROFILES, ref_audio.codec, ref_audio.profile)[0]):
+            return None
+    return MergePlan(items, reference)
+
+def plan_full_reencode(file_list):
+    """
+    Lập kế hoạch mã hóa lại TẤT CẢ các file (video) về H.264/AAC cùng thông số,
+    để có thể mã hóa song song từng file rồi ghép bằng stream copy.
+    Trả về None nếu có file không chứa video.
+    """
+    items = []
+    for path in file_list:
+        info = probe_media_streams(path)
+        if not info:
+            return None
+        item = MergeItem(path, stream_signature(info), info)
+        if item.signature["video"] is None:
+            return None
+        item.needs_reencode = True
+        items.append(item)
+
+    first_video = items[0].signature["video"]
+    audio_source = next((item.signature["audio"] for item in items if item.signature["audio"]), None)
+    reference = {
+        "video": VideoSignature("h264", "High", None, first_video.width, first_video.height, "yuv420p", first_video.fps, None),
+        "audio": AudioSignature("aac", "LC", audio_source.sample_rate, 2) if audio_source else None,
+    }
+    return MergePlan(items, reference)
+
+def build_normalize_args(item, reference, video=True, audio=True, start=None, length=None):
+    """
+    Tạo tham số FFmpeg (bao gồm cả input) để mã hóa lại một file về đúng thông số tham chiếu:
+    cùng codec, profile/level, kích thước, pix_fmt, tốc độ khung hình, time base và thông số audio,
+    để file mã hóa lại ghép được với các file stream copy.
+    Nếu file thiếu audio mà tham chiếu có audio, chèn luồng im lặng cùng thông số.
+    video/audio=False bỏ luồng tương ứng và start/length chỉ mã hóa một đoạn, dùng khi chia
+    timeline của file thành nhiều đoạn video mã hóa song song (audio mã hóa một lần cho cả file).
+    """
+    args = []
+    if start is not None:
+        args.extend(["-ss", f"{start:.3f}"])
+    if length is not None:
+        args.extend(["-t", f"{length:.3f}"])
+    args.extend(["-i", item.path])
+    map_args = []
+
+    ref_video, ref_audio = reference["video"] if video else None, reference["audio"] if audio else None
+    if ref_video:
+        width, height = ref_video.width, ref_video.height
+        video_filters = [
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+            "setsar=1",
+        ]
+        if ref_video.fps:
+            video_filters.append(f"fps={ref_video.fps}")
+        if ref_video.pix_fmt:
+            video_filters.append(f"format={ref_video.pix_fmt}")
+        map_args.extend(["-map", "0:v:0", "-vf", ",".join(video_filters), "-c:v", VIDEO_ENCODERS[ref_video.codec]])
+        _, profile = _encoder_profile(VIDEO_PROFILES, ref_video.codec, ref_video.profile)
+        if profile:
+            map_args.extend(["-profile:v", profile])
+        # ffprobe báo level H.264 dạng 31 nghĩa là 3.1; level HEVC của libx265 đặt qua x265-params nên bỏ qua
+        if ref_video.codec == "h264" and isinstance(ref_video.level, int) and ref_video.level > 0:
+            map_args.extend(["-level:v", f"{ref_video.level / 10:.1f}"])
+        # Time base của track MP4/MOV (muxer khác tự quyết định time base và bỏ qua tùy chọn này).
+        # Không dùng -enc_time_base vì libx264 mã hóa rất chậm với time base nhỏ như 1/15360.
+        timescale = _timescale(ref_video.time_base)
+        if timescale:
+            map_args.extend(["-video_track_timescale", timescale])
+
+    if ref_audio:
+        if item.signature["audio"] is None:
+            layout = "mono" if ref_audio.channels == 1 else "stereo"
+            args.extend(["-f", "lavfi", "-i", f"anullsrc=r={ref_audio.sample_rate}:cl={layout}"])
+            map_args.extend(["-map", "1:a:0"])
+            if ref_video:
+                map_args.append("-shortest")
+            else:
+                # Không có video để -shortest dừng theo: giới hạn luồng im lặng bằng thời lượng file
+                map_args.extend(["-t", str(length or item.info["format"].get("duration", 0))])
+        else:
+            map_args.extend(["-map", "0:a:0"])
+        map_args.extend([
+            "-c:a", AUDIO_ENCODERS[ref_audio.codec], "-ar", ref_audio.sample_rate, "-ac", str(ref_audio.channels)
+        ])
+        _, profile = _encoder_profile(AUDIO_PROFILES, ref_audio.codec, ref_audio.profile)
+        if profile:
+            map_args.extend(["-profile:a", profile])
+
+    return args + map_args
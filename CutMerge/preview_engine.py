@@ -0,0 +1,309 @@
+# CutMerge/preview_engine.py
+
+import os
+import queue
+import subprocess
+import threading
+import time
+import pygame
+
+from Utils.logger_setup import LoggerProvider
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+BYTES_PER_FRAME = 2 * CHANNELS  # s16le
+CHUNK_FRAMES = SAMPLE_RATE // 10  # mỗi khối 100ms
+CHUNK_BYTES = CHUNK_FRAMES * BYTES_PER_FRAME
+RING_CHUNKS = 50  # bộ đệm vòng ~5 giây phía trước đầu phát
+POSITION_REPORT_INTERVAL = 0.05
+MAX_LOOP_CACHE_SECONDS = 60  # vùng lặp dài hơn (~10 MB PCM) thì tua lại bằng bộ giải mã như bình thường
+SHUTDOWN_JOIN_TIMEOUT = 2.0
+
+class PreviewEngine:
+    """
+    Bộ phát nghe thử từ bộ nhớ.
+    FFmpeg giải mã một cửa sổ bắt đầu từ đầu phát thành PCM vào bộ đệm vòng (queue có giới hạn),
+    các khối PCM được nạp lần lượt vào một pygame Channel. Vị trí được tính bằng số mẫu đã phát
+    (sample clock) thay vì get_pos() của pygame.mixer.music, nên tua/lặp không cần nạp lại file.
+    Vùng lặp (tối đa MAX_LOOP_CACHE_SECONDS) được giữ lại trong bộ nhớ sau vòng đầu tiên, nên các
+    vòng sau phát lại từ bộ nhớ thay vì khởi động lại FFmpeg (không có khoảng lặng ở điểm lặp).
+    Mọi lời gọi từ luồng UI chỉ đổi trạng thái và trả về ngay.
+    """
+    def __init__(self, on_position=None, on_finished=None):
+        self.logger = LoggerProvider.get_logger('cut_merge')
+        self.on_position = on_position
+        self.on_finished = on_finished
+
+        self.file_path = None
+        self.duration = 0
+        self.state = "stopped"  # stopped | playing | paused
+
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._eof_generation = -1
+        self._buffer = queue.Queue(maxsize=RING_CHUNKS)
+        self._decoder = None
+
+        self._base_sec = 0.0
+        self._played_frames = 0
+        self._current = None
+        self._queued = None
+        self._current_started = 0.0
+        self._pause_started = None
+
+        self.loop_region = None
+        self._loop_cache = None  # (vùng lặp, [(Sound, số frame), ...]) của vòng đã giải mã đầy đủ
+        self._recording = None   # (generation, vùng lặp, [khối]) khi đang ghi lại một vòng
+        self._replay = None      # iterator các khối của _loop_cache khi đang phát lại từ bộ nhớ
+
+        self._channel = pygame.mixer.Channel(0)
+        self._shutdown = threading.Event()
+        self._player_thread = threading.Thread(target=self._player_loop, daemon=True)
+        self._player_thread.start()
+
+    # --- API gọi từ controller ---
+    def load(self, file_path, duration):
+        self.stop()
+        with self._lock:
+            self._loop_cache = None
+        self.file_path = file_path
+        self.duration = duration
+
+    def play(self, start_sec):
+        self.seek(start_sec, play=True)
+
+    def seek(self, time_seconds, play=True):
+        """Tua tới vị trí mới: dừng bộ giải mã cũ, xả bộ đệm và giải mã lại từ vị trí đó."""
+        if not self.file_path:
+            return
+        time_seconds = max(0.0, min(time_seconds, self.duration))
+        with self._lock:
+            generation = self._reset_locked(time_seconds, play)
+            self._start_decoder(generation, time_seconds)
+
+    def pause(self):
+        with self._lock:
+            if self.state != "playing":
+                return
+            self._channel.pause()
+            self._pause_started = time.perf_counter()
+            self.state = "paused"
+
+    def resume(self):
+        with self._lock:
+            if self.state != "paused":
+                return
+            if self._pause_started is not None and self._current is not None:
+                # Bù thời gian tạm dừng để đồng hồ nội suy trong khối hiện tại không bị lệch
+                self._current_started += time.perf_counter() - self._pause_started
+            self._pause_started = None
+            self._channel.unpause()
+            self.state = "playing"
+
+    def stop(self):
+        with self._lock:
+            self._generation += 1
+            self._stop_decoder()
+            self._channel.stop()
+            self._drain_buffer()
+            self._current = None
+            self._queued = None
+            self._replay = None
+            self._recording = None
+            self._played_frames = 0
+            self._base_sec = 0.0
+            self.state = "stopped"
+
+    def set_loop(self, start_sec, end_sec):
+        """Bật lặp trong khoảng [start_sec, end_sec]; truyền None để tắt."""
+        if start_sec is None or end_sec is None or end_sec - start_sec < 0.1:
+            self.loop_region = None
+        else:
+            self.loop_region = (start_sec, end_sec)
+        with self._lock:
+            # Bộ nhớ đệm chỉ dùng cho đúng vùng đã ghi; vùng mới sẽ được ghi lại ở vòng kế tiếp
+            if self._loop_cache is not None and self._loop_cache[0] != self.loop_region:
+                self._loop_cache = None
+
+    @property
+    def position(self):
+        with self._lock:
+            return self._position_locked()
+
+    def shutdown(self):
+        """Dừng phát và chờ luồng phát thoát hẳn; phải gọi trước pygame.mixer.quit()."""
+        self.stop()
+        self._shutdown.set()
+        if self._player_thread is not threading.current_thread():
+            self._player_thread.join(timeout=SHUTDOWN_JOIN_TIMEOUT)
+            if self._player_thread.is_alive():
+                self.logger.warning("Luồng phát nghe thử chưa dừng kịp khi đóng.")
+
+    # --- Nội bộ ---
+    def _reset_locked(self, time_seconds, play):
+        """Dừng bộ giải mã cũ, xả bộ đệm và đặt đầu phát về time_seconds. Trả về generation mới."""
+        self._generation += 1
+        self._stop_decoder()
+        self._channel.stop()
+        self._drain_buffer()
+        self._base_sec = time_seconds
+        self._played_frames = 0
+        self._current = None
+        self._queued = None
+        self._replay = None
+        self._recording = None
+        self._pause_started = None
+        self.state = "playing" if play else "paused"
+        return self._generation
+
+    def _loop_back(self):
+        """Quay về đầu vùng lặp: phát lại từ bộ nhớ nếu vòng trước đã được ghi đủ, nếu không thì giải mã lại và ghi vòng này."""
+        with self._lock:
+            region = self.loop_region
+            if region is None or not self.file_path:
+                return
+            generation = self._reset_locked(region[0], play=True)
+            if self._loop_cache is not None and self._loop_cache[0] == region:
+                self._replay = iter(self._loop_cache[1])
+                # Không có bộ giải mã: hết khối phát lại nghĩa là hết dữ liệu của generation này
+                self._eof_generation = generation
+                return
+            self._loop_cache = None
+            if region[1] - region[0] <= MAX_LOOP_CACHE_SECONDS:
+                self._recording = (generation, region, [])
+            self._start_decoder(generation, region[0])
+
+    def _position_locked(self):
+        frames = self._played_frames
+        if self._current is not None:
+            now = self._pause_started if self._pause_started is not None else time.perf_counter()
+            elapsed_frames = int((now - self._current_started) * SAMPLE_RATE)
+            frames += max(0, min(elapsed_frames, self._current[1]))
+        return min(self._base_sec + frames / SAMPLE_RATE, self.duration)
+
+    def _start_decoder(self, generation, start_sec):
+        ffmpeg_path = os.environ.get("FFMPEG_PATH")
+        if not ffmpeg_path:
+            raise FileNotFoundError("Đường dẫn FFmpeg chưa được thiết lập.")
+        cmd = [
+            ffmpeg_path, "-v", "error", "-nostdin",
+            "-ss", f"{start_sec:.3f}", "-i", self.file_path,
+            "-vn", "-ac", str(CHANNELS), "-ar", str(SAMPLE_RATE),
+            "-f", "s16le", "-acodec", "pcm_s16le", "-"
+        ]
+        self._decoder = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        threading.Thread(target=self._decoder_loop, args=(generation, self._decoder), daemon=True).start()
+
+    def _stop_decoder(self):
+        if self._decoder is not None:
+            try:
+                self._decoder.kill()
+            except OSError:
+                pass
+            self._decoder = None
+
+    def _drain_buffer(self):
+        while True:
+            try:
+                self._buffer.get_nowait()
+            except queue.Empty:
+                break
+
+    def _decoder_loop(self, generation, process):
+        try:
+            while generation == self._generation:
+                data = process.stdout.read(CHUNK_BYTES)
+                if not data:
+                    break
+                data = data[:len(data) - len(data) % BYTES_PER_FRAME]
+                item = (generation, len(data) // BYTES_PER_FRAME, data)
+                while generation == self._generation:
+                    try:
+                        self._buffer.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Bộ giải mã nghe thử dừng: {e}")
+        finally:
+            if generation == self._generation:
+                self._eof_generation = generation
+
+    def _next_chunk(self, generation):
+        if self._replay is not None:
+            return next(self._replay, None)
+        while True:
+            try:
+                chunk_generation, frames, data = self._buffer.get_nowait()
+            except queue.Empty:
+                return None
+            if chunk_generation == generation:
+                chunk = (pygame.mixer.Sound(buffer=data), frames)
+                self._record_chunk(generation, chunk)
+                return chunk
+
+    def _record_chunk(self, generation, chunk):
+        if self._recording is None or self._recording[0] != generation:
+            return
+        _, region, chunks = self._recording
+        chunks.append(chunk)
+        if sum(frames for _, frames in chunks) >= (region[1] - region[0]) * SAMPLE_RATE:
+            self._loop_cache = (region, chunks)
+            self._recording = None
+
+    def _player_loop(self):
+        last_report = 0.0
+        while not self._shutdown.is_set():
+            finished = False
+            loop_back = False
+            with self._lock:
+                if self.state == "playing":
+                    generation = self._generation
+                    if self._current is None:
+                        chunk = self._next_chunk(generation)
+                        if chunk is not None:
+                            self._channel.play(chunk[0])
+                            self._current = chunk
+                            self._current_started = time.perf_counter()
+                        elif self._eof_generation == generation:
+                            finished = True
+                    else:
+                        if self._queued is None:
+                            self._queued = self._next_chunk(generation)
+                            if self._queued is not None:
+                                self._channel.queue(self._queued[0])
+                        if self._queued is not None and self._channel.get_queue() is None:
+                            # Khối đang chờ đã bắt đầu phát => khối hiện tại đã phát xong
+                            self._played_frames += self._current[1]
+                            self._current = self._queued
+                            self._queued = None
+                            self._current_started = time.perf_counter()
+                        elif self._queued is None and not self._channel.get_busy():
+                            # Hết dữ liệu trong kênh (cuối file hoặc bộ giải mã chưa kịp)
+                            self._played_frames += self._current[1]
+                            self._current = None
+
+                    position = self._position_locked()
+                    if self.loop_region and (position >= self.loop_region[1] or finished):
+                        loop_back = True
+                        finished = False
+                    if finished:
+                        self.state = "stopped"
+                else:
+                    position = None
+
+            if loop_back:
+                self._loop_back()
+                continue
+            if finished:
+                if self.on_finished:
+                    self.on_finished()
+                continue
+            now = time.perf_counter()
+            if position is not None and self.on_position and now - last_report >= POSITION_REPORT_INTERVAL:
+                last_report = now
+                self.on_position(position)
+            time.sleep(0.01)
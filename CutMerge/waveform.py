@@ -0,0 +1,168 @@
+# CutMerge/waveform.py
+
+import os
+import subprocess
+import numpy as np
+
+from Utils.logger_setup import LoggerProvider
+from Utils.cache_utils import get_cache_dir, file_identity_key
+
+# Giải mã audio ở tần số thấp (mono) chỉ để vẽ dạng sóng tổng quan
+WAVEFORM_SAMPLE_RATE = 4000
+# Số mẫu trong một bucket ở tầng chi tiết nhất (~16ms)
+BASE_BUCKET_SAMPLES = 64
+# Mỗi tầng tiếp theo gộp 4 bucket của tầng trước
+LEVEL_FACTOR = 4
+MIN_LEVEL_BUCKETS = 512
+READ_BLOCK_BUCKETS = 4096
+WAVEFORM_CACHE_DIR = "waveforms"
+CACHE_VERSION = 1
+
+class Waveform:
+    """
+    Kim tự tháp min/max (nhiều độ phân giải) của một file audio.
+    Mỗi tầng là hai mảng int16 (min, max); tầng 0 chi tiết nhất.
+    Việc vẽ lại khi phóng to/thu nhỏ chỉ đọc từ các mảng này, không giải mã lại file.
+    """
+    def __init__(self, levels, bucket_seconds):
+        self.levels = levels
+        self.bucket_seconds = bucket_seconds
+
+    @property
+    def duration(self):
+        return len(self.levels[0][0]) * self.bucket_seconds
+
+    def get_peaks(self, width, start_sec=0.0, end_sec=None):
+        """
+        Trả về (mins, maxs) dạng float trong khoảng [-1, 1] với đúng `width` cột
+        cho khoảng thời gian [start_sec, end_sec]. Trả về None nếu khoảng rỗng.
+        """
+        if width <= 0:
+            return None
+        if end_sec is None:
+            end_sec = self.duration
+        if end_sec <= start_sec:
+            return None
+
+        # Chọn tầng thô nhất vẫn còn ít nhất một bucket cho mỗi cột pixel
+        level = 0
+        for i in range(len(self.levels)):
+            seconds_per_bucket = self.bucket_seconds * (LEVEL_FACTOR ** i)
+            if (end_sec - start_sec) / seconds_per_bucket >= width:
+                level = i
+            else:
+                break
+
+        mins, maxs = self.levels[level]
+        seconds_per_bucket = self.bucket_seconds * (LEVEL_FACTOR ** level)
+        lo = int(start_sec / seconds_per_bucket)
+        hi = min(int(np.ceil(end_sec / seconds_per_bucket)), len(mins))
+        if hi - lo <= 0:
+            return None
+        mins, maxs = mins[lo:hi], maxs[lo:hi]
+
+        # Gộp các bucket vào đúng `width` cột (mỗi cột ít nhất một bucket)
+        edges = np.linspace(0, len(mins), num=min(width, len(mins)) + 1).astype(np.int64)[:-1]
+        col_mins = np.minimum.reduceat(mins, edges).astype(np.float32) / 32768.0
+        col_maxs = np.maximum.reduceat(maxs, edges).astype(np.float32) / 32768.0
+        return col_mins, col_maxs
+
+    def save(self, path):
+        arrays = {"bucket_seconds": np.array([self.bucket_seconds]), "version": np.array([CACHE_VERSION])}
+        for i, (mins, maxs) in enumerate(self.levels):
+            arrays[f"min{i}"] = mins
+            arrays[f"max{i}"] = maxs
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data["version"][0]) != CACHE_VERSION:
+                raise ValueError("Phiên bản cache dạng sóng không khớp.")
+            levels = []
+            i = 0
+            while f"min{i}" in data:
+                levels.append((data[f"min{i}"], data[f"max{i}"]))
+                i += 1
+            return cls(levels, float(data["bucket_seconds"][0]))
+
+
+def _build_pyramid(mins, maxs):
+    levels = [(mins, maxs)]
+    while len(levels[-1][0]) > MIN_LEVEL_BUCKETS:
+        prev_mins, prev_maxs = levels[-1]
+        usable = len(prev_mins) - len(prev_mins) % LEVEL_FACTOR
+        if usable == 0:
+            break
+        levels.append((
+            prev_mins[:usable].reshape(-1, LEVEL_FACTOR).min(axis=1),
+            prev_maxs[:usable].reshape(-1, LEVEL_FACTOR).max(axis=1),
+        ))
+    return levels
+
+
+def analyze_waveform(file_path):
+    """Giải mã file một lần qua FFmpeg thành PCM tần số thấp và tính min/max theo bucket."""
+    ffmpeg_path = os.environ.get("FFMPEG_PATH")
+    if not ffmpeg_path:
+        raise FileNotFoundError("Đường dẫn FFmpeg chưa được thiết lập.")
+
+    cmd = [
+        ffmpeg_path, "-v", "error", "-i", file_path,
+        "-vn", "-ac", "1", "-ar", str(WAVEFORM_SAMPLE_RATE),
+        "-f", "s16le", "-acodec", "pcm_s16le", "-"
+    ]
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        creationflags=subprocess.CREATE_NO_WINDOW
+    )
+
+    block_bytes = READ_BLOCK_BUCKETS * BASE_BUCKET_SAMPLES * 2
+    min_chunks, max_chunks = [], []
+    remainder = np.empty(0, dtype=np.int16)
+    while True:
+        raw = process.stdout.read(block_bytes)
+        if not raw:
+            break
+        samples = np.frombuffer(raw[:len(raw) - len(raw) % 2], dtype=np.int16)
+        if len(remainder):
+            samples = np.concatenate((remainder, samples))
+        usable = len(samples) - len(samples) % BASE_BUCKET_SAMPLES
+        buckets = samples[:usable].reshape(-1, BASE_BUCKET_SAMPLES)
+        min_chunks.append(buckets.min(axis=1))
+        max_chunks.append(buckets.max(axis=1))
+        remainder = samples[usable:].copy()
+    process.wait()
+    # Giải mã lỗi/bị dừng giữa chừng: không trả về (và không lưu cache) dạng sóng thiếu dữ liệu
+    if process.returncode != 0:
+        raise Exception(f"FFmpeg giải mã audio thất bại (mã lỗi {process.returncode}), không thể vẽ dạng sóng.")
+
+    if len(remainder):
+        min_chunks.append(remainder.min(keepdims=True))
+        max_chunks.append(remainder.max(keepdims=True))
+    if not min_chunks:
+        raise ValueError("Không giải mã được dữ liệu audio để vẽ dạng sóng.")
+
+    mins = np.concatenate(min_chunks)
+    maxs = np.concatenate(max_chunks)
+    return Waveform(_build_pyramid(mins, maxs), BASE_BUCKET_SAMPLES / WAVEFORM_SAMPLE_RATE)
+
+
+def get_waveform(file_path, project_root):
+    """Trả về Waveform cho file, dùng cache trong 'Data/waveforms' nếu đã phân tích trước đó."""
+    logger = LoggerProvider.get_logger('cut_merge')
+    cache_path = os.path.join(get_cache_dir(project_root, WAVEFORM_CACHE_DIR), file_identity_key(file_path) + ".npz")
+    if os.path.exists(cache_path):
+        try:
+            return Waveform.load(cache_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Cache dạng sóng bị lỗi, sẽ phân tích lại: {e}")
+
+    waveform = analyze_waveform(file_path)
+    try:
+        waveform.save(cache_path)
+    except OSError as e:
+        logger.warning(f"Không thể lưu cache dạng sóng: {e}")
+    return waveform
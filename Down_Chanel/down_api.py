@@ -1,62 +1,104 @@
 import asyncio
-import requests
-import logging
+import aiohttp
 import json
 import re
 import os
 
-from .down_logic import retry_api
+from .down_logic import (
+    clean_link, parse_video_url, handle_partial_file, save_partial_meta, discard_partial, finalize_partial,
+    IncompleteDownloadError,
+)
 from Utils.logger_setup import LoggerProvider
 logger = LoggerProvider.get_logger('download')
 
+# Cấu hình connection pool của aiohttp
+DNS_CACHE_TTL = 300          # Giữ kết quả phân giải DNS 5 phút
+KEEPALIVE_TIMEOUT = 30       # Giữ kết nối rảnh để tái sử dụng (HTTP keep-alive)
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+# Tải theo từng khối và ghi thẳng ra đĩa, không giữ cả video trong RAM
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Video nhỏ hơn ngưỡng này thường là trang lỗi/video được bảo vệ chứ không phải file video thật
+MIN_VIDEO_BYTES = 50 * 1024
+
+class ProtectedVideoError(Exception):
+    """Máy chủ trả về nội dung không phải video (trang lỗi, video được bảo vệ)."""
+
+def _content_range_start(response):
+    """Byte bắt đầu trong header 'Content-Range: bytes <start>-<end>/<total>' (None nếu không có)."""
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
 class TikTokDownloader:
     def __init__(self, cookies_str=None):
         """
         Khởi tạo downloader với chuỗi cookie được cung cấp.
+        Session aiohttp chỉ được tạo trong event loop của luồng tải (xem open()).
         """
         self.logger = logger
-        self.session = requests.Session()
-        # Gọi hàm khởi tạo session với cookie được truyền vào
+        self.session = None
+        self.headers = {}
+        self.cookies = {}
+        # Gọi hàm khởi tạo header/cookie với cookie được truyền vào
         self.initialize_session(cookies_str)
 
     def initialize_session(self, cookies_str):
         """
         Thiết lập header và cookie cho session.
         """
-        self.session.headers.update({
+        self.headers.update({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
             "Accept-Language": "en-US,en;q=0.9,vi-VN;q=0.8",
             "Referer": "https://www.tiktok.com/",
         })
         
-        # Chuyển đổi chuỗi cookie thành dictionary và cập nhật vào session
+        # Chuyển đổi chuỗi cookie thành dictionary, sẽ được nạp vào cookie jar khi mở session
         if cookies_str:
             try:
                 # Tách chuỗi cookie thành các cặp key=value
                 cookies_dict = {k.strip(): v for k, v in (item.split('=', 1) for item in cookies_str.split(';') if '=' in item)}
-                self.session.cookies.update(cookies_dict)
+                self.cookies.update(cookies_dict)
                 self.logger.info("Khởi tạo session cho tab Download với cookie được cung cấp.")
             except Exception as e:
                 self.logger.error(f"Lỗi định dạng cookie cho tab Download: {e}. Session sẽ không có cookie.")
         else:
             self.logger.warning("Không có cookie nào được cung cấp cho tab Download.")
 
+    async def open(self, max_connections):
+        """
+        Mở session aiohttp dùng chung cho cả lượt tải: connection pool giới hạn theo số luồng tải
+        (tổng và theo từng host), cache DNS và giữ kết nối keep-alive để các request sau không phải
+        bắt tay TCP/TLS lại. Phải gọi trong event loop sẽ chạy các request.
+        """
+        await self.close()
+        connector = aiohttp.TCPConnector(
+            limit=max_connections * 2,
+            limit_per_host=max_connections,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            use_dns_cache=True,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True,
+        )
+        timeout = aiohttp.ClientTimeout(total=None, connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+        # Cookie không gắn với URL phản hồi nào sẽ được gửi cho mọi host (giống requests.Session)
+        self.session.cookie_jar.update_cookies(self.cookies)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
     def extract_username_and_video_id(self, url_or_id):
         """
         Trích xuất username và video_id từ một URL đầy đủ.
         Rất quan trọng để tạo thư mục lưu trữ.
+        Link rút gọn cần được chuẩn hóa trước (xem ShortLinkResolver).
         """
-        url_or_id = url_or_id.replace('\n', '').replace('%0A', '').strip()
-        if "tiktok.com" in url_or_id and "/video/" in url_or_id:
-            clean_url = url_or_id.split("?")[0]
-            try:
-                video_id = self.extract_video_id(clean_url)
-                username_match = re.search(r'/@([^/]+)', clean_url)
-                username = username_match.group(1) if username_match else "unknown"
-                return username, video_id
-            except Exception as e:
-                self.logger.error(f"Lỗi trích xuất username/video_id từ {clean_url}: {e}")
-                return "unknown", self.extract_video_id(url_or_id)
+        url_or_id = clean_link(url_or_id)
+        parsed = parse_video_url(url_or_id)
+        if parsed:
+            return parsed
         # Nếu đầu vào không phải URL đầy đủ, trả về mặc định
         return "unknown", self.extract_video_id(url_or_id)
     
@@ -67,7 +109,13 @@ class TikTokDownloader:
         if url_or_id.isdigit(): return url_or_id
         return url_or_id
 
-    async def download_video(self, url_or_id):
+    async def download_video(self, url_or_id, file_path, on_bytes=None):
+        """Phân tích trang video rồi tải về file_path (hai bước resolve_download_addr + download_file)."""
+        download_addr = await self.resolve_download_addr(url_or_id)
+        return await self.download_file(self.extract_video_id(url_or_id), download_addr, file_path, on_bytes)
+
+    async def resolve_download_addr(self, url_or_id):
+        """Bước metadata: phân tích trang video và trả về địa chỉ tải trực tiếp."""
         video_id = self.extract_video_id(url_or_id)
         self.logger.info(f"Bắt đầu tải video {video_id}")
         video_info = await self.get_video_info(url_or_id)
@@ -80,30 +128,99 @@ class TikTokDownloader:
         if not download_addr:
             self.logger.error(f"Thất bại: Không tìm thấy địa chỉ tải hợp lệ cho video {video_id}.")
             raise Exception(f"Video này được bảo vệ hoặc không có link tải công khai.")
-        self.logger.info(f"Đã tìm thấy URL tải cho {video_id}. Bắt đầu tải xuống...")
+        self.logger.info(f"Đã tìm thấy URL tải cho {video_id}.")
+        return download_addr
+
+    async def download_file(self, video_id, download_addr, file_path, on_bytes=None):
+        """
+        Bước truyền dữ liệu: tải download_addr về file_path. Dữ liệu được ghi dần vào '<file_path>.part'
+        và chỉ đổi tên thành file_path khi đã đủ kích thước, nên file_path không bao giờ là file dở dang.
+        Nếu có phần tải dở từ lần trước (kể cả phiên trước), việc tải được tiếp tục bằng HTTP Range.
+        on_bytes(n) được gọi sau mỗi khối n bytes nhận được. Trả về kích thước file (bytes).
+        """
         for attempt in range(3):
             try:
-                response = self.session.get(download_addr, stream=True, timeout=30)
-                response.raise_for_status()
-                video_bytes = response.content
-                if len(video_bytes) < 50 * 1024:
-                    raise Exception(f"Kích thước video tải về quá nhỏ, có thể đây là video được bảo vệ.")
-                self.logger.info(f"Tải video {video_id} thành công, kích thước={len(video_bytes)} bytes")
-                return video_bytes
-            except requests.RequestException as e:
+                size = await self.stream_to_file(download_addr, file_path, on_bytes)
+                self.logger.info(f"Tải video {video_id} thành công, kích thước={size} bytes")
+                return size
+            except (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownloadError) as e:
+                # Giữ lại file .part: lần thử sau (hoặc lần chạy sau) sẽ tải tiếp phần còn thiếu
                 self.logger.error(f"Thử {attempt + 1}/3 thất bại khi tải {video_id}: {e}")
                 if attempt == 2: raise Exception(f"Tải video {video_id} thất bại sau 3 lần thử")
                 await asyncio.sleep(2)
+            except Exception:
+                discard_partial(file_path)
+                raise
         return None
 
+    async def stream_to_file(self, download_addr, file_path, on_bytes=None):
+        """
+        Tải download_addr theo từng khối vào '<file_path>.part', rồi kiểm tra kích thước và đổi tên.
+        Có phần tải dở hợp lệ thì gửi Range kèm If-Range (ETag/Last-Modified): máy chủ trả 206 nếu
+        nội dung không đổi, trả 200 (toàn bộ file) nếu đã đổi. Video được bảo vệ bị phát hiện sớm
+        qua Content-Length hoặc vài byte đầu tiên, không cần tải hết nội dung.
+        """
+        part_file = file_path + ".part"
+        resume = handle_partial_file(file_path, min_size=MIN_VIDEO_BYTES)
+        headers = {}
+        if resume and resume[0] == resume[1].get("expected_size"):
+            # Lần trước đã tải đủ nhưng chưa kịp đổi tên
+            return finalize_partial(file_path, resume[0])
+        if resume:
+            offset, meta = resume
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = meta.get("etag") or meta.get("last_modified")
+
+        async with self.session.get(download_addr, headers=headers) as response:
+            if response.status == 416:
+                # Phần đã có không khớp với file trên máy chủ
+                discard_partial(file_path)
+                raise IncompleteDownloadError("Máy chủ từ chối tiếp tục tải, sẽ tải lại từ đầu.")
+            response.raise_for_status()
+
+            if resume and response.status == 206 and _content_range_start(response) == resume[0]:
+                size = resume[0]
+                expected = resume[1].get("expected_size")
+                mode = "ab"
+                self.logger.info(f"Tiếp tục tải từ byte {size}: {os.path.basename(file_path)}")
+            else:
+                if response.status == 206:
+                    # Máy chủ trả một đoạn không mong muốn: bỏ phần cũ, lần thử sau tải lại từ đầu
+                    discard_partial(file_path)
+                    raise IncompleteDownloadError("Máy chủ trả về đoạn dữ liệu không khớp với phần đã tải.")
+                size = 0
+                expected = response.content_length
+                mode = "wb"
+                if expected is not None and expected < MIN_VIDEO_BYTES:
+                    raise ProtectedVideoError("Kích thước video quá nhỏ, có thể đây là video được bảo vệ.")
+                content_type = response.headers.get("Content-Type", "")
+                if content_type.startswith(("text/", "application/json")):
+                    raise ProtectedVideoError(f"Máy chủ trả về {content_type} thay vì video, có thể đây là video được bảo vệ.")
+                save_partial_meta(
+                    file_path, expected,
+                    etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"),
+                )
+
+            with open(part_file, mode) as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    if size == 0 and chunk.lstrip()[:1] in (b"<", b"{"):
+                        raise ProtectedVideoError("Nội dung tải về là trang HTML/JSON, có thể đây là video được bảo vệ.")
+                    f.write(chunk)
+                    size += len(chunk)
+                    if on_bytes:
+                        on_bytes(len(chunk))
+        if size < MIN_VIDEO_BYTES:
+            raise ProtectedVideoError("Kích thước video tải về quá nhỏ, có thể đây là video được bảo vệ.")
+        return finalize_partial(file_path, expected)
+
     async def get_video_info(self, url_or_id):
         video_url = url_or_id
         if "tiktok.com" not in video_url: video_url = f"https://www.tiktok.com/t/{video_url}"
         self.logger.info(f"Phân tích trực tiếp trang video: {video_url}")
         try:
-            r = self.session.get(video_url, allow_redirects=True)
-            r.raise_for_status()
-            html_content = r.text
+            async with self.session.get(video_url, allow_redirects=True) as r:
+                r.raise_for_status()
+                html_content = await r.text()
             match = re.search(r'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">(.*?)</script>', html_content)
             if not match: match = re.search(r'<script id="SIGI_STATE" type="application/json">(.*?)</script>', html_content)
             if not match:
@@ -122,7 +239,7 @@ class TikTokDownloader:
             else:
                 self.logger.error("Đã tìm thấy JSON nhưng không có cấu trúc video hợp lệ.")
                 return None
-        except (requests.RequestException, json.JSONDecodeError, KeyError) as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError, KeyError) as e:
             self.logger.error(f"Lỗi khi phân tích trang video: {e}", exc_info=True)
             return None
 
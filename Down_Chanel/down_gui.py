@@ -8,7 +8,10 @@ import sys
 import threading
 
 # <--- THAY ĐỔI IMPORT --->
-from .down_api import TikTokDownloader
+from .down_api import TikTokDownloader, MIN_VIDEO_BYTES
+from .down_pipeline import DownloadPipeline
+from .download_index import DownloadIndex, file_sha1, find_downloaded_files
+from .link_resolver import ShortLinkResolver
 from Utils.logger_setup import LoggerProvider
 from Utils.cookie_loader import load_user_cookies
 from Utils.config import FALLBACK_TIKTOK_COOKIE
@@ -16,6 +19,15 @@ from Utils.config import FALLBACK_TIKTOK_COOKIE
 # Lấy logger dành riêng cho tab Download
 logger = LoggerProvider.get_logger('download') 
 
+# Giới hạn tốc độ của từng bước (số thao tác bắt đầu mỗi giây)
+RESOLVE_RATE_PER_SECOND = 5
+TRANSFER_RATE_PER_SECOND = 10
+PROGRESS_REFRESH_SECONDS = 0.5
+# Chờ người dùng dán/gõ xong rồi mới kiểm tra danh sách link với sổ video đã tải
+LINK_CHECK_DELAY_MS = 300
+# Số link rút gọn được phân giải đồng thời
+SHORT_LINK_WORKERS = 8
+
 
 class TikTokDownloaderGUI:
     def __init__(self, root_frame, project_root):
@@ -31,6 +43,14 @@ class TikTokDownloaderGUI:
         self.downloader = TikTokDownloader(cookies_str=active_tiktok_cookie)
         
         self.is_downloading = False
+        self.pipeline = None
+        self.download_index = DownloadIndex(project_root)
+        self.link_resolver = ShortLinkResolver(project_root)
+        self.link_check_job = None
+        # Sổ video chỉ được đóng khi luồng tải đã kết thúc (luồng tải còn ghi vào sổ)
+        self.close_lock = threading.Lock()
+        self.download_running = False
+        self.is_closing = False
         self.reset_stats()
         
         self.folder_placeholder = "Để trống sẽ lưu vào thư mục Download_Output"
@@ -72,6 +92,9 @@ class TikTokDownloaderGUI:
         ttk.Label(input_frame, text="Link video:").grid(row=2, column=0, sticky="w", pady=(5, 2))
         self.input_text = tk.Text(input_frame, height=8, font=('Segoe UI', 10), relief=tk.SOLID, borderwidth=1)
         self.input_text.grid(row=3, column=0, columnspan=2, sticky="ew")
+        self.input_text.bind("<<Modified>>", self.on_links_modified)
+        self.library_label = ttk.Label(input_frame, text="", foreground="grey")
+        self.library_label.grid(row=4, column=0, columnspan=2, sticky="w", pady=(2, 0))
 
         mode_frame = ttk.LabelFrame(self.root, text="Tùy chọn", padding="10")
         # --- THAY ĐỔI: .grid() -> .pack() ---
@@ -86,6 +109,10 @@ class TikTokDownloaderGUI:
 
         concurrent_frame = ttk.Frame(mode_frame)
         concurrent_frame.pack(side=tk.RIGHT)
+        ttk.Label(concurrent_frame, text="Phân tích đồng thời:").pack(side=tk.LEFT, padx=(0, 5))
+        self.resolve_entry = ttk.Entry(concurrent_frame, width=5)
+        self.resolve_entry.insert(0, "3")
+        self.resolve_entry.pack(side=tk.LEFT, padx=(0, 10))
         ttk.Label(concurrent_frame, text="Tải đồng thời:").pack(side=tk.LEFT, padx=(0, 5))
         self.concurrent_entry = ttk.Entry(concurrent_frame, width=5)
         self.concurrent_entry.insert(0, "5")
@@ -129,6 +156,55 @@ class TikTokDownloaderGUI:
             self.folder_entry.insert(0, self.folder_placeholder)
             self.folder_entry.config(foreground="grey")
     
+    def parse_links(self, text):
+        """
+        Tách danh sách link, chuẩn hóa về link đầy đủ và bỏ link trùng video_id (không gọi mạng).
+        Trả về ([(url, video_id)], số link trùng); link rút gọn chưa phân giải có video_id là None.
+        """
+        links = []
+        seen = set()
+        duplicates = 0
+        for line in text.splitlines():
+            url = line.strip()
+            if not url:
+                continue
+            normalized = self.link_resolver.normalize(url)
+            if normalized is None:
+                key, video_id = url, None
+            else:
+                url, _, video_id = normalized
+                key = video_id
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            links.append((url, video_id))
+        return links, duplicates
+
+    def on_links_modified(self, event=None):
+        if not self.input_text.edit_modified():
+            return
+        self.input_text.edit_modified(False)
+        if self.link_check_job is not None:
+            self.root.after_cancel(self.link_check_job)
+        self.link_check_job = self.root.after(LINK_CHECK_DELAY_MS, self.report_known_links)
+
+    def report_known_links(self):
+        """Báo ngay số video trong danh sách đã có trong sổ (chỉ truy vấn SQLite, không gọi mạng)."""
+        self.link_check_job = None
+        links, duplicates = self.parse_links(self.input_text.get("1.0", tk.END))
+        if not links:
+            self.library_label.config(text="")
+            return
+        known = self.download_index.lookup(video_id for _, video_id in links if video_id)
+        text = f"Đã có {len(known)}/{len(links)} video trong thư viện"
+        if duplicates:
+            text += f" | {duplicates} link trùng sẽ được bỏ qua"
+        unresolved = sum(1 for _, video_id in links if video_id is None)
+        if unresolved:
+            text += f" | {unresolved} link rút gọn sẽ được kiểm tra khi tải"
+        self.library_label.config(text=text)
+
     def log_status(self, message, level="info"):
         self.root.after(0, self._log_status, message, level)
 
@@ -151,10 +227,16 @@ class TikTokDownloaderGUI:
         if self.total_videos > 0:
             percentage = (self.processed_videos / self.total_videos) * 100
             self.progressbar['value'] = percentage
-            self.progress_label.config(text=f"Đang xử lý: {self.processed_videos}/{self.total_videos} | "
-                                            f"Thành công: {self.success_count} | Thất bại: {self.failed_count}")
+            text = (f"Đang xử lý: {self.processed_videos}/{self.total_videos} | "
+                    f"Thành công: {self.success_count} | Thất bại: {self.failed_count}")
         else:
-            self.progress_label.config(text=f"Thành công: {self.success_count} | Thất bại: {self.failed_count}")
+            text = f"Thành công: {self.success_count} | Thất bại: {self.failed_count}"
+        if self.pipeline is not None:
+            # Tốc độ của từng bước: số link phân tích/giây và MB/giây tải về
+            resolve, transfer = self.pipeline.resolve_stats, self.pipeline.transfer_stats
+            text += (f"\nPhân tích: {resolve.done} link ({resolve.item_rate():.1f}/s, {resolve.active} đang chạy) | "
+                     f"Tải: {transfer.done} video ({transfer.byte_rate() / (1024 * 1024):.1f} MB/s, {transfer.active} đang chạy)")
+        self.progress_label.config(text=text)
 
     def browse_folder(self):
         folder_path = filedialog.askdirectory()
@@ -189,15 +271,23 @@ class TikTokDownloaderGUI:
         try:
             self.max_concurrent = int(self.concurrent_entry.get().strip())
         except ValueError: self.max_concurrent = 5
+        try:
+            self.max_resolve = int(self.resolve_entry.get().strip())
+        except ValueError: self.max_resolve = 3
             
-        self.urls = [line.strip() for line in urls_text.splitlines() if line.strip()]
+        self.links, duplicates = self.parse_links(urls_text)
+        self.urls = [url for url, _ in self.links]
         self.is_downloading = True
         self.start_button.config(state=tk.DISABLED, text="ĐANG TẢI...")
         self.status_text.config(state=tk.NORMAL)
         self.status_text.delete(1.0, tk.END)
         self.status_text.config(state=tk.DISABLED)
         self.reset_stats()
+        if duplicates:
+            self.log_status(f"Đã bỏ {duplicates} link trùng trong danh sách.", "warning")
         self.update_progress()
+        with self.close_lock:
+            self.download_running = True
         threading.Thread(target=self.run_async_download, daemon=True).start()
 
     def download_finished(self):
@@ -219,46 +309,136 @@ class TikTokDownloaderGUI:
         except Exception as e:
             self.log_status(f"Lỗi không xác định trong luồng tải: {e}", "error")
         finally:
-            self.root.after(0, self.download_finished)
+            with self.close_lock:
+                self.download_running = False
+                closing = self.is_closing
+            if closing:
+                # Ứng dụng đã đóng trong lúc tải: luồng tải đóng sổ sau lần ghi cuối cùng
+                self.download_index.close()
+            else:
+                self.root.after(0, self.download_finished)
 
     async def process_downloads(self):
-        self.urls_to_download = self.urls
-        self.total_videos = len(self.urls_to_download)
+        self.pipeline = None
+        self.total_videos = len(self.links)
+        self.update_progress()
+        # Một connection pool cho cả lượt tải, đủ cho cả hai bước
+        await self.downloader.open(max(self.max_concurrent + self.max_resolve, SHORT_LINK_WORKERS))
+        ticker = asyncio.create_task(self.refresh_progress_periodically())
+        try:
+            await self.normalize_links()
+            # Bỏ qua video đã có trong sổ (ở bất kỳ thư mục nào) trước khi phân tích/tải
+            existing = await asyncio.to_thread(self.download_index.find_existing, [video_id for _, video_id in self.links])
+            existing.update(await self.adopt_untracked_files(existing))
+            for video_id, path in existing.items():
+                self.log_status(f"Video {video_id} đã có tại {path}, bỏ qua.", "warning")
+            self.success_count += len(existing)
+            self.urls_to_download = [url for url, video_id in self.links if video_id not in existing]
+            self.update_progress()
+            self.pipeline = DownloadPipeline(
+                self.resolve_url, self.transfer_video, self.on_download_failed,
+                resolve_workers=self.max_resolve, transfer_workers=self.max_concurrent,
+                resolve_rate=RESOLVE_RATE_PER_SECOND, transfer_rate=TRANSFER_RATE_PER_SECOND,
+            )
+            await self.pipeline.run(self.urls_to_download)
+        finally:
+            ticker.cancel()
+            await self.downloader.close()
+            self.update_progress()
+
+    async def adopt_untracked_files(self, existing):
+        """
+        Ghi bổ sung vào sổ các video đã tải từ trước khi có sổ (chỉ liệt kê thư mục của các kênh
+        còn video chưa có trong sổ). Trả về {video_id: path} của các file được nhận.
+        """
+        videos_by_user = {}
+        for url, video_id in self.links:
+            if video_id not in existing:
+                username, _ = self.downloader.extract_username_and_video_id(url)
+                videos_by_user.setdefault(username, set()).add(video_id)
+        if not videos_by_user:
+            return {}
+        found = await asyncio.to_thread(find_downloaded_files, self.save_folder, videos_by_user, MIN_VIDEO_BYTES)
+        for video_id, (path, username) in found.items():
+            await self.record_download(video_id, path, username)
+        return {video_id: path for video_id, (path, _) in found.items()}
+
+    async def normalize_links(self):
+        """
+        Phân giải song song các link rút gọn chưa có trong cache, rồi chuẩn hóa và bỏ trùng lại
+        cả danh sách: link rút gọn và link đầy đủ của cùng một video chỉ được tải một lần.
+        """
+        short_links = [url for url, video_id in self.links if video_id is None]
+        if not short_links:
+            return
+        self.log_status(f"Đang phân giải {len(short_links)} link rút gọn...")
+        failures = await self.link_resolver.resolve_all(self.downloader.session, short_links, SHORT_LINK_WORKERS)
+        for url, reason in failures.items():
+            self.on_download_failed(url, reason)
+        remaining = "\n".join(url for url, _ in self.links if url not in failures)
+        self.links, duplicates = self.parse_links(remaining)
+        if duplicates:
+            self.log_status(f"Đã bỏ {duplicates} link rút gọn trùng với video khác trong danh sách.", "warning")
+        self.total_videos = len(self.links) + len(failures)
+        self.update_progress()
+
+    async def refresh_progress_periodically(self):
+        while True:
+            await asyncio.sleep(PROGRESS_REFRESH_SECONDS)
+            self.update_progress()
+
+    async def resolve_url(self, url):
+        """Bước metadata: bỏ qua video đã có, nếu chưa thì lấy địa chỉ tải. Trả về job cho bước tải."""
+        username, video_id = self.downloader.extract_username_and_video_id(url)
+
+        # Tạo thư mục theo tên kênh
+        user_folder = os.path.join(self.save_folder, username)
+        os.makedirs(user_folder, exist_ok=True)
+
+        file_path = os.path.join(user_folder, f"{video_id}.mp4")
+
+        # Video đã tải được lọc theo sổ trước khi vào pipeline (process_downloads), không stat từng link
+        download_addr = await self.downloader.resolve_download_addr(url)
+        return url, video_id, username, file_path, download_addr
+
+    async def record_download(self, video_id, file_path, username):
+        # Lỗi ghi sổ không làm hỏng một lượt tải đã thành công
+        try:
+            sha1 = await asyncio.to_thread(file_sha1, file_path)
+            await asyncio.to_thread(self.download_index.record, video_id, file_path, author=username, sha1=sha1)
+        except Exception as e:
+            self.log_status(f"Không thể ghi video {video_id} vào sổ video đã tải: {e}", "warning")
+
+    async def transfer_video(self, job, stats):
+        url, video_id, username, file_path, download_addr = job
+        if os.path.exists(file_path + ".part"):
+            self.log_status(f"Tiếp tục tải dở: {video_id}")
+        else:
+            self.log_status(f"Đang tải: {video_id}")
+        size = await self.downloader.download_file(video_id, download_addr, file_path, on_bytes=stats.add_bytes)
+        self.log_status(f"Lưu thành công: {video_id} ({size / (1024 * 1024):.1f} MB)", "info")
+        await self.record_download(video_id, file_path, username)
+        self.success_count += 1
+        self.update_progress()
+
+    def on_download_failed(self, item, error):
+        # item là URL (lỗi ở bước metadata) hoặc job (lỗi ở bước tải)
+        url = item[0] if isinstance(item, tuple) else item
+        self.log_status(f"Tải thất bại: {self.downloader.extract_video_id(url)} - Lý do: {error}", "error")
+        self.failed_count += 1
+        self.failed_videos.append((url, str(error)))
         self.update_progress()
-        semaphore = asyncio.Semaphore(self.max_concurrent)
-        tasks = [self.download_with_semaphore(semaphore, url) for url in self.urls_to_download]
-        await asyncio.gather(*tasks)
-
-    async def download_with_semaphore(self, semaphore, url):
-        async with semaphore:
-            try:
-                username, video_id = self.downloader.extract_username_and_video_id(url)
-                
-                # Tạo thư mục theo tên kênh
-                user_folder = os.path.join(self.save_folder, username)
-                os.makedirs(user_folder, exist_ok=True)
-                
-                file_path = os.path.join(user_folder, f"{video_id}.mp4")
-
-                if os.path.exists(file_path) and os.path.getsize(file_path) > 1024 * 50:
-                    self.log_status(f"Video {video_id} đã tồn tại, bỏ qua.", "warning")
-                    self.success_count += 1
-                else:
-                    self.log_status(f"Đang tải: {video_id}")
-                    video_bytes = await self.downloader.download_video(url)
-                    with open(file_path, "wb") as f: f.write(video_bytes)
-                    self.log_status(f"Lưu thành công: {video_id}", "info")
-                    self.success_count += 1
-            except Exception as e:
-                self.log_status(f"Tải thất bại: {self.downloader.extract_video_id(url)} - Lý do: {e}", "error")
-                self.failed_count += 1
-                self.failed_videos.append((url, str(e)))
-            finally:
-                self.update_progress()
 
     def on_closing(self):
         """Hàm được gọi khi đóng ứng dụng chính."""
-        # Hiện tại, tab này không có tiến trình nền cần hủy bắt buộc,
-        # nhưng chúng ta vẫn thêm hàm này để có thể xử lý trong tương lai.
         logger.info("Đã nhận tín hiệu đóng cho tab Download.")
         self.is_downloading = False # Ngăn các tác vụ mới bắt đầu
+        if self.link_check_job is not None:
+            self.root.after_cancel(self.link_check_job)
+            self.link_check_job = None
+        with self.close_lock:
+            self.is_closing = True
+            download_running = self.download_running
+        # Đang tải thì luồng tải tự đóng sổ khi kết thúc, tránh đóng kết nối SQLite khi còn đang ghi
+        if not download_running:
+            self.download_index.close()
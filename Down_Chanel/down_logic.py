@@ -1,39 +1,32 @@
 # logic.py
 import requests
 import os
+import re
+import json
 import logging
 import asyncio
 
-def extract_video_id_from_url(url, headers={}, proxy=None):
-    """
-    Trích xuất ID video từ URL.
-    Hàm này giờ đây sẽ ghi log chi tiết hơn để chẩn đoán lỗi.
-    """
-    logger = logging.getLogger(__name__)
-    try:
-        logger.debug(f"Thực hiện HEAD request tới URL: {url}")
-        response = requests.head(url=url, allow_redirects=True, headers=headers, proxies=proxy, timeout=10)
-        response.raise_for_status() # Gây lỗi nếu status code là 4xx hoặc 5xx
-        
-        final_url = response.url
-        logger.debug(f"URL cuối cùng sau khi chuyển hướng là: {final_url}")
-
-        if "@" in final_url and "/video/" in final_url:
-            video_id = final_url.split("/video/")[1].split("?")[0]
-            logger.debug(f"Trích xuất thành công video_id: {video_id} từ {final_url}")
-            return video_id
-        else:
-            # Đây là điểm có thể gây lỗi. Ghi log lại URL không hợp lệ.
-            logger.error(f"URL cuối cùng '{final_url}' không có định dạng '@.../video/...' như mong đợi.")
-            raise TypeError(f"Định dạng URL cuối cùng không được hỗ trợ: {final_url}")
-            
-    except requests.RequestException as e:
-        logger.error(f"Lỗi mạng trong khi thực hiện HEAD request tới {url}: {e}", exc_info=True)
-        # Ném lại lỗi để khối try-except bên ngoài (trong standardize_url) có thể bắt được
-        raise
-    except TypeError as e:
-        # Ném lại lỗi TypeError để khối try-except bên ngoài bắt được
-        raise
+# --- CHUẨN HÓA LINK ---
+# Link đầy đủ: https://www.tiktok.com/@<user>/video/<id> (có thể là m.tiktok.com, kèm query string)
+VIDEO_URL_RE = re.compile(r"^https?://(?:www\.|m\.)?tiktok\.com/@([^/?#]+)/video/(\d+)", re.IGNORECASE)
+# Link rút gọn: vm.tiktok.com/<mã>, vt.tiktok.com/<mã>, www.tiktok.com/t/<mã>
+SHORT_LINK_RE = re.compile(r"^https?://(?:(?:vm|vt)\.tiktok\.com|(?:www\.|m\.)?tiktok\.com/t)/[\w-]+", re.IGNORECASE)
+
+def clean_link(url):
+    return url.replace('\n', '').replace('%0A', '').strip()
+
+def parse_video_url(url):
+    """(username, video_id) của một link video đầy đủ, hoặc None nếu không phải link đầy đủ."""
+    match = VIDEO_URL_RE.match(clean_link(url))
+    return (match.group(1), match.group(2)) if match else None
+
+def short_link_key(url):
+    """Dạng chuẩn của link rút gọn (bỏ query string, dấu '/' cuối), hoặc None nếu không phải link rút gọn."""
+    match = SHORT_LINK_RE.match(clean_link(url))
+    return match.group(0) if match else None
+
+def canonical_video_url(username, video_id):
+    return f"https://www.tiktok.com/@{username}/video/{video_id}"
 
 
 def retry_api(session, url, params=None, max_attempts=3, delay=2):
@@ -50,15 +43,72 @@ def retry_api(session, url, params=None, max_attempts=3, delay=2):
                 raise Exception(f"API thất bại sau {max_attempts} lần thử: {str(e)}")
             asyncio.sleep(delay)
 
-def handle_partial_file(file_path, min_size=1024):
-    """Xóa file tải dở nếu kích thước nhỏ hơn min_size."""
+# --- VÒNG ĐỜI FILE TẢI DỞ ---
+# Video đang tải được ghi vào '<file>.part'; file sidecar '<file>.part.json' lưu kích thước dự kiến
+# và validator (ETag/Last-Modified) để lần sau tiếp tục bằng HTTP Range thay vì tải lại từ đầu.
+
+def partial_paths(file_path):
+    """Trả về (file .part, file sidecar) của một file đích."""
+    return file_path + ".part", file_path + ".part.json"
+
+def save_partial_meta(file_path, expected_size, etag=None, last_modified=None):
+    _, meta_file = partial_paths(file_path)
+    meta = {"expected_size": expected_size, "etag": etag, "last_modified": last_modified}
+    tmp_file = meta_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_file, meta_file)
+
+def discard_partial(file_path):
+    """Xóa file .part và sidecar của file đích (nếu có)."""
     logger = logging.getLogger(__name__)
-    if os.path.exists(file_path) and os.path.getsize(file_path) < min_size:
+    for path in partial_paths(file_path):
         try:
-            os.remove(file_path)
-            logger.info(f"Xóa file tải dở: {file_path}")
-        except Exception as e:
-            logger.error(f"Lỗi xóa file tải dở {file_path}: {str(e)}")
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.error(f"Lỗi xóa file tải dở {path}: {str(e)}")
+
+def handle_partial_file(file_path, min_size=1024):
+    """
+    Kiểm tra phần đã tải dở của file_path. Trả về (số byte đã có, sidecar) nếu có thể tiếp tục tải;
+    nếu phần tải dở quá nhỏ (< min_size), thiếu/hỏng sidecar hoặc đã vượt kích thước dự kiến
+    thì xóa đi và trả về None (tải lại từ đầu).
+    """
+    logger = logging.getLogger(__name__)
+    part_file, meta_file = partial_paths(file_path)
+    if not os.path.exists(part_file):
+        if os.path.exists(meta_file):
+            discard_partial(file_path)
+        return None
+    try:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        meta = None
+    size = os.path.getsize(part_file)
+    expected = meta.get("expected_size") if meta else None
+    if meta is None or size < min_size or (expected and size > expected) \
+            or not (meta.get("etag") or meta.get("last_modified")):
+        logger.info(f"Xóa file tải dở không thể tiếp tục: {part_file}")
+        discard_partial(file_path)
+        return None
+    return size, meta
+
+def finalize_partial(file_path, expected_size=None):
+    """Kiểm tra kích thước rồi đổi tên '<file>.part' thành file đích (nguyên tử) và xóa sidecar."""
+    part_file, meta_file = partial_paths(file_path)
+    size = os.path.getsize(part_file)
+    if expected_size and size != expected_size:
+        raise IncompleteDownloadError(f"File tải về thiếu dữ liệu ({size}/{expected_size} bytes).")
+    os.replace(part_file, file_path)
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+    return size
+
+class IncompleteDownloadError(Exception):
+    """Kết nối bị ngắt trước khi nhận đủ dữ liệu; có thể tiếp tục tải từ phần đã có."""
+    pass
 
 class TikTokException(Exception):
     def __init__(self, raw_response, message, error_code=None):
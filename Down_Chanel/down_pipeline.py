@@ -0,0 +1,128 @@
+# Down_Chanel/down_pipeline.py
+
+import time
+import asyncio
+
+class RateLimiter:
+    """Giới hạn số thao tác được bắt đầu mỗi giây (rate <= 0: không giới hạn)."""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_time = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_time = max(loop.time(), self._next_time) + self.interval
+
+
+class StageStats:
+    """Số liệu của một bước trong pipeline, dùng để hiển thị tốc độ theo thời gian thực."""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.done = 0
+        self.failed = 0
+        self.active = 0
+        self.bytes = 0
+
+    def add_bytes(self, count):
+        self.bytes += count
+
+    def elapsed(self):
+        return max(time.monotonic() - self.started, 0.001)
+
+    def item_rate(self):
+        return self.done / self.elapsed()
+
+    def byte_rate(self):
+        return self.bytes / self.elapsed()
+
+
+class DownloadPipeline:
+    """
+    Pipeline tải hai bước chạy trong cùng một event loop:
+    - Bước metadata (resolve): phân tích trang video để lấy địa chỉ tải.
+    - Bước truyền dữ liệu (transfer): tải file.
+    Hai bước có số luồng và giới hạn tốc độ riêng, nối với nhau bằng một hàng đợi có giới hạn:
+    khi bước tải chậm, hàng đợi đầy và bước metadata tạm dừng (backpressure) thay vì phân tích
+    trước quá nhiều link (địa chỉ tải của TikTok có hạn dùng).
+
+    resolve(item) trả về job cho bước tải, hoặc None để bỏ qua item.
+    transfer(job, stats) tải job; stats.add_bytes() để cập nhật tốc độ.
+    on_error(item_or_job, error) được gọi khi một item lỗi ở bất kỳ bước nào.
+    """
+    def __init__(self, resolve, transfer, on_error, resolve_workers, transfer_workers, resolve_rate=0, transfer_rate=0):
+        self.resolve = resolve
+        self.transfer = transfer
+        self.on_error = on_error
+        self.resolve_workers = max(1, resolve_workers)
+        self.transfer_workers = max(1, transfer_workers)
+        self.resolve_rate = resolve_rate
+        self.transfer_rate = transfer_rate
+        self.resolve_stats = StageStats()
+        self.transfer_stats = StageStats()
+
+    async def run(self, items):
+        pending = asyncio.Queue()
+        for item in items:
+            pending.put_nowait(item)
+        jobs = asyncio.Queue(maxsize=self.transfer_workers * 2)
+        resolve_limiter = RateLimiter(self.resolve_rate)
+        transfer_limiter = RateLimiter(self.transfer_rate)
+        self.resolve_stats = StageStats()
+        self.transfer_stats = StageStats()
+
+        async def resolve_worker():
+            stats = self.resolve_stats
+            while True:
+                try:
+                    item = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await resolve_limiter.wait()
+                stats.active += 1
+                try:
+                    job = await self.resolve(item)
+                except Exception as e:
+                    stats.failed += 1
+                    self.on_error(item, e)
+                    continue
+                finally:
+                    stats.active -= 1
+                stats.done += 1
+                if job is not None:
+                    # Chờ ở đây khi hàng đợi đầy (bước tải chưa theo kịp)
+                    await jobs.put(job)
+
+        async def transfer_worker():
+            stats = self.transfer_stats
+            while True:
+                job = await jobs.get()
+                if job is None:
+                    return
+                await transfer_limiter.wait()
+                stats.active += 1
+                try:
+                    await self.transfer(job, stats)
+                except Exception as e:
+                    stats.failed += 1
+                    self.on_error(job, e)
+                else:
+                    stats.done += 1
+                finally:
+                    stats.active -= 1
+
+        transfers = [asyncio.create_task(transfer_worker()) for _ in range(self.transfer_workers)]
+        try:
+            await asyncio.gather(*(resolve_worker() for _ in range(self.resolve_workers)))
+            for _ in transfers:
+                await jobs.put(None)
+            await asyncio.gather(*transfers)
+        finally:
+            for task in transfers:
+                task.cancel()
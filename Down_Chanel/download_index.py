@@ -0,0 +1,117 @@
+# Down_Chanel/download_index.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+from Utils.logger_setup import LoggerProvider
+from Utils.cache_utils import get_cache_dir
+
+INDEX_CACHE_DIR = "download_index"
+INDEX_FILE = "downloads.sqlite3"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def file_sha1(file_path):
+    """Hash SHA-1 nội dung file, đọc theo khối để không nạp cả video vào RAM."""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def find_downloaded_files(save_folder, videos_by_user, min_size):
+    """
+    Tìm các video đã tải vào save_folder từ trước khi có sổ: mỗi thư mục kênh chỉ được liệt kê một lần
+    (không stat từng link). videos_by_user là {username: tập video_id}; trả về {video_id: (path, username)}
+    của các file '<video_id>.mp4' lớn hơn min_size.
+    """
+    found = {}
+    for username, video_ids in videos_by_user.items():
+        try:
+            entries = os.scandir(os.path.join(save_folder, username))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                video_id, ext = os.path.splitext(entry.name)
+                if ext == ".mp4" and video_id in video_ids and entry.stat().st_size > min_size:
+                    found[video_id] = (entry.path, username)
+    return found
+
+class DownloadIndex:
+    """
+    Sổ ghi các video đã tải, lưu trong 'Data/download_index/downloads.sqlite3' và dùng chung giữa
+    các lần mở ứng dụng. Khóa là video_id nên video đã tải vào bất kỳ thư mục nào cũng được nhận ra,
+    và việc kiểm tra trùng chỉ là một truy vấn SQLite thay vì stat từng file.
+    Một kết nối duy nhất, được khóa, dùng được từ cả luồng giao diện và luồng tải.
+    """
+    def __init__(self, project_root):
+        self.logger = LoggerProvider.get_logger('download')
+        self.path = os.path.join(get_cache_dir(project_root, INDEX_CACHE_DIR), INDEX_FILE)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS downloads (
+                    video_id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    sha1 TEXT,
+                    author TEXT,
+                    downloaded_at REAL NOT NULL
+                )
+            """)
+
+    def lookup(self, video_ids):
+        """Trả về {video_id: (path, size)} của các video trong video_ids đã có trong sổ."""
+        video_ids = list(video_ids)
+        found = {}
+        with self._lock:
+            # Chia nhỏ để không vượt giới hạn số tham số của SQLite
+            for start in range(0, len(video_ids), 500):
+                batch = video_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT video_id, path, size FROM downloads WHERE video_id IN ({placeholders})", batch
+                )
+                for video_id, path, size in rows:
+                    found[video_id] = (path, size)
+        return found
+
+    def find_existing(self, video_ids):
+        """
+        Như lookup() nhưng chỉ giữ các video mà file vẫn còn đúng kích thước trên đĩa;
+        bản ghi của file đã bị xóa/thay đổi sẽ bị gỡ khỏi sổ để video được tải lại.
+        """
+        existing = {}
+        stale = []
+        for video_id, (path, size) in self.lookup(video_ids).items():
+            try:
+                if os.path.getsize(path) == size:
+                    existing[video_id] = path
+                    continue
+            except OSError:
+                pass
+            stale.append(video_id)
+        if stale:
+            self.remove(stale)
+        return existing
+
+    def record(self, video_id, path, author=None, sha1=None):
+        size = os.path.getsize(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (video_id, path, size, sha1, author, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, os.path.abspath(path), size, sha1, author, time.time()),
+            )
+
+    def remove(self, video_ids):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM downloads WHERE video_id = ?", [(video_id,) for video_id in video_ids])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,114 @@
+# Down_Chanel/link_resolver.py
+
+import os
+import json
+import asyncio
+import threading
+
+from .down_logic import clean_link, parse_video_url, short_link_key, canonical_video_url
+from Utils.logger_setup import LoggerProvider
+from Utils.cache_utils import get_cache_dir
+
+LINK_CACHE_DIR = "short_links"
+LINK_CACHE_FILE = "short_links.json"
+# Link rút gọn trỏ cố định tới một video nên có thể giữ lâu; chỉ giới hạn kích thước file cache
+MAX_CACHED_LINKS = 20000
+DEFAULT_RESOLVE_WORKERS = 8
+
+class ShortLinkResolver:
+    """
+    Chuẩn hóa danh sách link về dạng https://www.tiktok.com/@<user>/video/<id>.
+    Link rút gọn (vm.tiktok.com, vt.tiktok.com, /t/) được phân giải song song bằng cách theo
+    chuyển hướng, với số request đồng thời có giới hạn. Kết quả link rút gọn -> link đầy đủ được
+    lưu trong 'Data/short_links/short_links.json' nên lần dán sau không cần gọi mạng.
+    """
+    def __init__(self, project_root):
+        self.logger = LoggerProvider.get_logger('download')
+        self.path = os.path.join(get_cache_dir(project_root, LINK_CACHE_DIR), LINK_CACHE_FILE)
+        self._lock = threading.Lock()
+        self._cache = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        with self._lock:
+            # dict giữ thứ tự thêm vào: bỏ các link cũ nhất khi vượt giới hạn
+            for key in list(self._cache)[:max(0, len(self._cache) - MAX_CACHED_LINKS)]:
+                del self._cache[key]
+            data = dict(self._cache)
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning(f"Không thể lưu cache link rút gọn: {e}")
+
+    def normalize(self, url):
+        """
+        Trả về (link đầy đủ, username, video_id) mà không gọi mạng, hoặc None nếu là link rút gọn
+        chưa có trong cache. Đầu vào không nhận dạng được (ví dụ chỉ có ID) được giữ nguyên.
+        """
+        url = clean_link(url)
+        key = short_link_key(url)
+        if key:
+            with self._lock:
+                url = self._cache.get(key)
+            if url is None:
+                return None
+        parsed = parse_video_url(url)
+        if parsed:
+            username, video_id = parsed
+            return canonical_video_url(username, video_id), username, video_id
+        return url, "unknown", url
+
+    async def resolve_all(self, session, urls, max_workers=DEFAULT_RESOLVE_WORKERS):
+        """
+        Phân giải song song các link rút gọn chưa có trong cache (mỗi link một lần dù bị dán nhiều lần).
+        Trả về {url: lỗi} của các link không phân giải được.
+        """
+        pending = {}
+        for url in urls:
+            key = short_link_key(url)
+            if key and self.normalize(url) is None:
+                pending.setdefault(key, []).append(url)
+        if not pending:
+            return {}
+
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+        failures = {}
+        resolved = 0
+
+        async def _resolve(key):
+            nonlocal resolved
+            async with semaphore:
+                try:
+                    canonical = await self._follow_redirects(session, key)
+                except Exception as e:
+                    for url in pending[key]:
+                        failures[url] = f"Không phân giải được link rút gọn: {e}"
+                    return
+            with self._lock:
+                self._cache[key] = canonical
+            resolved += 1
+
+        await asyncio.gather(*(_resolve(key) for key in pending))
+        self._save()
+        self.logger.info(f"Đã phân giải {resolved}/{len(pending)} link rút gọn.")
+        return failures
+
+    async def _follow_redirects(self, session, short_url):
+        # HEAD là đủ để lấy URL cuối; một số máy chủ không chuyển hướng với HEAD thì thử lại bằng GET
+        # (không đọc nội dung trang).
+        for method in (session.head, session.get):
+            async with method(short_url, allow_redirects=True) as response:
+                final_url = str(response.url)
+            parsed = parse_video_url(final_url)
+            if parsed:
+                return canonical_video_url(*parsed)
+        raise Exception(f"Link chuyển hướng tới '{final_url}', không phải link video.")
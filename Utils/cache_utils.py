@@ -0,0 +1,21 @@
+# Utils/cache_utils.py
+
+import os
+import hashlib
+
+def get_cache_dir(project_root, name):
+    """Trả về (và tạo nếu cần) thư mục cache con nằm trong 'Data' của dự án."""
+    cache_dir = os.path.join(project_root, 'Data', name)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def file_identity_key(file_path, *extra):
+    """
+    Tạo khóa định danh cho một file dựa trên đường dẫn, kích thước và thời gian sửa đổi.
+    Các giá trị extra (nếu có) được gộp vào khóa, ví dụ tham số xử lý.
+    File thay đổi nội dung sẽ có khóa mới, nên cache cũ tự động không còn được dùng.
+    """
+    stat = os.stat(file_path)
+    parts = [os.path.normcase(os.path.abspath(file_path)), str(stat.st_size), str(stat.st_mtime_ns)]
+    parts.extend(str(item) for item in extra)
+    return hashlib.sha1("|".join(parts).encode('utf-8')).hexdigest()
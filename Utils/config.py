@@ -54,3 +54,6 @@ MP3_PROFILES = {
         "params": ["-vn", "-acodec", "mp3", "-ar", "48000", "-af", "atempo=0.93,asetrate=48000*1.3,aresample=48000"]
     }
 }
+
+# === Cache file output (bỏ qua chuyển đổi trùng lặp) ===
+OUTPUT_CACHE_MAX_BYTES = 5 * 1024 ** 3  # Giới hạn dung lượng 'Data/output_cache', xóa mục ít dùng nhất khi vượt
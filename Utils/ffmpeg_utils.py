@@ -6,6 +6,7 @@ import subprocess
 import psutil
 import shutil
 import json
+from collections import deque
 # <--- THAY ĐỔI Ở ĐÂY --->
 from .logger_setup import LoggerProvider
 logger = LoggerProvider.get_logger('ffmpeg')
@@ -48,13 +49,19 @@ def setup_ffmpeg(asset_path):
     logger.info(f"Đường dẫn FFmpeg được thiết lập: {ffmpeg_path}")
     return ffmpeg_path
 
-def run_ffmpeg(input_file, output_file, args, recording_id='N/A'):
+def run_ffmpeg(input_file, output_file, args, recording_id='N/A', input_args=None, on_start=None):
+    """
+    input_args được đặt trước -i (ví dụ -ss để tua nhanh theo keyframe khi đọc input).
+    on_start(pid) được gọi ngay khi tiến trình khởi động (để có thể dừng từ bên ngoài).
+    """
     ffmpeg_path = os.environ.get("FFMPEG_PATH")
     if not ffmpeg_path:
         raise FileNotFoundError("Đường dẫn FFmpeg chưa được thiết lập.")
     
     # --- THAY ĐỔI: Xây dựng câu lệnh linh hoạt ---
     cmd = [ffmpeg_path]
+    if input_args:
+        cmd.extend(input_args)
     # Chỉ thêm tham số -i nếu input_file được cung cấp
     if input_file:
         cmd.extend(["-i", input_file])
@@ -69,6 +76,8 @@ def run_ffmpeg(input_file, output_file, args, recording_id='N/A'):
             cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
             creationflags=subprocess.CREATE_NO_WINDOW, text=True, encoding='utf-8', errors='ignore'
         )
+        if on_start:
+            on_start(process.pid)
         stdout, stderr = process.communicate()
         if process.returncode != 0:
             error_msg = stderr if stderr else "Lỗi không xác định"
@@ -81,6 +90,75 @@ def run_ffmpeg(input_file, output_file, args, recording_id='N/A'):
         logger.error(f"Lỗi chạy FFmpeg: {e}", extra={'recording_id': recording_id})
         raise
 
+def run_ffmpeg_multi_output(input_file, outputs, input_args=None, recording_id='N/A', on_start=None):
+    """
+    Chạy MỘT tiến trình FFmpeg đọc input một lần và ghi ra nhiều file.
+    outputs là danh sách các cặp (args, output_file); mỗi nhóm args chỉ áp dụng
+    cho file output đứng ngay sau nó.
+    on_start(pid) được gọi ngay khi tiến trình khởi động (để có thể dừng từ bên ngoài).
+    """
+    ffmpeg_path = os.environ.get("FFMPEG_PATH")
+    if not ffmpeg_path:
+        raise FileNotFoundError("Đường dẫn FFmpeg chưa được thiết lập.")
+    if not outputs:
+        raise ValueError("Cần ít nhất một file output.")
+
+    cmd = [ffmpeg_path, "-y"]
+    if input_args:
+        cmd.extend(input_args)
+    if input_file:
+        cmd.extend(["-i", input_file])
+    for output_args, output_file in outputs:
+        cmd.extend(output_args)
+        cmd.append(output_file)
+
+    try:
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW, text=True, encoding='utf-8', errors='ignore'
+        )
+        if on_start:
+            on_start(process.pid)
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            error_msg = stderr if stderr else "Lỗi không xác định"
+            logger.error(f"Lỗi FFmpeg: {error_msg.strip()}", extra={'recording_id': recording_id})
+            raise Exception(f"Lỗi FFmpeg: {error_msg.strip()}")
+        logger.info(f"Thao tác FFmpeg với {len(outputs)} file output thành công", extra={'recording_id': recording_id})
+        return process.pid
+    except Exception as e:
+        logger.error(f"Lỗi chạy FFmpeg: {e}", extra={'recording_id': recording_id})
+        raise
+
+def iter_ffmpeg_stderr(args, on_start=None):
+    """
+    Chạy FFmpeg với args (đã bao gồm input/output) và trả về từng dòng stderr
+    ngay khi FFmpeg in ra, để phân tích sự kiện/tiến độ theo luồng.
+    on_start(pid) được gọi ngay khi tiến trình khởi động (để có thể dừng từ bên ngoài).
+    Ném Exception nếu FFmpeg kết thúc với mã lỗi.
+    """
+    ffmpeg_path = os.environ.get("FFMPEG_PATH")
+    if not ffmpeg_path:
+        raise FileNotFoundError("Đường dẫn FFmpeg chưa được thiết lập.")
+
+    cmd = [ffmpeg_path, "-hide_banner"] + list(args)
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        creationflags=subprocess.CREATE_NO_WINDOW, text=True, encoding='utf-8', errors='ignore'
+    )
+    if on_start:
+        on_start(process.pid)
+    tail = deque(maxlen=20)
+    for line in process.stderr:
+        line = line.rstrip()
+        tail.append(line)
+        yield line
+    process.wait()
+    if process.returncode != 0:
+        error_msg = "\n".join(tail) or "Lỗi không xác định"
+        logger.error(f"Lỗi FFmpeg: {error_msg}")
+        raise Exception(f"Lỗi FFmpeg: {error_msg}")
+
 def stop_ffmpeg_processes(pid_list):
     for pid in pid_list[:]:
         try:
@@ -96,17 +174,40 @@ def stop_ffmpeg_processes(pid_list):
         except Exception as e:
             logger.error(f"Lỗi khi dừng FFmpeg (PID: {pid}): {e}")
 
-def get_media_duration(file_path):
-    """
-    Sử dụng ffprobe để lấy tổng thời lượng (giây) của một file media.
-    Trả về duration dưới dạng float, hoặc None nếu có lỗi.
-    """
+_ffmpeg_version = None
+
+def get_ffmpeg_version():
+    """Dòng phiên bản của FFmpeg đang dùng (đọc một lần), dùng làm một phần khóa cache output."""
+    global _ffmpeg_version
+    if _ffmpeg_version is None:
+        ffmpeg_path = os.environ.get("FFMPEG_PATH")
+        if not ffmpeg_path:
+            raise FileNotFoundError("Đường dẫn FFmpeg chưa được thiết lập.")
+        result = subprocess.run(
+            [ffmpeg_path, "-version"], capture_output=True, text=True, encoding='utf-8', errors='ignore',
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        _ffmpeg_version = (result.stdout.splitlines() or ["unknown"])[0].strip()
+    return _ffmpeg_version
+
+def get_ffprobe_path():
+    """Trả về đường dẫn ffprobe.exe nằm cạnh ffmpeg, hoặc None nếu không tìm thấy."""
     ffmpeg_dir = os.path.dirname(os.environ.get("FFMPEG_PATH", "ffmpeg.exe"))
     ffprobe_path = os.path.join(ffmpeg_dir, "ffprobe.exe")
 
     if not os.path.exists(ffprobe_path):
         logger.error(f"Không tìm thấy ffprobe.exe tại '{ffprobe_path}'")
         return None
+    return ffprobe_path
+
+def get_media_duration(file_path):
+    """
+    Sử dụng ffprobe để lấy tổng thời lượng (giây) của một file media.
+    Trả về duration dưới dạng float, hoặc None nếu có lỗi.
+    """
+    ffprobe_path = get_ffprobe_path()
+    if not ffprobe_path:
+        return None
 
     command = [
         ffprobe_path,
@@ -138,3 +239,67 @@ def get_media_duration(file_path):
         logger.error(f"Không thể lấy thời lượng file '{file_path}': {e}", exc_info=True)
         return None
 
+def probe_media_streams(file_path):
+    """
+    Sử dụng ffprobe để lấy thông tin các luồng (stream) và định dạng của file.
+    Trả về dict {'streams': [...], 'format': {...}}, hoặc None nếu có lỗi.
+    """
+    ffprobe_path = get_ffprobe_path()
+    if not ffprobe_path:
+        return None
+
+    command = [
+        ffprobe_path,
+        "-v", "quiet",
+        "-print_format", "json",
+        "-show_streams",
+        "-show_format",
+        file_path
+    ]
+
+    try:
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        if result.returncode != 0:
+            logger.error(f"Lỗi khi chạy ffprobe: {result.stderr}")
+            return None
+        data = json.loads(result.stdout)
+        data.setdefault('streams', [])
+        data.setdefault('format', {})
+        return data
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        logger.error(f"Không thể đọc thông tin luồng của file '{file_path}': {e}", exc_info=True)
+        return None
+
+def has_video_stream(file_path):
+    """Kiểm tra file có luồng video thật sự (bỏ qua ảnh bìa đính kèm) hay không."""
+    info = probe_media_streams(file_path)
+    if not info:
+        return False
+    return any(
+        stream.get('codec_type') == 'video' and not stream.get('disposition', {}).get('attached_pic')
+        for stream in info['streams']
+    )
+
+def has_audio_stream(file_path):
+    """Kiểm tra file có ít nhất một luồng audio hay không."""
+    info = probe_media_streams(file_path)
+    if not info:
+        return False
+    return any(stream.get('codec_type') == 'audio' for stream in info['streams'])
+
+def get_audio_codec(file_path):
+    """Tên codec của luồng audio đầu tiên (ví dụ 'aac', 'mp3'), hoặc None nếu không có."""
+    info = probe_media_streams(file_path)
+    if not info:
+        return None
+    for stream in info['streams']:
+        if stream.get('codec_type') == 'audio':
+            return stream.get('codec_name')
+    return None
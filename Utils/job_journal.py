@@ -0,0 +1,146 @@
+# Utils/job_journal.py
+
+import os
+import json
+import time
+import uuid
+import threading
+
+from .logger_setup import LoggerProvider
+from .cache_utils import get_cache_dir
+
+JOURNAL_DIR = "jobs"
+# Trạng thái của một tác vụ trong nhật ký
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+UNFINISHED_STATES = (STATE_PENDING, STATE_RUNNING)
+# Khi khởi động mà tab đang bận, hỏi lại việc tiếp tục tác vụ dang dở sau mỗi khoảng này (ms)
+RESUME_RETRY_MS = 2000
+
+class JobJournal:
+    """
+    Nhật ký tác vụ append-only (JSONL) trong 'Data/jobs/<name>.jsonl'.
+    Mỗi dòng là một sự kiện: thêm tác vụ (kèm loại, tham số, file output) hoặc đổi trạng thái.
+    Mỗi lần ghi đều flush + fsync nên khi ứng dụng bị tắt đột ngột, chỉ dòng cuối có thể hỏng
+    (và sẽ bị bỏ qua khi đọc lại).
+    """
+    def __init__(self, project_root, name):
+        self.logger = LoggerProvider.get_logger('job_journal')
+        self.path = os.path.join(get_cache_dir(project_root, JOURNAL_DIR), f"{name}.jsonl")
+        self._lock = threading.Lock()
+
+    def _append(self, records):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def add_tasks(self, kind, tasks):
+        """
+        Ghi một loạt tác vụ mới. tasks là danh sách dict {"params": ..., "outputs": [...]}
+        (params phải tuần tự hóa được bằng JSON). Trả về danh sách task_id theo đúng thứ tự.
+        """
+        now = time.time()
+        records = []
+        for task in tasks:
+            records.append({
+                "event": "add", "id": uuid.uuid4().hex, "kind": kind, "time": now,
+                "params": task["params"], "outputs": task.get("outputs", []),
+            })
+        self._append(records)
+        return [record["id"] for record in records]
+
+    def mark(self, task_id, state, error=None):
+        if not task_id:
+            return
+        record = {"event": "state", "id": task_id, "state": state, "time": time.time()}
+        if error:
+            record["error"] = str(error)[:500]
+        try:
+            self._append([record])
+        except OSError as e:
+            self.logger.warning(f"Không thể ghi nhật ký tác vụ: {e}")
+
+    def mark_many(self, task_ids, state):
+        """Như mark() cho nhiều tác vụ, nhưng ghi và fsync một lần cho cả lô."""
+        now = time.time()
+        records = [{"event": "state", "id": task_id, "state": state, "time": now} for task_id in task_ids if task_id]
+        if not records:
+            return
+        try:
+            self._append(records)
+        except OSError as e:
+            self.logger.warning(f"Không thể ghi nhật ký tác vụ: {e}")
+
+    def _replay(self):
+        tasks = {}
+        if not os.path.exists(self.path):
+            return tasks
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng ghi dở khi ứng dụng bị tắt đột ngột
+                    continue
+                if record.get("event") == "add":
+                    record["state"] = STATE_PENDING
+                    tasks[record["id"]] = record
+                elif record.get("event") == "state" and record.get("id") in tasks:
+                    tasks[record["id"]]["state"] = record["state"]
+        return tasks
+
+    def unfinished_tasks(self):
+        """Các tác vụ chưa hoàn thành (đang chờ hoặc đang chạy khi ứng dụng bị đóng)."""
+        return [task for task in self._replay().values() if task["state"] in UNFINISHED_STATES]
+
+    def cancel_unfinished(self, task_ids=None):
+        """Hủy các tác vụ chưa hoàn thành (chỉ trong task_ids nếu có)."""
+        self.mark_many(
+            [task["id"] for task in self.unfinished_tasks() if task_ids is None or task["id"] in task_ids],
+            STATE_CANCELLED,
+        )
+
+    def compact(self):
+        """Viết lại nhật ký chỉ với các tác vụ chưa hoàn thành (xóa file nếu không còn tác vụ nào)."""
+        with self._lock:
+            try:
+                remaining = [
+                    {key: value for key, value in task.items() if key != "state"}
+                    for task in self._replay().values() if task["state"] in UNFINISHED_STATES
+                ]
+                if not remaining:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                    return
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for record in remaining:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                self.logger.warning(f"Không thể thu gọn nhật ký tác vụ: {e}")
+
+
+def temp_output_path(output_file):
+    """Tên file tạm cho output (giữ nguyên đuôi để FFmpeg nhận đúng định dạng)."""
+    base, ext = os.path.splitext(output_file)
+    return f"{base}.part{ext}"
+
+def commit_output(temp_file, output_file):
+    """Đổi tên file tạm thành file output thật trong một thao tác nguyên tử."""
+    os.replace(temp_file, output_file)
+
+def discard_output(temp_file):
+    try:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    except OSError:
+        pass
@@ -0,0 +1,204 @@
+# Utils/media_index.py
+
+import os
+import struct
+import subprocess
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .logger_setup import LoggerProvider
+from .ffmpeg_utils import get_ffprobe_path
+from .cache_utils import get_cache_dir, file_identity_key
+logger = LoggerProvider.get_logger('ffmpeg')
+
+# Phiên bản 2: thời điểm tính từ đầu file (đã trừ start_time); cache phiên bản cũ sẽ được tạo lại
+INDEX_MAGIC = b"MIDX2"
+INDEX_CACHE_DIR = "media_index"
+
+class MediaIndex:
+    """
+    Chỉ mục gói tin (packet) của luồng chính trong một file media.
+    Lưu thời điểm (pts), vị trí byte và kích thước của từng gói tin trong các array
+    liên tục, cùng danh sách keyframe đã sắp xếp để tra cứu bằng tìm kiếm nhị phân.
+    Thời điểm được tính từ đầu file (pts trừ start_time của file), cùng mốc với
+    tham số -ss đặt trước -i của FFmpeg.
+    """
+    def __init__(self, stream_type, pts, pos, size, key_flags):
+        self.stream_type = stream_type
+        self.pts = pts
+        self.pos = pos
+        self.size = size
+        self.key_flags = key_flags
+
+        key_idx = [i for i in range(len(pts)) if key_flags[i]]
+        self.key_pts = array('d', (pts[i] for i in key_idx))
+        self.key_pos = array('q', (pos[i] for i in key_idx))
+
+    def __len__(self):
+        return len(self.pts)
+
+    @property
+    def has_video(self):
+        return self.stream_type == "video"
+
+    def keyframe_at_or_before(self, seconds):
+        """Trả về (pts, byte_offset) của keyframe gần nhất không muộn hơn seconds."""
+        if not self.key_pts:
+            return 0.0, 0
+        i = bisect_right(self.key_pts, seconds) - 1
+        i = max(i, 0)
+        return self.key_pts[i], self.key_pos[i]
+
+    def keyframe_at_or_after(self, seconds):
+        """Trả về (pts, byte_offset) của keyframe gần nhất không sớm hơn seconds."""
+        if not self.key_pts:
+            return 0.0, 0
+        i = bisect_left(self.key_pts, seconds)
+        i = min(i, len(self.key_pts) - 1)
+        return self.key_pts[i], self.key_pos[i]
+
+    def keyframes_between(self, start, end):
+        """Trả về danh sách thời điểm keyframe nằm trong khoảng [start, end)."""
+        lo = bisect_left(self.key_pts, start)
+        hi = bisect_left(self.key_pts, end)
+        return list(self.key_pts[lo:hi])
+
+    def packet_at(self, seconds):
+        """Trả về (pts, byte_offset, size) của gói tin chứa thời điểm seconds."""
+        if not self.pts:
+            return 0.0, 0, 0
+        i = max(bisect_right(self.pts, seconds) - 1, 0)
+        return self.pts[i], self.pos[i], self.size[i]
+
+    # --- Lưu / Đọc cache dạng nhị phân ---
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            stream_type = self.stream_type.encode('ascii')
+            f.write(INDEX_MAGIC)
+            f.write(struct.pack("<BI", len(stream_type), len(self.pts)))
+            f.write(stream_type)
+            self.pts.tofile(f)
+            self.pos.tofile(f)
+            self.size.tofile(f)
+            self.key_flags.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError("File chỉ mục không hợp lệ.")
+            type_len, count = struct.unpack("<BI", f.read(struct.calcsize("<BI")))
+            stream_type = f.read(type_len).decode('ascii')
+            pts, pos, size, key_flags = array('d'), array('q'), array('i'), array('b')
+            pts.fromfile(f, count)
+            pos.fromfile(f, count)
+            size.fromfile(f, count)
+            key_flags.fromfile(f, count)
+        return cls(stream_type, pts, pos, size, key_flags)
+
+    @classmethod
+    def build(cls, file_path):
+        """Quét file bằng một lần chạy ffprobe -show_packets và dựng chỉ mục."""
+        for stream_type, selector in (("video", "v:0"), ("audio", "a:0")):
+            packets = _probe_packets(file_path, selector)
+            if packets:
+                break
+        else:
+            return None
+
+        # Gói tin được ffprobe trả về theo thứ tự giải mã (dts); sắp xếp lại theo pts
+        packets.sort(key=lambda p: p[0])
+        pts = array('d', (p[0] for p in packets))
+        pos = array('q', (p[1] for p in packets))
+        size = array('i', (p[2] for p in packets))
+        key_flags = array('b', (p[3] for p in packets))
+        return cls(stream_type, pts, pos, size, key_flags)
+
+
+def parse_packet_lines(lines):
+    """
+    Đọc output dạng compact của ffprobe (các dòng 'packet|...' và một dòng 'format|start_time=...').
+    Trả về danh sách (pts, pos, size, is_key) với pts tính từ đầu file: file TS/FLV của các buổi live
+    thường có start_time khác 0, còn -ss đặt trước -i của FFmpeg lại tính từ đầu file.
+    """
+    packets = []
+    start_time = 0.0
+    for line in lines:
+        section, _, rest = line.strip().partition("|")
+        fields = dict(item.split("=", 1) for item in rest.split("|") if "=" in item)
+        if section == "format":
+            try:
+                start_time = float(fields.get("start_time", 0))
+            except ValueError:
+                pass
+            continue
+        if section != "packet":
+            continue
+        try:
+            pts = float(fields["pts_time"])
+        except (KeyError, ValueError):
+            continue
+        pos = int(fields["pos"]) if fields.get("pos", "N/A").isdigit() else -1
+        size = int(fields["size"]) if fields.get("size", "").isdigit() else 0
+        is_key = 1 if fields.get("flags", "").startswith("K") else 0
+        packets.append((pts, pos, size, is_key))
+    # Dòng format đứng sau các gói tin, nên chỉ trừ start_time khi đã đọc hết
+    return [(pts - start_time, pos, size, is_key) for pts, pos, size, is_key in packets]
+
+def _probe_packets(file_path, selector):
+    ffprobe_path = get_ffprobe_path()
+    if not ffprobe_path:
+        return []
+
+    command = [
+        ffprobe_path, "-v", "error",
+        "-select_streams", selector,
+        "-show_entries", "packet=pts_time,pos,size,flags:format=start_time",
+        "-of", "compact",
+        file_path
+    ]
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        creationflags=subprocess.CREATE_NO_WINDOW, text=True, encoding='utf-8', errors='ignore'
+    )
+    packets = parse_packet_lines(process.stdout)
+    process.wait()
+    return packets
+
+
+_index_lock = threading.Lock()
+
+def get_media_index(file_path, project_root):
+    """
+    Trả về MediaIndex cho file, đọc từ cache trong 'Data/media_index' nếu có.
+    Trả về None nếu không thể dựng chỉ mục.
+    """
+    try:
+        cache_path = os.path.join(get_cache_dir(project_root, INDEX_CACHE_DIR), file_identity_key(file_path) + ".idx")
+    except OSError as e:
+        logger.error(f"Không thể truy cập file để tạo chỉ mục '{file_path}': {e}")
+        return None
+
+    with _index_lock:
+        if os.path.exists(cache_path):
+            try:
+                return MediaIndex.load(cache_path)
+            except (OSError, ValueError, EOFError, struct.error) as e:
+                logger.warning(f"Cache chỉ mục bị lỗi, sẽ tạo lại: {e}")
+
+    logger.info(f"Đang tạo chỉ mục keyframe cho '{os.path.basename(file_path)}'...")
+    index = MediaIndex.build(file_path)
+    if index is None:
+        logger.error(f"Không thể tạo chỉ mục cho '{os.path.basename(file_path)}'.")
+        return None
+
+    with _index_lock:
+        try:
+            index.save(cache_path)
+        except OSError as e:
+            logger.warning(f"Không thể lưu cache chỉ mục: {e}")
+    logger.info(f"Tạo chỉ mục thành công: {len(index)} gói tin, {len(index.key_pts)} keyframe.")
+    return index
@@ -0,0 +1,148 @@
+# Utils/output_cache.py
+
+import os
+import json
+import time
+import shutil
+import threading
+
+from .logger_setup import LoggerProvider
+from .cache_utils import get_cache_dir, file_identity_key
+from .ffmpeg_utils import get_ffmpeg_version
+from .config import OUTPUT_CACHE_MAX_BYTES
+
+OUTPUT_CACHE_DIR = "output_cache"
+INDEX_FILE = "index.json"
+
+class OutputCache:
+    """
+    Cache file output theo nội dung công việc: khóa gồm định danh file nguồn (đường dẫn, kích thước,
+    mtime), toàn bộ tham số FFmpeg và phiên bản FFmpeg. Cùng file + cùng cài đặt sẽ trả lại ngay
+    output đã tạo trước đó (hardlink nếu được, nếu không thì sao chép) thay vì chạy lại FFmpeg.
+    Tổng dung lượng được giới hạn; vượt giới hạn thì xóa các mục lâu không dùng nhất (LRU).
+    """
+    def __init__(self, project_root, max_bytes=OUTPUT_CACHE_MAX_BYTES):
+        self.logger = LoggerProvider.get_logger('output_cache')
+        self.cache_dir = get_cache_dir(project_root, OUTPUT_CACHE_DIR)
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def make_key(self, input_file, args, output_ext):
+        """Khóa cache cho một output; args là danh sách tham số quyết định nội dung output."""
+        return file_identity_key(input_file, json.dumps(list(args)), get_ffmpeg_version(), output_ext.lower())
+
+    def _entry_path(self, key, entry):
+        return os.path.join(self.cache_dir, key + entry["ext"])
+
+    def _is_intact(self, path, entry):
+        # Output được trả ra bằng hardlink dùng chung dữ liệu với mục cache; nếu người dùng
+        # sửa file đó tại chỗ (ví dụ ghi tag) thì mục cache không còn đúng và phải bỏ.
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+    def fetch(self, key, output_file):
+        """Đặt output đã cache vào output_file. Trả về True nếu trúng cache."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return False
+            path = self._entry_path(key, entry)
+            if not self._is_intact(path, entry):
+                self._remove_locked(key)
+                self._save_index()
+                return False
+            entry["last_used"] = time.time()
+            self._save_index()
+
+        # Đặt vào tên tạm rồi đổi tên, để output_file không bao giờ ở trạng thái dở dang
+        tmp_output = output_file + ".cache_tmp"
+        try:
+            _link_or_copy(path, tmp_output)
+            os.replace(tmp_output, output_file)
+            return True
+        except OSError as e:
+            self.logger.warning(f"Không thể lấy output từ cache: {e}")
+            if os.path.exists(tmp_output):
+                os.remove(tmp_output)
+            return False
+
+    def store(self, key, output_file):
+        """Lưu output vừa tạo vào cache (lỗi khi lưu chỉ được ghi log, không ảnh hưởng tác vụ)."""
+        ext = os.path.splitext(output_file)[1]
+        path = os.path.join(self.cache_dir, key + ext)
+        try:
+            tmp_path = path + ".tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            _link_or_copy(output_file, tmp_path)
+            os.replace(tmp_path, path)
+            stat = os.stat(path)
+        except OSError as e:
+            self.logger.warning(f"Không thể lưu output vào cache: {e}")
+            return
+
+        with self._lock:
+            self._index[key] = {"ext": ext, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "last_used": time.time()}
+            self._evict_locked()
+            try:
+                self._save_index()
+            except OSError as e:
+                self.logger.warning(f"Không thể ghi chỉ mục cache output: {e}")
+
+    def _remove_locked(self, key):
+        entry = self._index.pop(key, None)
+        if entry is None:
+            return
+        try:
+            os.remove(self._entry_path(key, entry))
+        except OSError:
+            pass
+
+    def _evict_locked(self):
+        total = sum(entry["size"] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._remove_locked(key)
+            self.logger.info(f"Đã xóa mục cache output ít dùng: {key}")
+
+
+def _link_or_copy(src, dst):
+    """Tạo hardlink (không tốn dung lượng, tức thì); khác ổ đĩa hoặc không hỗ trợ thì sao chép."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+def get_output_cache(project_root):
+    """Trả về OutputCache dùng chung cho mọi tab (một chỉ mục duy nhất cho mỗi thư mục cache)."""
+    with _instances_lock:
+        key = os.path.normcase(os.path.abspath(project_root))
+        if key not in _instances:
+            _instances[key] = OutputCache(project_root)
+        return _instances[key]
@@ -0,0 +1,112 @@
+# Utils/parallel_encode.py
+
+import os
+import re
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from .ffmpeg_utils import iter_ffmpeg_stderr
+
+PROGRESS_TIME_RE = re.compile(r"time=(\d+):(\d+):([\d.]+)")
+# Không chia đoạn với video ngắn hơn ngưỡng này (chi phí khởi động không đáng)
+MIN_CHUNK_SECONDS = 30
+
+def default_worker_count(threads_per_job=2):
+    """Số tiến trình FFmpeg chạy song song, dựa trên số nhân CPU hiện có."""
+    return max(1, (os.cpu_count() or 2) // threads_per_job)
+
+def plan_keyframe_chunks(duration, chunk_count, keyframes=None):
+    """
+    Chia [0, duration] thành tối đa chunk_count đoạn gần bằng nhau.
+    Nếu có danh sách keyframe (đã sắp xếp), mỗi điểm chia được căn về keyframe
+    gần nhất phía trước để FFmpeg không phải giải mã thừa ở đầu mỗi đoạn.
+    """
+    chunk_count = max(1, min(chunk_count, int(duration // MIN_CHUNK_SECONDS) or 1))
+    boundaries = [0.0]
+    for i in range(1, chunk_count):
+        target = duration * i / chunk_count
+        if keyframes:
+            candidates = [k for k in keyframes if boundaries[-1] < k <= target]
+            if candidates:
+                target = candidates[-1]
+            else:
+                continue
+        boundaries.append(target)
+    boundaries.append(duration)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end - start > 0.01]
+
+def allocate_chunk_counts(durations, total_chunks):
+    """
+    Chia total_chunks đoạn cho nhiều file theo tỷ lệ thời lượng (mỗi file ít nhất một đoạn),
+    để một lô gồm vài file dài vẫn dùng hết các tiến trình song song.
+    """
+    total = sum(durations)
+    if total <= 0:
+        return [1] * len(durations)
+    return [max(1, round(total_chunks * duration / total)) for duration in durations]
+
+
+class EncodeJob:
+    """Một lệnh FFmpeg độc lập: args đã bao gồm các input, output ghi ở cuối."""
+    def __init__(self, args, output_file, duration):
+        self.args = args
+        self.output_file = output_file
+        self.duration = duration
+
+
+def run_parallel_encodes(jobs, max_workers=None, on_progress=None, on_start=None, on_job_done=None, slots=None):
+    """
+    Chạy các EncodeJob trên nhiều tiến trình FFmpeg song song (mỗi luồng điều khiển một tiến trình).
+    on_progress(fraction) nhận tiến độ tổng hợp (0..1) của tất cả các job theo thời lượng.
+    Nếu có on_job_done(job, error), hàm được gọi khi mỗi job kết thúc (error là None nếu thành công)
+    và lỗi của từng job không làm dừng cả lô; nếu không, ném lại lỗi đầu tiên nếu có job thất bại.
+    slots là semaphore tùy chọn: mỗi job giữ một slot trong lúc FFmpeg chạy, để nhiều lô chạy cùng lúc
+    dùng chung một giới hạn số tiến trình.
+    """
+    if not jobs:
+        return
+    max_workers = max_workers or default_worker_count()
+    total_duration = sum(job.duration for job in jobs) or 1
+    done_seconds = [0.0] * len(jobs)
+    progress_lock = threading.Lock()
+
+    def run_job(index, job):
+        if on_job_done:
+            try:
+                encode_job(index, job)
+            except Exception as e:
+                on_job_done(job, e)
+            else:
+                on_job_done(job, None)
+        else:
+            encode_job(index, job)
+
+    def encode_job(index, job):
+        with slots or nullcontext():
+            for line in iter_ffmpeg_stderr(job.args + ["-y", job.output_file], on_start=on_start):
+                match = PROGRESS_TIME_RE.search(line)
+                if match and on_progress:
+                    hours, minutes, seconds = match.groups()
+                    with progress_lock:
+                        done_seconds[index] = min(int(hours) * 3600 + int(minutes) * 60 + float(seconds), job.duration)
+                        fraction = sum(done_seconds) / total_duration
+                    on_progress(fraction)
+        with progress_lock:
+            done_seconds[index] = job.duration
+            fraction = sum(done_seconds) / total_duration
+        if on_progress:
+            on_progress(fraction)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_job, i, job) for i, job in enumerate(jobs)]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        raise errors[0]
+
+def write_concat_list(file_list, list_file_path):
+    """Ghi file danh sách cho concat demuxer của FFmpeg."""
+    with open(list_file_path, 'w', encoding='utf-8') as f:
+        for file_path in file_list:
+            escaped_path = file_path.replace("'", "'\\''")
+            f.write(f"file '{escaped_path}'\n")
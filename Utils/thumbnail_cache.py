@@ -0,0 +1,100 @@
+# Utils/thumbnail_cache.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from PIL import Image
+
+from .logger_setup import LoggerProvider
+from .cache_utils import get_cache_dir
+
+THUMBNAIL_CACHE_DIR = "thumbnails"
+MEMORY_MAX_ITEMS = 256
+DISK_MAX_FILES = 5000
+
+class ThumbnailCache:
+    """
+    Cache ảnh thu nhỏ theo hash nội dung ảnh gốc (ví dụ dữ liệu APIC), gồm hai tầng:
+    - bộ nhớ: LRU giữ tối đa MEMORY_MAX_ITEMS ảnh PIL đã thu nhỏ;
+    - ổ đĩa: file PNG nhỏ trong 'Data/thumbnails', dùng lại giữa các lần mở ứng dụng.
+    Ảnh JPEG được giải mã ở chế độ draft (thu nhỏ ngay khi giải mã DCT), nhanh hơn nhiều so với
+    giải mã toàn bộ ảnh rồi mới thu nhỏ. Mọi hàm đều an toàn khi gọi từ luồng nền.
+    """
+    def __init__(self, project_root, size=(150, 150), memory_items=MEMORY_MAX_ITEMS, disk_files=DISK_MAX_FILES):
+        self.logger = LoggerProvider.get_logger('thumbnail_cache')
+        self.cache_dir = get_cache_dir(project_root, THUMBNAIL_CACHE_DIR)
+        self.size = size
+        self.memory_items = memory_items
+        self.disk_files = disk_files
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}_{self.size[0]}x{self.size[1]}.png")
+
+    def get(self, data):
+        """Trả về ảnh PIL đã thu nhỏ của dữ liệu ảnh `data` (bytes)."""
+        key = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                return image
+
+        image = self._load_from_disk(key)
+        if image is None:
+            image = self._make_thumbnail(data)
+            self._save_to_disk(key, image)
+
+        with self._lock:
+            self._memory[key] = image
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+        return image
+
+    def _make_thumbnail(self, data):
+        image = Image.open(BytesIO(data))
+        # Với JPEG, draft() chọn tỉ lệ giải mã 1/2, 1/4 hoặc 1/8 gần nhất với kích thước cần
+        image.draft('RGB', self.size)
+        image.thumbnail(self.size)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        return image
+
+    def _load_from_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as image:
+                image.load()
+                os.utime(path)
+                return image.copy()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            self.logger.warning(f"Ảnh thu nhỏ trong cache bị hỏng, tạo lại: {e}")
+            return None
+
+    def _save_to_disk(self, key, image):
+        path = self._disk_path(key)
+        tmp_path = path + ".tmp"
+        try:
+            image.save(tmp_path, format='PNG')
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError as e:
+            self.logger.warning(f"Không thể lưu ảnh thu nhỏ vào cache: {e}")
+
+    def _evict_disk(self):
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.png')]
+        if len(entries) <= self.disk_files:
+            return
+        # Xóa các ảnh lâu không được dùng nhất (thời gian sửa đổi được cập nhật mỗi lần đọc)
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.disk_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
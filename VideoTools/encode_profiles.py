@@ -0,0 +1,151 @@
+# VideoTools/encode_profiles.py
+
+import os
+import json
+import threading
+
+from Utils.logger_setup import LoggerProvider
+from Utils.cache_utils import get_cache_dir
+from Utils.ffmpeg_utils import probe_media_streams
+
+PROFILE_CACHE_DIR = "encode_profiles"
+CALIBRATION_FILE = "calibration.json"
+AUTO_PROFILE = "auto"
+DEFAULT_PROFILE = "medium"
+# Tốc độ tham chiếu của libx264 preset medium: số điểm ảnh mã hóa được mỗi giây trên một luồng CPU.
+# Chỉ là giá trị khởi đầu; hệ số hiệu chỉnh được học lại từ các lần mã hóa thực tế.
+MEDIUM_PIXELS_PER_THREAD_SECOND = 1920 * 1080 * 6
+# Tỉ trọng của lần đo mới khi cập nhật hệ số hiệu chỉnh (trung bình trượt hàm mũ)
+CALIBRATION_WEIGHT = 0.3
+
+class EncodeProfile:
+    """
+    Một mức tốc độ của libx264. Preset nhanh nén kém hơn nên CRF được hạ tương ứng
+    để chất lượng hình ảnh tương đương preset medium CRF 23.
+    relative_speed là tốc độ so với preset medium.
+    """
+    def __init__(self, key, name, preset, crf, relative_speed, tune=None):
+        self.key = key
+        self.name = name
+        self.preset = preset
+        self.crf = crf
+        self.relative_speed = relative_speed
+        self.tune = tune
+
+    def video_args(self, threads=None):
+        args = ["-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf), "-pix_fmt", "yuv420p"]
+        if self.tune:
+            args.extend(["-tune", self.tune])
+        if threads:
+            args.extend(["-threads", str(threads)])
+        return args
+
+# Sắp xếp từ chậm (nén tốt nhất) đến nhanh nhất
+PROFILES = [
+    EncodeProfile("slow", "Chậm - nén tốt nhất (slow, CRF 23)", "slow", 23, 0.5),
+    EncodeProfile("medium", "Cân bằng (medium, CRF 23)", "medium", 23, 1.0),
+    EncodeProfile("fast", "Nhanh (fast, CRF 22)", "fast", 22, 1.4),
+    EncodeProfile("faster", "Nhanh hơn (faster, CRF 22)", "faster", 22, 2.0),
+    EncodeProfile("veryfast", "Rất nhanh (veryfast, CRF 21)", "veryfast", 21, 3.5),
+    EncodeProfile("superfast", "Siêu nhanh (superfast, CRF 20)", "superfast", 20, 5.5),
+    EncodeProfile("ultrafast", "Nhanh nhất (ultrafast, CRF 19)", "ultrafast", 19, 8.0),
+]
+PROFILES_BY_KEY = {profile.key: profile for profile in PROFILES}
+
+
+def _parse_fps(rate):
+    try:
+        num, den = rate.split("/")
+        return float(num) / float(den) if float(den) else None
+    except (AttributeError, ValueError):
+        return None
+
+def probe_video_geometry(file_path):
+    """(width, height, fps) của luồng video đầu tiên, hoặc None nếu không đọc được."""
+    info = probe_media_streams(file_path)
+    if not info:
+        return None
+    for stream in info["streams"]:
+        if stream.get("codec_type") == "video" and stream.get("width") and stream.get("height"):
+            fps = _parse_fps(stream.get("avg_frame_rate")) or _parse_fps(stream.get("r_frame_rate")) or 30.0
+            return int(stream["width"]), int(stream["height"]), fps
+    return None
+
+def output_geometry(geometry, params):
+    """Kích thước khung hình sau các bộ lọc biến đổi (xoay 90° đổi chiều, thu phóng cắt nhỏ khung)."""
+    width, height, fps = geometry
+    if params.get("rotate_enabled") and params.get("rotate_option", "").startswith("Xoay 90"):
+        width, height = height, width
+    if params.get("scale_enabled"):
+        factor = params["scale_factor"]
+        width, height = int(width / factor), int(height / factor)
+    return width, height, fps
+
+
+class EncodeEstimator:
+    """
+    Ước tính thời gian mã hóa từ thời lượng, độ phân giải, fps và số luồng CPU.
+    Sau mỗi lần mã hóa, tỉ lệ thời gian thực tế/ước tính của preset đó được lưu vào
+    'Data/encode_profiles/calibration.json' để các lần ước tính sau sát với máy đang chạy.
+    """
+    def __init__(self, project_root):
+        self.logger = LoggerProvider.get_logger('video_tools')
+        self.path = os.path.join(get_cache_dir(project_root, PROFILE_CACHE_DIR), CALIBRATION_FILE)
+        self._lock = threading.Lock()
+        self._calibration = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._calibration, f)
+        os.replace(tmp_path, self.path)
+
+    def estimate(self, profile, duration, geometry, threads):
+        """Số giây ước tính để mã hóa `duration` giây video với kích thước `geometry` (width, height, fps)."""
+        width, height, fps = geometry
+        pixels = duration * fps * width * height
+        speed = MEDIUM_PIXELS_PER_THREAD_SECOND * profile.relative_speed * max(1, threads)
+        with self._lock:
+            factor = self._calibration.get(profile.key, 1.0)
+        return pixels / speed * factor
+
+    def record(self, profile, estimated_seconds, actual_seconds):
+        if estimated_seconds <= 0 or actual_seconds <= 0:
+            return
+        with self._lock:
+            old = self._calibration.get(profile.key, 1.0)
+            ratio = old * actual_seconds / estimated_seconds
+            self._calibration[profile.key] = old * (1 - CALIBRATION_WEIGHT) + ratio * CALIBRATION_WEIGHT
+            try:
+                self._save()
+            except OSError as e:
+                self.logger.warning(f"Không thể lưu hệ số ước tính thời gian mã hóa: {e}")
+
+    def estimate_many(self, profile, items, threads):
+        """Tổng thời gian ước tính cho nhiều file; items là danh sách (duration, geometry)."""
+        return sum(self.estimate(profile, duration, geometry, threads) for duration, geometry in items)
+
+    def choose_profile(self, items, threads, budget_seconds):
+        """
+        Chọn preset chậm nhất (nén tốt nhất) mà vẫn xử lý xong mọi file trong items trong budget_seconds.
+        Không có giới hạn thì dùng preset mặc định; không preset nào kịp thì dùng preset nhanh nhất.
+        """
+        if not budget_seconds:
+            return PROFILES_BY_KEY[DEFAULT_PROFILE]
+        for profile in PROFILES:
+            if self.estimate_many(profile, items, threads) <= budget_seconds:
+                return profile
+        return PROFILES[-1]
+
+
+def format_seconds(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} giây"
+    return f"{seconds / 60:.1f} phút"
@@ -0,0 +1,32 @@
+# VideoTools/logo_cache.py
+
+import os
+import threading
+from PIL import Image
+
+from Utils.cache_utils import get_cache_dir, file_identity_key
+
+LOGO_CACHE_DIR = "logo_cache"
+
+_lock = threading.Lock()
+
+def get_scaled_logo(project_root, logo_path, frame_width, width_percent):
+    """
+    Trả về file PNG của logo đã thu nhỏ về width_percent% chiều rộng khung hình frame_width.
+    Mỗi cặp (logo, độ rộng đích) chỉ được tạo một lần và lưu trong 'Data/logo_cache', nên FFmpeg
+    không phải chạy bộ lọc scale cho logo ở mọi file/mọi lần xử lý.
+    """
+    target_width = max(1, int(frame_width * width_percent / 100))
+    key = file_identity_key(logo_path, target_width)
+    path = os.path.join(get_cache_dir(project_root, LOGO_CACHE_DIR), f"{key}.png")
+    # Nhiều file cùng độ phân giải trong một lô dùng chung một file logo
+    with _lock:
+        if not os.path.exists(path):
+            with Image.open(logo_path) as image:
+                image = image.convert("RGBA")
+                target_height = max(1, round(image.height * target_width / image.width))
+                scaled = image.resize((target_width, target_height), Image.LANCZOS)
+            tmp_path = path + ".tmp"
+            scaled.save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,61 @@
+# VideoTools/preview_engine.py
+
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Khung hình xem trước được thu nhỏ về tối đa chiều rộng này sau khi áp dụng filter graph
+PREVIEW_WIDTH = 480
+PREVIEW_SAMPLES = 4
+PREVIEW_JPEG_QUALITY = 4  # -q:v của mjpeg: 2 (tốt nhất) .. 31
+
+def sample_times(duration, count=PREVIEW_SAMPLES):
+    """Các thời điểm lấy mẫu rải đều trên video (giữa mỗi đoạn, tránh khung đen ở đầu/cuối)."""
+    if not duration:
+        return [0.0]
+    return [duration * (i + 0.5) / count for i in range(count)]
+
+def build_preview_args(video_path, graph, at_seconds, width=PREVIEW_WIDTH):
+    """
+    Lệnh FFmpeg render đúng filter graph của tác vụ tại một thời điểm, ra một khung JPEG qua stdout.
+    Seek trước -i (nhanh, theo keyframe) và chỉ giải mã đúng một khung hình.
+    """
+    args = ["-v", "error", "-nostdin", "-ss", f"{at_seconds:.3f}", "-i", video_path]
+    for path in graph["extra_inputs"]:
+        args.extend(["-i", path])
+    # Thu nhỏ sau cùng để vị trí/kích thước logo giống hệt bản render đầy đủ
+    scale = f"scale='min({width},iw)':-2"
+    if graph["video_filters"]:
+        filters = graph["video_filters"] + [f"{graph['video_label']}{scale}[preview]"]
+    else:
+        filters = [f"[0:v:0]{scale}[preview]"]
+    args.extend([
+        "-filter_complex", ";".join(filters), "-map", "[preview]", "-frames:v", "1", "-an",
+        "-f", "image2pipe", "-c:v", "mjpeg", "-q:v", str(PREVIEW_JPEG_QUALITY), "pipe:1",
+    ])
+    return args
+
+def render_frame(args, on_start=None):
+    """Chạy FFmpeg và trả về dữ liệu JPEG đọc từ pipe (không ghi file tạm)."""
+    ffmpeg_path = os.environ.get("FFMPEG_PATH")
+    if not ffmpeg_path:
+        raise FileNotFoundError("Đường dẫn FFmpeg chưa được thiết lập.")
+    process = subprocess.Popen(
+        [ffmpeg_path] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        creationflags=subprocess.CREATE_NO_WINDOW
+    )
+    if on_start:
+        on_start(process.pid)
+    data, stderr = process.communicate()
+    if process.returncode != 0 or not data:
+        error = stderr.decode('utf-8', errors='ignore').strip() or "Không nhận được khung hình"
+        raise Exception(f"Lỗi FFmpeg khi tạo xem trước: {error[-500:]}")
+    return data
+
+def render_preview_frames(video_path, graph, times, width=PREVIEW_WIDTH, on_start=None):
+    """Render song song các khung xem trước, trả về danh sách (thời điểm, bytes JPEG) theo thứ tự times."""
+    with ThreadPoolExecutor(max_workers=max(1, len(times))) as executor:
+        frames = executor.map(
+            lambda at: render_frame(build_preview_args(video_path, graph, at, width), on_start=on_start), times
+        )
+        return list(zip(times, frames))
@@ -1,11 +1,42 @@
 # VideoTools/video_tools_controller.py
 
 import os
+import shutil
+import time
 import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from Utils.logger_setup import LoggerProvider
-from Utils.ffmpeg_utils import run_ffmpeg, stop_ffmpeg_processes
+from Utils.ffmpeg_utils import run_ffmpeg, stop_ffmpeg_processes, get_media_duration, has_audio_stream, get_audio_codec
+from Utils.media_index import get_media_index
+from Utils.parallel_encode import EncodeJob, run_parallel_encodes, plan_keyframe_chunks, default_worker_count, write_concat_list
+from .logo_cache import get_scaled_logo
+from .preview_engine import render_preview_frames, sample_times
+from .encode_profiles import (
+    EncodeEstimator, PROFILES_BY_KEY, AUTO_PROFILE, DEFAULT_PROFILE,
+    probe_video_geometry, output_geometry, format_seconds,
+)
+
+# Codec audio có thể sao chép nguyên vào từng loại container (không cần mã hóa lại)
+CONTAINER_AUDIO_CODECS = {
+    '.mp4': {'aac', 'mp3', 'ac3', 'eac3', 'alac'},
+    '.m4v': {'aac', 'mp3', 'ac3', 'eac3', 'alac'},
+    '.mov': {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'pcm_s16le', 'pcm_s24le'},
+    '.mkv': {'aac', 'mp3', 'ac3', 'eac3', 'flac', 'opus', 'vorbis', 'alac', 'pcm_s16le', 'pcm_s24le', 'mp2'},
+    '.webm': {'opus', 'vorbis'},
+    '.flv': {'aac', 'mp3'},
+    '.ts': {'aac', 'mp3', 'ac3', 'eac3', 'mp2'},
+    '.avi': {'mp3', 'ac3', 'mp2', 'pcm_s16le'},
+}
+# Encoder dùng khi audio mới phải mã hóa lại, theo container output (các container còn lại dùng AAC)
+CONTAINER_AUDIO_ENCODERS = {
+    '.webm': 'libopus',
+    '.avi': 'libmp3lame',
+}
+DEFAULT_AUDIO_ENCODER = 'aac'
+# Đuôi file audio trung gian khi mã hóa audio riêng (mã hóa song song theo đoạn)
+AUDIO_ENCODER_EXTENSIONS = {'aac': '.m4a', 'libopus': '.opus', 'libmp3lame': '.mp3'}
 
 class VideoToolsController:
     def __init__(self, gui, project_root, thread_pool):
@@ -17,10 +48,16 @@ class VideoToolsController:
         self.is_processing = False
         self.task_lock = threading.Lock()
         self.active_tasks = 0
+        self.active_ffmpeg_pids = []
+        self.audio_codecs = {}
+        self.is_previewing = False
+        # Ước tính thời gian mã hóa để chọn preset theo giới hạn thời gian
+        self.estimator = EncodeEstimator(project_root)
 
     def on_closing(self):
-        # This method is good practice if you need to clean up ffmpeg on exit
-        pass
+        if self.active_ffmpeg_pids:
+            self.logger.warning(f"Đang dừng {len(self.active_ffmpeg_pids)} tiến trình FFmpeg...")
+            stop_ffmpeg_processes(self.active_ffmpeg_pids)
 
     def task_finished(self, operation_name):
         with self.task_lock:
@@ -48,94 +85,394 @@ class VideoToolsController:
         self.gui.set_ui_state("processing")
         with self.task_lock: self.active_tasks = 1
 
+        video_paths = params["video_paths"]
+        if len(video_paths) > 1:
+            session_folder = self.create_session_folder("Processed_Batch")
+            self.thread_pool.submit(self.run_batch_task, video_paths, session_folder, params)
+            return
+
+        params["video_path"] = video_paths[0]
         session_folder = self.create_session_folder("Processed_Video")
         output_file = self.get_output_path(params["video_path"], session_folder, "_processed")
 
         self.thread_pool.submit(self.run_combined_task, output_file, params)
 
+    def build_filter_graph(self, params):
+        """
+        Dựng filter graph video từ các tùy chọn.
+        Input 0 luôn là video chính; logo (nếu có) là input 1.
+        Trả về dict gồm: extra_inputs, video_filters, video_label, log_messages.
+        """
+        extra_inputs = []
+        video_filters = []
+        log_messages = []
+        video_stream_label = "[0:v]"
+
+        # --- Xử lý Transform (Xoay/Lật & Thu phóng) ---
+        transform_filters = []
+        if params.get("rotate_enabled"):
+            option = params["rotate_option"]
+            log_messages.append(f"xoay/lật ({option})")
+            filter_map = {
+                "Xoay 90° theo chiều kim đồng hồ": "transpose=1",
+                "Xoay 90° ngược chiều kim đồng hồ": "transpose=2",
+                "Lật video theo chiều ngang": "hflip",
+                "Lật video theo chiều dọc": "vflip"
+            }
+            transform_filters.append(filter_map[option])
+
+        if params.get("scale_enabled"):
+            factor = params["scale_factor"]
+            log_messages.append(f"thu phóng ({factor}x)")
+            transform_filters.append(f"crop=iw/{factor}:ih/{factor}")
+        
+        if transform_filters:
+            # Nối các filter transform và gán nhãn tạm thời
+            video_filters.append(f"{video_stream_label}{','.join(transform_filters)}[v_transformed]")
+            video_stream_label = "[v_transformed]" # Cập nhật nhãn cho bước tiếp theo
+
+        # --- Xử lý Watermark (Chèn Logo) ---
+        if params.get("watermark_enabled"):
+            pos = params["watermark_pos"]
+            pad = params["watermark_pad"]
+            log_messages.append("chèn logo")
+
+            # Input 1: Logo
+            extra_inputs.append(params["logo_path"])
+            pos_map = {
+                "Trên-Trái": f"overlay={pad}:{pad}", "Trên-Phải": f"overlay=W-w-{pad}:{pad}",
+                "Dưới-Trái": f"overlay={pad}:H-h-{pad}", "Dưới-Phải": f"overlay=W-w-{pad}:H-h-{pad}"
+            }
+            # Nối filter watermark và gán nhãn tạm thời
+            video_filters.append(f"{video_stream_label}[1:v]{pos_map[pos]}[v_watermarked]")
+            video_stream_label = "[v_watermarked]" # Cập nhật nhãn
+
+        if params.get("audio_enabled"):
+            log_messages.append("ghép âm thanh mới")
+
+        return {
+            "extra_inputs": extra_inputs,
+            "video_filters": video_filters,
+            # Không có filter thì map thẳng luồng video gốc (không dùng ngoặc vuông)
+            "video_label": video_stream_label if video_filters else "0:v:0",
+            "log_messages": log_messages,
+        }
+
+    def with_scaled_logo(self, graph, params, frame_width):
+        """Thay logo gốc bằng bản PNG đã thu nhỏ theo chiều rộng khung hình (nếu có chọn tỉ lệ logo)."""
+        if not params.get("watermark_enabled") or not params.get("logo_scale"):
+            return graph
+        logo_path = get_scaled_logo(self.project_root, params["logo_path"], frame_width, params["logo_scale"])
+        return dict(graph, extra_inputs=[logo_path])
+
+    def select_profile(self, params, items, threads):
+        """items là danh sách (duration, geometry) của các file. Trả về (hồ sơ mã hóa, số giây ước tính hoặc None)."""
+        key = params.get("encode_profile", DEFAULT_PROFILE)
+        if not items:
+            return PROFILES_BY_KEY.get(key, PROFILES_BY_KEY[DEFAULT_PROFILE]), None
+        if key == AUTO_PROFILE:
+            profile = self.estimator.choose_profile(items, threads, params.get("time_budget"))
+        else:
+            profile = PROFILES_BY_KEY[key]
+        return profile, self.estimator.estimate_many(profile, items, threads)
+
+    def probe_output_geometry(self, video_path, params):
+        """(thời lượng, kích thước khung hình output) của một file, hoặc (thời lượng, None) nếu không đọc được."""
+        geometry = probe_video_geometry(video_path)
+        return get_media_duration(video_path), output_geometry(geometry, params) if geometry else None
+
+    def _track_pid(self, pid, started=None):
+        """Ghi PID ngay khi FFmpeg khởi động để nút dừng/đóng ứng dụng có thể kết thúc tiến trình."""
+        if started is not None:
+            started.append(pid)
+        self.active_ffmpeg_pids.append(pid)
+
+    def _release_pids(self, started):
+        for pid in started:
+            if pid in self.active_ffmpeg_pids:
+                self.active_ffmpeg_pids.remove(pid)
+
     def run_combined_task(self, output_file, params):
         try:
-            input_files = []
-            video_filters = []
-            map_args = []
-            log_messages = []
-
-            # --- Xây dựng danh sách Input và Map cơ bản ---
-            # Input 0: Video chính
-            input_files.extend(["-i", params["video_path"]])
-            video_stream_label = "[0:v]"
-            audio_stream_label = "[0:a]"
-
-            # --- Xử lý Transform (Xoay/Lật & Thu phóng) ---
-            transform_filters = []
-            if params.get("rotate_enabled"):
-                option = params["rotate_option"]
-                log_messages.append(f"xoay/lật ({option})")
-                filter_map = {
-                    "Xoay 90° theo chiều kim đồng hồ": "transpose=1",
-                    "Xoay 90° ngược chiều kim đồng hồ": "transpose=2",
-                    "Lật video theo chiều ngang": "hflip",
-                    "Lật video theo chiều dọc": "vflip"
-                }
-                transform_filters.append(filter_map[option])
-
-            if params.get("scale_enabled"):
-                factor = params["scale_factor"]
-                log_messages.append(f"thu phóng ({factor}x)")
-                transform_filters.append(f"crop=iw/{factor}:ih/{factor}")
-            
-            if transform_filters:
-                # Nối các filter transform và gán nhãn tạm thời
-                video_filters.append(f"{video_stream_label}{','.join(transform_filters)}[v_transformed]")
-                video_stream_label = "[v_transformed]" # Cập nhật nhãn cho bước tiếp theo
-
-            # --- Xử lý Watermark (Chèn Logo) ---
-            if params.get("watermark_enabled"):
-                logo_path = params["logo_path"]
-                pos = params["watermark_pos"]
-                pad = params["watermark_pad"]
-                log_messages.append("chèn logo")
-
-                # Input 1: Logo
-                input_files.extend(["-i", logo_path])
-                pos_map = {
-                    "Trên-Trái": f"overlay={pad}:{pad}", "Trên-Phải": f"overlay=W-w-{pad}:{pad}",
-                    "Dưới-Trái": f"overlay={pad}:H-h-{pad}", "Dưới-Phải": f"overlay=W-w-{pad}:H-h-{pad}"
-                }
-                # Nối filter watermark và gán nhãn tạm thời
-                video_filters.append(f"{video_stream_label}[1:v]{pos_map[pos]}[v_watermarked]")
-                video_stream_label = "[v_watermarked]" # Cập nhật nhãn
-
-            # --- Xử lý Audio (Ghép âm thanh mới) ---
-            if params.get("audio_enabled"):
-                audio_path = params["audio_path"]
-                log_messages.append("ghép âm thanh mới")
-                
-                # Input tiếp theo: Audio
-                input_files.extend(["-i", audio_path])
-                audio_input_index = len(input_files) // 2 - 1 # Tìm chỉ số của input audio
-                audio_stream_label = f"[{audio_input_index}:a]"
-
-            # --- Finalize và chạy FFmpeg ---
-            final_args = list(input_files)
-            if video_filters:
-                final_args.extend(["-filter_complex", ";".join(video_filters)])
-            
-            # Map video và audio cuối cùng
-            map_args.extend(["-map", video_stream_label, "-map", audio_stream_label])
-            final_args.extend(map_args)
-            
-            # Thêm codec và flag -shortest để đảm bảo video kết thúc cùng âm thanh
-            final_args.extend(["-c:v", "libx264", "-c:a", "aac", "-shortest"])
-
-            log_string = " và ".join(log_messages) if log_messages else "xử lý"
+            graph = self.build_filter_graph(params)
+            log_string = " và ".join(graph["log_messages"]) if graph["log_messages"] else "xử lý"
             self.gui.log_status(f"Bắt đầu {log_string}...")
+
+            duration, geometry = self.probe_output_geometry(params["video_path"], params)
+            copy_video = not graph["video_filters"]
+            chunks = []
+            if params.get("parallel_enabled") and duration and not copy_video:
+                media_index = get_media_index(params["video_path"], self.project_root)
+                keyframes = list(media_index.key_pts) if media_index and media_index.has_video else None
+                chunks = plan_keyframe_chunks(duration, default_worker_count(), keyframes)
+
+            if geometry:
+                graph = self.with_scaled_logo(graph, params, geometry[0])
+            if copy_video:
+                profile, estimated = None, None
+                self.gui.log_status("Không có bộ lọc video: sao chép nguyên luồng video (không mã hóa lại).")
+            else:
+                items = [(duration, geometry)] if duration and geometry else []
+                profile, estimated = self.select_profile(params, items, os.cpu_count() or 1)
+                message = f"Hồ sơ mã hóa: {profile.name}"
+                if estimated:
+                    message += f", ước tính ~{format_seconds(estimated)}"
+                self.gui.log_status(message)
+
+            start = time.time()
+            if len(chunks) > 1:
+                self.run_chunked_encode(output_file, params, graph, chunks, profile)
+            else:
+                self.run_single_encode(output_file, params, graph, profile)
+            elapsed = time.time() - start
+            # Ước tính tính cho một tiến trình FFmpeg; thời gian của các đoạn chạy song song không dùng để hiệu chỉnh
+            if estimated and len(chunks) <= 1:
+                self.estimator.record(profile, estimated, elapsed)
             
-            run_ffmpeg(None, output_file, final_args, use_input_path_as_first_arg=False)
-            
-            self.gui.log_status(f"Xử lý video thành công -> {os.path.basename(output_file)}", "success")
+            self.gui.log_status(f"Xử lý video thành công sau {format_seconds(elapsed)} -> {os.path.basename(output_file)}", "success")
         except Exception as e:
             self.logger.error(f"Lỗi khi xử lý video: {e}", exc_info=True)
             self.gui.log_status(f"LỖI: {e}", "error")
         finally:
-            self.task_finished("xử lý video")
\ No newline at end of file
+            self.task_finished("xử lý video")
+
+    def build_encode_args(self, video_path, params, graph, profile, threads=None):
+        """Tham số FFmpeg (không gồm output) để áp dụng filter graph lên toàn bộ một file."""
+        input_files = ["-i", video_path]
+        for path in graph["extra_inputs"]:
+            input_files.extend(["-i", path])
+
+        audio_stream = "0:a:0?"
+        if params.get("audio_enabled"):
+            input_files.extend(["-i", params["audio_path"]])
+            audio_input_index = len(input_files) // 2 - 1 # Tìm chỉ số của input audio
+            audio_stream = f"{audio_input_index}:a:0"
+
+        final_args = list(input_files)
+        if graph["video_filters"]:
+            final_args.extend(["-filter_complex", ";".join(graph["video_filters"])])
+        
+        # Map video và audio cuối cùng
+        final_args.extend(["-map", graph["video_label"], "-map", audio_stream])
+        
+        # Không có bộ lọc video thì sao chép nguyên luồng video (profile là None)
+        if graph["video_filters"]:
+            final_args.extend(profile.video_args(threads=threads))
+        else:
+            final_args.extend(["-c:v", "copy"])
+
+        final_args.extend(self.audio_codec_args(video_path, params))
+
+        # Flag -shortest để đảm bảo video kết thúc cùng âm thanh
+        final_args.append("-shortest")
+        return final_args
+
+    def audio_codec_args(self, video_path, params):
+        """
+        Audio gốc luôn hợp với container gốc; audio mới chỉ được sao chép nếu container hỗ trợ codec của nó,
+        nếu không thì mã hóa lại bằng encoder mà container chấp nhận (ví dụ Opus cho .webm).
+        """
+        container = os.path.splitext(video_path)[1].lower()
+        if not params.get("audio_enabled") or self.audio_fits_container(params["audio_path"], container):
+            return ["-c:a", "copy"]
+        return ["-c:a", CONTAINER_AUDIO_ENCODERS.get(container, DEFAULT_AUDIO_ENCODER)]
+
+    def audio_fits_container(self, audio_path, container):
+        key = (audio_path, os.path.getmtime(audio_path))
+        if key not in self.audio_codecs:
+            self.audio_codecs[key] = get_audio_codec(audio_path)
+        return self.audio_codecs[key] in CONTAINER_AUDIO_CODECS.get(container, set())
+
+    def run_single_encode(self, output_file, params, graph, profile):
+        """Mã hóa toàn bộ timeline bằng một tiến trình FFmpeg."""
+        started = []
+        try:
+            run_ffmpeg("", output_file, self.build_encode_args(params["video_path"], params, graph, profile),
+                       on_start=lambda pid: self._track_pid(pid, started))
+        finally:
+            self._release_pids(started)
+
+    # --- XEM TRƯỚC ---
+    def start_preview(self, params):
+        """Render vài khung hình mẫu với đúng filter graph để xem trước (không mã hóa cả video)."""
+        if self.is_previewing: return
+        self.is_previewing = True
+        self.thread_pool.submit(self.run_preview_task, params)
+
+    def run_preview_task(self, params):
+        started = []
+        try:
+            video_path = params["video_paths"][0]
+            graph = self.build_filter_graph(params)
+            duration, geometry = self.probe_output_geometry(video_path, params)
+            if geometry:
+                graph = self.with_scaled_logo(graph, params, geometry[0])
+            start = time.time()
+            frames = render_preview_frames(video_path, graph, sample_times(duration),
+                                           on_start=lambda pid: self._track_pid(pid, started))
+            self.gui.log_status(f"Đã tạo {len(frames)} khung hình xem trước trong {time.time() - start:.2f} giây.")
+            self.gui.root.after(0, self.gui.show_preview, video_path, frames)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi tạo xem trước: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI xem trước: {e}", "error")
+        finally:
+            self._release_pids(started)
+            self.is_previewing = False
+
+    # --- XỬ LÝ HÀNG LOẠT ---
+    def run_batch_task(self, video_paths, session_folder, params):
+        """
+        Áp dụng cùng một filter graph cho nhiều video: graph được dựng một lần, logo được thu nhỏ
+        một lần cho mỗi độ phân giải, các file chạy trên một số giới hạn tiến trình FFmpeg song song.
+        """
+        try:
+            graph = self.build_filter_graph(params)
+            log_string = " và ".join(graph["log_messages"]) if graph["log_messages"] else "xử lý"
+            self.gui.log_status(f"Bắt đầu {log_string} cho {len(video_paths)} video...")
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                probes = list(executor.map(lambda path: self.probe_output_geometry(path, params), video_paths))
+            entries = []
+            for path, (duration, geometry) in zip(video_paths, probes):
+                if not duration or not geometry:
+                    self.gui.log_status(f"Bỏ qua {os.path.basename(path)}: không đọc được luồng video.", "warning")
+                    continue
+                entries.append((path, duration, geometry))
+            if not entries:
+                return
+
+            cpu_count = os.cpu_count() or 1
+            workers = min(default_worker_count(), len(entries))
+            threads_per_job = max(1, cpu_count // workers)
+            if graph["video_filters"]:
+                profile, estimated = self.select_profile(params, [(d, g) for _, d, g in entries], cpu_count)
+                self.gui.log_status(
+                    f"Hồ sơ mã hóa: {profile.name}, {workers} tiến trình song song, ước tính ~{format_seconds(estimated)}"
+                )
+            else:
+                profile, estimated = None, None
+                self.gui.log_status(f"Sao chép nguyên luồng video (không mã hóa lại), {workers} tiến trình song song.")
+
+            jobs = []
+            sources = {}
+            # File dài chạy trước để các tiến trình kết thúc gần cùng lúc
+            for path, duration, geometry in sorted(entries, key=lambda entry: entry[1], reverse=True):
+                file_graph = self.with_scaled_logo(graph, params, geometry[0])
+                args = self.build_encode_args(path, params, file_graph, profile, threads=threads_per_job)
+                output_file = self.get_output_path(path, session_folder, "_processed")
+                if output_file in sources:
+                    # Hai file cùng tên ở các thư mục khác nhau
+                    base, ext = os.path.splitext(output_file)
+                    output_file = f"{base}_{len(jobs)}{ext}"
+                job = EncodeJob(args, output_file, duration)
+                jobs.append(job)
+                sources[job.output_file] = path
+
+            start = time.time()
+            progress_lock = threading.Lock()
+            stats = {"done": 0, "failed": 0, "seconds": 0.0}
+            # Mỗi job khởi động và kết thúc trên cùng một luồng điều khiển: PID được gỡ ngay khi job xong,
+            # để lô dài không giữ PID đã chết (có thể bị hệ điều hành cấp lại cho tiến trình khác)
+            job_pids = {}
+
+            def on_start(pid):
+                job_pids[threading.get_ident()] = pid
+                self._track_pid(pid)
+
+            def on_job_done(job, error):
+                pid = job_pids.pop(threading.get_ident(), None)
+                if pid is not None:
+                    self._release_pids([pid])
+                with progress_lock:
+                    stats["done"] += 1
+                    if error:
+                        stats["failed"] += 1
+                    else:
+                        stats["seconds"] += job.duration
+                    done, processed = stats["done"], stats["seconds"]
+                elapsed = max(time.time() - start, 0.001)
+                name = os.path.basename(sources[job.output_file])
+                if error:
+                    self.logger.error(f"Lỗi khi xử lý {name}: {error}")
+                    self.gui.log_status(f"[{done}/{len(jobs)}] LỖI {name}: {error}", "error")
+                else:
+                    self.gui.log_status(
+                        f"[{done}/{len(jobs)}] Xong {name} | tốc độ lô: {processed / elapsed:.1f}x thời gian thực, "
+                        f"{done / elapsed * 60:.1f} file/phút"
+                    )
+
+            try:
+                run_parallel_encodes(jobs, max_workers=workers, on_start=on_start, on_job_done=on_job_done)
+            finally:
+                self._release_pids(list(job_pids.values()))
+            elapsed = time.time() - start
+            if profile and not stats["failed"]:
+                self.estimator.record(profile, estimated, elapsed)
+            self.gui.log_status(
+                f"Hoàn tất {len(jobs) - stats['failed']}/{len(jobs)} video sau {format_seconds(elapsed)} "
+                f"({stats['seconds'] / max(elapsed, 0.001):.1f}x thời gian thực).",
+                "success" if not stats["failed"] else "warning"
+            )
+        except Exception as e:
+            self.logger.error(f"Lỗi khi xử lý video hàng loạt: {e}", exc_info=True)
+            self.gui.log_status(f"LỖI: {e}", "error")
+        finally:
+            self.task_finished("xử lý video hàng loạt")
+
+    def run_chunked_encode(self, output_file, params, graph, chunks, profile):
+        """
+        Chia timeline tại các keyframe thành nhiều đoạn, mã hóa video của các đoạn song song
+        trên nhiều tiến trình FFmpeg, rồi ghép bằng concat demuxer. Audio theo cùng quy tắc sao chép/mã hóa
+        như khi mã hóa một lần: sao chép thẳng khi ghép, hoặc mã hóa một lần cho cả timeline.
+        """
+        work_dir = os.path.join(os.path.dirname(output_file), "_chunks")
+        os.makedirs(work_dir, exist_ok=True)
+        workers = default_worker_count()
+        threads_per_job = max(1, (os.cpu_count() or 2) // workers)
+        self.gui.log_status(f"Mã hóa song song {len(chunks)} đoạn trên {workers} tiến trình FFmpeg...")
+
+        started = []
+        try:
+            jobs = []
+            for i, (start, end) in enumerate(chunks):
+                args = ["-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", params["video_path"]]
+                for path in graph["extra_inputs"]:
+                    args.extend(["-i", path])
+                if graph["video_filters"]:
+                    args.extend(["-filter_complex", ";".join(graph["video_filters"])])
+                args.extend(["-map", graph["video_label"], "-an"] + profile.video_args(threads=threads_per_job))
+                jobs.append(EncodeJob(args, os.path.join(work_dir, f"chunk_{i:04d}.mp4"), end - start))
+
+            # Audio không chia đoạn (tránh khoảng lặng tại ranh giới đoạn): sao chép thẳng từ nguồn khi ghép,
+            # hoặc mã hóa một lần cho cả timeline song song với các đoạn video
+            audio_source = params["audio_path"] if params.get("audio_enabled") else params["video_path"]
+            audio_jobs = []
+            audio_input = None
+            if has_audio_stream(audio_source):
+                audio_args = self.audio_codec_args(params["video_path"], params)
+                if audio_args == ["-c:a", "copy"]:
+                    audio_input = audio_source
+                else:
+                    audio_input = os.path.join(work_dir, "audio" + AUDIO_ENCODER_EXTENSIONS[audio_args[1]])
+                    audio_jobs.append(EncodeJob(["-i", audio_source, "-map", "0:a:0", "-vn"] + audio_args, audio_input, 0))
+
+            last_reported = [0]
+            def on_progress(fraction):
+                percent = int(fraction * 100) // 10 * 10
+                if percent > last_reported[0]:
+                    last_reported[0] = percent
+                    self.gui.log_status(f"Tiến độ mã hóa: {percent}%")
+
+            run_parallel_encodes(jobs + audio_jobs, max_workers=workers, on_progress=on_progress,
+                                 on_start=lambda pid: self._track_pid(pid, started))
+
+            list_file_path = os.path.join(work_dir, "chunks.txt")
+            write_concat_list([job.output_file for job in jobs], list_file_path)
+            final_args = ["-f", "concat", "-safe", "0", "-i", list_file_path]
+            if audio_input:
+                final_args.extend(["-i", audio_input, "-map", "0:v:0", "-map", "1:a:0", "-shortest"])
+            final_args.extend(["-c", "copy"])
+            run_ffmpeg("", output_file, final_args, on_start=lambda pid: self._track_pid(pid, started))
+        finally:
+            self._release_pids(started)
+            shutil.rmtree(work_dir, ignore_errors=True)
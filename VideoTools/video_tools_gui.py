@@ -3,10 +3,15 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
+from io import BytesIO
+from PIL import Image, ImageTk
 
 from .video_tools_controller import VideoToolsController
+from .encode_profiles import PROFILES, AUTO_PROFILE, DEFAULT_PROFILE
 from Utils.ui_utils import create_tab_title
 
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.avi', '.flv', '.webm', '.ts')
+
 class VideoToolsGUI:
     def __init__(self, root_frame, project_root, thread_pool):
         self.root = root_frame
@@ -27,10 +32,21 @@ class VideoToolsGUI:
         self.watermark_logo_var = tk.StringVar()
         self.watermark_pos_var = tk.StringVar(value="Dưới-Phải")
         self.watermark_pad_var = tk.StringVar(value="10")
+        self.watermark_scale_var = tk.StringVar(value="") # % chiều rộng video, để trống = giữ nguyên kích thước logo
 
         # Biến Audio
         self.audio_enabled_var = tk.BooleanVar(value=False)
         self.audio_path_var = tk.StringVar()
+
+        # Mã hóa song song theo đoạn trên nhiều nhân CPU
+        self.parallel_enabled_var = tk.BooleanVar(value=True)
+
+        # Hồ sơ mã hóa (preset libx264) và giới hạn thời gian cho chế độ tự động
+        self.profile_options = {"Tự động (theo giới hạn thời gian)": AUTO_PROFILE}
+        self.profile_options.update({profile.name: profile.key for profile in PROFILES})
+        default_name = next(name for name, key in self.profile_options.items() if key == DEFAULT_PROFILE)
+        self.encode_profile_var = tk.StringVar(value=default_name)
+        self.time_budget_var = tk.StringVar(value="")
         
         self.create_widgets()
 
@@ -42,9 +58,15 @@ class VideoToolsGUI:
         main_frame.columnconfigure(0, weight=1)
 
         # --- 1. Input Video chính ---
-        video_input_frame = self._create_file_input_frame(main_frame, "File Video:", self.video_path_var, "Chọn file video")
-        video_input_frame.pack(fill="x", pady=(5, 15))
+        # Chọn nhiều file hoặc cả thư mục để xử lý hàng loạt (các đường dẫn cách nhau bởi ';')
+        video_input_frame = ttk.Frame(main_frame)
+        ttk.Label(video_input_frame, text="File Video:", width=12).pack(side="left")
+        ttk.Entry(video_input_frame, textvariable=self.video_path_var).pack(side="left", expand=True, fill="x")
+        ttk.Button(video_input_frame, text="Duyệt...", command=self.browse_videos).pack(side="left", padx=(5, 0))
+        ttk.Button(video_input_frame, text="Thư mục...", command=self.browse_video_folder).pack(side="left", padx=(5, 0))
+        video_input_frame.pack(fill="x", pady=(5, 0))
         self.widgets_to_disable.extend(video_input_frame.winfo_children())
+        ttk.Label(main_frame, text="(chọn nhiều file hoặc một thư mục để áp dụng cùng thiết lập cho cả lô)", foreground="gray").pack(anchor="w", pady=(0, 10))
 
         # --- 2. Khung Biến đổi ---
         self.create_transform_frame(main_frame)
@@ -55,12 +77,21 @@ class VideoToolsGUI:
         # --- 4. Khung Ghép Âm thanh ---
         self.create_audio_frame(main_frame)
 
-        # --- 5. Nút Bắt đầu ---
-        self.process_btn = ttk.Button(main_frame, text="BẮT ĐẦU XỬ LÝ", style="Accent.TButton", command=self.start_processing_action)
-        self.process_btn.pack(pady=20, ipady=5)
+        # --- 5. Khung Mã hóa ---
+        self.create_encode_frame(main_frame)
+
+        # --- 6. Nút Bắt đầu ---
+        actions_frame = ttk.Frame(main_frame)
+        actions_frame.pack(pady=20)
+        self.preview_btn = ttk.Button(actions_frame, text="XEM TRƯỚC", command=self.start_preview_action)
+        self.preview_btn.pack(side="left", padx=5, ipady=5)
+        self.widgets_to_disable.append(self.preview_btn)
+        self.process_btn = ttk.Button(actions_frame, text="BẮT ĐẦU XỬ LÝ", style="Accent.TButton", command=self.start_processing_action)
+        self.process_btn.pack(side="left", padx=5, ipady=5)
         self.widgets_to_disable.append(self.process_btn)
+        self.preview_window = None
 
-        # --- 6. Khung Nhật ký ---
+        # --- 7. Khung Nhật ký ---
         status_frame = ttk.LabelFrame(main_frame, text="Nhật ký", padding=10)
         status_frame.pack(side="bottom", fill="both", expand=True, padx=0, pady=(10, 0))
         status_frame.rowconfigure(0, weight=1)
@@ -122,6 +153,10 @@ class VideoToolsGUI:
         self.wm_pad_entry = ttk.Entry(pos_frame, textvariable=self.watermark_pad_var, width=5)
         self.wm_pad_entry.pack(side="left", padx=5)
 
+        ttk.Label(pos_frame, text="Cỡ (% rộng):").pack(side="left")
+        self.wm_scale_entry = ttk.Entry(pos_frame, textvariable=self.watermark_scale_var, width=5)
+        self.wm_scale_entry.pack(side="left", padx=5)
+
     def create_audio_frame(self, parent):
         frame = ttk.LabelFrame(parent, text="3. Ghép Âm thanh", padding=10)
         frame.pack(fill="x", pady=5)
@@ -132,6 +167,24 @@ class VideoToolsGUI:
         self.audio_file_input = self._create_file_input_frame(frame, "File Audio:", self.audio_path_var, "Chọn file âm thanh", [("Audio Files", "*.mp3 *.wav *.aac")])
         self.audio_file_input.pack(side="left", fill="x", expand=True, padx=10)
 
+    def create_encode_frame(self, parent):
+        frame = ttk.LabelFrame(parent, text="4. Mã hóa", padding=10)
+        frame.pack(fill="x", pady=5)
+        frame.columnconfigure(1, weight=1)
+        ttk.Label(frame, text="Tốc độ:").grid(row=0, column=0, sticky="w", padx=5)
+        profile_combo = ttk.Combobox(frame, textvariable=self.encode_profile_var, values=list(self.profile_options), state="readonly")
+        profile_combo.grid(row=0, column=1, sticky="ew", padx=5)
+        profile_combo.bind("<<ComboboxSelected>>", lambda e: self.toggle_all_options())
+        self.widgets_to_disable.append(profile_combo)
+
+        ttk.Label(frame, text="Giới hạn (phút):").grid(row=0, column=2, sticky="w", padx=(10, 5))
+        self.time_budget_entry = ttk.Entry(frame, textvariable=self.time_budget_var, width=8)
+        self.time_budget_entry.grid(row=0, column=3, sticky="w", padx=5)
+
+        parallel_check = ttk.Checkbutton(frame, text="Mã hóa song song theo đoạn (nhanh hơn với video dài trên máy nhiều nhân)", variable=self.parallel_enabled_var)
+        parallel_check.grid(row=1, column=0, columnspan=4, sticky="w", padx=5, pady=(5, 0))
+        self.widgets_to_disable.append(parallel_check)
+
     def toggle_all_options(self):
         # Kích hoạt/Vô hiệu hóa các widget con dựa trên checkbox của chúng
         self.rotate_combo.config(state="readonly" if self.rotate_enabled_var.get() else "disabled")
@@ -140,29 +193,49 @@ class VideoToolsGUI:
         for w in self.wm_file_input.winfo_children(): w.config(state="normal" if self.watermark_enabled_var.get() else "disabled")
         self.wm_pos_combo.config(state="readonly" if self.watermark_enabled_var.get() else "disabled")
         self.wm_pad_entry.config(state="normal" if self.watermark_enabled_var.get() else "disabled")
+        self.wm_scale_entry.config(state="normal" if self.watermark_enabled_var.get() else "disabled")
 
         for w in self.audio_file_input.winfo_children(): w.config(state="normal" if self.audio_enabled_var.get() else "disabled")
+        is_auto = self.profile_options[self.encode_profile_var.get()] == AUTO_PROFILE
+        self.time_budget_entry.config(state="normal" if is_auto else "disabled")
 
     def browse_file(self, string_var, title, filetypes=None):
         path = filedialog.askopenfilename(title=title, filetypes=filetypes or [])
         if path:
             string_var.set(path)
 
-    def start_processing_action(self):
+    def browse_videos(self):
+        paths = filedialog.askopenfilenames(title="Chọn file video", filetypes=[("Video files", " ".join(f"*{ext}" for ext in VIDEO_EXTENSIONS)), ("All files", "*.*")])
+        if paths:
+            self.video_path_var.set(";".join(paths))
+
+    def browse_video_folder(self):
+        folder = filedialog.askdirectory(title="Chọn thư mục chứa video")
+        if not folder: return
+        paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.lower().endswith(VIDEO_EXTENSIONS)]
+        if not paths:
+            self.show_message("warning", "Không có video", "Thư mục không chứa file video nào.")
+            return
+        self.video_path_var.set(";".join(paths))
+
+    def collect_params(self):
+        """Thu thập và xác thực các tùy chọn; trả về None (và báo lỗi) nếu không hợp lệ."""
         # 1. Thu thập và xác thực dữ liệu
-        params = {"video_path": self.video_path_var.get()}
-        if not params["video_path"]:
+        params = {"video_paths": [path.strip() for path in self.video_path_var.get().split(";") if path.strip()]}
+        if not params["video_paths"]:
             self.show_message("error", "Lỗi", "Vui lòng chọn file video chính.")
-            return
+            return None
 
         params["rotate_enabled"] = self.rotate_enabled_var.get()
         params["scale_enabled"] = self.scale_enabled_var.get()
         params["watermark_enabled"] = self.watermark_enabled_var.get()
         params["audio_enabled"] = self.audio_enabled_var.get()
+        params["parallel_enabled"] = self.parallel_enabled_var.get()
+        params["encode_profile"] = self.profile_options[self.encode_profile_var.get()]
 
         if not any([params["rotate_enabled"], params["scale_enabled"], params["watermark_enabled"], params["audio_enabled"]]):
             self.show_message("warning", "Thiếu thao tác", "Vui lòng bật ít nhất một tùy chọn xử lý.")
-            return
+            return None
 
         # 2. Xác thực các tham số phụ
         try:
@@ -174,16 +247,48 @@ class VideoToolsGUI:
                 params["logo_path"] = self.watermark_logo_var.get()
                 params["watermark_pos"] = self.watermark_pos_var.get()
                 params["watermark_pad"] = int(self.watermark_pad_var.get())
+                if self.watermark_scale_var.get().strip():
+                    params["logo_scale"] = float(self.watermark_scale_var.get())
+                    if not 0 < params["logo_scale"] <= 100: raise ValueError("Cỡ logo phải trong khoảng 0-100%")
                 if not params["logo_path"]: raise ValueError("Chưa chọn file logo")
             if params["audio_enabled"]:
                 params["audio_path"] = self.audio_path_var.get()
                 if not params["audio_path"]: raise ValueError("Chưa chọn file âm thanh")
+            if params["encode_profile"] == AUTO_PROFILE and self.time_budget_var.get().strip():
+                params["time_budget"] = float(self.time_budget_var.get()) * 60
+                if params["time_budget"] <= 0: raise ValueError("Giới hạn thời gian phải > 0")
         except ValueError as e:
             self.show_message("error", "Giá trị không hợp lệ", f"Lỗi: {e}. Vui lòng kiểm tra lại các giá trị đã nhập.")
-            return
-        
-        # 3. Gọi controller
-        self.controller.start_combined_processing(params)
+            return None
+        return params
+
+    def start_processing_action(self):
+        params = self.collect_params()
+        if params:
+            self.controller.start_combined_processing(params)
+
+    def start_preview_action(self):
+        params = self.collect_params()
+        if params:
+            self.controller.start_preview(params)
+
+    def show_preview(self, video_path, frames):
+        """Hiển thị các khung xem trước (bytes JPEG) trong một cửa sổ riêng, thay cho cửa sổ xem trước cũ."""
+        if self.preview_window is not None and self.preview_window.winfo_exists():
+            self.preview_window.destroy()
+        window = tk.Toplevel(self.root)
+        window.title(f"Xem trước - {os.path.basename(video_path)}")
+        self.preview_window = window
+        window.photos = []  # Giữ tham chiếu để ảnh không bị thu hồi
+        for i, (at_seconds, data) in enumerate(frames):
+            image = Image.open(BytesIO(data))
+            photo = ImageTk.PhotoImage(image)
+            window.photos.append(photo)
+            cell = ttk.Frame(window, padding=5)
+            cell.grid(row=i // 2, column=i % 2)
+            ttk.Label(cell, image=photo).pack()
+            minutes, seconds = divmod(int(at_seconds), 60)
+            ttk.Label(cell, text=f"{minutes:02d}:{seconds:02d}").pack()
 
     def set_ui_state(self, state):
         ui_state = "disabled" if state == "processing" else "normal"
@@ -204,7 +309,9 @@ class VideoToolsGUI:
              for w in self.wm_file_input.winfo_children(): w.config(state="disabled")
              self.wm_pos_combo.config(state="disabled")
              self.wm_pad_entry.config(state="disabled")
+             self.wm_scale_entry.config(state="disabled")
              for w in self.audio_file_input.winfo_children(): w.config(state="disabled")
+             self.time_budget_entry.config(state="disabled")
 
     def log_status(self, message, level="info"):
         color_map = {"info": "black", "success": "green", "error": "red", "warning": "orange"}
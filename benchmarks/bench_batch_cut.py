@@ -0,0 +1,103 @@
+# benchmarks/bench_batch_cut.py
+"""
+So sánh cắt nhiều đoạn: mỗi đoạn một tiến trình FFmpeg (chế độ cũ) với cắt gộp trong một lần đọc file.
+
+    python benchmarks/bench_batch_cut.py [--input FILE] [--segments 20] [--workers 4]
+
+Không có --input thì tạo một file thử nghiệm dài (--duration giây) bằng nguồn lavfi của FFmpeg.
+Đường dẫn FFmpeg lấy từ biến môi trường FFMPEG_PATH hoặc PATH.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+if not hasattr(subprocess, "CREATE_NO_WINDOW"):
+    subprocess.CREATE_NO_WINDOW = 0  # Cờ chỉ có trên Windows
+
+from Utils.logger_setup import LoggerProvider
+LoggerProvider.base_path = tempfile.gettempdir()  # Không ghi log benchmark vào thư mục 'Logs' của dự án
+
+from Utils.ffmpeg_utils import run_ffmpeg, run_ffmpeg_multi_output
+
+
+def make_test_file(path, duration):
+    ffmpeg_path = os.environ["FFMPEG_PATH"]
+    subprocess.run([
+        ffmpeg_path, "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "60", "-c:a", "aac", path,
+    ], check=True)
+
+
+def plan_segments(duration, count, length):
+    step = duration / count
+    return [(f"{i * step:.3f}", f"{min(i * step + length, duration):.3f}") for i in range(count)]
+
+
+def cut_per_segment(input_file, segments, out_dir, workers):
+    """Giống chế độ cũ: mỗi đoạn một tác vụ trong thread pool, mỗi tác vụ mở và đọc lại file nguồn."""
+    def cut(item):
+        i, (start, end) = item
+        run_ffmpeg(input_file, os.path.join(out_dir, f"single_{i}.mp4"), ["-ss", start, "-to", end, "-c", "copy"])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(cut, enumerate(segments)))
+
+
+def cut_batch(input_file, segments, out_dir):
+    outputs = [
+        (["-ss", start, "-to", end, "-map", "0:v?", "-map", "0:a?", "-c", "copy"], os.path.join(out_dir, f"batch_{i}.mp4"))
+        for i, (start, end) in enumerate(segments)
+    ]
+    run_ffmpeg_multi_output(input_file, outputs)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="File nguồn dài có sẵn (mặc định: tự tạo)")
+    parser.add_argument("--duration", type=float, default=1800, help="Thời lượng file (giây): của file tự tạo, hoặc của --input")
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--length", type=float, default=30, help="Độ dài mỗi đoạn (giây)")
+    parser.add_argument("--workers", type=int, default=4, help="Số luồng của thread pool ở chế độ cũ")
+    args = parser.parse_args()
+
+    os.environ.setdefault("FFMPEG_PATH", shutil.which("ffmpeg") or "")
+    if not os.environ["FFMPEG_PATH"]:
+        sys.exit("Không tìm thấy FFmpeg (đặt FFMPEG_PATH).")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_batch_cut_")
+    try:
+        input_file = args.input
+        duration = args.duration
+        if not input_file:
+            input_file = os.path.join(work_dir, "source.mp4")
+            print(f"Đang tạo file thử nghiệm {duration:.0f} giây...")
+            make_test_file(input_file, duration)
+        segments = plan_segments(duration, args.segments, args.length)
+        size_mb = os.path.getsize(input_file) / (1024 * 1024)
+        print(f"File nguồn: {input_file} ({size_mb:.1f} MB), {len(segments)} đoạn x {args.length:.0f} giây")
+
+        single = timed(cut_per_segment, input_file, segments, work_dir, args.workers)
+        batch = timed(cut_batch, input_file, segments, work_dir)
+        print(f"Từng đoạn ({args.workers} luồng): {single:.2f} giây")
+        print(f"Cắt gộp (1 tiến trình):   {batch:.2f} giây  ->  nhanh hơn {single / max(batch, 1e-6):.1f} lần")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# benchmarks/bench_download_pool.py
+"""
+Đo thông lượng tải của tab Download (TikTokDownloader trên aiohttp) với 1 luồng và N luồng đồng thời,
+dùng một máy chủ aiohttp cục bộ đóng vai máy chủ video.
+
+    python benchmarks/bench_download_pool.py [--videos 24] [--concurrency 8] [--size-kb 2048]
+
+Máy chủ giả lập độ trễ trước byte đầu tiên (--latency) và giới hạn băng thông của từng kết nối
+(--rate), giống CDN thật: tải song song chỉ nhanh hơn nếu các request thực sự chạy đồng thời.
+Số kết nối TCP mà máy chủ nhận được cho thấy keep-alive có tái sử dụng kết nối hay không.
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Utils.logger_setup import LoggerProvider
+LoggerProvider.base_path = tempfile.gettempdir()  # Không ghi log benchmark vào thư mục 'Logs' của dự án
+
+from Down_Chanel.down_api import TikTokDownloader
+
+SERVER_CHUNK_SIZE = 64 * 1024
+
+
+class StandInServer:
+    """Máy chủ video cục bộ: mỗi /video/<id> trả về size byte, với độ trễ và băng thông theo kết nối."""
+    def __init__(self, size, latency, rate):
+        self.payload = os.urandom(size)
+        self.latency = latency
+        self.chunk_delay = SERVER_CHUNK_SIZE / rate if rate > 0 else 0
+        self.connections = set()
+        self.runner = None
+        self.base_url = None
+
+    async def handle_video(self, request):
+        self.connections.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.latency)
+        response = web.StreamResponse(headers={
+            "Content-Type": "video/mp4", "Content-Length": str(len(self.payload)), "ETag": '"bench"',
+        })
+        await response.prepare(request)
+        for start in range(0, len(self.payload), SERVER_CHUNK_SIZE):
+            await response.write(self.payload[start:start + SERVER_CHUNK_SIZE])
+            await asyncio.sleep(self.chunk_delay)
+        await response.write_eof()
+        return response
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/video/{video_id}", self.handle_video)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def download_all(server, video_count, concurrency, out_dir):
+    """Tải video_count video với tối đa concurrency request đồng thời, như download_with_semaphore của GUI."""
+    downloader = TikTokDownloader()
+    await downloader.open(concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    server.connections.clear()
+
+    async def download(i):
+        async with semaphore:
+            return await downloader.download_file(
+                str(i), f"{server.base_url}/video/{i}", os.path.join(out_dir, f"{concurrency}_{i}.mp4")
+            )
+
+    start = time.perf_counter()
+    try:
+        sizes = await asyncio.gather(*(download(i) for i in range(video_count)))
+    finally:
+        await downloader.close()
+    return time.perf_counter() - start, sum(sizes), len(server.connections)
+
+
+async def run(args):
+    server = StandInServer(args.size_kb * 1024, args.latency, args.rate * 1024 * 1024)
+    await server.start()
+    work_dir = tempfile.mkdtemp(prefix="bench_download_pool_")
+    try:
+        print(f"Máy chủ giả lập: {server.base_url}, {args.videos} video x {args.size_kb} KB, "
+              f"trễ {args.latency * 1000:.0f} ms, {args.rate:.1f} MB/s mỗi kết nối")
+        results = {}
+        for concurrency in (1, args.concurrency):
+            elapsed, total, connections = await download_all(server, args.videos, concurrency, work_dir)
+            results[concurrency] = elapsed
+            print(f"{concurrency:>3} luồng: {elapsed:.2f} giây, {total / (1024 * 1024) / elapsed:.1f} MB/s, "
+                  f"{connections} kết nối TCP")
+        print(f"Nhanh hơn {results[1] / max(results[args.concurrency], 1e-6):.1f} lần với {args.concurrency} luồng")
+    finally:
+        await server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=24, help="Số video cần tải")
+    parser.add_argument("--concurrency", type=int, default=8, help="Số luồng tải đồng thời (N)")
+    parser.add_argument("--size-kb", type=int, default=2048, help="Kích thước mỗi video (KB)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Độ trễ trước byte đầu tiên (giây)")
+    parser.add_argument("--rate", type=float, default=8.0, help="Băng thông mỗi kết nối (MB/s)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
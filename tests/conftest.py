@@ -0,0 +1,56 @@
+# tests/conftest.py
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+# Ứng dụng chạy trên Windows; cờ này không tồn tại trên hệ điều hành khác (0 = không dùng cờ nào)
+if not hasattr(subprocess, "CREATE_NO_WINDOW"):
+    subprocess.CREATE_NO_WINDOW = 0
+
+from Utils.logger_setup import LoggerProvider
+
+# Log của các lần chạy test không ghi vào thư mục 'Logs' của dự án
+LoggerProvider.base_path = tempfile.mkdtemp(prefix="mediatools-test-logs-")
+
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH") or shutil.which("ffmpeg")
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    """Đường dẫn FFmpeg cho các test cần chạy FFmpeg thật; bỏ qua test nếu máy không có FFmpeg."""
+    if not FFMPEG_PATH:
+        pytest.skip("Cần FFmpeg (đặt biến môi trường FFMPEG_PATH hoặc thêm ffmpeg vào PATH).")
+    monkeypatch.setenv("FFMPEG_PATH", FFMPEG_PATH)
+    return FFMPEG_PATH
+
+
+@pytest.fixture
+def project_root(tmp_path):
+    """Thư mục dự án tạm: các cache trong 'Data/' được tạo ở đây thay vì trong dự án thật."""
+    return str(tmp_path)
+
+
+@pytest.fixture
+def make_media(ffmpeg, tmp_path):
+    """Tạo file media thử nghiệm từ nguồn lavfi, ví dụ make_media("a.mp4", "sine=f=440", duration=5)."""
+    def _make(name, audio="sine=frequency=440:sample_rate=48000", video=None, duration=5.0, extra_args=()):
+        path = str(tmp_path / name)
+        cmd = [ffmpeg, "-v", "error", "-y"]
+        if video:
+            cmd += ["-f", "lavfi", "-i", f"{video}:duration={duration}"]
+        if audio:
+            cmd += ["-f", "lavfi", "-i", f"{audio}:duration={duration}"]
+        if video:
+            cmd += ["-c:v", "libx264", "-preset", "ultrafast", "-g", "25", "-pix_fmt", "yuv420p"]
+        cmd += list(extra_args) + [path]
+        subprocess.run(cmd, check=True)
+        return path
+    return _make
@@ -0,0 +1,56 @@
+# tests/test_auto_segment.py
+
+import wave
+
+import numpy as np
+import pytest
+
+from CutMerge.auto_segment import (
+    analyze_media_events, propose_without_silences, propose_scene_splits, format_timestamp, MIN_SEGMENT_SECONDS,
+)
+
+
+def test_format_timestamp_keeps_fractional_seconds():
+    assert format_timestamp(10.2) == "00:00:10.200"
+    assert format_timestamp(3723.0456) == "01:02:03.046"
+    assert format_timestamp(-1) == "00:00:00.000"
+
+
+def test_short_proposals_do_not_collapse_to_empty_segments():
+    # Đoạn 10.2 -> 10.9 giây (dài hơn MIN_SEGMENT_SECONDS) phải giữ được độ dài khi định dạng
+    segments = propose_without_silences([(0.0, 10.2), (10.9, 20.0)], 20.0)
+    assert segments == [(10.2, 10.9)]
+    start, end = (format_timestamp(t) for t in segments[0])
+    assert start < end
+
+
+def test_propose_without_silences_merges_overlaps_and_drops_tiny_gaps():
+    silences = [(5.0, 8.0), (7.0, 9.0), (9.0 + MIN_SEGMENT_SECONDS / 2, 12.0)]
+    assert propose_without_silences(silences, 20.0) == [(0.0, 5.0), (12.0, 20.0)]
+
+
+def test_propose_scene_splits_ignores_out_of_range_changes():
+    assert propose_scene_splits([3.0, 0.0, 25.0, 3.2, 10.0], 20.0) == [(0.0, 3.0), (3.2, 10.0), (10.0, 20.0)]
+
+
+def test_analyze_media_events_finds_silence_in_one_pass(ffmpeg, tmp_path):
+    rate = 16000
+    t = np.arange(rate * 2) / rate
+    tone = (0.5 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16)
+    samples = np.concatenate([tone, np.zeros(rate * 3, dtype=np.int16), tone])
+    path = str(tmp_path / "gap.wav")
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+    pids = []
+    events = analyze_media_events(path, 7.0, has_video=False, min_silence=1.0, on_start=pids.append)
+
+    assert len(pids) == 1
+    assert len(events.silences) == 1
+    start, end = events.silences[0]
+    assert start == pytest.approx(2.0, abs=0.05)
+    assert end == pytest.approx(5.0, abs=0.05)
+    assert propose_without_silences(events.silences, 7.0) == [(0.0, start), (end, 7.0)]
@@ -0,0 +1,136 @@
+# tests/test_bulk_tagger.py
+
+import os
+import time
+import builtins
+
+import pytest
+from mutagen.id3 import ID3, TRCK, TIT2, TPE1
+
+from AudioTools import bulk_tagger
+from AudioTools.bulk_tagger import (
+    TagRow, read_tags, load_tags_parallel, render_template, apply_templates, write_tags,
+    write_rows_parallel, build_cover_frame, list_audio_files,
+)
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\0" * 32
+
+
+@pytest.fixture
+def mp3(make_media):
+    """File MP3 thật có sẵn tag: tiêu đề, nghệ sĩ và số track (trường ngoài bảng sửa hàng loạt)."""
+    def _make(name):
+        path = make_media(name, duration=1.0)
+        id3 = ID3()
+        id3.add(TIT2(encoding=3, text="Old title"))
+        id3.add(TPE1(encoding=3, text="Old artist"))
+        id3.add(TRCK(encoding=3, text="7"))
+        id3.save(path)
+        return path
+    return _make
+
+
+def audio_payload(path):
+    """Phần dữ liệu sau tag ID3 (luồng audio) của file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    size = ID3(path).size
+    return data[size:]
+
+
+def test_template_variables_from_recording_name(tmp_path):
+    folder = tmp_path / "Live"
+    folder.mkdir()
+    path = folder / "TT_alice_20240102_030405.mp3"
+    path.write_bytes(b"")
+    row = TagRow(str(path), {"artist": "Alice", "title": ""})
+    rendered = render_template("{user} {date} {time} {year} #{index} {folder}/{filename} {artist} {missing}", row, 3)
+    assert rendered == "alice 2024-01-02 03:04 2024 #3 Live/TT_alice_20240102_030405 Alice"
+
+
+def test_template_date_falls_back_to_name_then_mtime(tmp_path):
+    dated = tmp_path / "show 2023.05.06 final.mp3"
+    dated.write_bytes(b"")
+    assert render_template("{date}|{user}", TagRow(str(dated), {}), 1) == "2023-05-06|"
+
+    undated = tmp_path / "episode.mp3"
+    undated.write_bytes(b"")
+    moment = time.mktime((2020, 8, 9, 10, 11, 0, 0, 0, -1))
+    os.utime(undated, (moment, moment))
+    assert render_template("{date} {time}", TagRow(str(undated), {}), 1) == "2020-08-09 10:11"
+
+
+def test_template_sees_pending_changes_and_skips_error_rows(tmp_path):
+    rows = [TagRow(str(tmp_path / f"{i}.mp3"), {"title": f"t{i}"}) for i in range(3)]
+    for row in rows:
+        open(row.path, "wb").close()
+    rows[1].error = "hỏng"
+    apply_templates(rows, {"album": "Album", "title": "{index}. {title}", "genre": ""})
+    assert rows[0].changes == {"album": "Album", "title": "1. t0"}
+    assert rows[1].changes == {}
+    assert rows[2].value("title") == "3. t2"
+    assert "genre" not in rows[2].changes
+    assert rows[0].is_dirty()
+
+
+def test_write_tags_opens_file_once_and_keeps_other_tags(mp3, monkeypatch, tmp_path):
+    path = mp3("song.mp3")
+    payload = audio_payload(path)
+    cover = tmp_path / "cover.png"
+    cover.write_bytes(PNG_BYTES)
+    cover_frame = build_cover_frame(str(cover))
+    opened = []
+    def counting_open(file, *args, **kwargs):
+        opened.append(file)
+        return builtins.open(file, *args, **kwargs)
+    monkeypatch.setattr(bulk_tagger, "open", counting_open, raising=False)
+
+    write_tags(path, {"title": "New title", "artist": "", "album": "Album"}, cover_frame)
+    assert opened == [path]
+
+    id3 = ID3(path)
+    assert str(id3["TIT2"].text[0]) == "New title"
+    assert "TPE1" not in id3                      # giá trị rỗng xóa trường
+    assert str(id3["TALB"].text[0]) == "Album"
+    assert str(id3["TRCK"].text[0]) == "7"        # trường không sửa được giữ nguyên
+    assert id3.getall("APIC")[0].mime == "image/png"
+    assert audio_payload(path) == payload
+
+
+def test_write_tags_adds_header_to_untagged_file(make_media):
+    path = make_media("plain.mp3", duration=1.0)
+    write_tags(path, {"title": "Fresh"})
+    assert read_tags(path)["title"] == "Fresh"
+
+
+def test_load_tags_keeps_order_and_reports_unreadable_files(mp3, tmp_path):
+    good = mp3("a.mp3")
+    missing = str(tmp_path / "missing.mp3")
+    rows = load_tags_parallel([missing, good])
+    assert [row.path for row in rows] == [missing, good]
+    assert rows[0].error and rows[0].tags == {}
+    assert rows[1].error is None and rows[1].tags["title"] == "Old title" and rows[1].tags["album"] == ""
+
+
+def test_write_rows_reports_errors_and_keeps_failed_changes(mp3, tmp_path):
+    ok_path, gone_path = mp3("ok.mp3"), mp3("gone.mp3")
+    rows = load_tags_parallel([ok_path, gone_path, str(tmp_path / "unreadable.mp3")])
+    clean = TagRow(ok_path, dict(rows[0].tags))
+    apply_templates(rows, {"album": "{filename}"})
+    os.remove(gone_path)
+
+    progress = []
+    written, errors = write_rows_parallel(rows + [clean], on_progress=lambda done, total: progress.append((done, total)))
+    assert written == 1
+    assert [path for path, _ in errors] == [gone_path]
+    assert progress[-1] == (2, 2)                          # dòng lỗi đọc và dòng không đổi không được ghi
+    assert rows[0].changes == {} and rows[0].tags["album"] == "ok"
+    assert rows[1].changes == {"album": "gone"}            # vẫn hiện là thay đổi chưa ghi
+    assert read_tags(ok_path)["album"] == "ok"
+
+
+def test_list_audio_files_filters_and_sorts(tmp_path):
+    for name in ("b.MP3", "a.mp3", "c.wav"):
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / "dir.mp3").mkdir()
+    assert [os.path.basename(p) for p in list_audio_files(str(tmp_path))] == ["a.mp3", "b.MP3"]
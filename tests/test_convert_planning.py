@@ -0,0 +1,42 @@
+# tests/test_convert_planning.py
+
+import threading
+import time
+
+from Convert import convert_controller
+from Convert.convert_controller import ConvertController, probe_durations
+
+
+def test_durations_are_probed_concurrently(monkeypatch):
+    active = []
+    peak = [0]
+    lock = threading.Lock()
+    def slow_duration(path):
+        with lock:
+            active.append(path)
+            peak[0] = max(peak[0], len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(path)
+        return {"a.mp3": 30.0, "b.mp3": None, "c.mp3": 90.0, "d.mp3": 10.0}[path]
+    monkeypatch.setattr(convert_controller, "get_media_duration", slow_duration)
+
+    durations = probe_durations(["a.mp3", "b.mp3", "c.mp3", "d.mp3"], max_workers=4)
+    assert durations == {"a.mp3": 30.0, "b.mp3": 0, "c.mp3": 90.0, "d.mp3": 10.0}
+    assert peak[0] > 1
+    assert probe_durations([], max_workers=4) == {}
+
+
+def test_multi_output_splits_filter_chain_once():
+    format_args = {"mp3": ["-ar", "44100", "-ab", "192k"], "wav": ["-ar", "48000", "-acodec", "pcm_s16le"]}
+    outputs = ConvertController.build_multi_output("/in/song.flac", "/out", ["atempo=1.25"], format_args)
+    (mp3_args, mp3_file), (wav_args, wav_file) = outputs
+    assert mp3_file.endswith("song.mp3") and wav_file.endswith("song.wav")
+    assert mp3_args[:2] == ["-filter_complex", "[0:a:0]atempo=1.25,asplit=2[out0][out1]"]
+    assert mp3_args[2:4] == ["-map", "[out0]"] and wav_args[:2] == ["-map", "[out1]"]
+    assert wav_args[-2:] == ["-acodec", "pcm_s16le"]
+
+
+def test_multi_output_without_filters_maps_audio_directly():
+    outputs = ConvertController.build_multi_output("/in/a.mp4", "/out", [], {"wav": []})
+    assert outputs == [(["-map", "0:a:0"], ConvertController.get_output_file("/in/a.mp4", "/out", "wav"))]
@@ -0,0 +1,111 @@
+# tests/test_denoise_engine.py
+
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from AudioTools import denoise_engine
+from AudioTools.denoise_engine import (
+    plan_overlapping_chunks, build_crossfade_graph, build_denoise_filter, denoise_chunked, learn_noise_floor,
+    CHUNK_OVERLAP_SECONDS, NOISE_FLOOR_MIN,
+)
+from Utils import parallel_encode
+from Utils.parallel_encode import EncodeJob, run_parallel_encodes
+
+
+def test_chunks_overlap_by_fixed_amount_and_cover_timeline():
+    chunks = plan_overlapping_chunks(600.0, 4)
+    assert chunks[0][0] == 0.0 and chunks[-1][1] == 600.0
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert end - start == pytest.approx(CHUNK_OVERLAP_SECONDS)
+    assert chunks[1] == (149.0, 301.0)
+    assert plan_overlapping_chunks(100.0, 1) == [(0.0, 100.0)]
+
+
+def test_crossfade_graph_chains_every_boundary():
+    chunks = plan_overlapping_chunks(90.0, 3)
+    assert build_crossfade_graph(chunks) == (
+        "[0:a][1:a]acrossfade=d=2.000:c1=tri:c2=tri[x1];"
+        "[x1][2:a]acrossfade=d=2.000:c1=tri:c2=tri[out]"
+    )
+    assert build_crossfade_graph([(0.0, 90.0)]) is None
+
+
+def test_denoise_filter_selection():
+    assert build_denoise_filter(0.0001) == "anlmdn=s=0.0001"
+    assert build_denoise_filter(12, noise_floor=-55.0) == "afftdn=nr=24.0:nf=-55.0"
+    assert build_denoise_filter(80, noise_floor=-50.0) == "afftdn=nr=97.0:nf=-50.0"
+
+
+def decode(ffmpeg, path):
+    raw = subprocess.run(
+        [ffmpeg, "-v", "error", "-i", path, "-f", "f32le", "-ac", "1", "-ar", "48000", "-"],
+        capture_output=True, check=True,
+    ).stdout
+    return np.frombuffer(raw, dtype=np.float32)
+
+
+def test_chunked_output_is_seamless_and_full_length(make_media, tmp_path, ffmpeg, monkeypatch):
+    source = make_media("tone.wav", audio="sine=frequency=440:sample_rate=48000", duration=40.0)
+    monkeypatch.setattr(denoise_engine, "_audio_format", lambda path: (48000, 1))
+    output = str(tmp_path / "tone_denoised.wav")
+    slots = threading.BoundedSemaphore(2)
+    # Bộ lọc không đổi tín hiệu: output ghép bằng crossfade phải trùng với file gốc
+    denoise_chunked(source, output, "volume=1.0", 40.0, 2, str(tmp_path / "chunks"), slots=slots)
+
+    original, processed = decode(ffmpeg, source), decode(ffmpeg, output)
+    assert abs(len(processed) - len(original)) <= 2
+    n = min(len(original), len(processed))
+    assert np.max(np.abs(original[:n] - processed[:n])) < 1e-3
+    assert not (tmp_path / "chunks").exists()
+
+
+def test_shared_slots_limit_concurrent_ffmpeg(monkeypatch):
+    active = [0]
+    peak = [0]
+    lock = threading.Lock()
+    def fake_ffmpeg(args, on_start=None):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return iter(())
+    monkeypatch.setattr(parallel_encode, "iter_ffmpeg_stderr", fake_ffmpeg)
+
+    slots = threading.BoundedSemaphore(3)
+    batches = [[EncodeJob([], f"out_{b}_{i}", 1.0) for i in range(6)] for b in range(4)]
+    threads = [threading.Thread(target=run_parallel_encodes, args=(jobs,), kwargs={"max_workers": 6, "slots": slots})
+               for jobs in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] <= 3
+
+
+def test_noise_floor_is_learned_from_first_silence(make_media):
+    # 3 giây tạp âm nhỏ (~-55 dB RMS) rồi một âm lớn: mức nền là RMS của đoạn tạp âm
+    source = make_media(
+        "speech.wav", audio="aevalsrc='if(lt(t,3),0.003*(random(0)*2-1),0.5*sin(2*PI*440*t))':s=48000", duration=6.0,
+    )
+    pids = []
+    noise_floor = learn_noise_floor(source, on_start=pids.append)
+    assert -60.0 < noise_floor < -50.0
+    assert len(pids) == 2
+
+
+def test_no_silence_means_no_learned_floor(make_media):
+    source = make_media("tone.wav", audio="sine=frequency=440:sample_rate=48000", duration=3.0)
+    assert learn_noise_floor(source) is None
+
+
+def test_very_quiet_floor_is_clamped(make_media):
+    source = make_media(
+        "quiet.wav", audio="aevalsrc='if(lt(t,2),0.00005*sin(2*PI*50*t),0.5*sin(2*PI*440*t))':s=48000", duration=4.0,
+    )
+    assert learn_noise_floor(source) == NOISE_FLOOR_MIN
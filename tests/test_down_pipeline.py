@@ -0,0 +1,87 @@
+# tests/test_down_pipeline.py
+
+import asyncio
+
+from Down_Chanel.down_pipeline import DownloadPipeline, RateLimiter
+
+
+def test_slow_transfers_pause_resolving():
+    async def run():
+        release = asyncio.Event()
+        resolved = []
+        transferred = []
+
+        async def resolve(item):
+            resolved.append(item)
+            return item
+
+        async def transfer(job, stats):
+            await release.wait()
+            stats.add_bytes(10)
+            transferred.append(job)
+
+        pipeline = DownloadPipeline(resolve, transfer, on_error=None, resolve_workers=2, transfer_workers=2)
+        task = asyncio.create_task(pipeline.run(range(50)))
+        for _ in range(20):
+            await asyncio.sleep(0)
+        # 2 job đang tải + 4 trong hàng đợi + mỗi luồng metadata giữ 1 job chờ đưa vào hàng đợi
+        in_flight = len(resolved)
+        release.set()
+        await task
+        return in_flight, resolved, transferred, pipeline
+
+    in_flight, resolved, transferred, pipeline = asyncio.run(run())
+    assert 2 <= in_flight <= 2 + 2 * 2 + 2
+    assert sorted(resolved) == sorted(transferred) == list(range(50))
+    assert pipeline.transfer_stats.done == 50 and pipeline.transfer_stats.bytes == 500
+    assert pipeline.resolve_stats.active == pipeline.transfer_stats.active == 0
+
+
+def test_errors_and_skipped_items():
+    errors = []
+
+    async def resolve(item):
+        if item == "bad-link":
+            raise ValueError("resolve")
+        return None if item == "skip" else item
+
+    async def transfer(job, stats):
+        if job == "bad-file":
+            raise OSError("transfer")
+
+    pipeline = DownloadPipeline(resolve, transfer, lambda item, e: errors.append((item, type(e))), 3, 2)
+    asyncio.run(pipeline.run(["ok", "bad-link", "skip", "bad-file", "ok2"]))
+    assert sorted(errors) == [("bad-file", OSError), ("bad-link", ValueError)]
+    assert pipeline.resolve_stats.done == 4 and pipeline.resolve_stats.failed == 1
+    assert pipeline.transfer_stats.done == 2 and pipeline.transfer_stats.failed == 1
+
+
+def test_empty_input_finishes():
+    async def never(*args):
+        raise AssertionError("không được gọi")
+
+    asyncio.run(DownloadPipeline(never, never, None, 2, 2).run([]))
+
+
+def test_rate_limiter_spaces_starts():
+    async def run():
+        limiter = RateLimiter(50)  # 20 ms giữa hai lần bắt đầu
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(limiter.wait() for _ in range(6)))
+        return loop.time() - start
+
+    elapsed = asyncio.run(run())
+    assert elapsed >= 5 * 0.02 - 0.005
+
+
+def test_unlimited_rate_does_not_wait():
+    async def run():
+        limiter = RateLimiter(0)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(1000):
+            await limiter.wait()
+        return loop.time() - start
+
+    assert asyncio.run(run()) < 0.1
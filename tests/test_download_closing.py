@@ -0,0 +1,75 @@
+# tests/test_download_closing.py
+"""Đóng ứng dụng trong lúc tải: sổ video chỉ được đóng sau lần ghi cuối cùng của luồng tải."""
+
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from Down_Chanel.down_gui import TikTokDownloaderGUI
+from Down_Chanel.download_index import DownloadIndex
+
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+        self.cancelled = []
+
+    def after(self, delay, func, *args):
+        self.scheduled.append(func)
+        return f"after#{len(self.scheduled)}"
+
+    def after_cancel(self, job):
+        self.cancelled.append(job)
+
+
+def make_gui(project_root):
+    # Không dựng widget: chỉ cần phần quản lý luồng tải và sổ video
+    gui = TikTokDownloaderGUI.__new__(TikTokDownloaderGUI)
+    gui.root = FakeRoot()
+    gui.download_index = DownloadIndex(project_root)
+    gui.link_check_job = None
+    gui.close_lock = threading.Lock()
+    gui.download_running = False
+    gui.is_closing = False
+    gui.log_status = lambda *args: None
+    return gui
+
+
+def test_closing_while_downloading_defers_index_close(project_root):
+    gui = make_gui(project_root)
+    release = threading.Event()
+    video = os.path.join(project_root, "123.mp4")
+    with open(video, "wb") as f:
+        f.write(b"\0" * 1024)
+
+    async def process_downloads():
+        release.wait(5)
+        gui.download_index.record("123", video)  # Video vừa tải xong sau khi bấm đóng
+
+    gui.process_downloads = process_downloads
+    gui.link_check_job = gui.root.after(300, gui.report_known_links)
+    gui.download_running = True
+    thread = threading.Thread(target=gui.run_async_download)
+    thread.start()
+
+    gui.on_closing()
+    assert gui.root.cancelled == ["after#1"] and gui.link_check_job is None
+    assert gui.download_index.lookup(["123"]) == {}  # Sổ vẫn mở
+
+    release.set()
+    thread.join(5)
+    assert gui.download_finished not in gui.root.scheduled
+    reopened = DownloadIndex(project_root)
+    assert "123" in reopened.lookup(["123"])
+    reopened.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        gui.download_index.lookup(["123"])
+
+
+def test_closing_when_idle_closes_index(project_root):
+    gui = make_gui(project_root)
+    gui.on_closing()
+    with pytest.raises(sqlite3.ProgrammingError):
+        gui.download_index.lookup(["123"])
@@ -0,0 +1,65 @@
+# tests/test_download_index.py
+
+import os
+
+import pytest
+
+from Down_Chanel.download_index import DownloadIndex, find_downloaded_files, file_sha1
+
+
+@pytest.fixture
+def index(project_root):
+    index = DownloadIndex(project_root)
+    yield index
+    index.close()
+
+
+def write_video(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return str(path)
+
+
+def test_record_and_lookup(index, tmp_path):
+    path = write_video(tmp_path / "user" / "1.mp4", 2048)
+    index.record("1", path, author="user", sha1=file_sha1(path))
+    assert index.lookup(["1", "2"]) == {"1": (os.path.abspath(path), 2048)}
+
+
+def test_index_persists_between_sessions(project_root, tmp_path):
+    path = write_video(tmp_path / "user" / "1.mp4", 2048)
+    first = DownloadIndex(project_root)
+    first.record("1", path)
+    first.close()
+    second = DownloadIndex(project_root)
+    assert second.find_existing(["1"]) == {"1": os.path.abspath(path)}
+    second.close()
+
+
+def test_find_existing_drops_deleted_and_changed_files(index, tmp_path):
+    kept = write_video(tmp_path / "user" / "1.mp4", 2048)
+    deleted = write_video(tmp_path / "user" / "2.mp4", 2048)
+    changed = write_video(tmp_path / "user" / "3.mp4", 2048)
+    for video_id, path in (("1", kept), ("2", deleted), ("3", changed)):
+        index.record(video_id, path)
+    os.remove(deleted)
+    write_video(changed, 100)
+    assert index.find_existing(["1", "2", "3"]) == {"1": os.path.abspath(kept)}
+    assert index.lookup(["1", "2", "3"]).keys() == {"1"}
+
+
+def test_lookup_handles_more_ids_than_sqlite_parameters(index, tmp_path):
+    path = write_video(tmp_path / "user" / "1.mp4", 2048)
+    index.record("1999", path)
+    assert index.lookup(str(i) for i in range(2000)).keys() == {"1999"}
+
+
+def test_find_downloaded_files_lists_each_channel_folder(tmp_path):
+    save_folder = tmp_path / "downloads"
+    complete = write_video(save_folder / "alice" / "1.mp4", 4096)
+    write_video(save_folder / "alice" / "2.mp4", 10)          # quá nhỏ
+    write_video(save_folder / "alice" / "3.mp4.part", 4096)   # đang tải dở
+    write_video(save_folder / "alice" / "9.mp4", 4096)        # không có trong danh sách
+    found = find_downloaded_files(str(save_folder), {"alice": {"1", "2", "3"}, "bob": {"4"}}, min_size=1024)
+    assert found == {"1": (complete, "alice")}
@@ -0,0 +1,100 @@
+# tests/test_encode_profiles.py
+
+import pytest
+
+from VideoTools import video_tools_controller
+from VideoTools.video_tools_controller import VideoToolsController
+from VideoTools.encode_profiles import (
+    EncodeEstimator, PROFILES, PROFILES_BY_KEY, DEFAULT_PROFILE, CALIBRATION_WEIGHT,
+    MEDIUM_PIXELS_PER_THREAD_SECOND,
+)
+
+FULL_HD = (1920, 1080, 30.0)
+MEDIUM = PROFILES_BY_KEY["medium"]
+
+
+def test_estimate_scales_with_pixels_threads_and_preset(project_root):
+    estimator = EncodeEstimator(project_root)
+    base = estimator.estimate(MEDIUM, 60, FULL_HD, 1)
+    assert base == pytest.approx(60 * 30 * 1920 * 1080 / MEDIUM_PIXELS_PER_THREAD_SECOND)
+    assert estimator.estimate(MEDIUM, 120, FULL_HD, 1) == pytest.approx(2 * base)
+    assert estimator.estimate(MEDIUM, 60, (1280, 720, 30.0), 1) == pytest.approx(base * 1280 * 720 / (1920 * 1080))
+    assert estimator.estimate(MEDIUM, 60, FULL_HD, 4) == pytest.approx(base / 4)
+    assert estimator.estimate(PROFILES_BY_KEY["ultrafast"], 60, FULL_HD, 1) == pytest.approx(base / 8.0)
+
+
+def test_record_calibrates_and_persists(project_root):
+    estimator = EncodeEstimator(project_root)
+    estimated = estimator.estimate(MEDIUM, 60, FULL_HD, 8)
+    estimator.record(MEDIUM, estimated, estimated * 2)  # Máy chậm gấp đôi giá trị tham chiếu
+    factor = 1 - CALIBRATION_WEIGHT + 2 * CALIBRATION_WEIGHT
+    assert estimator.estimate(MEDIUM, 60, FULL_HD, 8) == pytest.approx(estimated * factor)
+    # Hệ số được lưu lại cho lần chạy sau và chỉ áp dụng cho preset đã đo
+    reopened = EncodeEstimator(project_root)
+    assert reopened.estimate(MEDIUM, 60, FULL_HD, 8) == pytest.approx(estimated * factor)
+    fast = PROFILES_BY_KEY["fast"]
+    assert reopened.estimate(fast, 60, FULL_HD, 8) == pytest.approx(estimated / fast.relative_speed)
+
+
+def test_record_ignores_empty_measurements(project_root):
+    estimator = EncodeEstimator(project_root)
+    before = estimator.estimate(MEDIUM, 60, FULL_HD, 1)
+    estimator.record(MEDIUM, 0, 10)
+    estimator.record(MEDIUM, 10, 0)
+    assert estimator.estimate(MEDIUM, 60, FULL_HD, 1) == before
+
+
+def test_choose_profile_picks_slowest_preset_within_budget(project_root):
+    estimator = EncodeEstimator(project_root)
+    items = [(60, FULL_HD), (30, FULL_HD)]
+    assert estimator.choose_profile(items, 4, None).key == DEFAULT_PROFILE
+    assert estimator.choose_profile(items, 4, 10 ** 6).key == "slow"
+    budget = estimator.estimate_many(PROFILES_BY_KEY["faster"], items, 4) * 1.01
+    assert estimator.choose_profile(items, 4, budget).key == "faster"
+    assert estimator.choose_profile(items, 4, 0.001) is PROFILES[-1]
+
+
+# --- Hiệu chỉnh chỉ dùng thời gian của lần mã hóa một tiến trình ---
+
+class FakeGui:
+    def __init__(self):
+        self.root = self
+
+    def after(self, *args):
+        pass
+
+    def log_status(self, message, level=None):
+        pass
+
+    def finalize_processing(self, operation_name):
+        pass
+
+
+@pytest.fixture
+def combined_task(monkeypatch, tmp_path):
+    controller = VideoToolsController(FakeGui(), str(tmp_path), thread_pool=None)
+    controller.active_tasks = 1
+    graph = {"extra_inputs": [], "video_filters": ["[0:v]hflip[v]"], "video_label": "[v]", "log_messages": []}
+    monkeypatch.setattr(controller, "build_filter_graph", lambda params: graph)
+    monkeypatch.setattr(controller, "probe_output_geometry", lambda path, params: (60.0, FULL_HD))
+    monkeypatch.setattr(controller, "select_profile", lambda params, items, threads: (MEDIUM, 12.0))
+    monkeypatch.setattr(controller, "run_single_encode", lambda *args: None)
+    monkeypatch.setattr(controller, "run_chunked_encode", lambda *args: None)
+    monkeypatch.setattr(video_tools_controller, "get_media_index", lambda path, root: None)
+    recorded = []
+    monkeypatch.setattr(controller.estimator, "record", lambda *args: recorded.append(args))
+
+    def run(chunks):
+        monkeypatch.setattr(video_tools_controller, "plan_keyframe_chunks", lambda *args: chunks)
+        controller.run_combined_task(str(tmp_path / "out.mp4"), {"video_path": "source.mp4", "parallel_enabled": True})
+        return recorded
+    return run
+
+
+def test_single_process_encode_is_recorded(combined_task):
+    recorded = combined_task([(0.0, 60.0)])
+    assert len(recorded) == 1 and recorded[0][:2] == (MEDIUM, 12.0)
+
+
+def test_chunked_encode_is_not_recorded(combined_task):
+    assert combined_task([(0.0, 30.0), (30.0, 60.0)]) == []
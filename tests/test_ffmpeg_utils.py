@@ -0,0 +1,44 @@
+# tests/test_ffmpeg_utils.py
+
+import os
+import wave
+
+import psutil
+import pytest
+
+from Utils.ffmpeg_utils import run_ffmpeg, run_ffmpeg_multi_output
+
+
+def test_multi_output_writes_every_segment_in_one_process(make_media, tmp_path):
+    source = make_media("source.mp4", video="testsrc=size=160x120:rate=25", duration=6)
+    outputs = [
+        (["-ss", "0", "-to", "2", "-map", "0:v?", "-map", "0:a?", "-c", "copy"], str(tmp_path / "part1.mp4")),
+        (["-ss", "3", "-to", "5", "-map", "0:v?", "-map", "0:a?", "-c", "copy"], str(tmp_path / "part2.mp4")),
+    ]
+    running = []
+
+    pid = run_ffmpeg_multi_output(source, outputs, on_start=lambda pid: running.append(psutil.pid_exists(pid)))
+
+    # on_start được gọi khi tiến trình còn sống, đúng một lần cho cả hai output
+    assert running == [True]
+    assert pid > 0
+    for _, output_file in outputs:
+        assert os.path.getsize(output_file) > 0
+
+
+def test_multi_output_skips_optional_streams_that_are_missing(make_media, tmp_path):
+    # File chỉ có audio: "0:v?" không làm FFmpeg báo lỗi
+    source = make_media("audio_only.wav", duration=3)
+    output_file = str(tmp_path / "cut.wav")
+    run_ffmpeg_multi_output(source, [(["-ss", "1", "-to", "2", "-map", "0:v?", "-map", "0:a?", "-c", "copy"], output_file)])
+    assert os.path.getsize(output_file) > 0
+
+
+def test_run_ffmpeg_places_input_args_before_input(make_media, tmp_path):
+    source = make_media("tone.wav", duration=5)
+    output_file = str(tmp_path / "tail.wav")
+    started = []
+    run_ffmpeg(source, output_file, ["-c", "copy"], input_args=["-ss", "2"], on_start=started.append)
+    assert len(started) == 1
+    with wave.open(output_file) as f:
+        assert f.getnframes() / f.getframerate() == pytest.approx(3.0, abs=0.05)
@@ -0,0 +1,83 @@
+# tests/test_job_journal.py
+
+import os
+
+from Utils import job_journal
+from Utils.job_journal import JobJournal, STATE_DONE, STATE_RUNNING, STATE_CANCELLED, RESUME_RETRY_MS
+from Convert.convert_controller import ConvertController
+
+
+def test_unfinished_tasks_survive_a_torn_last_line(project_root):
+    journal = JobJournal(project_root, "test")
+    first, second = journal.add_tasks("convert", [{"params": {"n": 1}}, {"params": {"n": 2}}])
+    journal.mark(first, STATE_DONE)
+    journal.mark(second, STATE_RUNNING)
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "state", "id": "')
+    assert [task["id"] for task in journal.unfinished_tasks()] == [second]
+
+
+def test_cancel_unfinished_writes_once_and_respects_ids(project_root, monkeypatch):
+    journal = JobJournal(project_root, "test")
+    ids = journal.add_tasks("convert", [{"params": {"n": i}} for i in range(50)])
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(job_journal.os, "fsync", lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+
+    journal.cancel_unfinished(set(ids[:40]))
+    assert len(fsyncs) == 1
+    assert [task["id"] for task in journal.unfinished_tasks()] == ids[40:]
+
+
+def test_compact_keeps_only_unfinished(project_root):
+    journal = JobJournal(project_root, "test")
+    done, pending = journal.add_tasks("convert", [{"params": {}}, {"params": {}}])
+    journal.mark(done, STATE_DONE)
+    journal.compact()
+    with open(journal.path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+    journal.mark(pending, STATE_CANCELLED)
+    journal.compact()
+    assert not os.path.exists(journal.path)
+
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, func, *args):
+        self.scheduled.append((delay, func, args))
+
+
+class FakeGui:
+    def __init__(self, answer):
+        self.root = FakeRoot()
+        self.answer = answer
+        self.questions = 0
+
+    def ask_yes_no(self, title, message):
+        self.questions += 1
+        return self.answer
+
+    def log_status(self, message, level="info"):
+        pass
+
+
+def test_resume_prompt_waits_until_idle_instead_of_cancelling(project_root):
+    gui = FakeGui(answer=False)
+    controller = ConvertController(gui, project_root, thread_pool=None, options_map={})
+    old_ids = controller.journal.add_tasks("convert", [{"params": {"input_file": "x", "output_dir": "y"}}])
+
+    controller.is_converting = True
+    controller.offer_resume()
+    assert gui.questions == 0
+    assert [task["id"] for task in controller.journal.unfinished_tasks()] == old_ids
+    delay, func, args = gui.root.scheduled[-1]
+    assert delay == RESUME_RETRY_MS
+
+    # Tác vụ mới được thêm trong lúc bận không bị tính là tác vụ của lần chạy trước
+    new_ids = controller.journal.add_tasks("convert", [{"params": {"input_file": "z", "output_dir": "y"}}])
+    controller.is_converting = False
+    func(*args)
+    assert gui.questions == 1
+    assert [task["id"] for task in controller.journal.unfinished_tasks()] == new_ids
@@ -0,0 +1,103 @@
+# tests/test_link_resolver.py
+
+import asyncio
+
+import pytest
+
+from Down_Chanel.down_logic import clean_link, parse_video_url, short_link_key, canonical_video_url
+from Down_Chanel.link_resolver import ShortLinkResolver
+
+FULL = "https://www.tiktok.com/@alice/video/7300000000000000001"
+
+
+@pytest.mark.parametrize("url, expected", [
+    (FULL, ("alice", "7300000000000000001")),
+    ("https://m.tiktok.com/@alice/video/7300000000000000001?is_from_webapp=1&lang=vi", ("alice", "7300000000000000001")),
+    ("http://TikTok.com/@alice.b_c/video/42/", ("alice.b_c", "42")),
+    ("  https://www.tiktok.com/@alice/video/42%0A\n", ("alice", "42")),
+    ("https://vm.tiktok.com/ZMabc123/", None),
+    ("https://www.tiktok.com/@alice", None),
+    ("7300000000000000001", None),
+])
+def test_parse_video_url(url, expected):
+    assert parse_video_url(url) == expected
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://vm.tiktok.com/ZMabc123/", "https://vm.tiktok.com/ZMabc123"),
+    ("https://vt.tiktok.com/ZS-x_9/?k=1", "https://vt.tiktok.com/ZS-x_9"),
+    ("https://www.tiktok.com/t/ZTabc/", "https://www.tiktok.com/t/ZTabc"),
+    ("https://m.tiktok.com/t/ZTabc", "https://m.tiktok.com/t/ZTabc"),
+    (FULL, None),
+    ("https://example.com/t/abc", None),
+])
+def test_short_link_key(url, expected):
+    assert short_link_key(url) == expected
+
+
+def test_clean_link_and_canonical_url():
+    assert clean_link(" https://vm.tiktok.com/x/%0A\n") == "https://vm.tiktok.com/x/"
+    assert canonical_video_url("alice", "42") == "https://www.tiktok.com/@alice/video/42"
+
+
+def test_normalize_without_network(project_root):
+    resolver = ShortLinkResolver(project_root)
+    assert resolver.normalize(FULL + "?lang=vi") == (FULL, "alice", "7300000000000000001")
+    assert resolver.normalize("https://vm.tiktok.com/ZMabc123/") is None
+    assert resolver.normalize("7300000000000000001") == ("7300000000000000001", "unknown", "7300000000000000001")
+
+
+class FakeResponse:
+    def __init__(self, url):
+        self.url = url
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Theo chuyển hướng theo bảng redirects; HEAD có thể không chuyển hướng (head_redirects=False)."""
+    def __init__(self, redirects, head_redirects=True):
+        self.redirects = redirects
+        self.head_redirects = head_redirects
+        self.calls = []
+
+    def head(self, url, allow_redirects):
+        self.calls.append(("HEAD", url))
+        return FakeResponse(self.redirects.get(url, url) if self.head_redirects else url)
+
+    def get(self, url, allow_redirects):
+        self.calls.append(("GET", url))
+        return FakeResponse(self.redirects.get(url, url))
+
+
+def test_resolve_all_dedupes_and_caches(project_root):
+    session = FakeSession({"https://vm.tiktok.com/ZMabc123": FULL + "?_r=1"})
+    resolver = ShortLinkResolver(project_root)
+    urls = ["https://vm.tiktok.com/ZMabc123/", "https://vm.tiktok.com/ZMabc123?x=1", FULL]
+    assert asyncio.run(resolver.resolve_all(session, urls)) == {}
+    assert session.calls == [("HEAD", "https://vm.tiktok.com/ZMabc123")]
+    assert resolver.normalize(urls[1]) == (FULL, "alice", "7300000000000000001")
+
+    # Cache được lưu ra đĩa: lần mở sau không cần gọi mạng
+    reloaded = ShortLinkResolver(project_root)
+    session.calls.clear()
+    assert asyncio.run(reloaded.resolve_all(session, urls)) == {}
+    assert session.calls == []
+    assert reloaded.normalize(urls[0])[0] == FULL
+
+
+def test_resolve_falls_back_to_get_and_reports_failures(project_root):
+    session = FakeSession({
+        "https://vt.tiktok.com/good": FULL,
+        "https://vt.tiktok.com/bad": "https://www.tiktok.com/login",
+    }, head_redirects=False)
+    resolver = ShortLinkResolver(project_root)
+    failures = asyncio.run(resolver.resolve_all(session, ["https://vt.tiktok.com/good", "https://vt.tiktok.com/bad/"]))
+    assert list(failures) == ["https://vt.tiktok.com/bad/"]
+    assert ("GET", "https://vt.tiktok.com/good") in session.calls
+    assert resolver.normalize("https://vt.tiktok.com/good")[0] == FULL
+    assert resolver.normalize("https://vt.tiktok.com/bad/") is None
@@ -0,0 +1,50 @@
+# tests/test_logo_cache.py
+
+import os
+
+import pytest
+from PIL import Image
+
+from VideoTools import logo_cache
+from VideoTools.logo_cache import get_scaled_logo
+
+
+@pytest.fixture
+def logo(tmp_path):
+    path = str(tmp_path / "logo.png")
+    Image.new("RGBA", (500, 250), (0, 0, 255, 200)).save(path)
+    return path
+
+
+def test_logo_is_scaled_to_frame_width(project_root, logo):
+    path = get_scaled_logo(project_root, logo, 1920, 10)
+    with Image.open(path) as image:
+        assert image.size == (192, 96) and image.mode == "RGBA"
+    assert os.path.dirname(path) == os.path.join(project_root, "Data", logo_cache.LOGO_CACHE_DIR)
+
+
+def test_same_width_reuses_cached_file(project_root, logo, monkeypatch):
+    first = get_scaled_logo(project_root, logo, 1920, 10)
+    monkeypatch.setattr(logo_cache.Image, "open", lambda path: pytest.fail("không được thu nhỏ lại logo"))
+    assert get_scaled_logo(project_root, logo, 1920, 10) == first
+
+
+def test_width_or_logo_change_creates_new_file(project_root, logo):
+    first = get_scaled_logo(project_root, logo, 1920, 10)
+    assert get_scaled_logo(project_root, logo, 1280, 15) == first  # Cùng độ rộng đích 192 px
+    smaller = get_scaled_logo(project_root, logo, 1280, 10)
+    assert smaller != first
+    with Image.open(smaller) as image:
+        assert image.size == (128, 64)
+
+    Image.new("RGBA", (200, 200), (0, 255, 0, 255)).save(logo)
+    os.utime(logo, ns=(os.stat(logo).st_atime_ns, os.stat(logo).st_mtime_ns + 10 ** 9))
+    replaced = get_scaled_logo(project_root, logo, 1920, 10)
+    assert replaced != first
+    with Image.open(replaced) as image:
+        assert image.size == (192, 192)
+
+
+def test_tiny_target_keeps_at_least_one_pixel(project_root, logo):
+    with Image.open(get_scaled_logo(project_root, logo, 100, 0.1)) as image:
+        assert image.size == (1, 1)
@@ -0,0 +1,100 @@
+# tests/test_loudness.py
+
+import json
+import os
+
+import pytest
+
+from AudioTools.loudness import (
+    LoudnessService, LoudnessStats, resolve_targets, album_loudness,
+    TARGET_TRACK, TARGET_ALBUM, TARGET_BATCH, LOUDNORM_MIN_I, LOUDNORM_MAX_I, LOUDNESS_CACHE_DIR, INDEX_FILE,
+)
+
+
+def stats(input_i, duration=60.0):
+    return LoudnessStats(input_i, 5.0, -1.0, input_i - 10, duration)
+
+
+def test_track_mode_uses_target_for_every_file():
+    targets = resolve_targets({"a": stats(-20.0), "b": stats(-9.0)}, -14.0, TARGET_TRACK)
+    assert targets == {"a": -14.0, "b": -14.0}
+
+
+def test_album_mode_applies_one_gain_and_keeps_differences():
+    targets = resolve_targets({"a": stats(-20.0), "b": stats(-14.0)}, -16.0, TARGET_ALBUM)
+    assert targets["b"] - targets["a"] == pytest.approx(6.0)
+    # Cả album (trung bình năng lượng) đạt đúng mức mục tiêu
+    album = album_loudness([stats(targets["a"]), stats(targets["b"])])
+    assert album == pytest.approx(-16.0, abs=0.1)
+
+
+def test_album_loudness_is_weighted_by_duration():
+    long_quiet, short_loud = stats(-30.0, duration=600.0), stats(-10.0, duration=1.0)
+    assert album_loudness([long_quiet, short_loud]) < -25.0
+    # Không có thời lượng: mỗi file cùng trọng số
+    assert album_loudness([stats(-20.0, 0.0), stats(-20.0, 0.0)]) == pytest.approx(-20.0)
+
+
+@pytest.mark.parametrize("levels, median", [([-20.0, -10.0, -16.0], -16.0), ([-20.0, -10.0, -16.0, -12.0], -14.0)])
+def test_batch_mode_uses_median_of_batch(levels, median):
+    targets = resolve_targets({str(i): stats(level) for i, level in enumerate(levels)}, -23.0, TARGET_BATCH)
+    assert set(targets.values()) == {median}
+
+
+def test_targets_are_clamped_to_loudnorm_range():
+    targets = resolve_targets({"quiet": stats(-80.0), "loud": stats(-1.0)}, -14.0, TARGET_ALBUM)
+    assert LOUDNORM_MIN_I <= min(targets.values()) and max(targets.values()) <= LOUDNORM_MAX_I
+    assert resolve_targets({}, -14.0, TARGET_ALBUM) == {}
+
+
+class CountingMeasure:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, file_path, on_start=None):
+        self.calls.append(file_path)
+        if on_start:
+            on_start(1234)
+        return stats(-18.5)
+
+
+def test_service_measures_each_file_once_and_persists(project_root, tmp_path):
+    audio = tmp_path / "song.wav"
+    audio.write_bytes(b"\0" * 128)
+    measure = CountingMeasure()
+    service = LoudnessService(project_root, measure=measure)
+    pids = []
+    first = service.get_stats(str(audio), on_start=pids.append)
+    second = service.get_stats(str(audio))
+    assert measure.calls == [str(audio)] and pids == [1234]
+    assert first.input_i == second.input_i == -18.5
+
+    # Cache trên đĩa dùng lại được ở phiên sau
+    reloaded = LoudnessService(project_root, measure=measure)
+    assert reloaded.get_stats(str(audio)).input_i == -18.5
+    assert len(measure.calls) == 1
+    with open(os.path.join(project_root, "Data", LOUDNESS_CACHE_DIR, INDEX_FILE), encoding="utf-8") as f:
+        assert len(json.load(f)) == 1
+
+
+def test_service_remeasures_changed_file(project_root, tmp_path):
+    audio = tmp_path / "song.wav"
+    audio.write_bytes(b"\0" * 128)
+    measure = CountingMeasure()
+    service = LoudnessService(project_root, measure=measure)
+    service.get_stats(str(audio))
+    audio.write_bytes(b"\0" * 256)
+    service.get_stats(str(audio))
+    assert len(measure.calls) == 2
+
+
+def test_corrupt_index_starts_empty(project_root, tmp_path):
+    cache_dir = os.path.join(project_root, "Data", LOUDNESS_CACHE_DIR)
+    os.makedirs(cache_dir)
+    with open(os.path.join(cache_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+        f.write("{broken")
+    audio = tmp_path / "song.wav"
+    audio.write_bytes(b"\0" * 128)
+    measure = CountingMeasure()
+    assert LoudnessService(project_root, measure=measure).get_stats(str(audio)).input_i == -18.5
+    assert len(measure.calls) == 1
@@ -0,0 +1,144 @@
+# tests/test_loudness_meter.py
+#
+# Bộ đo NumPy được đối chiếu với hai bộ đo của FFmpeg trên các tín hiệu tạo sẵn:
+# ebur128 (bộ đo BS.1770 đầy đủ: I, LRA, đỉnh thật) và loudnorm (pass 1 mà bộ đo NumPy thay thế).
+
+import re
+import threading
+import subprocess
+
+import numpy as np
+import pytest
+
+from AudioTools.loudness import _parse_loudnorm_json
+from AudioTools.loudness_meter import (
+    compute_loudness, iter_pcm_blocks, channel_weights, METER_SAMPLE_RATE, READ_FRAMES,
+)
+from Utils.ffmpeg_utils import iter_ffmpeg_stderr
+
+NOISE = "(random({seed})*2-1)"
+
+SIGNALS = {
+    # Mức thay đổi theo chu kỳ 20s: kiểm tra gating của I và dải độ lớn LRA
+    "dynamic_noise": (
+        "aevalsrc='(0.05+0.3*between(mod(t,20),5,12)+0.1*gte(mod(t,20),15))*" + NOISE.format(seed=0) +
+        "|(0.05+0.3*between(mod(t,20),5,12))*" + NOISE.format(seed=1) + "':s=48000:d=60", 2, True),
+    # Đỉnh giữa các mẫu (inter-sample peak) cao hơn đỉnh mẫu
+    "multi_sine_44k": (
+        "aevalsrc='0.5*sin(2*PI*3000*t)+0.45*sin(2*PI*5000*t+1)|0.3*sin(2*PI*7000*t)':s=44100:d=12", 2, True),
+    # Một xung ngắn đúng tại ranh giới khối đọc 10s
+    "burst_on_block_boundary": (
+        "aevalsrc='exp(-((t-10)*40)^2)*0.95*sin(2*PI*9000*t+0.7)+0.02*" + NOISE.format(seed=2) + "':s=48000:d=20",
+        1, True),
+    "surround_5_1": (
+        "aevalsrc='0.1*sin(2*PI*300*t)|0.1*sin(2*PI*500*t)|0.1*sin(2*PI*700*t)|0.3*sin(2*PI*60*t)|0.2*"
+        + NOISE.format(seed=0) + "|0.2*" + NOISE.format(seed=1) + "':s=48000:d=20:c=5.1", 6, True),
+    # loudnorm chỉ tính 6 kênh đầu nên với 7.1 chỉ đối chiếu với ebur128
+    "surround_7_1": (
+        "aevalsrc='0.1*sin(2*PI*300*t)|0.1*sin(2*PI*500*t)|0.1*sin(2*PI*700*t)|0.3*sin(2*PI*60*t)|0.2*"
+        + NOISE.format(seed=0) + "|0.2*" + NOISE.format(seed=1) + "|0.2*" + NOISE.format(seed=2) + "|0.2*"
+        + NOISE.format(seed=3) + "':s=48000:d=20:c=7.1", 8, False),
+}
+
+
+def make_signal(ffmpeg, tmp_path, name):
+    source, _, _ = SIGNALS[name]
+    path = str(tmp_path / f"{name}.wav")
+    subprocess.run([ffmpeg, "-v", "error", "-y", "-f", "lavfi", "-i", source, "-c:a", "pcm_f32le", path], check=True)
+    return path
+
+def ebur128_summary(path):
+    output = "\n".join(iter_ffmpeg_stderr(["-nostdin", "-i", path, "-af", "ebur128=peak=true", "-f", "null", "-"]))
+    summary = output[output.rfind("Summary:"):]
+    def value(label):
+        return float(re.search(label + r":\s*(-?[\d.]+)", summary).group(1))
+    return value(r"\bI"), value("LRA"), value("Peak")
+
+def loudnorm_stats(path):
+    stats = _parse_loudnorm_json(iter_ffmpeg_stderr(
+        ["-nostdin", "-i", path, "-af", "loudnorm=print_format=json", "-f", "null", "-"]
+    ))
+    return float(stats["input_i"]), float(stats["input_lra"]), float(stats["input_tp"])
+
+
+@pytest.mark.parametrize("name", sorted(SIGNALS))
+def test_meter_matches_ffmpeg(ffmpeg, tmp_path, name):
+    path = make_signal(ffmpeg, tmp_path, name)
+    _, channels, compare_loudnorm = SIGNALS[name]
+    integrated, lra, true_peak, _, frames = compute_loudness(iter_pcm_blocks(path, channels), channels)
+    assert frames > 0
+
+    ref_i, ref_lra, ref_tp = ebur128_summary(path)
+    assert integrated == pytest.approx(ref_i, abs=0.1)
+    assert lra == pytest.approx(ref_lra, abs=0.2)
+    assert true_peak == pytest.approx(ref_tp, abs=0.2)
+
+    if compare_loudnorm:
+        # I của loudnorm lệch ebur128 vài phần mười LU với nội dung bị gating mạnh, nên chỉ so LRA và TP
+        _, norm_lra, norm_tp = loudnorm_stats(path)
+        assert lra == pytest.approx(norm_lra, abs=0.3)
+        assert true_peak == pytest.approx(norm_tp, abs=0.2)
+
+
+def test_steady_signal_integrated_matches_loudnorm(ffmpeg, tmp_path):
+    path = make_signal(ffmpeg, tmp_path, "multi_sine_44k")
+    integrated, _, _, _, _ = compute_loudness(iter_pcm_blocks(path, 2), 2)
+    assert integrated == pytest.approx(loudnorm_stats(path)[0], abs=0.1)
+
+
+def test_block_size_does_not_change_results():
+    rng = np.random.default_rng(1)
+    signal = rng.standard_normal((METER_SAMPLE_RATE * 12, 2)) * 0.2
+    # Đỉnh nhọn ngay tại ranh giới khối
+    signal[READ_FRAMES - 1:READ_FRAMES + 1] = [[0.9, -0.9], [-0.9, 0.9]]
+    whole = compute_loudness([signal], 2)
+    for block in (READ_FRAMES, 4801, 1000):
+        blocks = [signal[i:i + block] for i in range(0, len(signal), block)]
+        assert compute_loudness(blocks, 2) == pytest.approx(whole)
+
+
+def test_channel_weights_cover_common_layouts():
+    assert list(channel_weights(2)) == [1.0, 1.0]
+    assert list(channel_weights(6)) == [1.0, 1.0, 1.0, 0.0, 1.41, 1.41]
+    assert list(channel_weights(8)) == [1.0, 1.0, 1.0, 0.0, 1.41, 1.41, 1.41, 1.41]
+    assert list(channel_weights(8, "7.1(wide)")) == [1.0, 1.0, 1.0, 0.0, 1.41, 1.41, 1.0, 1.0]
+    assert list(channel_weights(4, "quad")) == [1.0, 1.0, 1.41, 1.41]
+    assert list(channel_weights(3)) == [1.0, 1.0, 0.0]
+    # Bố cục không khớp số kênh thì dùng bố cục mặc định (4.0); số kênh lạ thì mọi kênh trọng số 1
+    assert list(channel_weights(4, "5.1")) == [1.0, 1.0, 1.0, 1.41]
+    assert list(channel_weights(12)) == [1.0] * 12
+
+
+def run_with_deadline(func, seconds=30):
+    """Chạy func trên luồng riêng; trả về (kết quả, lỗi), hoặc fail nếu quá hạn (FFmpeg bị treo)."""
+    result = {}
+    def target():
+        try:
+            result["value"] = func()
+        except Exception as e:
+            result["error"] = e
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "Bộ đo bị treo khi FFmpeg in nhiều lỗi ra stderr"
+    return result.get("value"), result.get("error")
+
+
+def test_corrupt_file_with_large_stderr_does_not_hang(make_media):
+    path = make_media("damaged.mp3", audio="sine=frequency=440", duration=60.0)
+    data = bytearray(open(path, "rb").read())
+    rng = np.random.default_rng(1)
+    # Hỏng 40 byte mỗi 250 byte: FFmpeg in ra nhiều hơn bộ đệm pipe (~64 KB) lỗi "Header missing"
+    for start in range(2000, len(data) - 100, 250):
+        data[start:start + 40] = rng.integers(0, 256, 40, dtype=np.uint8).tobytes()
+    with open(path, "wb") as f:
+        f.write(data)
+    frames, error = run_with_deadline(lambda: sum(len(block) for block in iter_pcm_blocks(path, 1)))
+    assert error is None and frames > 0
+
+
+def test_undecodable_file_raises_with_ffmpeg_message(ffmpeg, tmp_path):
+    path = tmp_path / "broken.mp3"
+    path.write_bytes(b"not audio at all" * 1000)
+    _, error = run_with_deadline(lambda: list(iter_pcm_blocks(str(path), 2)))
+    assert error is not None and "Invalid data" in str(error)
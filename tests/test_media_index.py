@@ -0,0 +1,64 @@
+# tests/test_media_index.py
+
+from array import array
+
+import pytest
+
+from Utils.media_index import MediaIndex, parse_packet_lines
+
+
+def make_index(key_times, step=0.5, duration=10.0):
+    """Chỉ mục video giả lập: một gói tin mỗi `step` giây, keyframe tại key_times."""
+    count = int(duration / step)
+    pts = array('d', (i * step for i in range(count)))
+    pos = array('q', (i * 1000 for i in range(count)))
+    size = array('i', [1000] * count)
+    key_flags = array('b', (1 if t in key_times else 0 for t in pts))
+    return MediaIndex("video", pts, pos, size, key_flags)
+
+
+def test_packet_lines_are_relative_to_format_start_time():
+    lines = [
+        "packet|pts_time=1.400000|pos=564|size=100|flags=K__",
+        "packet|pts_time=1.440000|pos=664|size=50|flags=___",
+        "packet|pts_time=3.400000|pos=N/A|size=80|flags=K__",
+        "format|start_time=1.400000",
+    ]
+    packets = parse_packet_lines(lines)
+    assert [round(p[0], 6) for p in packets] == [0.0, 0.04, 2.0]
+    assert [p[1] for p in packets] == [564, 664, -1]
+    assert [p[3] for p in packets] == [1, 0, 1]
+
+
+def test_packet_lines_without_start_time_are_unchanged():
+    packets = parse_packet_lines(["packet|pts_time=2.5|pos=10|size=1|flags=K_", "packet|pts_time=N/A|pos=20"])
+    assert packets == [(2.5, 10, 1, 1)]
+
+
+def test_keyframe_lookups():
+    index = make_index({0.0, 2.0, 4.0, 8.0})
+    assert index.keyframe_at_or_before(3.9) == (2.0, 4000)
+    assert index.keyframe_at_or_before(4.0) == (4.0, 8000)
+    assert index.keyframe_at_or_after(4.1) == (8.0, 16000)
+    # Ngoài phạm vi: trả về keyframe đầu/cuối
+    assert index.keyframe_at_or_after(9.9) == (8.0, 16000)
+    assert index.keyframe_at_or_before(-1) == (0.0, 0)
+    assert index.keyframes_between(1.0, 8.0) == [2.0, 4.0]
+    assert index.packet_at(2.7) == (2.5, 5000, 1000)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = make_index({0.0, 5.0})
+    path = str(tmp_path / "index.idx")
+    index.save(path)
+    loaded = MediaIndex.load(path)
+    assert loaded.stream_type == "video"
+    assert list(loaded.pts) == list(index.pts)
+    assert list(loaded.key_pts) == [0.0, 5.0]
+
+
+def test_cache_from_older_format_is_rejected(tmp_path):
+    path = tmp_path / "old.idx"
+    path.write_bytes(b"MIDX1" + b"\x00" * 16)
+    with pytest.raises(ValueError):
+        MediaIndex.load(str(path))
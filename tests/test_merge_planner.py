@@ -0,0 +1,146 @@
+# tests/test_merge_planner.py
+
+import subprocess
+
+from CutMerge import merge_planner
+from CutMerge.merge_planner import plan_merge, plan_full_reencode, build_normalize_args, stream_signature
+
+
+def video_stream(**overrides):
+    stream = {
+        "codec_type": "video", "codec_name": "h264", "profile": "High", "level": 31,
+        "width": 1280, "height": 720, "pix_fmt": "yuv420p",
+        "r_frame_rate": "30/1", "avg_frame_rate": "30/1", "time_base": "1/15360",
+    }
+    stream.update(overrides)
+    return stream
+
+def audio_stream(**overrides):
+    stream = {"codec_type": "audio", "codec_name": "aac", "profile": "LC", "sample_rate": "48000", "channels": 2}
+    stream.update(overrides)
+    return stream
+
+def probe_info(video=None, audio=None, duration="60.0"):
+    streams = [s for s in (video, audio) if s is not None]
+    return {"streams": streams, "format": {"duration": duration}}
+
+def fake_probe(monkeypatch, infos):
+    monkeypatch.setattr(merge_planner, "probe_media_streams", lambda path: infos[path])
+
+
+def test_vfr_average_rate_does_not_make_outliers(monkeypatch):
+    fake_probe(monkeypatch, {
+        "a.mp4": probe_info(video_stream(avg_frame_rate="1799/60"), audio_stream()),
+        "b.mp4": probe_info(video_stream(avg_frame_rate="29971/1000"), audio_stream()),
+        "c.mp4": probe_info(video_stream(avg_frame_rate="30/1"), audio_stream()),
+    })
+    plan = plan_merge(["a.mp4", "b.mp4", "c.mp4"])
+    assert plan is not None and plan.outliers == []
+
+
+def test_profile_level_time_base_and_aac_profile_are_compared(monkeypatch):
+    fake_probe(monkeypatch, {
+        "ref1.mp4": probe_info(video_stream(), audio_stream()),
+        "ref2.mp4": probe_info(video_stream(), audio_stream()),
+        "profile.mp4": probe_info(video_stream(profile="Main"), audio_stream()),
+        "level.mp4": probe_info(video_stream(level=40), audio_stream()),
+        "timebase.mp4": probe_info(video_stream(time_base="1/90000"), audio_stream()),
+        "he_aac.mp4": probe_info(video_stream(), audio_stream(profile="HE-AAC")),
+    })
+    plan = plan_merge(["ref1.mp4", "ref2.mp4", "profile.mp4", "level.mp4", "timebase.mp4", "he_aac.mp4"])
+    assert [item.path for item in plan.outliers] == ["profile.mp4", "level.mp4", "timebase.mp4", "he_aac.mp4"]
+
+
+def test_outliers_are_encoded_with_reference_parameters(monkeypatch):
+    fake_probe(monkeypatch, {
+        "ref.mp4": probe_info(video_stream(), audio_stream()),
+        "ref2.mp4": probe_info(video_stream(), audio_stream()),
+        "odd.mp4": probe_info(video_stream(width=1920, height=1080, profile="Main"), audio_stream(sample_rate="44100")),
+    })
+    plan = plan_merge(["ref.mp4", "ref2.mp4", "odd.mp4"])
+    args = build_normalize_args(plan.outliers[0], plan.reference)
+    joined = " ".join(args)
+    assert "scale=1280:720" in joined and "fps=30.0" in joined and "format=yuv420p" in joined
+    assert args[args.index("-profile:v") + 1] == "high"
+    assert args[args.index("-level:v") + 1] == "3.1"
+    assert args[args.index("-video_track_timescale") + 1] == "15360"
+    assert args[args.index("-ar") + 1] == "48000"
+    assert args[args.index("-profile:a") + 1] == "aac_low"
+
+
+def test_reference_profile_without_encoder_falls_back(monkeypatch):
+    fake_probe(monkeypatch, {
+        "a.mp4": probe_info(video_stream(), audio_stream(profile="HE-AAC")),
+        "b.mp4": probe_info(video_stream(), audio_stream(profile="HE-AAC")),
+        "c.mp4": probe_info(video_stream(profile="Main"), audio_stream(profile="HE-AAC")),
+    })
+    assert plan_merge(["a.mp4", "b.mp4", "c.mp4"]) is None
+
+
+def test_missing_audio_gets_silence_with_reference_layout(monkeypatch):
+    fake_probe(monkeypatch, {
+        "a.mp4": probe_info(video_stream(), audio_stream(channels=1)),
+        "b.mp4": probe_info(video_stream(), audio_stream(channels=1)),
+        "silent.mp4": probe_info(video_stream()),
+    })
+    plan = plan_merge(["a.mp4", "b.mp4", "silent.mp4"])
+    args = build_normalize_args(plan.outliers[0], plan.reference)
+    assert "anullsrc=r=48000:cl=mono" in args
+    assert args[args.index("-ac") + 1] == "1"
+
+
+def test_full_reencode_reference(monkeypatch):
+    fake_probe(monkeypatch, {
+        "a.flv": probe_info(video_stream(r_frame_rate="60/1", codec_name="flv1", profile=None), audio_stream(codec_name="mp3")),
+        "b.mp4": probe_info(video_stream(), audio_stream()),
+    })
+    plan = plan_full_reencode(["a.flv", "b.mp4"])
+    assert plan.reference["video"].fps == 60.0
+    assert plan.reference["video"].codec == "h264" and plan.reference["audio"].codec == "aac"
+    assert all(item.needs_reencode for item in plan.items)
+
+
+def test_normalize_args_run_in_ffmpeg(make_media, tmp_path, ffmpeg):
+    source = make_media("odd.mp4", video="testsrc=size=320x240:rate=25", duration=1.0)
+    info = probe_info(video_stream(width=320, height=240, r_frame_rate="25/1"), audio_stream())
+    item = merge_planner.MergeItem(source, stream_signature(info), info)
+    reference = stream_signature(probe_info(video_stream(width=640, height=360), audio_stream()))
+    output = str(tmp_path / "normalized.mp4")
+    subprocess.run([ffmpeg, "-v", "error", "-y"] + build_normalize_args(item, reference) + [output], check=True)
+
+
+def test_chunked_normalize_reassembles_full_timeline(make_media, tmp_path, ffmpeg):
+    source = make_media("long.mp4", video="testsrc=size=320x240:rate=25", duration=4.0)
+    info = probe_info(video_stream(width=320, height=240, r_frame_rate="25/1"), audio_stream(), duration="4.0")
+    item = merge_planner.MergeItem(source, stream_signature(info), info)
+    reference = stream_signature(probe_info(video_stream(width=640, height=360), audio_stream()))
+
+    def run(args, output):
+        subprocess.run([ffmpeg, "-v", "error", "-y"] + args + [output], check=True)
+
+    chunk_files = []
+    for j, (start, end) in enumerate([(0.0, 2.0), (2.0, 4.0)]):
+        chunk_files.append(str(tmp_path / f"chunk_{j}.mp4"))
+        run(build_normalize_args(item, reference, audio=False, start=start, length=end - start), chunk_files[-1])
+    audio_file = str(tmp_path / "audio.mka")
+    run(build_normalize_args(item, reference, video=False), audio_file)
+    list_file = tmp_path / "list.txt"
+    list_file.write_text("".join(f"file '{path}'\n" for path in chunk_files))
+    output = str(tmp_path / "merged.mp4")
+    run(["-f", "concat", "-safe", "0", "-i", str(list_file), "-i", audio_file,
+         "-map", "0:v:0", "-map", "1:a:0", "-c", "copy"], output)
+
+    probe = subprocess.run([ffmpeg, "-hide_banner", "-i", output], capture_output=True, text=True).stderr
+    assert "Duration: 00:00:04.0" in probe
+    assert "Video: h264" in probe and "640x360" in probe and "Audio: aac" in probe
+
+
+def test_audio_only_job_for_silent_file_is_bounded(tmp_path, make_media, ffmpeg):
+    source = make_media("silent.mp4", audio=None, video="testsrc=size=320x240:rate=25", duration=2.0)
+    info = probe_info(video_stream(width=320, height=240), duration="2.0")
+    item = merge_planner.MergeItem(source, stream_signature(info), info)
+    reference = stream_signature(probe_info(video_stream(), audio_stream()))
+    args = build_normalize_args(item, reference, video=False)
+    assert "-shortest" not in args and args[args.index("-t") + 1] == "2.0"
+    output = str(tmp_path / "silence.mka")
+    subprocess.run([ffmpeg, "-v", "error", "-y"] + args + [output], check=True, timeout=30)
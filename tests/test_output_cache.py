@@ -0,0 +1,60 @@
+# tests/test_output_cache.py
+
+import os
+
+import pytest
+
+from Utils.output_cache import OutputCache
+
+
+@pytest.fixture
+def cache(project_root, ffmpeg):
+    return OutputCache(project_root, max_bytes=1000)
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_key_depends_on_full_argument_vector(cache, tmp_path):
+    source = write(tmp_path / "in.mp3", b"audio")
+    pass2 = ["-af", "loudnorm=I=-14:TP=-1.5:LRA=7:measured_I=-20.1:measured_TP=-3.0", "-ar", "44100"]
+    assert cache.make_key(source, pass2, ".mp3") == cache.make_key(source, list(pass2), ".MP3")
+    assert cache.make_key(source, pass2, ".mp3") != cache.make_key(source, pass2[:1] + ["loudnorm=I=-16"] + pass2[2:], ".mp3")
+    assert cache.make_key(source, pass2, ".mp3") != cache.make_key(source, pass2 + ["chunked", "8", "2.0"], ".mp3")
+    assert cache.make_key(source, pass2, ".mp3") != cache.make_key(source, pass2, ".wav")
+
+
+def test_key_changes_when_source_changes(cache, tmp_path):
+    source = write(tmp_path / "in.mp3", b"audio")
+    key = cache.make_key(source, ["-af", "anlmdn"], ".mp3")
+    write(source, b"longer audio")
+    assert cache.make_key(source, ["-af", "anlmdn"], ".mp3") != key
+
+
+def test_store_and_fetch_round_trip(cache, tmp_path):
+    source = write(tmp_path / "in.mp3", b"audio")
+    output = write(tmp_path / "out.mp3", b"result")
+    key = cache.make_key(source, [], ".mp3")
+    cache.store(key, output)
+    os.remove(output)
+    assert cache.fetch(key, output)
+    with open(output, 'rb') as f:
+        assert f.read() == b"result"
+    assert not cache.fetch("missing", str(tmp_path / "other.mp3"))
+
+
+def test_modified_cached_output_is_dropped(cache, tmp_path):
+    output = write(tmp_path / "out.mp3", b"result")
+    cache.store("key", output)
+    # Output trả ra bằng hardlink: sửa tại chỗ thì mục cache không còn đúng
+    write(cache._entry_path("key", cache._index["key"]), b"tagged result")
+    assert not cache.fetch("key", str(tmp_path / "again.mp3"))
+    assert "key" not in cache._index
+
+
+def test_least_recently_used_entries_are_evicted(cache, tmp_path):
+    for name in ("a", "b", "c"):
+        cache.store(name, write(tmp_path / f"{name}.wav", name.encode() * 400))
+    assert set(cache._index) == {"b", "c"}
@@ -0,0 +1,58 @@
+# tests/test_parallel_encode.py
+
+import os
+
+from Utils.parallel_encode import (
+    EncodeJob, allocate_chunk_counts, plan_keyframe_chunks, run_parallel_encodes, write_concat_list, MIN_CHUNK_SECONDS,
+)
+
+
+def test_chunks_cover_timeline_evenly_without_keyframes():
+    chunks = plan_keyframe_chunks(400.0, 4)
+    assert chunks == [(0.0, 100.0), (100.0, 200.0), (200.0, 300.0), (300.0, 400.0)]
+
+
+def test_chunk_boundaries_snap_back_to_keyframes():
+    keyframes = [0.0, 45.0, 98.0, 150.0, 210.0, 290.0, 380.0]
+    chunks = plan_keyframe_chunks(400.0, 4, keyframes)
+    assert chunks == [(0.0, 98.0), (98.0, 150.0), (150.0, 290.0), (290.0, 400.0)]
+    assert all(start in keyframes for start, _ in chunks)
+
+
+def test_short_media_is_not_split():
+    assert plan_keyframe_chunks(MIN_CHUNK_SECONDS * 1.5, 8) == [(0.0, MIN_CHUNK_SECONDS * 1.5)]
+
+
+def test_missing_keyframes_merge_chunks():
+    # Không có keyframe giữa 0 và 300: các điểm chia 100, 200 bị bỏ, chỉ còn điểm tại 300
+    chunks = plan_keyframe_chunks(400.0, 4, [0.0, 300.0])
+    assert chunks == [(0.0, 300.0), (300.0, 400.0)]
+
+
+def test_chunk_budget_is_shared_across_files():
+    assert allocate_chunk_counts([3600.0, 3600.0], 8) == [4, 4]
+    assert allocate_chunk_counts([7200.0, 600.0, 10.0], 8) == [7, 1, 1]
+    assert allocate_chunk_counts([0.0, 0.0], 8) == [1, 1]
+
+
+def test_parallel_encodes_report_progress_and_collect_errors(make_media, tmp_path):
+    source = make_media("tone.wav", duration=2.0)
+    jobs = [
+        EncodeJob(["-i", source, "-c:a", "pcm_s16le"], str(tmp_path / f"out_{i}.wav"), 2.0)
+        for i in range(3)
+    ]
+    progress = []
+    run_parallel_encodes(jobs, max_workers=2, on_progress=progress.append)
+    assert progress[-1] == 1.0
+    assert all(os.path.exists(job.output_file) for job in jobs)
+
+    failed = EncodeJob(["-i", str(tmp_path / "missing.wav")], str(tmp_path / "x.wav"), 1.0)
+    results = []
+    run_parallel_encodes([failed, jobs[0]], on_job_done=lambda job, error: results.append((job, error)))
+    assert {job: error is None for job, error in results} == {failed: False, jobs[0]: True}
+
+
+def test_concat_list_escapes_quotes(tmp_path):
+    list_file = tmp_path / "list.txt"
+    write_concat_list(["/a/it's.mp4", "/b/c.mp4"], str(list_file))
+    assert list_file.read_text(encoding="utf-8") == "file '/a/it'\\''s.mp4'\nfile '/b/c.mp4'\n"
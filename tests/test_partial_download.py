@@ -0,0 +1,243 @@
+# tests/test_partial_download.py
+
+import os
+import json
+import asyncio
+
+import pytest
+
+from Down_Chanel.down_logic import (
+    partial_paths, save_partial_meta, handle_partial_file, finalize_partial, discard_partial,
+    IncompleteDownloadError,
+)
+
+PAYLOAD = bytes(range(256)) * 1024  # 256 KB, lớn hơn MIN_VIDEO_BYTES
+
+
+def write_partial(file_path, data, **meta):
+    with open(partial_paths(file_path)[0], "wb") as f:
+        f.write(data)
+    if meta:
+        save_partial_meta(file_path, **meta)
+
+
+def test_resumable_partial_is_kept(tmp_path):
+    target = str(tmp_path / "video.mp4")
+    write_partial(target, PAYLOAD[:4096], expected_size=len(PAYLOAD), etag='"v1"')
+    size, meta = handle_partial_file(target)
+    assert size == 4096 and meta["etag"] == '"v1"'
+
+
+@pytest.mark.parametrize("data, meta", [
+    (PAYLOAD[:100], {"expected_size": len(PAYLOAD), "etag": '"v1"'}),          # quá nhỏ
+    (PAYLOAD[:4096], {}),                                                        # thiếu sidecar
+    (PAYLOAD[:4096], {"expected_size": len(PAYLOAD)}),                          # không có validator
+    (PAYLOAD[:4096], {"expected_size": 1024, "etag": '"v1"'}),                  # vượt kích thước dự kiến
+])
+def test_unusable_partial_is_discarded(tmp_path, data, meta):
+    target = str(tmp_path / "video.mp4")
+    write_partial(target, data, **meta)
+    assert handle_partial_file(target) is None
+    assert not any(os.path.exists(path) for path in partial_paths(target))
+
+
+def test_orphan_sidecar_is_removed(tmp_path):
+    target = str(tmp_path / "video.mp4")
+    save_partial_meta(target, len(PAYLOAD), etag='"v1"')
+    assert handle_partial_file(target) is None
+    assert not os.path.exists(partial_paths(target)[1])
+
+
+def test_corrupt_sidecar_is_discarded(tmp_path):
+    target = str(tmp_path / "video.mp4")
+    write_partial(target, PAYLOAD[:4096])
+    with open(partial_paths(target)[1], "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert handle_partial_file(target) is None
+    assert not os.path.exists(partial_paths(target)[0])
+
+
+def test_finalize_renames_only_complete_file(tmp_path):
+    target = str(tmp_path / "video.mp4")
+    write_partial(target, PAYLOAD[:4096], expected_size=len(PAYLOAD), etag='"v1"')
+    with pytest.raises(IncompleteDownloadError):
+        finalize_partial(target, len(PAYLOAD))
+    assert not os.path.exists(target) and os.path.exists(partial_paths(target)[0])
+
+    write_partial(target, PAYLOAD)
+    assert finalize_partial(target, len(PAYLOAD)) == len(PAYLOAD)
+    assert os.path.getsize(target) == len(PAYLOAD)
+    assert not any(os.path.exists(path) for path in partial_paths(target))
+
+
+def test_discard_partial_without_files_is_noop(tmp_path):
+    discard_partial(str(tmp_path / "missing.mp4"))
+
+
+# --- Tiếp tục tải qua HTTP Range với máy chủ cục bộ ---
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from Down_Chanel.down_api import TikTokDownloader
+
+
+async def serve_and_download(target, etag):
+    """Máy chủ hỗ trợ Range + If-Range theo ETag; trả về danh sách header Range đã nhận."""
+    ranges = []
+
+    async def handle(request):
+        ranges.append(request.headers.get("Range"))
+        headers = {"Content-Type": "video/mp4", "ETag": etag}
+        range_header = request.headers.get("Range")
+        if range_header and request.headers.get("If-Range") == etag:
+            start = int(range_header[len("bytes="):].rstrip("-"))
+            headers["Content-Range"] = f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}"
+            return web.Response(status=206, body=PAYLOAD[start:], headers=headers)
+        return web.Response(body=PAYLOAD, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/video", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    downloader = TikTokDownloader()
+    await downloader.open(1)
+    try:
+        size = await downloader.stream_to_file(f"http://127.0.0.1:{runner.addresses[0][1]}/video", target)
+    finally:
+        await downloader.close()
+        await runner.cleanup()
+    return size, ranges
+
+
+def test_download_resumes_from_partial(tmp_path):
+    target = str(tmp_path / "video.mp4")
+    write_partial(target, PAYLOAD[:100 * 1024], expected_size=len(PAYLOAD), etag='"v1"')
+    size, ranges = asyncio.run(serve_and_download(target, '"v1"'))
+    assert ranges == [f"bytes={100 * 1024}-"]
+    assert size == len(PAYLOAD)
+    with open(target, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert not any(os.path.exists(path) for path in partial_paths(target))
+
+
+def test_changed_file_on_server_restarts_download(tmp_path):
+    target = str(tmp_path / "video.mp4")
+    write_partial(target, b"\0" * (100 * 1024), expected_size=len(PAYLOAD), etag='"old"')
+    size, _ = asyncio.run(serve_and_download(target, '"new"'))
+    assert size == len(PAYLOAD)
+    with open(target, "rb") as f:
+        assert f.read() == PAYLOAD
+
+
+def test_interrupted_download_keeps_part_and_sidecar(tmp_path):
+    target = str(tmp_path / "video.mp4")
+
+    async def run():
+        async def handle(request):
+            response = web.StreamResponse(headers={
+                "Content-Type": "video/mp4", "Content-Length": str(len(PAYLOAD)), "ETag": '"v1"',
+            })
+            await response.prepare(request)
+            await response.write(PAYLOAD[:100 * 1024])
+            request.transport.close()  # Ngắt kết nối giữa chừng
+            return response
+
+        app = web.Application()
+        app.router.add_get("/video", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        downloader = TikTokDownloader()
+        await downloader.open(1)
+        try:
+            with pytest.raises((aiohttp.ClientError, IncompleteDownloadError)):
+                await downloader.stream_to_file(f"http://127.0.0.1:{runner.addresses[0][1]}/video", target)
+        finally:
+            await downloader.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+    assert not os.path.exists(target)
+    part_file, meta_file = partial_paths(target)
+    assert os.path.getsize(part_file) > 0
+    with open(meta_file, encoding="utf-8") as f:
+        assert json.load(f) == {"expected_size": len(PAYLOAD), "etag": '"v1"', "last_modified": None}
+    assert handle_partial_file(target)[0] == os.path.getsize(part_file)
+
+
+# --- Phát hiện sớm video được bảo vệ ---
+
+from Down_Chanel.down_api import ProtectedVideoError, MIN_VIDEO_BYTES
+
+
+async def download_from(handle, target):
+    """Gọi download_file với máy chủ cục bộ dùng handle; trả về (lỗi, số request máy chủ nhận được)."""
+    requests = []
+
+    async def counted(request):
+        requests.append(request.path)
+        return await handle(request)
+
+    app = web.Application()
+    app.router.add_get("/video", counted)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    downloader = TikTokDownloader()
+    await downloader.open(1)
+    try:
+        with pytest.raises(ProtectedVideoError) as error:
+            await downloader.download_file("123", f"http://127.0.0.1:{runner.addresses[0][1]}/video", target)
+    finally:
+        await downloader.close()
+        await runner.cleanup()
+    return error.value, requests
+
+
+def respond(body, content_type):
+    async def handle(request):
+        return web.Response(body=body, headers={"Content-Type": content_type})
+    return handle
+
+
+async def respond_chunked(request):
+    # Không có Content-Length: chỉ kiểm tra được kích thước sau khi tải xong
+    response = web.StreamResponse(headers={"Content-Type": "video/mp4"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    await response.write(PAYLOAD[:1024])
+    await response.write_eof()
+    return response
+
+
+HTML_PAGE = b"  <!DOCTYPE html><html>" + b" " * MIN_VIDEO_BYTES + b"</html>"
+JSON_BODY = b'{"statusCode": 10204' + b" " * MIN_VIDEO_BYTES + b"}"
+
+
+@pytest.mark.parametrize("handle, message", [
+    (respond(PAYLOAD[:1024], "video/mp4"), "quá nhỏ"),                             # Content-Length < MIN_VIDEO_BYTES
+    (respond(PAYLOAD, "text/html; charset=utf-8"), "text/html"),                    # Content-Type dạng văn bản
+    (respond(PAYLOAD, "application/json"), "application/json"),                     # Content-Type JSON
+    (respond(HTML_PAGE, "video/mp4"), "HTML/JSON"),                                 # khối đầu là trang HTML
+    (respond(JSON_BODY, "application/octet-stream"), "HTML/JSON"),                  # khối đầu là JSON
+    (respond_chunked, "tải về quá nhỏ"),                                            # không có Content-Length
+], ids=["content-length", "text-type", "json-type", "html-body", "json-body", "chunked-small"])
+def test_protected_video_is_rejected_without_retry(tmp_path, handle, message):
+    target = str(tmp_path / "video.mp4")
+    error, requests = asyncio.run(download_from(handle, target))
+    assert message in str(error)
+    assert requests == ["/video"]  # Không thử lại với video được bảo vệ
+    assert not os.path.exists(target)
+    assert not any(os.path.exists(path) for path in partial_paths(target))
+
+
+def test_protected_response_discards_stale_partial(tmp_path):
+    target = str(tmp_path / "video.mp4")
+    write_partial(target, PAYLOAD[:100 * 1024], expected_size=len(PAYLOAD), etag='"v1"')
+    # Máy chủ bỏ qua Range và trả về trang HTML: phần tải dở cũ cũng bị xóa
+    asyncio.run(download_from(respond(HTML_PAGE, "video/mp4"), target))
+    assert not any(os.path.exists(path) for path in partial_paths(target))
@@ -0,0 +1,228 @@
+# tests/test_pid_tracking.py
+"""PID FFmpeg phải được ghi nhận trong lúc chạy (để dừng/đóng ứng dụng) và chỉ gỡ đúng PID của tác vụ mình."""
+
+from AudioTools import audio_tools_controller
+from AudioTools.audio_tools_controller import AudioToolsController
+from AudioTools.loudness import LoudnessService, LoudnessStats
+from Convert import convert_controller
+from Convert.convert_controller import ConvertController
+from CutMerge import cut_merge_controller
+from CutMerge.cut_merge_controller import CutMergeController
+from CutMerge.auto_segment import MediaEvents
+from VideoTools import video_tools_controller
+from VideoTools.video_tools_controller import VideoToolsController
+from VideoTools.encode_profiles import DEFAULT_PROFILE, PROFILES_BY_KEY
+from Utils.logger_setup import LoggerProvider
+from Utils.job_journal import JobJournal
+
+OTHER_TASK_PID = 111
+
+
+class FakeVar:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class FakeGui:
+    """Giao diện giả: mọi lời gọi cập nhật giao diện đều bị bỏ qua."""
+    def __init__(self):
+        self.root = self
+        self.parallel_merge_var = FakeVar(True)
+
+    def after(self, delay, func=None, *args):
+        pass
+
+    def seconds_to_hhmmss(self, seconds):
+        return str(seconds)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def fake_ffmpeg(pid, seen, controller):
+    """Giả lập một lệnh FFmpeg: gọi on_start rồi ghi lại danh sách PID đang theo dõi lúc đang chạy."""
+    def run(*args, on_start=None, **kwargs):
+        on_start(pid)
+        seen.append(list(controller.active_ffmpeg_pids))
+    return run
+
+
+def make_cut_merge_controller():
+    # Không khởi tạo pygame/bộ phát nghe thử: chỉ cần phần quản lý tác vụ
+    controller = CutMergeController.__new__(CutMergeController)
+    controller.gui = FakeGui()
+    controller.logger = LoggerProvider.get_logger('cut_merge')
+    controller.active_ffmpeg_pids = [OTHER_TASK_PID]
+    controller.is_processing = True
+    controller.task_lock = cut_merge_controller.threading.Lock()
+    controller.active_tasks = 1
+    controller.is_closing = False
+    return controller
+
+
+def test_auto_segment_releases_only_its_own_pids(monkeypatch):
+    controller = make_cut_merge_controller()
+    seen = []
+    monkeypatch.setattr(cut_merge_controller, "get_media_duration", lambda path: 10.0)
+    monkeypatch.setattr(cut_merge_controller, "has_video_stream", lambda path: False)
+
+    def analyze(*args, on_start=None, **kwargs):
+        fake_ffmpeg(222, seen, controller)(on_start=on_start)
+        return MediaEvents()
+    monkeypatch.setattr(cut_merge_controller, "analyze_media_events", analyze)
+
+    controller.run_auto_segment_task("input.wav", "silence", 0.5)
+    assert seen == [[OTHER_TASK_PID, 222]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
+
+
+def fake_parallel_encodes(pids, seen, controller):
+    def run(jobs, on_start=None, **kwargs):
+        for pid in pids:
+            on_start(pid)
+        seen.append(list(controller.active_ffmpeg_pids))
+    return run
+
+
+def test_merge_encode_jobs_keep_other_tasks_pids(monkeypatch):
+    controller = make_cut_merge_controller()
+    seen = []
+    monkeypatch.setattr(cut_merge_controller, "run_parallel_encodes", fake_parallel_encodes([222, 333], seen, controller))
+    controller.run_encode_jobs([object()])
+    assert seen == [[OTHER_TASK_PID, 222, 333]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
+
+
+def make_video_tools_controller(tmp_path):
+    controller = VideoToolsController(FakeGui(), str(tmp_path), thread_pool=None)
+    controller.active_ffmpeg_pids.append(OTHER_TASK_PID)
+    return controller
+
+
+def test_chunked_encode_tracks_chunk_and_concat_pids(monkeypatch, tmp_path):
+    controller = make_video_tools_controller(tmp_path)
+    seen = []
+    monkeypatch.setattr(video_tools_controller, "has_audio_stream", lambda path: True)
+    monkeypatch.setattr(video_tools_controller, "run_parallel_encodes", fake_parallel_encodes([222, 333], seen, controller))
+    monkeypatch.setattr(video_tools_controller, "run_ffmpeg", fake_ffmpeg(444, seen, controller))
+    graph = {"extra_inputs": [], "video_filters": ["[0:v]hflip[v]"], "video_label": "[v]"}
+    controller.run_chunked_encode(str(tmp_path / "out.mp4"), {"video_path": "source.mp4"}, graph,
+                                  [(0.0, 30.0), (30.0, 60.0)], PROFILES_BY_KEY[DEFAULT_PROFILE])
+    assert seen == [[OTHER_TASK_PID, 222, 333], [OTHER_TASK_PID, 222, 333, 444]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
+
+
+def test_conversion_tracks_pid_while_ffmpeg_runs(monkeypatch, tmp_path):
+    controller = ConvertController(FakeGui(), str(tmp_path), thread_pool=None, options_map={})
+    controller.active_ffmpeg_pids.append(OTHER_TASK_PID)
+    seen = []
+
+    def run_multi_output(input_file, outputs, on_start=None, **kwargs):
+        fake_ffmpeg(222, seen, controller)(on_start=on_start)
+        for _, temp_file in outputs:
+            open(temp_file, "wb").close()
+    monkeypatch.setattr(convert_controller, "run_ffmpeg_multi_output", run_multi_output)
+
+    source = tmp_path / "song.wav"
+    source.write_bytes(b"\0" * 64)
+    controller.run_conversion_task(str(source), str(tmp_path), [], {"mp3": ["-c:a", "libmp3lame"]})
+    assert seen == [[OTHER_TASK_PID, 222]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
+    assert (tmp_path / "song.mp3").exists()
+
+
+def test_merge_tracks_pid_while_ffmpeg_runs(monkeypatch, tmp_path):
+    for mode in ("fast", "slow"):
+        controller = make_cut_merge_controller()
+        controller.journal = JobJournal(str(tmp_path), "cut_merge")
+        controller.gui.parallel_merge_var = FakeVar(False)
+        seen = []
+
+        def run_ffmpeg(input_file, output_file, args, on_start=None, **kwargs):
+            fake_ffmpeg(222, seen, controller)(on_start=on_start)
+            open(output_file, "wb").close()
+        monkeypatch.setattr(cut_merge_controller, "run_ffmpeg", run_ffmpeg)
+        monkeypatch.setattr(cut_merge_controller, "has_video_stream", lambda path: False)
+
+        output_dir = tmp_path / mode
+        output_dir.mkdir()
+        controller.run_merge_task(["a.mp3", "b.mp3"], mode, str(output_dir))
+        assert seen == [[OTHER_TASK_PID, 222]], mode
+        assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
+        assert (output_dir / "merged_output.mp3").exists()
+
+
+def make_audio_tools_controller(tmp_path):
+    controller = AudioToolsController(FakeGui(), str(tmp_path), thread_pool=None)
+    controller.active_ffmpeg_pids.append(OTHER_TASK_PID)
+    controller.active_tasks = 1
+    return controller
+
+
+def test_normalization_tracks_measure_and_pass2_pids(monkeypatch, tmp_path):
+    controller = make_audio_tools_controller(tmp_path)
+    seen = []
+
+    def measure(file_path, on_start=None):
+        fake_ffmpeg(222, seen, controller)(on_start=on_start)
+        return LoudnessStats(-20.0, 5.0, -1.0, -30.0, 10.0)
+    controller.loudness = LoudnessService(str(tmp_path), measure=measure)
+
+    def run_ffmpeg(input_file, output_file, args, on_start=None, **kwargs):
+        fake_ffmpeg(333, seen, controller)(on_start=on_start)
+        open(output_file, "wb").close()
+    monkeypatch.setattr(audio_tools_controller, "run_ffmpeg", run_ffmpeg)
+
+    source = tmp_path / "song.mp3"
+    source.write_bytes(b"\0" * 64)
+    controller.run_normalization_task(str(source), -14.0)
+    assert seen == [[OTHER_TASK_PID, 222], [OTHER_TASK_PID, 333]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
+
+
+def test_single_pass_denoise_tracks_pid(monkeypatch, tmp_path):
+    controller = make_audio_tools_controller(tmp_path)
+    seen = []
+
+    def run_ffmpeg(input_file, output_file, args, on_start=None, **kwargs):
+        fake_ffmpeg(222, seen, controller)(on_start=on_start)
+        open(output_file, "wb").close()
+    monkeypatch.setattr(audio_tools_controller, "run_ffmpeg", run_ffmpeg)
+    monkeypatch.setattr(audio_tools_controller, "get_media_duration", lambda path: 5.0)
+
+    source = tmp_path / "voice.wav"
+    source.write_bytes(b"\0" * 64)
+    controller.run_noise_reduction_task(str(source), 0.0001)
+    assert seen == [[OTHER_TASK_PID, 222]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
+
+
+def test_single_encode_tracks_pid(monkeypatch, tmp_path):
+    controller = make_video_tools_controller(tmp_path)
+    seen = []
+    monkeypatch.setattr(video_tools_controller, "run_ffmpeg", fake_ffmpeg(222, seen, controller))
+    graph = {"extra_inputs": [], "video_filters": ["[0:v]hflip[v]"], "video_label": "[v]"}
+    controller.run_single_encode(str(tmp_path / "out.mp4"), {"video_path": "source.mp4"}, graph,
+                                 PROFILES_BY_KEY[DEFAULT_PROFILE])
+    assert seen == [[OTHER_TASK_PID, 222]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
+
+
+def test_preview_releases_frame_pids(monkeypatch, tmp_path):
+    controller = make_video_tools_controller(tmp_path)
+    seen = []
+    monkeypatch.setattr(controller, "probe_output_geometry", lambda path, params: (10.0, None))
+
+    def render(video_path, graph, times, on_start=None):
+        for pid in (222, 333):
+            on_start(pid)
+        seen.append(list(controller.active_ffmpeg_pids))
+        return []
+    monkeypatch.setattr(video_tools_controller, "render_preview_frames", render)
+
+    controller.run_preview_task({"video_paths": ["source.mp4"]})
+    assert seen == [[OTHER_TASK_PID, 222, 333]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
@@ -0,0 +1,61 @@
+# tests/test_preview_engine.py
+
+import time
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from CutMerge import preview_engine
+from CutMerge.preview_engine import PreviewEngine, SAMPLE_RATE, CHANNELS
+
+
+@pytest.fixture
+def mixer(monkeypatch):
+    # Driver "dummy" của SDL vẫn tiêu thụ mẫu theo thời gian thực nhưng không cần card âm thanh
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    pygame.mixer.init(frequency=SAMPLE_RATE, size=-16, channels=CHANNELS)
+    yield
+    pygame.mixer.quit()
+
+
+def test_loop_replays_from_memory_after_first_pass(mixer, make_media, monkeypatch):
+    path = make_media("tone.wav", duration=6.0)
+    starts = []
+    original_start = PreviewEngine._start_decoder
+    def counting_start(self, generation, start_sec):
+        starts.append(start_sec)
+        original_start(self, generation, start_sec)
+    monkeypatch.setattr(PreviewEngine, "_start_decoder", counting_start)
+
+    engine = PreviewEngine()
+    engine.load(path, 6.0)
+    engine.set_loop(1.0, 1.5)
+    engine.play(1.0)
+    positions = []
+    deadline = time.perf_counter() + 2.5
+    while time.perf_counter() < deadline:
+        positions.append(engine.position)
+        time.sleep(0.02)
+    engine.shutdown()
+
+    # Lần phát đầu và vòng ghi lại vùng lặp; các vòng sau không khởi động lại FFmpeg
+    assert starts == [1.0, 1.0]
+    assert engine._loop_cache is not None and engine._loop_cache[0] == (1.0, 1.5)
+    assert min(positions) >= 1.0 and max(positions) <= 1.5 + 0.01
+
+
+def test_shutdown_joins_player_thread(mixer):
+    engine = PreviewEngine()
+    engine.shutdown()
+    assert not engine._player_thread.is_alive()
+
+
+def test_long_loop_region_is_not_cached(mixer, make_media):
+    path = make_media("long.wav", duration=1.0)
+    engine = PreviewEngine()
+    engine.load(path, preview_engine.MAX_LOOP_CACHE_SECONDS + 10)
+    engine.set_loop(0.0, preview_engine.MAX_LOOP_CACHE_SECONDS + 5)
+    engine._loop_back()
+    assert engine._recording is None
+    engine.shutdown()
@@ -0,0 +1,90 @@
+# tests/test_thumbnail_cache.py
+
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from Utils.thumbnail_cache import ThumbnailCache, THUMBNAIL_CACHE_DIR
+
+
+def encode(size, color, format="JPEG", mode="RGB"):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def disk_files(project_root):
+    cache_dir = os.path.join(project_root, "Data", THUMBNAIL_CACHE_DIR)
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith(".png"))
+
+
+def test_jpeg_is_decoded_in_draft_mode(project_root, monkeypatch):
+    decoded_sizes = []
+    original_thumbnail = Image.Image.thumbnail
+    def spy_thumbnail(image, size, *args, **kwargs):
+        decoded_sizes.append(image.size)
+        return original_thumbnail(image, size, *args, **kwargs)
+    monkeypatch.setattr(Image.Image, "thumbnail", spy_thumbnail)
+
+    image = ThumbnailCache(project_root).get(encode((1600, 1200), "red"))
+    # draft() giải mã JPEG ở tỉ lệ 1/8 (200x150), không giải mã đủ 1600x1200 rồi mới thu nhỏ
+    assert decoded_sizes == [(200, 150)]
+    assert image.size == (150, 113) and image.mode == "RGB"
+
+
+@pytest.mark.parametrize("mode, color, expected", [("P", 3, "RGB"), ("L", 128, "RGB"), ("LA", (10, 20), "RGBA")])
+def test_png_modes_are_converted_for_display(project_root, mode, color, expected):
+    image = ThumbnailCache(project_root).get(encode((300, 600), color, format="PNG", mode=mode))
+    assert image.mode == expected and image.size == (75, 150)
+
+
+def test_memory_tier_is_lru(project_root):
+    cache = ThumbnailCache(project_root, memory_items=2)
+    a, b, c = (encode((64, 64), color) for color in ("red", "green", "blue"))
+    first_a = cache.get(a)
+    cache.get(b)
+    assert cache.get(a) is first_a          # lấy từ bộ nhớ, không đọc lại ổ đĩa
+    cache.get(c)                             # b lâu không dùng nhất nên bị bỏ khỏi bộ nhớ
+    assert len(cache._memory) == 2
+    assert cache.get(a) is first_a
+
+
+def test_disk_tier_is_reused_across_instances(project_root, monkeypatch):
+    data = encode((800, 600), "purple")
+    ThumbnailCache(project_root).get(data)
+    assert len(disk_files(project_root)) == 1
+
+    reopened = ThumbnailCache(project_root)
+    monkeypatch.setattr(reopened, "_make_thumbnail", lambda data: pytest.fail("không được giải mã lại ảnh gốc"))
+    image = reopened.get(data)
+    assert image.size == (150, 113)
+
+
+def test_disk_tier_evicts_least_recently_used(project_root):
+    cache = ThumbnailCache(project_root, disk_files=2)
+    images = [encode((64, 64), color) for color in ("red", "green", "blue")]
+    cache.get(images[0])
+    cache.get(images[1])
+    cache_dir = os.path.join(project_root, "Data", THUMBNAIL_CACHE_DIR)
+    oldest, newest = disk_files(project_root)
+    os.utime(os.path.join(cache_dir, oldest), (1000, 1000))
+    os.utime(os.path.join(cache_dir, newest), (2000, 2000))
+    cache.get(images[2])
+    remaining = disk_files(project_root)
+    assert len(remaining) == 2 and oldest not in remaining
+
+
+def test_corrupt_disk_entry_is_regenerated(project_root):
+    data = encode((400, 400), "orange")
+    cache = ThumbnailCache(project_root)
+    cache.get(data)
+    cache_dir = os.path.join(project_root, "Data", THUMBNAIL_CACHE_DIR)
+    (name,) = disk_files(project_root)
+    with open(os.path.join(cache_dir, name), "wb") as f:
+        f.write(b"broken")
+    image = ThumbnailCache(project_root).get(data)
+    assert image.size == (150, 150)
+    with Image.open(os.path.join(cache_dir, name)) as repaired:
+        assert repaired.size == (150, 150)
@@ -0,0 +1,63 @@
+# tests/test_video_preview.py
+
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from VideoTools.preview_engine import build_preview_args, render_preview_frames, sample_times, PREVIEW_WIDTH
+
+NO_FILTERS = {"extra_inputs": [], "video_filters": [], "video_label": "0:v:0"}
+
+
+def test_sample_times_avoid_first_and_last_frame():
+    assert sample_times(None) == [0.0]
+    assert sample_times(8.0) == [1.0, 3.0, 5.0, 7.0]
+    assert sample_times(10.0, count=2) == [2.5, 7.5]
+
+
+def test_args_seek_before_input_and_decode_one_frame():
+    args = build_preview_args("in.mp4", NO_FILTERS, 12.3456)
+    assert args[args.index("-ss") + 1] == "12.346"
+    assert args.index("-ss") < args.index("-i") and args[args.index("-i") + 1] == "in.mp4"
+    assert args[args.index("-frames:v") + 1] == "1"
+    assert args[-1] == "pipe:1" and "-an" in args
+
+
+def test_args_without_filters_only_scale_the_video():
+    args = build_preview_args("in.mp4", NO_FILTERS, 0, width=320)
+    assert args[args.index("-filter_complex") + 1] == "[0:v:0]scale='min(320,iw)':-2[preview]"
+    assert args[args.index("-map") + 1] == "[preview]"
+
+
+def test_args_scale_after_the_task_filter_graph():
+    graph = {
+        "extra_inputs": ["logo.png"],
+        "video_filters": ["[0:v]hflip[v_transformed]", "[v_transformed][1:v]overlay=10:10[v_watermarked]"],
+        "video_label": "[v_watermarked]",
+    }
+    args = build_preview_args("in.mp4", graph, 1.0)
+    assert args[args.index("-i", args.index("-i") + 1) + 1] == "logo.png"
+    assert args[args.index("-filter_complex") + 1] == (
+        "[0:v]hflip[v_transformed];[v_transformed][1:v]overlay=10:10[v_watermarked];"
+        f"[v_watermarked]scale='min({PREVIEW_WIDTH},iw)':-2[preview]"
+    )
+
+
+def test_render_returns_scaled_jpeg_per_sample(make_media, tmp_path):
+    video = make_media("in.mp4", video="testsrc=size=1280x720:rate=25", duration=4)
+    logo = str(tmp_path / "logo.png")
+    Image.new("RGBA", (64, 32), (255, 0, 0, 255)).save(logo)
+    graph = {"extra_inputs": [logo], "video_filters": ["[0:v][1:v]overlay=10:10[v]"], "video_label": "[v]"}
+    pids = []
+    frames = render_preview_frames(video, graph, sample_times(4.0), on_start=pids.append)
+    assert [at for at, _ in frames] == sample_times(4.0)
+    assert len(pids) == len(frames)
+    for _, data in frames:
+        with Image.open(BytesIO(data)) as image:
+            assert image.format == "JPEG" and image.size == (PREVIEW_WIDTH, 270)
+
+
+def test_render_error_is_reported(ffmpeg, tmp_path):
+    with pytest.raises(Exception, match="xem trước"):
+        render_preview_frames(str(tmp_path / "missing.mp4"), NO_FILTERS, [0.0])
@@ -0,0 +1,107 @@
+# tests/test_video_tools_audio.py
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from VideoTools import video_tools_controller
+from VideoTools.video_tools_controller import VideoToolsController
+from VideoTools.encode_profiles import DEFAULT_PROFILE, PROFILES_BY_KEY
+
+
+class FakeGui:
+    def log_status(self, message, level=None):
+        pass
+
+
+@pytest.fixture
+def controller(tmp_path):
+    return VideoToolsController(FakeGui(), str(tmp_path), thread_pool=None)
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    calls = SimpleNamespace(jobs=[], final_args=None)
+    monkeypatch.setattr(video_tools_controller, "has_audio_stream", lambda path: True)
+    monkeypatch.setattr(video_tools_controller, "run_parallel_encodes",
+                        lambda jobs, **kwargs: calls.jobs.extend(jobs))
+    def fake_run_ffmpeg(input_file, output_file, args, **kwargs):
+        calls.final_args = args
+    monkeypatch.setattr(video_tools_controller, "run_ffmpeg", fake_run_ffmpeg)
+    return calls
+
+
+def run_chunked(controller, tmp_path, params):
+    graph = {"extra_inputs": [], "video_filters": ["[0:v]hflip[v]"], "video_label": "[v]"}
+    chunks = [(0.0, 30.0), (30.0, 60.0)]
+    controller.run_chunked_encode(str(tmp_path / "out.mp4"), params, graph, chunks, PROFILES_BY_KEY[DEFAULT_PROFILE])
+
+
+def test_chunked_encode_copies_original_audio(controller, captured, tmp_path):
+    run_chunked(controller, tmp_path, {"video_path": "source.mp4"})
+    assert all("-c:a" not in job.args for job in captured.jobs)
+    args = captured.final_args
+    assert args[args.index("-i", args.index("-i") + 1) + 1] == "source.mp4"
+    assert args[args.index("-c") + 1] == "copy"
+
+
+def test_chunked_encode_copies_new_audio_that_fits_container(controller, captured, tmp_path, monkeypatch):
+    audio = tmp_path / "music.m4a"
+    audio.write_bytes(b"")
+    monkeypatch.setattr(video_tools_controller, "get_audio_codec", lambda path: "aac")
+    run_chunked(controller, tmp_path, {"video_path": "source.mp4", "audio_enabled": True, "audio_path": str(audio)})
+    assert len(captured.jobs) == 2
+    assert str(audio) in captured.final_args
+
+
+def test_chunked_encode_reencodes_new_audio_the_container_cannot_hold(controller, captured, tmp_path, monkeypatch):
+    audio = tmp_path / "music.opus"
+    audio.write_bytes(b"")
+    monkeypatch.setattr(video_tools_controller, "get_audio_codec", lambda path: "opus")
+    run_chunked(controller, tmp_path, {"video_path": "source.mp4", "audio_enabled": True, "audio_path": str(audio)})
+    audio_job = captured.jobs[-1]
+    assert audio_job.args[audio_job.args.index("-c:a") + 1] == "aac"
+    assert audio_job.output_file in captured.final_args
+    assert os.path.basename(audio_job.output_file) == "audio.m4a"
+
+
+@pytest.mark.parametrize("container, codec, expected", [
+    (".mp4", "aac", "copy"),
+    (".mp4", "opus", "aac"),
+    (".mkv", "opus", "copy"),
+    (".webm", "aac", "libopus"),
+    (".webm", "vorbis", "copy"),
+    (".avi", "aac", "libmp3lame"),
+    (".mov", "flac", "aac"),
+])
+def test_new_audio_is_reencoded_for_the_container(controller, tmp_path, monkeypatch, container, codec, expected):
+    audio = tmp_path / "music.audio"
+    audio.write_bytes(b"")
+    monkeypatch.setattr(video_tools_controller, "get_audio_codec", lambda path: codec)
+    params = {"audio_enabled": True, "audio_path": str(audio)}
+    assert controller.audio_codec_args("source" + container, params) == ["-c:a", expected]
+
+
+def test_chunked_webm_encodes_audio_to_opus(controller, captured, tmp_path, monkeypatch):
+    audio = tmp_path / "music.m4a"
+    audio.write_bytes(b"")
+    monkeypatch.setattr(video_tools_controller, "get_audio_codec", lambda path: "aac")
+    graph = {"extra_inputs": [], "video_filters": ["[0:v]hflip[v]"], "video_label": "[v]"}
+    controller.run_chunked_encode(str(tmp_path / "out.webm"), {"video_path": "source.webm", "audio_enabled": True,
+                                  "audio_path": str(audio)}, graph, [(0.0, 30.0), (30.0, 60.0)],
+                                  PROFILES_BY_KEY[DEFAULT_PROFILE])
+    audio_job = captured.jobs[-1]
+    assert audio_job.args[audio_job.args.index("-c:a") + 1] == "libopus"
+    assert os.path.basename(audio_job.output_file) == "audio.opus"
+
+
+def test_aac_track_muxes_into_webm(controller, make_media, tmp_path, monkeypatch):
+    video = make_media("source.webm", audio="sine=frequency=440:sample_rate=48000", video="testsrc=size=160x120:rate=10",
+                       duration=2, extra_args=["-c:v", "libvpx-vp9", "-deadline", "realtime", "-c:a", "libopus"])
+    audio = make_media("music.m4a", duration=2)
+    monkeypatch.setattr(video_tools_controller, "get_audio_codec", lambda path: "aac")
+    output = str(tmp_path / "out.webm")
+    graph = {"extra_inputs": [], "video_filters": [], "video_label": "0:v:0"}
+    controller.run_single_encode(output, {"video_path": video, "audio_enabled": True, "audio_path": audio}, graph, None)
+    assert os.path.getsize(output) > 0
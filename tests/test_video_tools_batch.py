@@ -0,0 +1,101 @@
+# tests/test_video_tools_batch.py
+
+import os
+
+import pytest
+from PIL import Image
+
+from Utils import parallel_encode
+from VideoTools import video_tools_controller
+from VideoTools.video_tools_controller import VideoToolsController
+
+OTHER_TASK_PID = 111
+
+PROBES = {
+    os.path.join("a", "clip.mp4"): (120.0, (1920, 1080, 30.0)),
+    os.path.join("b", "clip.mp4"): (60.0, (1280, 720, 30.0)),
+    "short.mp4": (30.0, (1920, 1080, 30.0)),
+    "broken.mp4": (None, None),
+}
+
+
+class FakeGui:
+    def __init__(self):
+        self.root = self
+        self.messages = []
+
+    def after(self, *args):
+        pass
+
+    def log_status(self, message, level=None):
+        self.messages.append((message, level))
+
+    def finalize_processing(self, operation_name):
+        pass
+
+
+@pytest.fixture
+def controller(monkeypatch, tmp_path):
+    controller = VideoToolsController(FakeGui(), str(tmp_path), thread_pool=None)
+    controller.active_tasks = 1
+    controller.active_ffmpeg_pids.append(OTHER_TASK_PID)
+    monkeypatch.setattr(controller, "probe_output_geometry", lambda path, params: PROBES[path])
+    return controller
+
+
+@pytest.fixture
+def logo_params(tmp_path):
+    logo_path = str(tmp_path / "logo.png")
+    Image.new("RGBA", (400, 200), (255, 0, 0, 128)).save(logo_path)
+    return {"watermark_enabled": True, "watermark_pos": "Dưới-Phải", "watermark_pad": 10,
+            "logo_path": logo_path, "logo_scale": 10.0, "encode_profile": "fast"}
+
+
+def test_batch_builds_one_job_per_readable_video(controller, logo_params, monkeypatch, tmp_path):
+    captured = {}
+    def fake_run_parallel_encodes(jobs, max_workers=None, **kwargs):
+        captured["jobs"], captured["workers"] = jobs, max_workers
+    monkeypatch.setattr(video_tools_controller, "run_parallel_encodes", fake_run_parallel_encodes)
+    monkeypatch.setattr(video_tools_controller, "default_worker_count", lambda: 2)
+    session = str(tmp_path / "session")
+
+    controller.run_batch_task(list(PROBES), session, logo_params)
+
+    jobs = captured["jobs"]
+    assert captured["workers"] == 2
+    # File dài chạy trước, file không đọc được bị bỏ qua, trùng tên thì thêm hậu tố
+    assert [job.duration for job in jobs] == [120.0, 60.0, 30.0]
+    assert [job.output_file for job in jobs] == [
+        os.path.join(session, "clip_processed.mp4"),
+        os.path.join(session, "clip_processed_1.mp4"),
+        os.path.join(session, "short_processed.mp4"),
+    ]
+    threads = str(max(1, (os.cpu_count() or 1) // 2))
+    for job in jobs:
+        assert job.args[job.args.index("-threads") + 1] == threads
+        assert job.args[job.args.index("-preset") + 1] == "fast"
+    # Logo được thu nhỏ một lần cho mỗi độ rộng khung hình
+    logos = [job.args[job.args.index("-i", 2) + 1] for job in jobs]
+    assert logos[0] == logos[2] != logos[1]
+    assert [Image.open(path).size for path in logos[:2]] == [(192, 96), (128, 64)]
+    assert any("broken.mp4" in message for message, level in controller.gui.messages if level == "warning")
+
+
+def test_batch_releases_each_pid_when_its_job_ends(controller, monkeypatch, tmp_path):
+    pids = iter([222, 333, 444])
+    seen = []
+    def fake_iter_ffmpeg_stderr(args, on_start=None):
+        pid = next(pids)
+        on_start(pid)
+        seen.append(list(controller.active_ffmpeg_pids))
+        if pid == 333:
+            raise RuntimeError("FFmpeg lỗi")
+        return iter(())
+    monkeypatch.setattr(parallel_encode, "iter_ffmpeg_stderr", fake_iter_ffmpeg_stderr)
+    monkeypatch.setattr(video_tools_controller, "default_worker_count", lambda: 1)
+
+    controller.run_batch_task([os.path.join("a", "clip.mp4"), os.path.join("b", "clip.mp4"), "short.mp4"],
+                              str(tmp_path / "session"), {"rotate_enabled": True, "rotate_option": "Lật video theo chiều ngang"})
+
+    assert seen == [[OTHER_TASK_PID, 222], [OTHER_TASK_PID, 333], [OTHER_TASK_PID, 444]]
+    assert controller.active_ffmpeg_pids == [OTHER_TASK_PID]
@@ -0,0 +1,87 @@
+# tests/test_waveform.py
+
+import os
+
+import numpy as np
+import pytest
+
+from CutMerge import waveform
+from CutMerge.waveform import Waveform, LEVEL_FACTOR, MIN_LEVEL_BUCKETS, WAVEFORM_CACHE_DIR
+
+
+def make_waveform(bucket_count):
+    mins = -np.arange(bucket_count, dtype=np.int16)
+    maxs = np.arange(bucket_count, dtype=np.int16)
+    return Waveform(waveform._build_pyramid(mins, maxs), 0.01), mins, maxs
+
+
+def test_pyramid_levels_shrink_by_level_factor():
+    wf, mins, maxs = make_waveform(MIN_LEVEL_BUCKETS * LEVEL_FACTOR ** 2 + 3)
+    lengths = [len(level_mins) for level_mins, _ in wf.levels]
+    assert lengths[0] == len(mins)
+    assert all(lengths[i + 1] == lengths[i] // LEVEL_FACTOR for i in range(len(lengths) - 1))
+    assert lengths[-1] <= MIN_LEVEL_BUCKETS < lengths[-2]
+    # Mỗi bucket tầng trên là min/max của LEVEL_FACTOR bucket tầng dưới
+    level1_mins, level1_maxs = wf.levels[1]
+    assert level1_mins[5] == mins[20:24].min() and level1_maxs[5] == maxs[20:24].max()
+
+
+def test_short_waveform_has_single_level():
+    wf, _, _ = make_waveform(MIN_LEVEL_BUCKETS)
+    assert len(wf.levels) == 1
+
+
+def test_get_peaks_returns_requested_columns_and_scaled_extremes():
+    wf, _, maxs = make_waveform(MIN_LEVEL_BUCKETS * LEVEL_FACTOR ** 2)
+    col_mins, col_maxs = wf.get_peaks(100)
+    assert len(col_mins) == len(col_maxs) == 100
+    assert col_maxs[-1] == pytest.approx(maxs[-1] / 32768.0)
+    assert col_mins[-1] == pytest.approx(-maxs[-1] / 32768.0)
+    assert np.all(np.diff(col_maxs) > 0)
+
+
+def test_get_peaks_window_uses_coarsest_sufficient_level(monkeypatch):
+    wf, _, maxs = make_waveform(MIN_LEVEL_BUCKETS * LEVEL_FACTOR ** 2)
+    # 1 giây = 100 bucket tầng 0: với 100 cột chỉ tầng 0 đủ chi tiết
+    col_mins, col_maxs = wf.get_peaks(100, start_sec=2.0, end_sec=3.0)
+    assert len(col_maxs) == 100
+    assert col_maxs[0] == pytest.approx(maxs[200] / 32768.0)
+    # Nhiều cột hơn số bucket: mỗi cột một bucket
+    assert len(wf.get_peaks(1000, start_sec=2.0, end_sec=3.0)[0]) == 100
+
+
+def test_get_peaks_empty_ranges():
+    wf, _, _ = make_waveform(100)
+    assert wf.get_peaks(0) is None
+    assert wf.get_peaks(10, start_sec=5.0, end_sec=5.0) is None
+    assert wf.get_peaks(10, start_sec=50.0, end_sec=60.0) is None
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    wf, _, _ = make_waveform(MIN_LEVEL_BUCKETS * LEVEL_FACTOR + 7)
+    path = str(tmp_path / "wave.npz")
+    wf.save(path)
+    loaded = Waveform.load(path)
+    assert loaded.bucket_seconds == wf.bucket_seconds
+    assert len(loaded.levels) == len(wf.levels)
+    for (a_min, a_max), (b_min, b_max) in zip(loaded.levels, wf.levels):
+        assert np.array_equal(a_min, b_min) and np.array_equal(a_max, b_max)
+
+
+def test_analyze_real_file_and_cache(make_media, project_root):
+    path = make_media("tone.wav", audio="sine=frequency=440:sample_rate=48000", duration=3.0)
+    wf = waveform.get_waveform(path, project_root)
+    assert wf.duration == pytest.approx(3.0, abs=0.05)
+    col_mins, col_maxs = wf.get_peaks(50)
+    assert np.all(col_maxs > 0.05) and np.all(col_mins < -0.05)
+    cache_dir = os.path.join(project_root, "Data", WAVEFORM_CACHE_DIR)
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_failed_decode_raises_and_is_not_cached(ffmpeg, tmp_path, project_root):
+    path = tmp_path / "broken.mp3"
+    path.write_bytes(b"not audio at all" * 1000)
+    with pytest.raises(Exception, match="mã lỗi"):
+        waveform.get_waveform(str(path), project_root)
+    cache_dir = os.path.join(project_root, "Data", WAVEFORM_CACHE_DIR)
+    assert not os.path.isdir(cache_dir) or os.listdir(cache_dir) == []